@@ -1,10 +1,21 @@
 import * as functions from 'firebase-functions';
 import * as admin from 'firebase-admin';
+import * as crypto from 'crypto';
 
 // Inicializar Firebase Admin
 admin.initializeApp();
 
+// Perfilado local (scripts/function_profiler.py): Firestore por REST a través del proxy
+const profileHost = process.env.FUNCTIONS_EMULATOR === 'true' ?
+  process.env.FIRESTORE_PROFILE_HOST : undefined;
+if (profileHost) {
+  process.env.FIRESTORE_EMULATOR_HOST = profileHost;
+}
+
 const db = admin.firestore();
+if (profileHost) {
+  db.settings({ preferRest: true });
+}
 
 // Cloud Function para crear perfil de usuario
 export const createUserProfile = functions.https.onCall(async (data, context) => {
@@ -167,12 +178,15 @@ export const getInitialData = functions.https.onCall(async (data, context) => {
       };
     }
 
-    // Obtener datos básicos de la empresa y collections vacías
-    const [companyDoc] = await Promise.all([
-      db.collection('companies').doc(companyId).get()
-    ]);
+    // Obtener datos de la empresa y métricas precalculadas (scripts/metrics_engine.py)
+    // en un solo batchGet en lugar de dos round trips paralelos
+    const [companyDoc, metricsDoc] = await db.getAll(
+      db.collection('companies').doc(companyId),
+      db.collection('metrics').doc(companyId)
+    );
 
     const companyData = companyDoc.exists ? companyDoc.data() : null;
+    const metricsData = metricsDoc.exists ? metricsDoc.data() : null;
 
     return {
       success: true,
@@ -181,12 +195,12 @@ export const getInitialData = functions.https.onCall(async (data, context) => {
         needsOnboarding: false,
         user: userData,
         company: companyData,
-        // Placeholder data para dashboard vacío
+        // Métricas en centavos; cero mientras no exista metrics/{companyId}
         metrics: {
-          totalRevenue: 0,
-          recoveredRevenue: 0,
-          recoveryRate: 0,
-          activeCustomers: 0
+          totalRevenue: metricsData?.totalRevenue ?? 0,
+          recoveredRevenue: metricsData?.recoveredRevenue ?? 0,
+          recoveryRate: metricsData?.recoveryRate ?? 0,
+          activeCustomers: metricsData?.activeCustomers ?? 0
         },
         recentActivity: []
       }
@@ -205,3 +219,133 @@ export const getInitialData = functions.https.onCall(async (data, context) => {
     );
   }
 });
+
+// Estados de payment_events según el tipo de evento de Stripe
+const STRIPE_EVENT_STATUS: { [type: string]: string } = {
+  'invoice.payment_failed': 'failed',
+  'payment_intent.payment_failed': 'failed',
+  'invoice.payment_succeeded': 'succeeded',
+  'payment_intent.succeeded': 'succeeded',
+  'customer.subscription.updated': 'subscription_updated',
+  'customer.subscription.deleted': 'subscription_deleted'
+};
+
+// Tolerancia de la firma de Stripe (segundos)
+const STRIPE_SIGNATURE_TOLERANCE = 300;
+
+// Verifica el header Stripe-Signature (t=timestamp,v1=hmac_sha256)
+function verifyStripeSignature(payload: Buffer, header: string, secret: string): boolean {
+  const parts: { [key: string]: string[] } = {};
+  for (const item of header.split(',')) {
+    const [key, value] = item.split('=');
+    if (key && value) {
+      (parts[key] = parts[key] || []).push(value);
+    }
+  }
+
+  const timestamp = Number(parts['t']?.[0]);
+  if (!timestamp || Math.abs(Date.now() / 1000 - timestamp) > STRIPE_SIGNATURE_TOLERANCE) {
+    return false;
+  }
+
+  const expected = crypto
+    .createHmac('sha256', secret)
+    .update(`${timestamp}.${payload.toString('utf8')}`)
+    .digest();
+
+  return (parts['v1'] || []).some((signature) => {
+    const candidate = Buffer.from(signature, 'hex');
+    return candidate.length === expected.length && crypto.timingSafeEqual(candidate, expected);
+  });
+}
+
+// Cliente de Stripe del evento: en customer.* el objeto es el propio cliente
+function eventCustomerId(object: any): string | null {
+  const customerId = object.object === 'customer' ? object.id : object.customer;
+  return typeof customerId === 'string' && customerId ? customerId : null;
+}
+
+// Empresa dueña del evento a partir de datos firmados: la cuenta Connect (event.account)
+// o el mapeo customers/{stripeCustomerId}.companyId; nunca de parámetros sin firmar
+async function resolveEventCompany(event: any): Promise<string | null> {
+  if (typeof event.account === 'string') {
+    const companies = await db.collection('companies')
+      .where('stripeAccountId', '==', event.account)
+      .limit(1)
+      .get();
+    if (!companies.empty) {
+      return companies.docs[0].id;
+    }
+  }
+
+  const customerId = eventCustomerId(event.data?.object || {});
+  if (!customerId) {
+    return null;
+  }
+  const customer = await db.collection('customers').doc(customerId).get();
+  const companyId = customer.data()?.companyId;
+  return typeof companyId === 'string' ? companyId : null;
+}
+
+// Webhook de Stripe: guarda cada evento en payment_events/{eventId} (idempotente)
+export const stripeWebhook = functions.https.onRequest(async (req, res) => {
+  if (req.method !== 'POST') {
+    res.status(405).send('Method Not Allowed');
+    return;
+  }
+
+  const secret = process.env.STRIPE_WEBHOOK_SECRET;
+  const signature = req.get('Stripe-Signature');
+  if (!secret || !signature || !verifyStripeSignature(req.rawBody, signature, secret)) {
+    res.status(400).send('Firma inválida');
+    return;
+  }
+
+  const event = req.body;
+  if (!event?.id || !event?.type) {
+    res.status(400).send('Evento inválido');
+    return;
+  }
+
+  const object = event.data?.object || {};
+  // payment_method, charge o customer.source: la tarjeta alimenta el índice de vencimientos
+  const card = object.card || object.payment_method_details?.card ||
+    (object.object === 'card' ? object : null);
+
+  try {
+    const companyId = await resolveEventCompany(event);
+    if (!companyId) {
+      // 200: Stripe no debe reintentar un evento de un cliente que no pertenece a ninguna empresa
+      functions.logger.warn(`Evento ${event.id} sin empresa asociada`);
+      res.status(200).json({ received: true, ignored: true });
+      return;
+    }
+    // ?companyId= (endpoint por empresa) es opcional y solo se acepta si coincide con el firmado
+    if (req.query.companyId !== undefined && req.query.companyId !== companyId) {
+      res.status(400).send('companyId no coincide con el evento');
+      return;
+    }
+
+    // create() falla si el documento ya existe: los reenvíos de Stripe no duplican eventos
+    await db.collection('payment_events').doc(event.id).create({
+      companyId: companyId,
+      customerId: eventCustomerId(object),
+      type: event.type,
+      status: STRIPE_EVENT_STATUS[event.type] || 'other',
+      amount: object.amount_due ?? object.amount ?? 0,
+      currency: object.currency || null,
+      cardExpMonth: card?.exp_month ?? null,
+      cardExpYear: card?.exp_year ?? null,
+      createdAt: admin.firestore.Timestamp.fromMillis((event.created || 0) * 1000),
+      ingestedAt: admin.firestore.FieldValue.serverTimestamp()
+    });
+    res.status(200).json({ received: true });
+  } catch (error: any) {
+    if (error?.code === 6) {
+      res.status(200).json({ received: true, duplicate: true });
+      return;
+    }
+    functions.logger.error('Error al procesar webhook de Stripe:', error);
+    res.status(500).send('Error interno del servidor');
+  }
+});
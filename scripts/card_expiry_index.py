@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Índice de vencimiento de tarjetas por empresa y mes
+Ejecutar: python scripts/card_expiry_index.py --emulator --company <companyId> --days 30
+
+Detección de tarjetas por vencer (PRD 3.3) sin escanear todos los clientes:
+- Buckets por empresa y año-mes de vencimiento (una tarjeta vence al terminar su mes)
+- Mantenido incrementalmente desde customers y payment_events (watermark/offsets)
+- Consulta "tarjetas que vencen en los próximos N días para la empresa X"
+- Iterador en streaming ordenado por fecha de vencimiento para el pipeline de dunning
+- Benchmark contra un escaneo completo (datos sintéticos o sembrados en el emulador)
+"""
+
+import sys
+import json
+import time
+import random
+import calendar
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common import print_colored
+from firestore_emulator import FirestoreEmulator
+from metrics_engine import arrival_time, parse_timestamp, read_collection_with_arrival, read_jsonl_from
+
+INDEX_STATE = Path(".devtools/card_expiry_index.json")
+SECONDS_PER_DAY = 86400
+
+def month_index(year: int, month: int) -> int:
+    """Número de mes absoluto (año * 12 + mes - 1), clave de los buckets"""
+    return year * 12 + month - 1
+
+def month_start(index: int) -> int:
+    """Epoch del primer día del mes absoluto `index`"""
+    return calendar.timegm((index // 12, index % 12 + 1, 1, 0, 0, 0))
+
+def month_of(timestamp: float) -> int:
+    moment = time.gmtime(timestamp)
+    return month_index(moment.tm_year, moment.tm_mon)
+
+def card_expiry_month(record: Dict) -> Optional[int]:
+    """Mes absoluto de vencimiento de la tarjeta de un cliente o evento
+
+    Acepta cardExpMonth/cardExpYear, paymentMethod.{expMonth,expYear} o
+    card.{exp_month,exp_year} de Stripe.
+    """
+    month = record.get('cardExpMonth')
+    year = record.get('cardExpYear')
+    if month is None:
+        method = record.get('paymentMethod') or {}
+        month, year = method.get('expMonth'), method.get('expYear')
+    if month is None:
+        card = record.get('card') or {}
+        month, year = card.get('exp_month'), card.get('exp_year')
+    if month is None or year is None:
+        return None
+    year = int(year)
+    if year < 100:
+        year += 2000
+    return month_index(year, int(month))
+
+def observed_time(record: Dict) -> int:
+    """Momento en que se observó la tarjeta: updatedAt del cliente o llegada del evento"""
+    if record.get('updatedAt') is not None:
+        return parse_timestamp(record['updatedAt'])
+    return arrival_time(record)
+
+def card_expiry(record: Dict) -> Optional[int]:
+    """Epoch en que vence la tarjeta (inicio del mes siguiente a exp_month/exp_year)"""
+    index = card_expiry_month(record)
+    return month_start(index + 1) if index is not None else None
+
+class ExpiryIndex:
+    """Buckets empresa → mes de vencimiento → clientes, con entrada inversa por cliente
+
+    Cada cliente aparece en un solo bucket; una observación más reciente (por momento de
+    llegada) lo mueve de bucket, y una más antigua que la registrada se ignora.
+    """
+
+    def __init__(self):
+        self.buckets = {}  # type: Dict[str, Dict[int, set]]
+        self.entries = {}  # type: Dict[str, Tuple[str, int, int]]
+        # Watermark de llegada por colección (emulador) y offsets por dump JSONL
+        self.watermarks = {}  # type: Dict[str, str]
+        self.offsets = {}  # type: Dict[str, int]
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, path: Path) -> 'ExpiryIndex':
+        index = cls()
+        if not path.exists():
+            return index
+        with open(path, 'r') as f:
+            state = json.load(f)
+        for customer_id, (company_id, month, observed_at) in state['entries'].items():
+            index.observe(company_id, customer_id, month, observed_at)
+        index.watermarks = state['watermarks']
+        index.offsets = state['offsets']
+        return index
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            'entries': self.entries,
+            'watermarks': self.watermarks,
+            'offsets': self.offsets
+        }
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+    def observe(self, company_id: str, customer_id: str, month: int, observed_at: int = 0) -> bool:
+        """Registra la tarjeta vigente del cliente; retorna True si cambió el índice"""
+        current = self.entries.get(customer_id)
+        if current is not None:
+            if observed_at < current[2]:
+                return False
+            if current[0] == company_id and current[1] == month:
+                self.entries[customer_id] = (company_id, month, observed_at)
+                return False
+            self._unlink(customer_id, current)
+        self.entries[customer_id] = (company_id, month, observed_at)
+        self.buckets.setdefault(company_id, {}).setdefault(month, set()).add(customer_id)
+        return True
+
+    def remove(self, customer_id: str):
+        current = self.entries.pop(customer_id, None)
+        if current is not None:
+            self._unlink(customer_id, current)
+
+    def _unlink(self, customer_id: str, entry: Tuple[str, int, int]):
+        company_id, month = entry[0], entry[1]
+        months = self.buckets[company_id]
+        months[month].discard(customer_id)
+        if not months[month]:
+            del months[month]
+
+    def apply_records(self, records: Iterable[Dict], customer_field: str = 'id') -> int:
+        """Aplica documentos de customers (customer_field='id') o payment_events ('customerId')"""
+        changed = 0
+        for record in records:
+            company_id = record.get('companyId')
+            customer_id = record.get(customer_field)
+            month = card_expiry_month(record)
+            if not company_id or not customer_id or month is None:
+                continue
+            if self.observe(company_id, customer_id, month, observed_time(record)):
+                changed += 1
+        return changed
+
+    def _months(self, now: float, days: float, include_expired: bool,
+                months: Iterable[int]) -> List[int]:
+        """Meses cuyo vencimiento cae en (now, now + days] (o antes, con include_expired)"""
+        horizon = now + days * SECONDS_PER_DAY
+        first = month_of(now)
+        return sorted(m for m in months
+                      if (include_expired or m >= first) and month_start(m + 1) <= horizon)
+
+    def expiring(self, company_id: str, days: float, now: Optional[float] = None,
+                 include_expired: bool = False) -> Iterator[Tuple[str, int]]:
+        """(customerId, expira_en) de la empresa que vencen en los próximos `days` días"""
+        now = time.time() if now is None else now
+        months = self.buckets.get(company_id, {})
+        for month in self._months(now, days, include_expired, months):
+            expires_at = month_start(month + 1)
+            for customer_id in sorted(months[month]):
+                yield customer_id, expires_at
+
+    def iter_expiring(self, days: float, now: Optional[float] = None,
+                      companies: Optional[Iterable[str]] = None,
+                      include_expired: bool = False) -> Iterator[Dict]:
+        """Stream de tarjetas por vencer de todas las empresas, ordenado por vencimiento"""
+        now = time.time() if now is None else now
+        company_ids = sorted(companies if companies is not None else self.buckets)
+        all_months = set()
+        for company_id in company_ids:
+            all_months.update(self.buckets.get(company_id, {}))
+        for month in self._months(now, days, include_expired, all_months):
+            expires_at = month_start(month + 1)
+            expires_iso = datetime.fromtimestamp(expires_at, timezone.utc).isoformat().replace('+00:00', 'Z')
+            days_left = round((expires_at - now) / SECONDS_PER_DAY, 1)
+            for company_id in company_ids:
+                for customer_id in sorted(self.buckets.get(company_id, {}).get(month, ())):
+                    yield {
+                        'companyId': company_id,
+                        'customerId': customer_id,
+                        'expiresAt': expires_iso,
+                        'daysLeft': days_left
+                    }
+
+def refresh_from_files(index: ExpiryIndex, customers: Optional[Path], events: Optional[Path]) -> int:
+    """Aplica solo las líneas nuevas de los dumps JSONL desde el último offset"""
+    changed = 0
+    for path, field in ((customers, 'id'), (events, 'customerId')):
+        if path is None:
+            continue
+        records, offset = read_jsonl_from(path, index.offsets.get(str(path), 0))
+        changed += index.apply_records(records, field)
+        index.offsets[str(path)] = offset
+    return changed
+
+def refresh_from_emulator(index: ExpiryIndex, client: FirestoreEmulator) -> int:
+    """Aplica documentos modificados desde el watermark de cada colección
+
+    customers se ordena por updatedAt y payment_events por ingestedAt. La query por rango
+    no ve documentos sin ese campo: mientras existan, la colección se relee completa en
+    cada refresh (observe ignora observaciones repetidas o más antiguas).
+    """
+    changed = 0
+    for collection, field, customer_field in (('customers', 'updatedAt', 'id'),
+                                              ('payment_events', 'ingestedAt', 'customerId')):
+        unseen = client.count_missing_timestamp(collection, field)
+        if unseen:
+            print_colored(f"⚠️ {unseen:,} documentos de {collection} sin {field}: "
+                          f"se relee la colección completa", 'yellow', file=sys.stderr)
+            # El watermark no avanza: sus documentos con el campo se vuelven a aplicar sin cambios
+            changed += index.apply_records(read_collection_with_arrival(client, collection), customer_field)
+            continue
+        latest = index.watermarks.get(collection)
+        records = []
+        for path, data in client.iter_updated_since(collection, field, latest):
+            records.append(dict(data, id=path.rsplit('/', 1)[-1]))
+            latest = data[field]
+        changed += index.apply_records(records, customer_field)
+        if latest:
+            index.watermarks[collection] = latest
+    return changed
+
+def full_scan(records: Iterable[Dict], company_id: str, days: float, now: float) -> List[Tuple[str, int]]:
+    """Línea base: recorre todos los clientes y filtra por empresa y vencimiento"""
+    horizon = now + days * SECONDS_PER_DAY
+    found = []
+    for record in records:
+        if record.get('companyId') != company_id:
+            continue
+        expires_at = card_expiry(record)
+        if expires_at is not None and now < expires_at <= horizon:
+            found.append((record['id'], expires_at))
+    return sorted(found, key=lambda item: (item[1], item[0]))
+
+def synthetic_customers(count: int, num_companies: int, seed: int = 5) -> List[Dict]:
+    """Clientes con vencimientos repartidos en los próximos 5 años"""
+    rng = random.Random(seed)
+    today = datetime.now(timezone.utc)
+    base = month_index(today.year, today.month)
+    customers = []
+    for i in range(count):
+        month = base + rng.randint(-6, 60)
+        customers.append({
+            'id': f"cus_{i:08d}",
+            'companyId': f"company_{rng.randrange(num_companies)}",
+            'cardExpMonth': month % 12 + 1,
+            'cardExpYear': month // 12,
+            'updatedAt': today
+        })
+    return customers
+
+def run_benchmark(count: int, num_companies: int, days: float, client: Optional[FirestoreEmulator]):
+    """Compara consultas por empresa con el índice vs un escaneo completo"""
+    print_colored(f"⏱️ Benchmark: {count:,} clientes, {num_companies} empresas, "
+                  f"ventana de {days:g} días", 'cyan')
+    customers = synthetic_customers(count, num_companies)
+    now = time.time()
+    sample = [f"company_{i}" for i in range(min(num_companies, 20))]
+
+    if client is not None:
+        print_colored("  🌱 Sembrando customers en el emulador...", 'white')
+        client.set_documents((f"customers/{c['id']}", c) for c in customers)
+
+    started = time.perf_counter()
+    index = ExpiryIndex()
+    if client is not None:
+        refresh_from_emulator(index, client)
+    else:
+        index.apply_records(customers)
+    build_time = time.perf_counter() - started
+    print_colored(f"  🏗️ Índice construido en {build_time:.2f}s ({len(index):,} tarjetas)", 'white')
+
+    started = time.perf_counter()
+    indexed = {company: list(index.expiring(company, days, now)) for company in sample}
+    index_time = (time.perf_counter() - started) / len(sample)
+
+    started = time.perf_counter()
+    for company in sample:
+        # El escaneo real relee la colección completa en cada consulta
+        records = (dict(data, id=path.rsplit('/', 1)[-1]) for path, data in
+                   client.iter_documents('customers')) if client is not None else customers
+        baseline = full_scan(records, company, days, now)
+        if baseline != indexed[company]:
+            print_colored(f"  ❌ Resultado distinto al escaneo completo para {company}", 'red')
+            return 1
+    scan_time = (time.perf_counter() - started) / len(sample)
+
+    found = sum(len(v) for v in indexed.values()) / len(sample)
+    print_colored(f"  🔎 Índice: {index_time * 1000:.3f} ms/consulta "
+                  f"(~{found:,.0f} tarjetas por empresa)", 'green')
+    print_colored(f"  🐢 Escaneo completo: {scan_time * 1000:.1f} ms/consulta "
+                  f"({scan_time / max(index_time, 1e-9):,.0f}x más lento)", 'yellow')
+
+    started = time.perf_counter()
+    updates = synthetic_customers(min(count, 10_000), num_companies, seed=9)
+    index.apply_records(dict(c, ingestedAt=now + 1) for c in updates)
+    elapsed = time.perf_counter() - started
+    print_colored(f"  ♻️ Actualización incremental: {len(updates) / elapsed:,.0f} cambios/s", 'white')
+    return 0
+
+def main():
+    """Función principal del índice de vencimientos"""
+    parser = argparse.ArgumentParser(description="Índice de tarjetas por vencer")
+    parser.add_argument('--customers', type=Path, help="Dump JSONL de customers")
+    parser.add_argument('--events', type=Path, help="Dump JSONL de payment_events")
+    parser.add_argument('--emulator', action='store_true', help="Actualizar desde el Firestore Emulator")
+    parser.add_argument('--state', type=Path, default=INDEX_STATE, help="Archivo de estado del índice")
+    parser.add_argument('--rebuild', action='store_true', help="Descartar el estado y reconstruir")
+    parser.add_argument('--company', help="Consultar tarjetas por vencer de una empresa")
+    parser.add_argument('--days', type=float, default=30, help="Ventana de vencimiento en días")
+    parser.add_argument('--include-expired', action='store_true', help="Incluir tarjetas ya vencidas")
+    parser.add_argument('--stream', action='store_true', help="Emitir JSONL de todas las empresas")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark con N clientes")
+    parser.add_argument('--companies', type=int, default=100, help="Empresas en el benchmark")
+    args = parser.parse_args()
+
+    client = FirestoreEmulator() if args.emulator else None
+    try:
+        if args.benchmark:
+            return run_benchmark(args.benchmark, args.companies, args.days, client)
+
+        index = ExpiryIndex() if args.rebuild else ExpiryIndex.load(args.state)
+        started = time.perf_counter()
+        if client is not None:
+            changed = refresh_from_emulator(index, client)
+        else:
+            changed = refresh_from_files(index, args.customers, args.events)
+        index.save(args.state)
+        print_colored(f"💳 Índice actualizado: {changed:,} cambios, {len(index):,} tarjetas "
+                      f"({time.perf_counter() - started:.2f}s)", 'green', file=sys.stderr)
+
+        if args.stream:
+            for item in index.iter_expiring(args.days, include_expired=args.include_expired):
+                print(json.dumps(item))
+        elif args.company:
+            now = time.time()
+            expiring = list(index.expiring(args.company, args.days, now, args.include_expired))
+            print_colored(f"📅 {len(expiring)} tarjeta(s) de {args.company} vencen en "
+                          f"{args.days:g} días", 'cyan', file=sys.stderr)
+            for customer_id, expires_at in expiring:
+                print(f"{customer_id}\t{datetime.fromtimestamp(expires_at, timezone.utc):%Y-%m-%d}")
+    except Exception as e:
+        print_colored(f"❌ Error en el índice de vencimientos: {e}", 'red', file=sys.stderr)
+        return 1
+    finally:
+        if client is not None:
+            client.close()
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Motor de scoring de riesgo de churn por cliente
+Ejecutar: python scripts/churn_scoring.py --customers dump/customers.jsonl --events dump/payment_events.jsonl
+
+Churn prediction scoring y segmentación por riesgo (PRD 3.4):
+- Carga customers y payment_events en arrays NumPy columnares
+- Features por cliente: racha de pagos fallidos, días hasta el vencimiento de la
+  tarjeta, historial de recuperación, monto fallido reciente, días desde el último pago
+- Calcula el score de todos los clientes en una sola pasada vectorizada
+- Escribe riskScore/riskSegment en customers/ por lotes (merge) o a JSONL
+- Modo multiproceso opcional (--workers N) para tenants grandes
+
+Requiere NumPy: pip install numpy
+"""
+
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from common import print_colored
+from card_expiry_index import card_expiry
+from firestore_emulator import FirestoreEmulator
+from metrics_engine import (CompanyIndex, EventColumns, KIND_FAILED, KIND_RECOVERED,
+                            KIND_SUCCEEDED, SECONDS_PER_DAY, read_collection, read_jsonl,
+                            synthetic_columns)
+
+# Pesos del modelo logístico (z = bias + Σ peso · feature normalizada)
+DEFAULT_WEIGHTS = {
+    'bias': -3.0,
+    'failed_streak': 1.1,
+    'card_expiring': 1.6,
+    'unrecovered_ratio': 1.4,
+    'failed_amount_90d': 0.35,
+    'inactivity': 0.45
+}
+
+SEGMENTS = ['low', 'medium', 'high']
+SEGMENT_THRESHOLDS = (0.3, 0.6)
+
+# Valores usados cuando falta información del cliente
+NO_CARD_DAYS = 3650
+MAX_INACTIVITY_DAYS = 180
+
+class CustomerColumns:
+    """customers en formato columnar; el índice de cada cliente coincide con EventColumns.customer"""
+
+    def __init__(self, ids: List[str], company: np.ndarray, expiry: np.ndarray):
+        self.ids = ids
+        self.company = company
+        self.expiry = expiry
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], companies: CompanyIndex,
+                     positions: Dict[str, int]) -> 'CustomerColumns':
+        """Registra cada cliente en `positions` (id → índice) y extrae sus columnas"""
+        ids, company, expiry = [], [], []
+        for customer in records:
+            customer_id = customer.get('id')
+            if not customer_id or customer_id in positions:
+                continue
+            positions[customer_id] = len(ids)
+            ids.append(customer_id)
+            company.append(companies.get(customer.get('companyId') or ''))
+            expiry.append(card_expiry(customer) or -1)
+        return cls(ids, np.array(company, dtype=np.int32), np.array(expiry, dtype=np.int64))
+
+def compute_features(events: EventColumns, num_customers: int, expiry: np.ndarray,
+                     now: int) -> Dict[str, np.ndarray]:
+    """Features de todos los clientes con operaciones vectorizadas (sin loops por cliente)"""
+    customer = events.customer
+    created_at = events.created_at
+    kind = events.kind
+
+    success = (kind == KIND_SUCCEEDED) | (kind == KIND_RECOVERED)
+    failed = kind == KIND_FAILED
+
+    last_success = np.full(num_customers, -1, dtype=np.int64)
+    np.maximum.at(last_success, customer[success], created_at[success])
+
+    # Racha actual: fallos posteriores al último pago exitoso
+    streak_mask = failed & (created_at > last_success[customer])
+    failed_streak = np.bincount(customer[streak_mask], minlength=num_customers)
+
+    failed_count = np.bincount(customer[failed], minlength=num_customers)
+    recovered_count = np.bincount(customer[kind == KIND_RECOVERED], minlength=num_customers)
+    recent_failed = failed & (created_at >= now - 90 * SECONDS_PER_DAY)
+    failed_amount_90d = np.bincount(customer[recent_failed], weights=events.amount[recent_failed],
+                                    minlength=num_customers)
+
+    days_since_success = np.where(last_success >= 0, (now - last_success) / SECONDS_PER_DAY,
+                                  MAX_INACTIVITY_DAYS)
+    days_to_expiry = np.where(expiry >= 0, (expiry - now) / SECONDS_PER_DAY, NO_CARD_DAYS)
+    recovery_rate = np.where(failed_count > 0, recovered_count / np.maximum(failed_count, 1), 1.0)
+
+    return {
+        'failedStreak': failed_streak,
+        'daysToCardExpiry': np.round(days_to_expiry, 1),
+        'failedPayments': failed_count,
+        'recoveryRate': np.round(recovery_rate, 4),
+        'failedAmount90d': np.rint(failed_amount_90d).astype(np.int64),
+        'daysSinceLastPayment': np.round(np.clip(days_since_success, 0, MAX_INACTIVITY_DAYS), 1)
+    }
+
+def score(features: Dict[str, np.ndarray], weights: Dict[str, float] = DEFAULT_WEIGHTS) -> np.ndarray:
+    """Score de riesgo en [0, 1] con un modelo logístico sobre features normalizadas"""
+    has_failures = features['failedPayments'] > 0
+    z = (weights['bias']
+         + weights['failed_streak'] * np.minimum(features['failedStreak'], 5)
+         # Sigmoide centrada en 30 días: tarjetas vencidas o por vencer pesan ~1
+         + weights['card_expiring'] / (1 + np.exp((features['daysToCardExpiry'] - 30) / 7))
+         + weights['unrecovered_ratio'] * (1 - features['recoveryRate']) * has_failures
+         + weights['failed_amount_90d'] * np.log1p(features['failedAmount90d'] / 100)
+         + weights['inactivity'] * np.minimum(features['daysSinceLastPayment'] / 30, 6))
+    return 1 / (1 + np.exp(-z))
+
+def segment(scores: np.ndarray) -> np.ndarray:
+    """Índice de segmento (0=low, 1=medium, 2=high) por cliente"""
+    return np.searchsorted(np.array(SEGMENT_THRESHOLDS), scores, side='right')
+
+def _score_shard(args) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """Worker: puntúa el rango de clientes [start, end) con sus eventos"""
+    start, end, customer, created_at, kind, amount, expiry, now, weights = args
+    events = EventColumns(np.zeros(len(customer), dtype=np.int32), customer - start,
+                          amount, kind, created_at)
+    features = compute_features(events, end - start, expiry, now)
+    scores = score(features, weights)
+    return scores, segment(scores), features
+
+def score_customers(events: EventColumns, expiry: np.ndarray, now: int,
+                    weights: Dict[str, float] = DEFAULT_WEIGHTS, workers: int = 1):
+    """Puntúa a todos los clientes; con workers > 1 reparte rangos de clientes entre procesos"""
+    num_customers = len(expiry)
+    if workers <= 1:
+        features = compute_features(events, num_customers, expiry, now)
+        scores = score(features, weights)
+        return scores, segment(scores), features
+
+    # Particionar por rangos contiguos de cliente para que cada worker sea independiente
+    order = np.argsort(events.customer, kind='stable')
+    sorted_customer = events.customer[order]
+    bounds = np.linspace(0, num_customers, workers + 1).astype(np.int64)
+    cuts = np.searchsorted(sorted_customer, bounds)
+    shards = []
+    for i in range(workers):
+        part = order[cuts[i]:cuts[i + 1]]
+        shards.append((int(bounds[i]), int(bounds[i + 1]), events.customer[part],
+                       events.created_at[part], events.kind[part], events.amount[part],
+                       expiry[bounds[i]:bounds[i + 1]], now, weights))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(_score_shard, shards))
+    scores = np.concatenate([p[0] for p in parts])
+    segments = np.concatenate([p[1] for p in parts])
+    features = {name: np.concatenate([p[2][name] for p in parts]) for name in parts[0][2]}
+    return scores, segments, features
+
+def score_documents(ids: List[str], scores: np.ndarray, segments: np.ndarray,
+                    features: Dict[str, np.ndarray]) -> Iterable[Tuple[str, Dict]]:
+    """Genera (customers/{id}, campos de riesgo) para escribir con merge"""
+    scored_at = datetime.now(timezone.utc)
+    columns = {name: values.tolist() for name, values in features.items()}
+    rounded = np.round(scores, 4).tolist()
+    segment_list = segments.tolist()
+    for i, customer_id in enumerate(ids):
+        yield f"customers/{customer_id}", {
+            'riskScore': rounded[i],
+            'riskSegment': SEGMENTS[segment_list[i]],
+            'riskFeatures': {name: values[i] for name, values in columns.items()},
+            'riskScoredAt': scored_at
+        }
+
+def run_benchmark(count: int, events_per_customer: int, workers: int):
+    """Mide clientes/segundo con datos sintéticos"""
+    total_events = count * events_per_customer
+    print_colored(f"⏱️ Benchmark: {count:,} clientes, {total_events:,} eventos, "
+                  f"{workers} proceso(s)", 'cyan')
+    events, _ = synthetic_columns(total_events, num_companies=100, customers_per_company=count)
+    rng = np.random.default_rng(11)
+    now = int(events.created_at.max())
+    expiry = now + rng.integers(-30, 720, count, dtype=np.int64) * SECONDS_PER_DAY
+
+    started = time.perf_counter()
+    scores, segments, _ = score_customers(events, expiry, now, workers=workers)
+    elapsed = time.perf_counter() - started
+    distribution = np.bincount(segments, minlength=len(SEGMENTS))
+    print_colored(f"  🧮 {count / elapsed:,.0f} clientes/s ({elapsed:.2f}s)", 'green')
+    print_colored("  📊 Segmentos: " + ", ".join(f"{name}={int(n):,}" for name, n in
+                                                zip(SEGMENTS, distribution)), 'white')
+
+def main():
+    """Función principal del scoring de churn"""
+    parser = argparse.ArgumentParser(description="Scoring vectorizado de riesgo de churn")
+    parser.add_argument('--customers', type=Path, help="Dump JSONL de customers")
+    parser.add_argument('--events', type=Path, help="Dump JSONL de payment_events")
+    parser.add_argument('--emulator', action='store_true', help="Leer desde el Firestore Emulator")
+    parser.add_argument('--write', action='store_true', help="Escribir scores en customers/ del emulador")
+    parser.add_argument('--output', type=Path, help="Escribir scores a un archivo JSONL")
+    parser.add_argument('--weights', type=Path, help="JSON con pesos del modelo")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para tenants grandes")
+    parser.add_argument('--batch-size', type=int, default=500, help="Documentos por commit")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark con N clientes sintéticos")
+    parser.add_argument('--events-per-customer', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.events_per_customer, args.workers)
+        return 0
+
+    if not args.emulator and not (args.customers and args.events):
+        parser.print_help()
+        return 1
+
+    weights = dict(DEFAULT_WEIGHTS)
+    if args.weights:
+        with open(args.weights, 'r') as f:
+            weights.update(json.load(f))
+
+    print_colored("🎯 Calculando riesgo de churn...", 'green')
+    client = FirestoreEmulator() if (args.emulator or args.write) else None
+    try:
+        started = time.perf_counter()
+        companies = CompanyIndex()
+        positions = {}
+        customer_records = read_collection(client, 'customers') if args.emulator \
+            else read_jsonl(args.customers)
+        customers = CustomerColumns.from_records(customer_records, companies, positions)
+        event_records = read_collection(client, 'payment_events') if args.emulator \
+            else read_jsonl(args.events)
+        events = EventColumns.from_records(event_records, companies, positions)
+
+        # Eventos de clientes sin documento en customers/ se descartan
+        known = events.customer < len(customers)
+        events = EventColumns(events.company[known], events.customer[known], events.amount[known],
+                              events.kind[known], events.created_at[known])
+        loaded = time.perf_counter()
+        print_colored(f"  📥 {len(customers):,} clientes y {len(events):,} eventos cargados "
+                      f"en {loaded - started:.2f}s", 'white')
+
+        scores, segments, features = score_customers(events, customers.expiry, int(time.time()),
+                                                     weights, args.workers)
+        scored = time.perf_counter()
+        print_colored(f"  🧮 Scoring en {scored - loaded:.3f}s "
+                      f"({len(customers) / max(scored - loaded, 1e-9):,.0f} clientes/s)", 'white')
+        distribution = np.bincount(segments, minlength=len(SEGMENTS))
+        print_colored("  📊 Segmentos: " + ", ".join(f"{name}={int(n):,}" for name, n in
+                                                    zip(SEGMENTS, distribution)), 'white')
+
+        documents = score_documents(customers.ids, scores, segments, features)
+        if args.write:
+            written = client.set_documents(documents, args.batch_size, merge=True)
+            print_colored(f"  ✅ {written:,} clientes actualizados en {time.perf_counter() - scored:.2f}s", 'green')
+        elif args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                for path, data in documents:
+                    record = dict(data, id=path.split('/', 1)[1], riskScoredAt=data['riskScoredAt'].isoformat())
+                    f.write(json.dumps(record) + "\n")
+            print_colored(f"  ✅ Scores escritos en {args.output}", 'green')
+    except Exception as e:
+        print_colored(f"❌ Error calculando riesgo: {e}", 'red')
+        return 1
+    finally:
+        if client is not None:
+            client.close()
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+CLI único de scripts/ con subcomandos de carga diferida
+Ejecutar: python scripts/cli.py validate test deploy
+
+- Cada subcomando importa su módulo solo al ejecutarse (arranque mínimo)
+- Varios subcomandos en una invocación comparten el proceso: probes de
+  versiones y resultados ya obtenidos se reutilizan (history.py)
+- Los argumentos van después de su subcomando; `+` separa explícitamente:
+    python scripts/cli.py history report --tool test
+    python scripts/cli.py coldstart --check + deploy
+- `startup` mide con `-X importtime` el arranque y el import de cada subcomando
+  contra un presupuesto
+"""
+
+import os
+import sys
+
+from common import print_colored
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# nombre → (módulo en scripts/, descripción)
+COMMANDS = {
+    'setup': ('setup_improved', "Configuración automática completa"),
+    'validate': ('validate_setup_improved', "Validar entorno de desarrollo"),
+    'dev': ('dev', "Iniciar desarrollo local"),
+    'test': ('test', "Ejecutar tests automatizados"),
+    'deploy': ('deploy', "Deploy a producción"),
+    'history': ('history', "Historial de ejecuciones y tendencias"),
+    'coldstart': ('coldstart_analyzer', "Cold start y carga de módulos de Functions"),
+    'profile': ('function_profiler', "Lecturas de Firestore por callable function"),
+    'index-advisor': ('index_advisor', "Índices compuestos desde el log de consultas"),
+    'firestore-backup': ('firestore_backup', "Backup y restore del Firestore Emulator"),
+    'metrics': ('metrics_engine', "Precalcular métricas del dashboard"),
+    'churn': ('churn_scoring', "Score de riesgo de churn"),
+    'card-expiry': ('card_expiry_index', "Índice de tarjetas por vencer"),
+    'dunning': ('dunning_scheduler', "Scheduler de reintentos y notificaciones"),
+    'render': ('template_renderer', "Renderizar templates de email/SMS"),
+    'send': ('outbound_sender', "Enviar mensajes por SendGrid/Twilio"),
+    'crm-export': ('crm_export', "Exportar clientes a HubSpot/Salesforce"),
+    'webhook-replay': ('webhook_replay', "Replay de webhooks de Stripe"),
+    'stacks': ('emulator_stacks', "Stacks de emuladores aislados en paralelo"),
+    'reset': ('emulator_reset', "Limpiar Firestore/Auth Emulator entre tests"),
+    'functions-diff': ('functions_diff', "Deploy selectivo de Functions por diff de exports"),
+    'hosting-cache': ('hosting_cache', "Fingerprinting y headers de caché de Hosting"),
+    'logs': ('log_analyzer', "Latencias y errores de los logs de emuladores"),
+    'slo-gate': ('slo_gate', "SLO post-deploy con rollback automático"),
+    'deps': ('dependency_bloat', "Peso de dependencias y deltas entre commits"),
+    'startup': (None, "Medir el tiempo de arranque de este CLI"),
+}
+
+SEPARATOR = '+'
+
+# Presupuesto de imports propios del CLI (sin contar el arranque del intérprete)
+STARTUP_BUDGET_MS = 15.0
+
+# Presupuesto de imports al despachar cada subcomando (su módulo y lo que importa)
+COMMAND_BUDGET_MS = 150.0
+NUMPY_BUDGET_MS = 400.0
+NUMPY_COMMANDS = {'metrics', 'churn', 'card-expiry', 'dunning'}
+
+# Módulos que el intérprete importa antes de ejecutar cualquier script
+INTERPRETER_MODULES = {'site', 'encodings', 'codecs', 'io', 'abc', 'zipimport', '_signal',
+                       '_frozen_importlib_external', 'sitecustomize', 'usercustomize'}
+
+def show_help():
+    print_colored("🚀 Revenue Recovery SaaS - scripts", 'green')
+    print()
+    print("Uso: python scripts/cli.py <comando> [args] [<comando> [args] ...]")
+    print()
+    print("📋 Comandos disponibles:")
+    for name, (_, description) in COMMANDS.items():
+        print(f"  {name:<17} - {description}")
+    print()
+    print("🔗 Encadenar: python scripts/cli.py validate test deploy")
+    print("📖 Documentación: docs/HISTORIA_1_1_SETUP.md")
+
+def split_commands(argv):
+    """Divide argv en [(comando, args)]; un nombre de comando o `+` inicia el siguiente
+
+    Un nombre de comando justo después de una opción sin `=` se toma como su valor
+    (`--tool test`); usar `+` para forzar el corte en ese caso.
+    """
+    segments = []
+    for token in argv:
+        previous = segments[-1][1][-1] if segments and segments[-1][1] else None
+        takes_value = previous is not None and previous.startswith('-') and '=' not in previous
+        if token == SEPARATOR:
+            segments.append((None, []))
+        elif not segments or segments[-1][0] is None:
+            if segments:
+                segments.pop()
+            segments.append((token, []))
+        elif token in COMMANDS and not takes_value:
+            segments.append((token, []))
+        else:
+            segments[-1][1].append(token)
+    return [(name, args) for name, args in segments if name is not None]
+
+def run_module(name, args):
+    """Importa el módulo del comando y ejecuta su main() con sus argumentos"""
+    import importlib
+
+    module_name = COMMANDS[name][0]
+    module = importlib.import_module(module_name)
+    saved_argv = sys.argv
+    sys.argv = [f"scripts/{module_name}.py"] + args
+    try:
+        result = module.main()
+    except SystemExit as e:
+        result = e.code
+    finally:
+        sys.argv = saved_argv
+    if result is None:
+        return 0
+    return result if isinstance(result, int) else 1
+
+def parse_importtime(stderr):
+    """Retorna [(módulo, self µs, acumulado µs, nivel)] de la salida de -X importtime"""
+    entries = []
+    for line in stderr.splitlines():
+        fields = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = fields
+        # Formato: "import time: <self> | <acumulado> | <sangría de 2 por nivel><nombre>"
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative), depth))
+    return entries
+
+def measure_imports(command, runs, cwd=None):
+    """Mediana de los imports propios de `command` con -X importtime
+
+    Retorna (ms, [(módulo, µs acumulados)]) o (None, stderr) si el proceso falla.
+    """
+    import subprocess
+
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime'] + command,
+                                capture_output=True, text=True, cwd=cwd)
+        if result.returncode != 0:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            return None, "\n".join(errors)
+        entries = parse_importtime(result.stderr)
+        own = [(name, cumulative) for name, _, cumulative, depth in entries
+               if depth == 0 and name.split('.')[0] not in INTERPRETER_MODULES]
+        samples.append((sum(cumulative for _, cumulative in own) / 1000, own))
+    samples.sort(key=lambda item: item[0])
+    return samples[len(samples) // 2]
+
+def missing_dependency(stderr):
+    """Nombre del paquete externo faltante si el import falló solo por eso"""
+    import re
+
+    match = re.search(r"ModuleNotFoundError: No module named '([\w.]+)'", stderr)
+    if not match:
+        return None
+    name = match.group(1).split('.')[0]
+    local = {module for module, _ in COMMANDS.values() if module}
+    return None if name in local or os.path.exists(os.path.join(SCRIPTS_DIR, f"{name}.py")) else name
+
+def run_startup(args):
+    """Mide los imports de `cli.py --help` y de cada subcomando en procesos nuevos"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="scripts/cli.py startup",
+                                     description="Tiempo de arranque del CLI y de cada subcomando")
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                        help="Máximo de imports propios del CLI en ms")
+    parser.add_argument('--command-budget-ms', type=float, default=COMMAND_BUDGET_MS,
+                        help="Máximo de imports de cada subcomando en ms")
+    parser.add_argument('--runs', type=int, default=5, help="Procesos a medir (se usa la mediana)")
+    parser.add_argument('--command-runs', type=int, default=3, help="Procesos a medir por subcomando")
+    parser.add_argument('--only-cli', action='store_true', help="No medir los subcomandos")
+    parser.add_argument('--check', action='store_true', help="Salir con error si se excede el presupuesto")
+    options = parser.parse_args(args)
+
+    total_ms, own = measure_imports([__file__, '--help'], options.runs)
+    failed = total_ms is None or total_ms > options.budget_ms
+    if total_ms is None:
+        print_colored(f"❌ cli.py --help falló:\n{own}", 'red')
+    else:
+        print_colored(f"⏱️ Imports propios del CLI: {total_ms:.1f} ms (presupuesto {options.budget_ms:.1f} ms)", 'cyan')
+        for name, cumulative in sorted(own, key=lambda item: -item[1])[:10]:
+            print_colored(f"   {cumulative / 1000:>7.2f} ms  {name}", 'white')
+
+    if not options.only_cli:
+        # El despacho diferido importa el módulo del subcomando: se mide cada uno por separado
+        print_colored(f"\n⏱️ Imports de cada subcomando (presupuesto {options.command_budget_ms:.0f} ms,"
+                      f" NumPy {NUMPY_BUDGET_MS:.0f} ms):", 'cyan')
+        for name, (module, _) in COMMANDS.items():
+            if module is None:
+                continue
+            budget = NUMPY_BUDGET_MS if name in NUMPY_COMMANDS else options.command_budget_ms
+            ms, detail = measure_imports(['-c', f"import {module}"], options.command_runs, cwd=SCRIPTS_DIR)
+            if ms is None:
+                missing = missing_dependency(detail)
+                if missing:
+                    print_colored(f"   {'-':>7}     {name:<17} sin medir: falta {missing}", 'yellow')
+                else:
+                    failed = True
+                    print_colored(f"   {'-':>7}     {name:<17} ❌ el import falló: {detail.splitlines()[-1] if detail else ''}", 'red')
+                continue
+            color = 'white'
+            if ms > budget:
+                failed = True
+                color = 'red'
+            print_colored(f"   {ms:>7.1f} ms  {name:<17} {module}", color)
+
+    if failed:
+        print_colored("❌ Arranque fuera de presupuesto: mover imports a las funciones que los usan", 'red')
+        return 1 if options.check else 0
+    print_colored("✅ Arranque dentro del presupuesto", 'green')
+    return 0
+
+def main():
+    """Función principal del CLI"""
+    argv = sys.argv[1:]
+    if not argv or argv[0] in ('-h', '--help'):
+        show_help()
+        return 0 if argv else 1
+
+    segments = split_commands(argv)
+    unknown = [name for name, _ in segments if name not in COMMANDS]
+    if unknown:
+        print_colored(f"❌ Comando desconocido: {unknown[0]}", 'red')
+        print()
+        print(f"📋 Comandos válidos: {', '.join(COMMANDS)}")
+        return 1
+
+    for index, (name, args) in enumerate(segments):
+        if len(segments) > 1:
+            print_colored(f"\n▶️ [{index + 1}/{len(segments)}] {name} {' '.join(args)}".rstrip(), 'cyan')
+        exit_code = run_startup(args) if name == 'startup' else run_module(name, args)
+        if exit_code != 0:
+            if len(segments) > 1:
+                print_colored(f"❌ {name} terminó con código {exit_code}; se detiene la cadena", 'red')
+            return exit_code
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
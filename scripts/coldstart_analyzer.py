@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Analizador de cold start y carga de módulos de Cloud Functions
+Ejecutar: python scripts/coldstart_analyzer.py [--emulator] [--check]
+
+- Compila backend/functions (`npm run build`) y carga lib/index.js en procesos
+  Node nuevos, uno por function exportada (FUNCTION_TARGET como en producción)
+- Mide tiempo de carga del módulo, memoria residente y heap por function
+- Atribuye el tiempo de carga a cada import (tiempo propio por paquete) para
+  ver qué dependencias dominan el cold start
+- Con --emulator compara la primera invocación tras recargar el código (cold)
+  contra invocaciones siguientes (warm) a través del Functions Emulator
+- Guarda cada ejecución en .devtools/history.db (tool `coldstart`); --check
+  falla si la carga empeora respecto a la mediana de ejecuciones anteriores
+  (código REGRESSION_EXIT_CODE; 1 = no se pudo medir)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import http.client
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common import print_colored
+from firestore_emulator import get_project_id
+from history import HistoryStore, probe_tool_versions
+
+FUNCTIONS_DIR = Path("backend/functions")
+ENTRY = FUNCTIONS_DIR / "lib/index.js"
+HISTORY_TOOL = "coldstart"
+
+# Regresión: más de TOLERANCE sobre la mediana y al menos MIN_DELTA_MS de diferencia
+TOLERANCE = 0.25
+MIN_DELTA_MS = 20.0
+# Código de salida de --check con regresiones; los errores (build, módulo, setup) salen con 1
+REGRESSION_EXIT_CODE = 2
+
+# Marca la línea JSON del harness entre los logs que emita el código de las functions
+RESULT_MARKER = "__COLDSTART__"
+
+# Harness Node: envuelve Module._load para medir tiempo propio por paquete
+NODE_HARNESS = r"""
+const Module = require('module');
+const started = process.hrtime.bigint();
+const entry = process.argv[1];
+const stack = [];
+const self = {};
+const direct = {};
+
+function packageOf(request, parent) {
+  if (Module.isBuiltin ? Module.isBuiltin(request) : Module.builtinModules.includes(request)) {
+    return 'node:' + request.replace(/^node:/, '');
+  }
+  let filename = request;
+  try { filename = Module._resolveFilename(request, parent); } catch (e) { return request; }
+  const marker = filename.lastIndexOf('node_modules/');
+  if (marker === -1) {
+    return require('path').relative(require('path').dirname(entry), filename);
+  }
+  const parts = filename.slice(marker + 'node_modules/'.length).split('/');
+  return parts[0].startsWith('@') ? parts[0] + '/' + parts[1] : parts[0];
+}
+
+const originalLoad = Module._load;
+Module._load = function (request, parent) {
+  const begin = process.hrtime.bigint();
+  stack.push(0n);
+  try {
+    return originalLoad.apply(this, arguments);
+  } finally {
+    const total = process.hrtime.bigint() - begin;
+    const children = stack.pop();
+    const key = packageOf(request, parent);
+    const item = self[key] || (self[key] = { ms: 0, requires: 0 });
+    item.ms += Number(total - children) / 1e6;
+    item.requires += 1;
+    if (stack.length) {
+      stack[stack.length - 1] += total;
+    }
+    if (parent && parent.filename === entry) {
+      direct[key] = (direct[key] || 0) + Number(total) / 1e6;
+    }
+  }
+};
+
+const mod = require(entry);
+const target = process.env.FUNCTION_TARGET;
+const exported = {};
+for (const name of Object.keys(mod)) {
+  const endpoint = (mod[name] && mod[name].__endpoint) || {};
+  exported[name] = endpoint.callableTrigger ? 'callable' : endpoint.httpsTrigger ? 'https' : 'other';
+}
+const loadMs = Number(process.hrtime.bigint() - started) / 1e6;
+if (global.gc) {
+  global.gc();
+}
+const memory = process.memoryUsage();
+process.stdout.write('\n' + process.env.COLDSTART_MARKER + JSON.stringify({
+  target: target || null,
+  loadMs: loadMs,
+  rssMb: memory.rss / 1048576,
+  heapMb: memory.heapUsed / 1048576,
+  exports: exported,
+  imports: self,
+  direct: direct
+}) + '\n');
+process.exit(0);
+"""
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2] if ordered else 0.0
+
+def build_functions() -> bool:
+    print_colored("🔨 Compilando Functions (npm run build)...", 'yellow')
+    result = subprocess.run("npm run build", shell=True, cwd=str(FUNCTIONS_DIR),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        print_colored(f"❌ Build falló:\n{result.stdout[-2000:]}{result.stderr[-2000:]}", 'red')
+        return False
+    return True
+
+def load_module(entry: Path, target: Optional[str], project_id: str, timeout: float = 60) -> Dict:
+    """Carga el módulo en un proceso Node nuevo y retorna las mediciones del harness"""
+    env = dict(os.environ)
+    # Variables que el runtime de Cloud Functions define antes de cargar el código
+    env.update(GCLOUD_PROJECT=project_id, FIREBASE_CONFIG=json.dumps({'projectId': project_id}),
+               COLDSTART_MARKER=RESULT_MARKER)
+    for name in ('FUNCTION_TARGET', 'FUNCTIONS_EMULATOR', 'FIRESTORE_EMULATOR_HOST'):
+        env.pop(name, None)
+    if target:
+        env['FUNCTION_TARGET'] = target
+    result = subprocess.run(['node', '--expose-gc', '-e', NODE_HARNESS, str(entry.resolve())],
+                            capture_output=True, text=True, env=env, timeout=timeout)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f"node terminó con código {result.returncode}: {result.stderr.strip()[-1000:]}")
+
+def measure_loads(entry: Path, project_id: str, runs: int) -> Dict[str, Dict]:
+    """Mediana de `runs` cargas en frío por function exportada"""
+    exported = load_module(entry, None, project_id)['exports']
+    results = {}
+    for name in exported:
+        samples = [load_module(entry, name, project_id) for _ in range(runs)]
+        imports = {}
+        for sample in samples:
+            for key, item in sample['imports'].items():
+                imports.setdefault(key, []).append(item['ms'])
+        direct = {}
+        for sample in samples:
+            for key, ms in sample['direct'].items():
+                direct.setdefault(key, []).append(ms)
+        results[name] = {
+            'kind': exported[name],
+            'load_ms': median([s['loadMs'] for s in samples]),
+            'rss_mb': median([s['rssMb'] for s in samples]),
+            'heap_mb': median([s['heapMb'] for s in samples]),
+            'imports': {key: median(values) for key, values in imports.items()},
+            'direct': {key: median(values) for key, values in direct.items()}
+        }
+    return results
+
+def invoke(host: str, path: str, kind: str, token: Optional[str]) -> float:
+    """Una invocación HTTP nueva; retorna la latencia en ms"""
+    conn = http.client.HTTPConnection(host, timeout=120)
+    started = time.perf_counter()
+    if kind == 'callable':
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        conn.request('POST', path, body=json.dumps({'data': {}}), headers=headers)
+    else:
+        # GET rechazado por el handler: mide el arranque sin efectos en Firestore
+        conn.request('GET', path)
+    conn.getresponse().read()
+    conn.close()
+    return (time.perf_counter() - started) * 1000
+
+def measure_emulator(functions: Dict[str, Dict], entry: Path, args, project_id: str) -> Dict[str, Dict]:
+    """Cold (tras recargar lib/) vs warm por function a través del Functions Emulator"""
+    from function_profiler import CallableClient
+    client = CallableClient(args.functions_host, args.auth_host, project_id, args.region)
+    client.sign_up()
+    results = {}
+    for name, info in functions.items():
+        if info['kind'] == 'other':
+            continue
+        path = f"/{project_id}/{args.region}/{name}"
+        cold = []
+        for _ in range(args.cold_samples):
+            # El emulador recarga el código al cambiar lib/: la siguiente invocación es cold
+            os.utime(entry)
+            time.sleep(args.reload_wait)
+            cold.append(invoke(args.functions_host, path, info['kind'], client.token))
+        warm = [invoke(args.functions_host, path, info['kind'], client.token) for _ in range(args.warm_samples)]
+        results[name] = {'cold_ms': median(cold), 'warm_ms': median(warm)}
+    return results
+
+def baseline(store: HistoryStore, runs: int) -> Dict[tuple, float]:
+    """Mediana histórica de duración (ms) por (categoría, function)"""
+    recent = store.recent_runs(runs, HISTORY_TOOL)
+    history = store.check_history([r['id'] for r in recent])
+    return {(category, item): median([d for _, d in samples]) * 1000
+            for (_, category, item), samples in history.items()}
+
+def show_report(loads: Dict[str, Dict], emulator: Dict[str, Dict], previous: Dict[tuple, float], top: int):
+    print_colored(f"\n{'function':<22} {'tipo':<9} {'carga ms':>9} {'base ms':>8} {'RSS MB':>7} {'heap MB':>8}"
+                  f"{'':>3}{'cold ms':>9} {'warm ms':>8}", 'cyan')
+    for name, info in loads.items():
+        base = previous.get(('load', name))
+        remote = emulator.get(name, {})
+        color = 'yellow' if base and info['load_ms'] > base * (1 + TOLERANCE) else 'white'
+        print_colored(f"{name:<22} {info['kind']:<9} {info['load_ms']:>9.1f} "
+                      f"{(f'{base:.1f}' if base else '-'):>8} {info['rss_mb']:>7.1f} {info['heap_mb']:>8.1f}"
+                      f"{'':>3}{remote.get('cold_ms', 0):>9.1f} {remote.get('warm_ms', 0):>8.1f}", color)
+
+    # Todas las functions comparten index.js hoy: el desglose de la primera es representativo
+    first = next(iter(loads.values()))
+    print_colored("\n📦 Imports directos de index.js (tiempo inclusivo):", 'cyan')
+    for key, ms in sorted(first['direct'].items(), key=lambda item: -item[1])[:top]:
+        share = ms / first['load_ms'] * 100 if first['load_ms'] else 0
+        print_colored(f"   {ms:>8.1f} ms {share:>5.1f}%  {key}", 'white')
+    print_colored("\n🐢 Paquetes con más tiempo propio de carga:", 'cyan')
+    for key, ms in sorted(first['imports'].items(), key=lambda item: -item[1])[:top]:
+        print_colored(f"   {ms:>8.1f} ms  {key}", 'white')
+
+    distinct = {round(info['load_ms'] / 10) for info in loads.values()}
+    if len(loads) > 1 and len(distinct) == 1:
+        print_colored("\n💡 Todas las functions cargan el mismo grafo de módulos: mover imports pesados "
+                      "dentro de los handlers o a módulos por function reduce el cold start de las demás",
+                      'yellow')
+
+def regressions(loads: Dict[str, Dict], emulator: Dict[str, Dict], previous: Dict[tuple, float]) -> List[str]:
+    found = []
+    current = [('load', name, info['load_ms']) for name, info in loads.items()]
+    current += [('cold', name, info['cold_ms']) for name, info in emulator.items()]
+    for category, name, ms in current:
+        base = previous.get((category, name))
+        if base and ms > base * (1 + TOLERANCE) and ms - base >= MIN_DELTA_MS:
+            found.append(f"{name} ({category}): {base:.1f} ms → {ms:.1f} ms (+{(ms / base - 1) * 100:.0f}%)")
+    return found
+
+def main():
+    """Función principal del analizador de cold start"""
+    parser = argparse.ArgumentParser(description="Cold start y carga de módulos de Cloud Functions")
+    parser.add_argument('--skip-build', action='store_true', help="No ejecutar npm run build")
+    parser.add_argument('--runs', type=int, default=5, help="Procesos Node por function")
+    parser.add_argument('--top', type=int, default=10, help="Imports a listar")
+    parser.add_argument('--emulator', action='store_true', help="Medir cold/warm en el Functions Emulator")
+    parser.add_argument('--functions-host', default="localhost:5001", help="Host del Functions Emulator")
+    parser.add_argument('--auth-host', default="localhost:9099", help="Host del Auth Emulator")
+    parser.add_argument('--region', default="us-central1", help="Región de las functions")
+    parser.add_argument('--cold-samples', type=int, default=3, help="Invocaciones cold por function")
+    parser.add_argument('--warm-samples', type=int, default=10, help="Invocaciones warm por function")
+    parser.add_argument('--reload-wait', type=float, default=3.0,
+                        help="Segundos a esperar tras tocar lib/ para que el emulador recargue")
+    parser.add_argument('--check', action='store_true', help="Salir con error si hay regresiones")
+    parser.add_argument('--baseline-runs', type=int, default=5, help="Ejecuciones previas para la mediana")
+    parser.add_argument('--no-history', action='store_true', help="No guardar en .devtools/history.db")
+    args = parser.parse_args()
+
+    if not FUNCTIONS_DIR.exists():
+        print_colored("❌ Ejecuta este script desde la raíz del proyecto", 'red')
+        return 1
+    started = time.perf_counter()
+    if not args.skip_build and not build_functions():
+        return 1
+    if not ENTRY.exists():
+        print_colored(f"❌ No existe {ENTRY}; compila primero las Functions", 'red')
+        return 1
+
+    project_id = get_project_id()
+    print_colored(f"⏱️ Cargando {ENTRY} en procesos Node nuevos ({args.runs} por function)...", 'cyan')
+    try:
+        loads = measure_loads(ENTRY, project_id, args.runs)
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        print_colored(f"❌ No se pudo cargar el módulo: {e}", 'red')
+        return 1
+    if not loads:
+        print_colored(f"❌ {ENTRY} no exporta ninguna function (¿build incompleto?)", 'red')
+        return 1
+
+    emulator = {}
+    if args.emulator:
+        print_colored("🔥 Midiendo cold/warm en el Functions Emulator...", 'cyan')
+        try:
+            emulator = measure_emulator(loads, ENTRY, args, project_id)
+        except (OSError, RuntimeError, http.client.HTTPException) as e:
+            print_colored(f"⚠️ Emulador no disponible: {e}", 'yellow')
+
+    store = HistoryStore()
+    try:
+        previous = baseline(store, args.baseline_runs)
+        show_report(loads, emulator, previous, args.top)
+        found = regressions(loads, emulator, previous)
+        exit_code = REGRESSION_EXIT_CODE if found and args.check else 0
+
+        if not args.no_history:
+            checks = [{'category': 'load', 'item': name, 'status': ('load', name) not in previous or
+                       info['load_ms'] <= previous[('load', name)] * (1 + TOLERANCE),
+                       'duration': info['load_ms'] / 1000,
+                       'message': f"rss {info['rss_mb']:.1f} MB, heap {info['heap_mb']:.1f} MB"}
+                      for name, info in loads.items()]
+            for name, info in emulator.items():
+                checks.append({'category': 'cold', 'item': name, 'status': True,
+                               'duration': info['cold_ms'] / 1000})
+                checks.append({'category': 'warm', 'item': name, 'status': True,
+                               'duration': info['warm_ms'] / 1000})
+            store.record_run(HISTORY_TOOL, checks, time.perf_counter() - started, exit_code,
+                             probe_tool_versions(['node']))
+    finally:
+        store.close()
+
+    if found:
+        print_colored(f"\n❌ Regresiones de cold start: {len(found)}", 'red')
+        for line in found:
+            print_colored(f"   {line}", 'red')
+    elif previous:
+        print_colored("\n✅ Sin regresiones respecto a la mediana histórica", 'green')
+    return exit_code
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Utilidades compartidas por los scripts de scripts/
+Uso: from common import print_colored, run_command, run_check, percentile
+
+- `print_colored`: salida con color ANSI en la terminal
+- `run_command`: ejecuta un comando de shell y retorna (éxito, stdout, stderr)
+- `run_check`: run_command con la salida en la terminal que registra estado y
+  duración para history.py
+- `percentile`: percentil por rango más cercano de una lista de latencias
+- Sin imports pesados: cli.py lo carga en cada subcomando
+"""
+
+import math
+import time
+
+COLORS = {
+    'green': '\033[92m',
+    'yellow': '\033[93m',
+    'red': '\033[91m',
+    'cyan': '\033[96m',
+    'white': '\033[97m',
+    'blue': '\033[94m',
+    'magenta': '\033[95m',
+    'reset': '\033[0m'
+}
+
+def print_colored(message, color='white', file=None):
+    """Imprime mensaje con color en la terminal"""
+    print(f"{COLORS.get(color, COLORS['white'])}{message}{COLORS['reset']}", file=file)
+
+def run_command(command, cwd=None, description="", timeout=None, capture=True):
+    """Ejecuta un comando y retorna (éxito, stdout, stderr)
+
+    Con `description` informa inicio y resultado; con capture=False la salida del
+    comando va directo a la terminal y stdout/stderr se retornan vacíos.
+    """
+    # Import diferido: cli.py carga este módulo en el arranque de cada subcomando
+    import subprocess
+
+    if description:
+        print_colored(f"🔄 {description}...", 'yellow')
+
+    try:
+        result = subprocess.run(command, shell=True, cwd=cwd, capture_output=capture,
+                                text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if description:
+            print_colored(f"❌ {description} - Timeout después de {timeout}s", 'red')
+        return False, "", f"Timeout después de {timeout}s"
+    except Exception as e:
+        if description:
+            print_colored(f"❌ Error ejecutando {description}: {e}", 'red')
+        return False, "", str(e)
+
+    stdout, stderr = result.stdout or "", result.stderr or ""
+    if result.returncode == 0:
+        if description:
+            print_colored(f"✅ {description} - Exitoso", 'green')
+        return True, stdout, stderr
+    if description:
+        print_colored(f"❌ {description} - Falló", 'red')
+        if stderr.strip():
+            print_colored(f"   Error: {stderr.strip()}", 'red')
+    return False, stdout, stderr
+
+def run_check(checks, category, command, cwd=None, description=""):
+    """Ejecuta un comando y registra su estado y duración en `checks`"""
+    started = time.perf_counter()
+    success = run_command(command, cwd=cwd, description=description, capture=False)[0]
+    checks.append({
+        'category': category,
+        'item': description,
+        'status': success,
+        'duration': time.perf_counter() - started
+    })
+    return success
+
+def percentile(values, pct):
+    """Percentil por rango más cercano: el menor valor con al menos pct% de los datos (0 si no hay datos)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
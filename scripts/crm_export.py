@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Exportación de clientes a HubSpot y Salesforce en streaming
+Ejecutar: python scripts/crm_export.py --company <companyId> --target hubspot --output exports/
+
+Exportación CRM (PRD 4.3) con memoria acotada sin importar el tamaño del tenant:
+- Pagina customers/ del Firestore Emulator con cursores (orden por id)
+- Transforma cada registro con generadores (formato HubSpot o Salesforce)
+- Escribe chunks NDJSON/CSV (opcional gzip) o hace upsert por lotes en un CRM
+- Checkpoint del cursor tras cada chunk/lote: --resume continúa donde quedó
+- Stand-in local de las APIs batch de HubSpot y Salesforce (--serve-crm)
+"""
+
+import io
+import sys
+import csv
+import gzip
+import json
+import time
+import argparse
+import http.client
+import http.server
+import threading
+import tracemalloc
+import urllib.parse
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common import print_colored
+from firestore_emulator import FirestoreEmulator
+
+CHECKPOINT_DIR = Path(".devtools/crm_export")
+CRM_STANDIN_PORT = 7430
+# Máximo de registros por request en las APIs batch de cada CRM
+TARGET_BATCH = {'hubspot': 100, 'salesforce': 200}
+# Ambos endpoints son upserts por id externo: reenviar un lote tras un corte no duplica contactos
+TARGET_PATHS = {'hubspot': '/crm/v3/objects/contacts/batch/upsert',
+                'salesforce': '/services/data/v59.0/composite/sobjects/Contact/External_Id__c'}
+TARGET_METHODS = {'hubspot': 'POST', 'salesforce': 'PATCH'}
+
+HUBSPOT_FIELDS = ['email', 'firstname', 'lastname', 'phone', 'company_id', 'stripe_customer_id',
+                  'risk_score', 'risk_segment', 'card_expiry']
+SALESFORCE_FIELDS = ['External_Id__c', 'Email', 'FirstName', 'LastName', 'Phone', 'Company_Id__c',
+                     'Risk_Score__c', 'Risk_Segment__c', 'Card_Expiry__c']
+
+def _split_name(name: str) -> Tuple[str, str]:
+    first, _, last = (name or '').strip().partition(' ')
+    return first, last
+
+def _card_expiry(customer: Dict) -> str:
+    month, year = customer.get('cardExpMonth'), customer.get('cardExpYear')
+    return f"{int(year):04d}-{int(month):02d}" if month and year else ''
+
+def to_hubspot(records: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict]]:
+    """(cursor, propiedades de contacto HubSpot)"""
+    for path, customer in records:
+        first, last = _split_name(customer.get('name'))
+        yield path, {
+            'email': customer.get('email') or '',
+            'firstname': first,
+            'lastname': last,
+            'phone': customer.get('phone') or '',
+            'company_id': customer.get('companyId') or '',
+            'stripe_customer_id': path.rsplit('/', 1)[-1],
+            'risk_score': customer.get('riskScore', ''),
+            'risk_segment': customer.get('riskSegment') or '',
+            'card_expiry': _card_expiry(customer)
+        }
+
+def to_salesforce(records: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict]]:
+    """(cursor, campos de Contact de Salesforce)"""
+    for path, customer in records:
+        first, last = _split_name(customer.get('name'))
+        yield path, {
+            'External_Id__c': path.rsplit('/', 1)[-1],
+            'Email': customer.get('email') or '',
+            'FirstName': first,
+            # LastName es obligatorio en Contact
+            'LastName': last or first or path.rsplit('/', 1)[-1],
+            'Phone': customer.get('phone') or '',
+            'Company_Id__c': customer.get('companyId') or '',
+            'Risk_Score__c': customer.get('riskScore', ''),
+            'Risk_Segment__c': customer.get('riskSegment') or '',
+            'Card_Expiry__c': _card_expiry(customer)
+        }
+
+TRANSFORMS = {'hubspot': (to_hubspot, HUBSPOT_FIELDS), 'salesforce': (to_salesforce, SALESFORCE_FIELDS)}
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+class Checkpoint:
+    """Cursor del último registro exportado, persistido en .devtools/crm_export/"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.cursor = None
+        self.exported = 0
+        self.chunks = 0
+
+    @classmethod
+    def load(cls, path: Path) -> 'Checkpoint':
+        checkpoint = cls(path)
+        if path.exists():
+            with open(path, 'r') as f:
+                state = json.load(f)
+            checkpoint.cursor = state['cursor']
+            checkpoint.exported = state['exported']
+            checkpoint.chunks = state['chunks']
+        return checkpoint
+
+    def advance(self, cursor: str, count: int):
+        self.cursor = cursor
+        self.exported += count
+        self.chunks += 1
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix('.tmp')
+        with open(temporary, 'w') as f:
+            json.dump({'cursor': self.cursor, 'exported': self.exported, 'chunks': self.chunks,
+                       'updatedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}, f)
+        temporary.replace(self.path)
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+class ChunkedFileSink:
+    """Escribe cada chunk a un archivo part-NNNNN.{ndjson,csv}[.gz]"""
+
+    def __init__(self, directory: Path, fmt: str, fields: List[str], compress: bool):
+        self.directory = directory
+        self.fmt = fmt
+        self.fields = fields
+        self.compress = compress
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, index: int, rows: List[Dict]):
+        name = f"part-{index:05d}.{self.fmt}" + ('.gz' if self.compress else '')
+        path = self.directory / name
+        temporary = path.with_name(name + '.tmp')
+        raw = gzip.open(temporary, 'wb') if self.compress else open(temporary, 'wb')
+        with raw, io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+            if self.fmt == 'csv':
+                writer = csv.DictWriter(f, fieldnames=self.fields)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    f.write(json.dumps(row))
+                    f.write("\n")
+        # Renombrar al final: un chunk a medio escribir nunca queda con el nombre final
+        temporary.replace(path)
+
+class CRMSink:
+    """Upsert de cada lote en la API batch del CRM (o su stand-in local)"""
+
+    def __init__(self, base_url: str, target: str, token: str = 'local'):
+        parsed = urllib.parse.urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parsed.netloc, timeout=60)
+        self.target = target
+        self.path = TARGET_PATHS[target]
+        self.method = TARGET_METHODS[target]
+        self.token = token
+
+    def write(self, index: int, rows: List[Dict]):
+        if self.target == 'hubspot':
+            payload = {'inputs': [{'idProperty': 'stripe_customer_id', 'id': row['stripe_customer_id'],
+                                   'properties': row} for row in rows]}
+        else:
+            payload = {'allOrNone': False,
+                       'records': [dict(row, attributes={'type': 'Contact'}) for row in rows]}
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Authorization': f"Bearer {self.token}", 'Content-Type': 'application/json'}
+        for attempt in range(3):
+            try:
+                self.connection.request(self.method, self.path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.connection.close()
+                if attempt == 2:
+                    raise
+                continue
+            if response.status == 429 and attempt < 2:
+                time.sleep(float(response.getheader('Retry-After') or 1))
+                continue
+            if response.status >= 300:
+                raise RuntimeError(f"CRM respondió HTTP {response.status}: {data[:200]!r}")
+            if self.target == 'salesforce':
+                # Con allOrNone=False Salesforce responde 200 aunque fallen registros sueltos
+                failed = [result for result in json.loads(data) if not result.get('success')]
+                if failed:
+                    raise RuntimeError(f"Salesforce rechazó {len(failed)} registros: {failed[0].get('errors')!r}")
+            return
+
+    def close(self):
+        self.connection.close()
+
+def export(records: Iterable[Tuple[str, Dict]], transform: Callable, sink, checkpoint: Checkpoint,
+           chunk_size: int, on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    """Pipeline en streaming: registros → transform → chunks → sink, con checkpoint por chunk
+
+    Solo un chunk vive en memoria a la vez; el cursor se guarda después de que el sink
+    confirmó el chunk, así un corte reescribe a lo sumo el chunk en curso (los archivos
+    se reemplazan y los CRM hacen upsert por id externo, sin duplicados).
+    """
+    exported = 0
+    for chunk in chunked(transform(records), chunk_size):
+        sink.write(checkpoint.chunks, [row for _, row in chunk])
+        checkpoint.advance(chunk[-1][0], len(chunk))
+        exported += len(chunk)
+        if on_chunk is not None:
+            on_chunk(exported)
+    return exported
+
+class CRMStandIn(http.server.BaseHTTPRequestHandler):
+    """Stand-in de las APIs batch de HubSpot y Salesforce: cuenta registros recibidos"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    received = {'hubspot': 0, 'salesforce': 0}
+
+    def do_POST(self):
+        self._upsert('POST')
+
+    def do_PATCH(self):
+        self._upsert('PATCH')
+
+    def _upsert(self, method: str):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        if (method, self.path) == (TARGET_METHODS['hubspot'], TARGET_PATHS['hubspot']):
+            items = payload.get('inputs', [])
+            key = 'hubspot'
+            response = {'status': 'COMPLETE', 'results': [{'id': item['id']} for item in items]}
+        elif (method, self.path) == (TARGET_METHODS['salesforce'], TARGET_PATHS['salesforce']):
+            items = payload.get('records', [])
+            key = 'salesforce'
+            response = [{'id': item['External_Id__c'], 'success': True, 'errors': [], 'created': True}
+                        for item in items]
+        else:
+            self.send_error(404)
+            return
+        limit = TARGET_BATCH[key]
+        if len(items) > limit:
+            body = json.dumps({'message': f"Máximo {limit} registros por request"}).encode('utf-8')
+            self.send_response(400)
+        else:
+            CRMStandIn.received[key] += len(items)
+            body = json.dumps(response).encode('utf-8')
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_crm_standin(port: int = CRM_STANDIN_PORT) -> http.server.ThreadingHTTPServer:
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), CRMStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def synthetic_customers(count: int, start_after: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+    """Clientes sintéticos en orden de id (respetan el cursor igual que el emulador)"""
+    start = int(start_after.rsplit('_', 1)[-1]) + 1 if start_after else 0
+    for i in range(start, count):
+        yield f"customers/cus_{i:09d}", {
+            'companyId': 'company_bench',
+            'name': f"Cliente Número{i}",
+            'email': f"cliente{i}@example.com",
+            'phone': f"+1555{i % 10_000_000:07d}",
+            'riskScore': round((i % 1000) / 1000, 3),
+            'riskSegment': ('low', 'medium', 'high')[i % 3],
+            'cardExpMonth': i % 12 + 1,
+            'cardExpYear': 2027
+        }
+
+def run_benchmark(args) -> int:
+    """Exporta N clientes sintéticos y reporta throughput y memoria máxima"""
+    print_colored(f"⏱️ Benchmark: {args.benchmark:,} clientes → {args.target} "
+                  f"({'CRM stand-in' if args.crm_url else args.format})", 'cyan')
+    transform, fields = TRANSFORMS[args.target]
+    checkpoint = Checkpoint(CHECKPOINT_DIR / f"benchmark_{args.target}.json")
+    checkpoint.clear()
+    server = None
+    if args.crm_url:
+        server = start_crm_standin()
+        sink = CRMSink(args.crm_url, args.target)
+        chunk_size = TARGET_BATCH[args.target]
+    else:
+        sink = ChunkedFileSink(args.output or Path(".devtools/crm_export/benchmark"), args.format,
+                               fields, args.gzip)
+        chunk_size = args.chunk_size
+
+    peaks = []
+    tracemalloc.start()
+
+    def sample(exported):
+        # Memoria máxima tras los primeros chunks, para comparar con la del final
+        if not peaks and exported >= chunk_size * 10:
+            peaks.append((exported, tracemalloc.get_traced_memory()[1]))
+
+    started = time.perf_counter()
+    try:
+        exported = export(synthetic_customers(args.benchmark), transform, sink, checkpoint,
+                          chunk_size, sample)
+    finally:
+        if server is not None:
+            sink.close()
+            server.shutdown()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print_colored(f"  📤 {exported:,} registros en {elapsed:.2f}s ({exported / elapsed:,.0f} registros/s)", 'green')
+    if peaks:
+        print_colored(f"  💾 Memoria máxima: {peaks[0][1] / 1024:,.0f} KiB a los {peaks[0][0]:,} registros, "
+                      f"{peak / 1024:,.0f} KiB al final", 'white')
+    if server is not None and CRMStandIn.received[args.target] != exported:
+        print_colored(f"  ❌ El stand-in recibió {CRMStandIn.received[args.target]:,} registros", 'red')
+        return 1
+    checkpoint.clear()
+    return 0
+
+def main():
+    """Función principal de la exportación CRM"""
+    parser = argparse.ArgumentParser(description="Exportación de clientes a HubSpot/Salesforce")
+    parser.add_argument('--company', help="Exportar solo los clientes de esta empresa")
+    parser.add_argument('--target', choices=sorted(TRANSFORMS), default='hubspot')
+    parser.add_argument('--output', type=Path, help="Directorio de chunks de salida")
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--gzip', action='store_true', help="Comprimir cada chunk")
+    parser.add_argument('--chunk-size', type=int, default=10_000, help="Registros por archivo")
+    parser.add_argument('--crm-url', help=f"Upsert por lotes en el CRM (stand-in: http://127.0.0.1:{CRM_STANDIN_PORT})")
+    parser.add_argument('--crm-token', default='local', help="Token Bearer del CRM")
+    parser.add_argument('--page-size', type=int, default=500, help="Documentos por página de Firestore")
+    parser.add_argument('--resume', action='store_true', help="Continuar desde el último checkpoint")
+    parser.add_argument('--serve-crm', action='store_true', help="Levantar solo el CRM stand-in")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark con N clientes sintéticos")
+    args = parser.parse_args()
+
+    if args.serve_crm:
+        server = start_crm_standin()
+        print_colored(f"🧪 CRM stand-in en http://127.0.0.1:{CRM_STANDIN_PORT} (Ctrl+C para detener)", 'cyan')
+        try:
+            while True:
+                time.sleep(5)
+                print_colored(f"  HubSpot: {CRMStandIn.received['hubspot']:,}, "
+                              f"Salesforce: {CRMStandIn.received['salesforce']:,} registros", 'white')
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+
+    if args.benchmark:
+        return run_benchmark(args)
+
+    if not args.output and not args.crm_url:
+        parser.print_help()
+        return 1
+
+    transform, fields = TRANSFORMS[args.target]
+    checkpoint_path = CHECKPOINT_DIR / f"{args.target}_{args.company or 'all'}.json"
+    checkpoint = Checkpoint.load(checkpoint_path) if args.resume else Checkpoint(checkpoint_path)
+    if args.resume and checkpoint.cursor:
+        print_colored(f"🔁 Reanudando después de {checkpoint.cursor} "
+                      f"({checkpoint.exported:,} ya exportados)", 'cyan')
+
+    if args.crm_url:
+        sink = CRMSink(args.crm_url, args.target, args.crm_token)
+        chunk_size = TARGET_BATCH[args.target]
+    else:
+        sink = ChunkedFileSink(args.output, args.format, fields, args.gzip)
+        chunk_size = args.chunk_size
+
+    print_colored(f"📤 Exportando customers a {args.target}...", 'green')
+    started = time.perf_counter()
+    try:
+        with FirestoreEmulator() as client:
+            filters = {'companyId': args.company} if args.company else None
+            records = client.iter_collection('customers', filters, checkpoint.cursor, args.page_size)
+            exported = export(records, transform, sink, checkpoint, chunk_size)
+    except Exception as e:
+        print_colored(f"❌ Exportación interrumpida: {e}", 'red')
+        print_colored(f"   Checkpoint en {checkpoint.cursor}; usa --resume para continuar", 'yellow')
+        return 1
+    finally:
+        if isinstance(sink, CRMSink):
+            sink.close()
+
+    elapsed = time.perf_counter() - started
+    print_colored(f"✅ {exported:,} registros exportados en {elapsed:.2f}s "
+                  f"({checkpoint.exported:,} en total, {checkpoint.chunks} chunks)", 'green')
+    checkpoint.clear()
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
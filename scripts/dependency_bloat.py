@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Peso de dependencias de Flutter Web y Functions por dependencia de primer nivel
+Ejecutar: python scripts/dependency_bloat.py [--base <commit>] [--check]
+
+- Construye el grafo de dependencias de `frontend/pubspec.lock` (aristas desde los
+  pubspec.yaml del pub cache o `flutter pub deps --json`) y de
+  `backend/functions/package-lock.json` (resolución de node_modules)
+- Atribuye a cada dependencia directa el tamaño instalado y, en Flutter Web, los
+  bytes de `main.dart.js` que aporta (`--dump-info` o source map de `flutter build web`):
+  exclusivo (solo llega por ella) y compartido con otras dependencias directas
+- Guarda un snapshot por commit en `.devtools/dependency_snapshots.json` y reporta
+  deltas contra el último commit analizado (o `--base`): paquetes nuevos, quitados,
+  cambios de versión y crecimiento de bytes
+- `--check` falla si el JS compilado o el install de Functions crecen por encima
+  del presupuesto: así las regresiones de bundle y cold start llegan a test.py
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from typing import Dict, List, Optional, Set, Tuple
+
+from common import print_colored
+
+FRONTEND_DIR = Path("frontend")
+PUBSPEC_LOCK = FRONTEND_DIR / "pubspec.lock"
+PACKAGE_CONFIG = FRONTEND_DIR / ".dart_tool" / "package_config.json"
+BUILD_DIR = FRONTEND_DIR / "build" / "web"
+FUNCTIONS_DIR = Path("backend/functions")
+PACKAGE_LOCK = FUNCTIONS_DIR / "package-lock.json"
+PACKAGE_JSON = FUNCTIONS_DIR / "package.json"
+SNAPSHOTS_FILE = Path(".devtools/dependency_snapshots.json")
+MAX_SNAPSHOTS = 50
+
+# Presupuesto: crecimiento relativo y mínimo absoluto para considerarlo regresión
+GROWTH_TOLERANCE = 0.10
+MIN_GROWTH = {'js': 50 * 1024, 'install': 1024 * 1024}
+
+APP = '(app)'
+DART_SDK = '(sdk dart/engine)'
+UNMAPPED = '(sin mapear)'
+UNATTRIBUTED = '(sin atribuir)'
+
+B64 = {c: i for i, c in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/")}
+
+def format_bytes(size: Optional[float], signed: bool = False) -> str:
+    if size is None:
+        return '-'
+    sign = ('+' if size > 0 else '-' if size < 0 else '') if signed else ''
+    size = abs(size)
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{sign}{size:.0f} {unit}" if unit == 'B' else f"{sign}{size:.1f} {unit}"
+        size /= 1024
+    return ''
+
+def directory_size(path: Path, skip: Tuple[str, ...] = ()) -> int:
+    """Bytes de los archivos bajo `path`, sin descender a los directorios de `skip`"""
+    total = 0
+    for root, dirs, files in os.walk(str(path)):
+        dirs[:] = [d for d in dirs if d not in skip]
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+class DependencyGraph:
+    """Paquetes con sus aristas y tamaños; `top` son las dependencias directas de producción"""
+
+    def __init__(self, ecosystem: str):
+        self.ecosystem = ecosystem
+        self.packages = {}  # type: Dict[str, Dict]
+        self.top = []  # type: List[str]
+        self.edges = 'completo'  # completo | parcial | ninguno
+        self.extra = {}  # type: Dict[str, Dict[str, Optional[int]]]
+
+    def add(self, key: str, name: str, version: str, deps: Optional[List[str]] = None) -> Dict:
+        package = {'name': name, 'version': version, 'deps': deps or [], 'install': None, 'js': None}
+        self.packages[key] = package
+        return package
+
+    def closure(self, start: str) -> Set[str]:
+        seen = set()
+        stack = [start]
+        while stack:
+            key = stack.pop()
+            if key in seen or key not in self.packages:
+                continue
+            seen.add(key)
+            stack.extend(self.packages[key]['deps'])
+        return seen
+
+    def total(self, keys, metric: str) -> Optional[int]:
+        values = [self.packages[k][metric] for k in keys if self.packages[k][metric] is not None]
+        return sum(values) if values or not keys else None
+
+    def snapshot(self) -> Dict:
+        """Resumen serializable: versiones, atribución por dependencia directa y totales"""
+        reach = {top: self.closure(top) for top in self.top}
+        owners = {}  # type: Dict[str, Set[str]]
+        for top, keys in reach.items():
+            for key in keys:
+                owners.setdefault(key, set()).add(top)
+
+        top_rows = {}
+        for top, keys in reach.items():
+            exclusive = [k for k in keys if len(owners[k]) == 1]
+            shared = [k for k in keys if len(owners[k]) > 1]
+            package = self.packages[top]
+            top_rows[package['name']] = {
+                'version': package['version'], 'packages': len(keys),
+                'install': self.total(exclusive, 'install'), 'js': self.total(exclusive, 'js'),
+                'shared_install': self.total(shared, 'install'), 'shared_js': self.total(shared, 'js'),
+            }
+
+        # Con el grafo completo lo inalcanzable es solo de desarrollo; si no, queda sin atribuir
+        unattributed = [] if self.edges == 'completo' else \
+            [k for k in self.packages if k not in owners and not self.packages[k].get('dev')]
+        counted = list(owners) + unattributed
+        totals = {'install': self.total(counted, 'install'), 'js': self.total(counted, 'js')}
+        extra_js = [row['js'] for row in self.extra.values() if row.get('js') is not None]
+        if extra_js:
+            totals['js'] = (totals['js'] or 0) + sum(extra_js)
+        extra = dict(self.extra)
+        if unattributed:
+            extra[UNATTRIBUTED] = {'install': self.total(unattributed, 'install'),
+                                   'js': self.total(unattributed, 'js')}
+
+        versions = {}  # type: Dict[str, List[str]]
+        for key in self.packages:
+            package = self.packages[key]
+            versions.setdefault(package['name'], [])
+            if package['version'] not in versions[package['name']]:
+                versions[package['name']].append(package['version'])
+        return {'edges': self.edges, 'packages': {n: sorted(v) for n, v in sorted(versions.items())},
+                'top': top_rows, 'extra': extra, 'totals': totals}
+
+# --- Dart / Flutter -------------------------------------------------------
+
+def section_keys(text: str, section: str) -> List[str]:
+    """Claves del mapa `section:` de primer nivel de un YAML (pubspec.yaml)"""
+    keys = []
+    inside = False
+    indent = None
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        depth = len(line) - len(line.lstrip())
+        if depth == 0:
+            inside = line.startswith(section + ':')
+            indent = None
+            continue
+        if inside:
+            indent = depth if indent is None else indent
+            if depth == indent and ':' in line:
+                keys.append(line.strip().split(':', 1)[0].strip().strip('"\''))
+    return keys
+
+def parse_pubspec_lock(text: str) -> Dict[str, Dict[str, str]]:
+    """{nombre: {version, kind, source}} del bloque `packages:` de pubspec.lock"""
+    packages = {}  # type: Dict[str, Dict[str, str]]
+    current = None
+    in_packages = False
+    for raw in text.splitlines():
+        if not raw.strip() or raw.lstrip().startswith('#'):
+            continue
+        depth = len(raw) - len(raw.lstrip())
+        if depth == 0:
+            in_packages = raw.startswith('packages:')
+            continue
+        if not in_packages:
+            continue
+        key, _, value = raw.strip().partition(':')
+        value = value.strip().strip('"')
+        if depth == 2:
+            current = packages.setdefault(key, {'version': '', 'kind': '', 'source': ''})
+        elif depth == 4 and current is not None:
+            if key == 'dependency':
+                current['kind'] = value
+            elif key in ('version', 'source'):
+                current[key] = value
+    return packages
+
+def pub_cache_roots() -> List[Path]:
+    if os.environ.get('PUB_CACHE'):
+        root = Path(os.environ['PUB_CACHE'])
+    elif os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        root = Path(os.environ['LOCALAPPDATA']) / 'Pub' / 'Cache'
+    else:
+        root = Path.home() / '.pub-cache'
+    return [root / 'hosted' / 'pub.dev', root / 'hosted' / 'pub.dartlang.org']
+
+def package_dirs(lock: Dict[str, Dict[str, str]]) -> Dict[str, Path]:
+    """Directorio de cada paquete: package_config.json de `pub get` o el pub cache"""
+    dirs = {}  # type: Dict[str, Path]
+    if PACKAGE_CONFIG.exists():
+        try:
+            config = json.loads(PACKAGE_CONFIG.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            config = {}
+        for entry in config.get('packages', []):
+            uri = entry.get('rootUri', '')
+            if uri.startswith('file:'):
+                path = Path(url2pathname(urlparse(uri).path))
+            else:
+                path = (PACKAGE_CONFIG.parent / uri).resolve()
+            if entry.get('name') in lock and path.is_dir():
+                dirs[entry['name']] = path
+    for name, info in lock.items():
+        if name in dirs or info['source'] != 'hosted':
+            continue
+        for root in pub_cache_roots():
+            candidate = root / f"{name}-{info['version']}"
+            if candidate.is_dir():
+                dirs[name] = candidate
+                break
+    return dirs
+
+def flutter_pub_deps() -> Dict[str, List[str]]:
+    """Aristas de `flutter pub deps --json` (vacío si Flutter no está disponible)"""
+    if not shutil.which('flutter'):
+        return {}
+    try:
+        result = subprocess.run("flutter pub deps --json", shell=True, cwd=str(FRONTEND_DIR),
+                                capture_output=True, text=True, timeout=180)
+    except subprocess.TimeoutExpired:
+        return {}
+    start = result.stdout.find('{')
+    if result.returncode != 0 or start < 0:
+        return {}
+    try:
+        data = json.loads(result.stdout[start:])
+    except ValueError:
+        return {}
+    return {p['name']: list(p.get('dependencies', [])) for p in data.get('packages', [])}
+
+def dart_graph(lock_text: str, measure: bool = True, use_flutter: bool = True) -> DependencyGraph:
+    lock = parse_pubspec_lock(lock_text)
+    graph = DependencyGraph('dart')
+    for name, info in lock.items():
+        package = graph.add(name, name, info['version'])
+        package['dev'] = info['kind'] == 'direct dev'
+    graph.top = [n for n, info in lock.items() if info['kind'] in ('direct main', 'direct overridden')]
+    if not measure:
+        graph.edges = 'ninguno'
+        return graph
+
+    dirs = package_dirs(lock)
+    for name, path in dirs.items():
+        try:
+            text = (path / 'pubspec.yaml').read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            continue
+        graph.packages[name]['deps'] = [d for d in section_keys(text, 'dependencies') if d in lock]
+        graph.packages[name]['install'] = directory_size(path, skip=('.dart_tool', 'build'))
+
+    missing = [n for n in lock if n not in dirs]
+    if missing and use_flutter:
+        edges = flutter_pub_deps()
+        for name in missing:
+            if name in edges:
+                graph.packages[name]['deps'] = [d for d in edges[name] if d in lock]
+        missing = [n for n in missing if n not in edges]
+    if missing:
+        graph.edges = 'ninguno' if len(missing) == len(lock) else 'parcial'
+
+    sizes = js_sizes(set(lock), BUILD_DIR)
+    if sizes is not None:
+        for name, package in graph.packages.items():
+            package['js'] = sizes.pop(name, 0)
+        graph.extra = {key: {'install': None, 'js': size} for key, size in sizes.items() if size}
+    return graph
+
+# --- Tamaño compilado de Flutter Web -----------------------------------------
+
+def main_js(build_dir: Path) -> Optional[Path]:
+    """main.dart.js, o main.dart.<hash>.js si hosting_cache.py ya lo renombró"""
+    plain = build_dir / 'main.dart.js'
+    if plain.exists():
+        return plain
+    hashed = sorted(build_dir.glob('main.dart.*.js'))
+    return hashed[0] if hashed else None
+
+def source_package(source: str, known: Set[str], map_dir: Path) -> str:
+    """Paquete Dart de una entrada `sources` del source map"""
+    if source.startswith(('org-dartlang-sdk:', 'dart:')) or '/dart-sdk/lib/' in source:
+        return DART_SDK
+    if source.startswith('package:'):
+        name = source[len('package:'):].split('/', 1)[0]
+        return name if name in known else UNMAPPED
+    if re.match(r'^[a-z][a-z0-9+.\-]*:', source) and not source.startswith('file:'):
+        return UNMAPPED
+    path = Path(url2pathname(urlparse(source).path)) if source.startswith('file:') else (map_dir / source)
+    relative = os.path.relpath(os.path.abspath(str(path)), os.path.abspath(str(FRONTEND_DIR / 'lib')))
+    if not relative.startswith('..'):
+        return APP
+    parts = source.replace('\\', '/').split('/')
+    for i in range(len(parts) - 1, 0, -1):
+        if parts[i] != 'lib':
+            continue
+        candidate = parts[i - 1]
+        name = candidate if candidate in known else re.sub(r'-\d[\w.+\-]*$', '', candidate)
+        if name in known:
+            return name
+    return UNMAPPED
+
+def decode_vlq(segment: str) -> List[int]:
+    values = []
+    value = shift = 0
+    for char in segment:
+        digit = B64[char]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            values.append(-(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return values
+
+def source_map_sizes(js_path: Path, map_path: Path) -> List[int]:
+    """Caracteres de main.dart.js por índice de `sources`; el último elemento es lo no mapeado"""
+    data = json.loads(map_path.read_text(encoding='utf-8'))
+    line_lengths = [len(line) for line in js_path.read_text(encoding='utf-8', errors='replace').split('\n')]
+    sizes = [0] * (len(data.get('sources', [])) + 1)
+    source = 0
+    for line_no, line in enumerate(data.get('mappings', '').split(';')):
+        length = line_lengths[line_no] if line_no < len(line_lengths) else 0
+        column = 0
+        start = 0
+        current = -1
+        for segment in line.split(','):
+            if not segment:
+                continue
+            values = decode_vlq(segment)
+            column += values[0]
+            sizes[current] += max(0, min(column, length) - start)
+            start = min(column, length)
+            if len(values) >= 4:
+                source += values[1]
+                current = source
+            else:
+                current = -1
+        sizes[current] += max(0, length - start)
+    for line_no in range(len(data.get('mappings', '').split(';')), len(line_lengths)):
+        sizes[-1] += line_lengths[line_no]
+    return sizes
+
+def js_sizes(known: Set[str], build_dir: Path) -> Optional[Dict[str, int]]:
+    """Bytes de main.dart.js por paquete Dart, o None si no hay build con info o source map"""
+    js_path = main_js(build_dir)
+    if js_path is None:
+        return None
+    sizes = {}  # type: Dict[str, int]
+    total = js_path.stat().st_size
+
+    info_path = build_dir / 'main.dart.js.info.json'
+    map_path = build_dir / 'main.dart.js.map'
+    if info_path.exists():
+        # dart2js --dump-info: tamaño de cada librería con su URI canónica
+        info = json.loads(info_path.read_text(encoding='utf-8'))
+        for library in info.get('elements', {}).get('library', {}).values():
+            uri = library.get('canonicalUri', '')
+            if uri.startswith('dart:'):
+                key = DART_SDK
+            elif uri.startswith('package:'):
+                key = uri[len('package:'):].split('/', 1)[0]
+                key = key if key in known else UNMAPPED
+            else:
+                key = APP
+            sizes[key] = sizes.get(key, 0) + int(library.get('size', 0))
+    elif map_path.exists():
+        sources = json.loads(map_path.read_text(encoding='utf-8')).get('sources', [])
+        per_source = source_map_sizes(js_path, map_path)
+        for index, size in enumerate(per_source[:-1]):
+            key = source_package(sources[index], known, map_path.parent)
+            sizes[key] = sizes.get(key, 0) + size
+        sizes[UNMAPPED] = sizes.get(UNMAPPED, 0) + per_source[-1]
+    else:
+        return None
+
+    # Lo que la herramienta no atribuye (runtime, constantes, holders) queda como no mapeado
+    attributed = sum(sizes.values())
+    if attributed < total:
+        sizes[UNMAPPED] = sizes.get(UNMAPPED, 0) + total - attributed
+    return sizes
+
+# --- npm / Functions ---------------------------------------------------------
+
+def lock_v1_packages(dependencies: Dict, prefix: str = '') -> Dict[str, Dict]:
+    """Convierte el árbol `dependencies` de lockfileVersion 1 al formato `packages` (v2/v3)"""
+    packages = {}
+    for name, info in dependencies.items():
+        path = f"{prefix}node_modules/{name}"
+        packages[path] = {'version': info.get('version', ''), 'dev': info.get('dev', False),
+                          'dependencies': info.get('requires', {})}
+        packages.update(lock_v1_packages(info.get('dependencies', {}), path + '/'))
+    return packages
+
+def resolve_module(packages: Dict[str, Dict], from_path: str, name: str) -> Optional[str]:
+    """Resolución de Node: node_modules del paquete y luego de cada ancestro"""
+    base = from_path
+    while True:
+        candidate = f"{base}/node_modules/{name}" if base else f"node_modules/{name}"
+        if candidate in packages:
+            return packages[candidate].get('resolved', candidate) if packages[candidate].get('link') else candidate
+        if not base:
+            return None
+        index = base.rfind('/node_modules/')
+        base = base[:index] if index >= 0 else ''
+
+def npm_graph(lock_text: str, manifest: Dict, measure: bool = True) -> DependencyGraph:
+    data = json.loads(lock_text)
+    packages = data.get('packages')
+    if packages is None:
+        packages = lock_v1_packages(data.get('dependencies', {}))
+        packages[''] = {'dependencies': manifest.get('dependencies', {})}
+    graph = DependencyGraph('npm')
+    for path, info in packages.items():
+        if not path or info.get('link'):
+            continue
+        deps = {}
+        for field in ('dependencies', 'optionalDependencies', 'peerDependencies'):
+            deps.update(info.get(field) or {})
+        resolved = [resolve_module(packages, path, name) for name in deps]
+        name = info.get('name') or path[path.rfind('node_modules/') + len('node_modules/'):]
+        package = graph.add(path, name, info.get('version', ''), [r for r in resolved if r])
+        package['dev'] = bool(info.get('dev'))
+        if measure and (FUNCTIONS_DIR / path).is_dir():
+            package['install'] = directory_size(FUNCTIONS_DIR / path, skip=('node_modules',))
+    root = packages.get('', {})
+    top = [resolve_module(packages, '', name) for name in (root.get('dependencies') or {})]
+    graph.top = [t for t in top if t in graph.packages]
+    return graph
+
+# --- Snapshots y deltas -------------------------------------------------------
+
+def git(command: str) -> Optional[str]:
+    result = subprocess.run(f"git {command}", shell=True, capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else None
+
+def load_snapshots(path: Path = SNAPSHOTS_FILE) -> Dict[str, Dict]:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding='utf-8')).get('snapshots', {})
+    except (OSError, ValueError):
+        return {}
+
+def save_snapshots(snapshots: Dict[str, Dict], path: Path = SNAPSHOTS_FILE):
+    newest = sorted(snapshots.items(), key=lambda item: item[1].get('created', 0))[-MAX_SNAPSHOTS:]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'snapshots': dict(newest)}, indent=2), encoding='utf-8')
+
+def read_manifest(text: Optional[str]) -> Dict:
+    try:
+        return json.loads(text) if text else {}
+    except ValueError:
+        return {}
+
+def current_snapshot(use_flutter: bool) -> Dict:
+    snapshot = {'created': time.time()}
+    if PUBSPEC_LOCK.exists():
+        snapshot['dart'] = dart_graph(PUBSPEC_LOCK.read_text(encoding='utf-8'), use_flutter=use_flutter).snapshot()
+    if PACKAGE_LOCK.exists():
+        manifest = read_manifest(PACKAGE_JSON.read_text(encoding='utf-8') if PACKAGE_JSON.exists() else None)
+        snapshot['npm'] = npm_graph(PACKAGE_LOCK.read_text(encoding='utf-8'), manifest).snapshot()
+    return snapshot
+
+def lock_snapshot(commit: str) -> Dict:
+    """Snapshot solo con versiones, leyendo los lockfiles del commit (sin tamaños)"""
+    snapshot = {'created': 0, 'lock_only': True}
+    dart_lock = git(f"show {commit}:{PUBSPEC_LOCK.as_posix()}")
+    if dart_lock:
+        snapshot['dart'] = dart_graph(dart_lock, measure=False).snapshot()
+    npm_lock = git(f"show {commit}:{PACKAGE_LOCK.as_posix()}")
+    if npm_lock:
+        manifest = read_manifest(git(f"show {commit}:{PACKAGE_JSON.as_posix()}"))
+        snapshot['npm'] = npm_graph(npm_lock, manifest, measure=False).snapshot()
+    return snapshot
+
+def lockfiles_dirty() -> bool:
+    paths = " ".join(p.as_posix() for p in (PUBSPEC_LOCK, PACKAGE_LOCK, PACKAGE_JSON))
+    return bool((git(f"status --porcelain -- {paths}") or '').strip())
+
+def resolve_base(snapshots: Dict[str, Dict], requested: Optional[str], head: Optional[str],
+                 dirty: bool) -> Optional[str]:
+    """`--base`, o el commit analizado más cercano por debajo del árbol actual"""
+    if requested:
+        sha = git(f"rev-parse --verify {requested}^{{commit}}")
+        return sha.strip() if sha else None
+    history = (git("rev-list --max-count=50 HEAD") or '').split() if head else []
+    candidates = history if dirty else history[1:]
+    for sha in candidates:
+        if sha in snapshots:
+            return sha
+    return candidates[0] if candidates else None
+
+def lock_delta(current: Dict, base: Dict) -> List[Tuple[str, str]]:
+    now, before = current.get('packages', {}), base.get('packages', {})
+    lines = []
+    for name in sorted(set(now) | set(before)):
+        if name not in before:
+            lines.append(('green', f"+ {name} {', '.join(now[name])}"))
+        elif name not in now:
+            lines.append(('yellow', f"- {name} {', '.join(before[name])}"))
+        elif now[name] != before[name]:
+            lines.append(('cyan', f"~ {name} {', '.join(before[name])} → {', '.join(now[name])}"))
+    return lines
+
+def grew(now: Optional[int], before: Optional[int], metric: str) -> bool:
+    if now is None or before is None:
+        return False
+    return now - before > MIN_GROWTH[metric] and now > before * (1 + GROWTH_TOLERANCE)
+
+def regressions(label: str, current: Dict, base: Dict) -> List[str]:
+    """Crecimientos por encima del presupuesto en totales y por dependencia directa"""
+    found = []
+    for metric in ('js', 'install'):
+        # El total instalado depende de qué paquetes se pudieron atribuir: solo se compara con aristas iguales
+        if metric == 'install' and current['edges'] != base['edges']:
+            continue
+        now, before = current['totals'].get(metric), base['totals'].get(metric)
+        if grew(now, before, metric):
+            found.append(f"{label}: total {metric} {format_bytes(before)} → {format_bytes(now)}")
+    if current['edges'] != base['edges']:
+        return found
+    for name, row in current['top'].items():
+        previous = base['top'].get(name)
+        for metric in ('js', 'install'):
+            if previous is None:
+                if base['totals'].get(metric) is not None and (row[metric] or 0) > MIN_GROWTH[metric]:
+                    found.append(f"{label}: nueva dependencia {name} añade {format_bytes(row[metric])} de {metric}")
+            elif grew(row[metric], previous[metric], metric):
+                found.append(f"{label}: {name} {metric} {format_bytes(previous[metric])} → {format_bytes(row[metric])}")
+    return found
+
+def show_report(label: str, current: Dict, base: Optional[Dict], top: int):
+    metric = 'js' if current['totals'].get('js') is not None else 'install'
+    print_colored(f"\n📦 {label} (aristas: {current['edges']}, {len(current['packages'])} paquetes)", 'cyan')
+    print_colored(f"{'dependencia':<28} {'versión':>10} {'paqs':>5} {'instalado':>10} {'JS':>10}"
+                  f" {'compartido':>11} {'Δ ' + metric:>10}", 'cyan')
+    rows = sorted(current['top'].items(), key=lambda item: -((item[1][metric] or 0) + (item[1]['shared_' + metric] or 0)))
+    for name, row in rows[:top]:
+        previous = (base or {}).get('top', {}).get(name)
+        delta = None
+        if previous is not None and row[metric] is not None and previous[metric] is not None:
+            delta = row[metric] - previous[metric]
+        elif previous is None and base is not None:
+            delta = row[metric]
+        shared = row['shared_' + metric]
+        color = 'yellow' if delta and grew(row[metric], (previous or {}).get(metric) or 0, metric) else 'white'
+        print_colored(f"{name:<28} {row['version'][:10]:>10} {row['packages']:>5} {format_bytes(row['install']):>10}"
+                      f" {format_bytes(row['js']):>10} {format_bytes(shared):>11}"
+                      f" {format_bytes(delta, signed=True):>10}", color)
+    for name, row in sorted(current['extra'].items()):
+        print_colored(f"{name:<28} {'':>10} {'':>5} {format_bytes(row.get('install')):>10}"
+                      f" {format_bytes(row.get('js')):>10}", 'white')
+
+    totals = current['totals']
+    line = f"   Total: instalado {format_bytes(totals.get('install'))}, JS {format_bytes(totals.get('js'))}"
+    if base and base['totals'].get(metric) is not None and totals.get(metric) is not None:
+        line += f" ({format_bytes(totals[metric] - base['totals'][metric], signed=True)} {metric})"
+    print_colored(line, 'white')
+    if current['edges'] != 'completo':
+        print_colored("   ⚠️ Aristas incompletas: los paquetes sin pubspec.yaml en el pub cache ni"
+                      " `flutter pub deps` quedan sin atribuir (ejecutar `flutter pub get`)", 'yellow')
+    if label.startswith('Flutter') and totals.get('js') is None:
+        print_colored("   ℹ️ Sin tamaño compilado: `flutter build web --source-maps` (o `--dump-info`)", 'white')
+
+def main():
+    parser = argparse.ArgumentParser(description="Peso de dependencias por dependencia directa y deltas entre commits")
+    parser.add_argument('--base', help="Commit contra el que comparar (default: último commit analizado)")
+    parser.add_argument('--check', action='store_true', help="Salir con código 1 si se excede el presupuesto de crecimiento")
+    parser.add_argument('--top', type=int, default=20, help="Dependencias directas a mostrar por ecosistema")
+    parser.add_argument('--no-flutter', action='store_true', help="No usar `flutter pub deps` para las aristas")
+    parser.add_argument('--no-save', action='store_true', help="No guardar el snapshot del commit actual")
+    args = parser.parse_args()
+
+    if not PUBSPEC_LOCK.exists() and not PACKAGE_LOCK.exists():
+        print_colored("⚠️ No hay pubspec.lock ni package-lock.json: nada que analizar", 'yellow')
+        return 0
+
+    print_colored("🔍 Analizando dependencias...", 'cyan')
+    current = current_snapshot(not args.no_flutter)
+    snapshots = load_snapshots()
+    head = (git("rev-parse HEAD") or '').strip() or None
+    dirty = lockfiles_dirty() if head else True
+    base_sha = resolve_base(snapshots, args.base, head, dirty)
+    if args.base and base_sha is None:
+        print_colored(f"❌ Commit no encontrado: {args.base}", 'red')
+        return 1
+    base = snapshots.get(base_sha) or (lock_snapshot(base_sha) if base_sha else None)
+    if base_sha:
+        kind = "solo lockfiles" if base.get('lock_only') else "snapshot"
+        print_colored(f"📌 Base: {base_sha[:10]} ({kind})", 'white')
+
+    found = []
+    for key, label in (('dart', 'Flutter (pubspec.lock)'), ('npm', 'Functions (package-lock.json)')):
+        if key not in current:
+            continue
+        previous = (base or {}).get(key)
+        show_report(label, current[key], previous, args.top)
+        if previous is None:
+            continue
+        delta = lock_delta(current[key], previous)
+        if delta:
+            print_colored(f"   Cambios en el lockfile: {len(delta)}", 'cyan')
+            for color, line in delta:
+                print_colored(f"   {line}", color)
+        found.extend(regressions(label.split(' ')[0], current[key], previous))
+
+    if head and not dirty and not args.no_save:
+        snapshots[head] = current
+        save_snapshots(snapshots)
+
+    if found:
+        print_colored(f"\n❌ Crecimiento por encima del presupuesto ({GROWTH_TOLERANCE:.0%}): {len(found)}", 'red')
+        for line in found:
+            print_colored(f"   {line}", 'red')
+        return 1 if args.check else 0
+    if base and not base.get('lock_only'):
+        print_colored("\n✅ Peso de dependencias dentro del presupuesto", 'green')
+    else:
+        print_colored("\nℹ️ Sin snapshot base con tamaños: este análisis queda como referencia", 'white')
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
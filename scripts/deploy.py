@@ -7,44 +7,14 @@ Construye y despliega la aplicación a Firebase
 import os
 import sys
 import subprocess
+import time
 from pathlib import Path
 
-def print_colored(message, color='white'):
-    colors = {
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'red': '\033[91m',
-        'cyan': '\033[96m',
-        'white': '\033[97m',
-        'reset': '\033[0m'
-    }
-    print(f"{colors.get(color, colors['white'])}{message}{colors['reset']}")
+from common import print_colored, run_check
+from coldstart_analyzer import REGRESSION_EXIT_CODE
+from history import record_run, session_exit_code
 
-def run_command(command, cwd=None, description=""):
-    """Ejecuta un comando y retorna True si fue exitoso"""
-    if description:
-        print_colored(f"🔄 {description}...", 'yellow')
-    
-    try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=cwd,
-            text=True
-        )
-        
-        if result.returncode == 0:
-            print_colored(f"✅ {description} - Exitoso", 'green')
-            return True
-        else:
-            print_colored(f"❌ {description} - Falló", 'red')
-            return False
-            
-    except Exception as e:
-        print_colored(f"❌ Error ejecutando {description}: {e}", 'red')
-        return False
-
-def main():
+def deploy(checks):
     print_colored("🚀 Desplegando Historia 1.1...", 'green')
     print()
     
@@ -62,7 +32,11 @@ def main():
     
     # Paso 1: Ejecutar tests
     print_colored("🧪 Ejecutando tests antes del deploy...", 'cyan')
-    if run_command("python scripts/test.py", description="Tests pre-deploy"):
+    if session_exit_code("test") == 0:
+        # Encadenado tras `cli.py test`: los tests ya pasaron en este proceso
+        print_colored("✅ Tests pre-deploy - ya exitosos en esta ejecución", 'green')
+        deploy_steps.append("Tests")
+    elif run_check(checks, "Tests", "python scripts/test.py", description="Tests pre-deploy"):
         deploy_steps.append("Tests")
     else:
         print_colored("⚠️ Tests fallaron. ¿Continuar con el deploy? (y/N): ", 'yellow', end='')
@@ -73,31 +47,58 @@ def main():
     
     # Paso 2: Build Flutter Web
     print_colored("📱 Construyendo Flutter Web...", 'cyan')
-    if run_command("flutter build web --release", cwd="frontend", description="Build Flutter Web"):
+    if run_check(checks, "Build", "flutter build web --release", cwd="frontend", description="Build Flutter Web"):
         deploy_steps.append("Flutter Build")
     else:
         print_colored("❌ Error en build de Flutter", 'red')
         sys.exit(1)
     
+    # Paso 2b: Hash de contenido en los assets de arranque y headers de caché de Hosting
+    print_colored("🔖 Fingerprinting de assets de Hosting...", 'cyan')
+    if not run_check(checks, "Build", "python scripts/hosting_cache.py fingerprint --no-compare", description="Fingerprinting Hosting"):
+        print_colored("❌ Error en el fingerprinting de Hosting", 'red')
+        sys.exit(1)
+    
     # Paso 3: Build Functions
     print_colored("⚡ Construyendo Functions...", 'cyan')
-    if run_command("npm run build", cwd="backend/functions", description="Build Functions"):
+    if run_check(checks, "Build", "npm run build", cwd="backend/functions", description="Build Functions"):
         deploy_steps.append("Functions Build")
     else:
         print_colored("❌ Error en build de Functions", 'red')
         sys.exit(1)
     
+    # Paso 3b: Regresiones de cold start contra el historial local
+    print_colored("⏱️ Midiendo cold start de Functions...", 'cyan')
+    # run_check solo informa éxito/fallo: el código distingue regresión de error del analizador
+    step_started = time.perf_counter()
+    returncode = subprocess.run("python scripts/coldstart_analyzer.py --skip-build --check", shell=True).returncode
+    checks.append({'category': "Build", 'item': "Cold start Functions", 'status': returncode == 0,
+                   'duration': time.perf_counter() - step_started})
+    if returncode != 0:
+        if returncode == REGRESSION_EXIT_CODE:
+            prompt = "⚠️ El cold start empeoró. ¿Continuar con el deploy? (y/N): "
+        else:
+            prompt = f"⚠️ No se pudo medir el cold start (código {returncode}). ¿Continuar con el deploy? (y/N): "
+        response = input(prompt).strip().lower()
+        if response != 'y':
+            print_colored("❌ Deploy cancelado", 'red')
+            sys.exit(1)
+    
+    # Paso 3c: Versión live actual de Hosting (destino del rollback si falla el SLO)
+    print_colored("📸 Registrando versión actual para rollback...", 'cyan')
+    run_check(checks, "Deploy", "python scripts/slo_gate.py snapshot", description="Snapshot pre-deploy")
+    
     # Paso 4: Deploy Firestore Rules
     print_colored("🔥 Desplegando reglas de Firestore...", 'cyan')
-    if run_command("firebase deploy --only firestore:rules", cwd="backend", description="Deploy Firestore Rules"):
+    if run_check(checks, "Deploy", "firebase deploy --only firestore:rules", cwd="backend", description="Deploy Firestore Rules"):
         deploy_steps.append("Firestore Rules")
     else:
         print_colored("❌ Error desplegando reglas de Firestore", 'red')
         sys.exit(1)
     
-    # Paso 5: Deploy Functions
+    # Paso 5: Deploy Functions (solo las que cambiaron desde el último deploy)
     print_colored("⚡ Desplegando Cloud Functions...", 'cyan')
-    if run_command("firebase deploy --only functions", cwd="backend", description="Deploy Functions"):
+    if run_check(checks, "Deploy", "python scripts/functions_diff.py deploy", description="Deploy Functions"):
         deploy_steps.append("Cloud Functions")
     else:
         print_colored("❌ Error desplegando Functions", 'red')
@@ -105,12 +106,20 @@ def main():
     
     # Paso 6: Deploy Hosting
     print_colored("🌐 Desplegando Hosting...", 'cyan')
-    if run_command("firebase deploy --only hosting", cwd="backend", description="Deploy Hosting"):
+    if run_check(checks, "Deploy", "firebase deploy --only hosting", cwd="backend", description="Deploy Hosting"):
         deploy_steps.append("Hosting")
     else:
         print_colored("❌ Error desplegando Hosting", 'red')
         sys.exit(1)
     
+    # Paso 7: SLO de latencia y errores contra los baselines; rollback si se incumple
+    print_colored("🎯 Verificando SLO post-deploy...", 'cyan')
+    if run_check(checks, "Deploy", "python scripts/slo_gate.py verify --rollback", description="SLO post-deploy"):
+        deploy_steps.append("SLO verificado")
+    else:
+        print_colored("❌ SLO incumplido: deploy revertido a la versión anterior", 'red')
+        sys.exit(1)
+    
     # Resultados finales
     print()
     print_colored("=" * 50, 'white')
@@ -138,5 +147,20 @@ def main():
     except:
         print_colored("   Ejecuta 'firebase hosting:channel:list' para ver la URL", 'white')
 
+def main():
+    started = time.perf_counter()
+    checks = []
+    exit_code = 1
+    try:
+        deploy(checks)
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+        raise
+    finally:
+        # Guardar resultados en el historial local
+        if checks:
+            record_run("deploy", checks, time.perf_counter() - started, exit_code)
+
 if __name__ == "__main__":
     main()
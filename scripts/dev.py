@@ -5,87 +5,303 @@ Inicia Flutter Web y Firebase Emulators en paralelo
 """
 
 import os
+import re
 import sys
+import codecs
+import time
+import asyncio
+import argparse
 import signal
 import subprocess
-import threading
-import time
 from pathlib import Path
 
-def print_colored(message, color='white'):
-    colors = {
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'red': '\033[91m',
-        'cyan': '\033[96m',
-        'white': '\033[97m',
-        'reset': '\033[0m'
-    }
-    print(f"{colors.get(color, colors['white'])}{message}{colors['reset']}")
+from common import print_colored
+
+IS_WINDOWS = sys.platform == 'win32'
+
+DEV_LOG = Path(".devtools/dev.log")
+# Líneas más largas que esto se emiten en trozos (stack traces minificados, JSON de debug)
+LINE_LIMIT = 1 << 20
+READY_TIMEOUT = 10
+STOP_TIMEOUT = 5
+# Watcher: polling de mtimes y ventana sin eventos antes de reconstruir
+POLL_INTERVAL = 0.25
+DEBOUNCE = 0.3
+LIVE_TIMEOUT = 60
+IGNORED_DIRS = {'node_modules', 'lib', 'build', '.dart_tool'}
+# Salida que indica que el cambio ya está en vivo
+FUNCTIONS_LIVE = re.compile(r'Loaded functions definitions|function initialized')
+FLUTTER_LIVE = re.compile(r'Restarted application in')
+# Proxy de grabación de index_advisor.py
+QUERY_PROXY_HOST = "localhost:8085"
+TSC_COMMAND = "npx --no-install tsc --incremental --tsBuildInfoFile node_modules/.cache/tsc.tsbuildinfo"
+
+class Service:
+    """Proceso hijo de la sesión de desarrollo"""
+
+    def __init__(self, name, command, cwd=None, interactive=False, env=None):
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        # Variables extra sobre el entorno actual
+        self.env = env
+        # stdin por pipe para enviar comandos (p. ej. `R` de Flutter)
+        self.interactive = interactive
+        self.process = None
+
+class Watcher:
+    """Cambios en archivos por polling de mtimes (sin hilos ni dependencias)"""
+
+    def __init__(self, name, root, extensions, action):
+        self.name = name
+        self.root = root
+        self.extensions = tuple(extensions)
+        self.action = action
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS and not d.startswith('.')]
+            for filename in filenames:
+                if filename.endswith(self.extensions):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        files[path] = os.stat(path).st_mtime
+                    except OSError:
+                        pass
+        return files
+
+    def changes(self):
+        """Archivos modificados, creados o borrados desde el último scan y la edición más vieja"""
+        current = self._scan()
+        changed = [p for p, mtime in current.items() if self.snapshot.get(p) != mtime]
+        changed += [p for p in self.snapshot if p not in current]
+        self.snapshot = current
+        edited_at = min((current[p] for p in changed if p in current), default=time.time())
+        return changed, edited_at
 
 class ServiceRunner:
-    def __init__(self):
-        self.processes = []
+    """Servicios de desarrollo multiplexados en un solo event loop de asyncio
+
+    La salida de todos los hijos se lee sin bloquear desde el mismo loop; agregar
+    servicios no agrega hilos. Las señales solo marcan la detención y el loop
+    termina los grupos de procesos en orden.
+    """
+
+    def __init__(self, log_path=None):
+        self.services = []
+        self.watchers = []
+        self.waiters = []
+        self.latencies = {}
         self.running = True
-    
-    def signal_handler(self, signum, frame):
-        print_colored("\n🛑 Deteniendo servicios...", 'yellow')
-        self.cleanup()
-        sys.exit(0)
-    
-    def cleanup(self):
-        self.running = False
-        for process in self.processes:
-            if process.poll() is None:
-                process.terminate()
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-        print_colored("✅ Servicios detenidos", 'green')
-    
-    def run_service(self, name, command, cwd=None):
-        """Ejecuta un servicio en un hilo separado"""
-        def run():
+        self.loop = None
+        self.stopping = None
+        # Copia de la salida de los servicios para scripts/log_analyzer.py
+        self.log_file = None
+        if log_path:
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            self.log_file = open(log_path, 'a', buffering=1, encoding='utf-8')
+
+    def add_service(self, name, command, cwd=None, interactive=False, env=None):
+        """Registra un servicio; se inicia al llamar a run()"""
+        service = Service(name, command, cwd, interactive, env)
+        self.services.append(service)
+        return service
+
+    def add_watch(self, name, root, extensions, action):
+        """Llama a `await action(runner, changed, edited_at)` tras cada ráfaga de cambios"""
+        if Path(root).exists():
+            self.watchers.append(Watcher(name, root, extensions, action))
+
+    def service(self, name):
+        return next((s for s in self.services if s.name == name), None)
+
+    def run(self):
+        """Ejecuta el event loop hasta Ctrl+C, SIGTERM o la caída de un servicio"""
+        if IS_WINDOWS and sys.version_info < (3, 8):
+            # Subprocesos con pipes en Windows requieren el loop Proactor
+            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+        elif not IS_WINDOWS and sys.version_info < (3, 12) and hasattr(os, 'pidfd_open'):
+            # El watcher por defecto espera cada hijo en un hilo; pidfd lo hace desde el loop
+            asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+        try:
+            asyncio.run(self._main())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
+
+    def stop(self):
+        self.stopping.set()
+        if self.running:
+            self.running = False
+            print_colored("\n🛑 Deteniendo servicios...", 'yellow')
+
+    def _install_signal_handlers(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows: el handler corre fuera del loop, se agenda la detención
+                signal.signal(signum, lambda *_: self.loop.call_soon_threadsafe(self.stop))
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        self._install_signal_handlers()
+
+        pumps = []
+        for service in self.services:
+            if await self._start(service):
+                pumps.append(self.loop.create_task(self._pump(service)))
+        readiness = self.loop.create_task(self.wait_for_services())
+        watches = [self.loop.create_task(self._watch(w)) for w in self.watchers]
+
+        await self.stopping.wait()
+        readiness.cancel()
+        for task in watches:
+            task.cancel()
+        await asyncio.gather(*watches, return_exceptions=True)
+        await self.cleanup()
+        # Con los procesos terminados los pipes llegan a EOF: se vacía la salida pendiente
+        if pumps:
+            await asyncio.wait(pumps, timeout=STOP_TIMEOUT)
+        for task in pumps + [readiness]:
+            task.cancel()
+        await asyncio.gather(*pumps, readiness, return_exceptions=True)
+
+    async def _start(self, service):
+        print_colored(f"🔄 Iniciando {service.name}...", 'cyan')
+        options = {}
+        if IS_WINDOWS:
+            options['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            # Grupo propio: al detener se termina también lo que lance el shell
+            options['start_new_session'] = True
+        try:
+            service.process = await asyncio.create_subprocess_shell(
+                service.command,
+                cwd=service.cwd,
+                env=dict(os.environ, **service.env) if service.env else None,
+                stdin=asyncio.subprocess.PIPE if service.interactive else None,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=LINE_LIMIT,
+                **options
+            )
+        except OSError as e:
+            print_colored(f"❌ Error en {service.name}: {e}", 'red')
+            return False
+        return True
+
+    def emit(self, name, line):
+        line = line.strip()
+        if line:
+            print(f"[{name}] {line}")
+            if self.log_file:
+                self.log_file.write(f"[{name}] {line}\n")
+            for waiter in list(self.waiters):
+                service, pattern, future = waiter
+                if service == name and pattern.search(line) and not future.done():
+                    future.set_result(time.time())
+                    self.waiters.remove(waiter)
+
+    def expect(self, name, pattern):
+        """Future con el momento en que el servicio imprima una línea que coincida"""
+        future = self.loop.create_future()
+        self.waiters.append((name, pattern, future))
+        return future
+
+    def forget(self, future):
+        future.cancel()
+        self.waiters = [w for w in self.waiters if w[2] is not future]
+
+    async def wait_live(self, future, timeout=LIVE_TIMEOUT):
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.forget(future)
+            return None
+
+    def send(self, name, text):
+        """Escribe en el stdin de un servicio interactivo"""
+        service = self.service(name)
+        if service is None or service.process is None or service.process.stdin is None \
+                or service.process.returncode is not None:
+            return False
+        service.process.stdin.write(text.encode('utf-8'))
+        return True
+
+    async def run_step(self, name, command, cwd=None):
+        """Ejecuta un comando corto con su salida prefijada; retorna True si fue exitoso"""
+        process = await asyncio.create_subprocess_shell(
+            command, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        output, _ = await process.communicate()
+        for line in output.decode('utf-8', 'replace').splitlines():
+            self.emit(name, line)
+        return process.returncode == 0
+
+    def report_latency(self, target, seconds, detail):
+        samples = self.latencies.setdefault(target, [])
+        samples.append(seconds)
+        print_colored(f"⏱️ {target} en vivo {seconds:.1f}s después de la edición ({detail})", 'cyan')
+
+    async def _watch(self, watcher):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            changed, edited_at = watcher.changes()
+            if not changed:
+                continue
+            # Debounce: guardados en ráfaga (formatters, varios archivos) → una sola reconstrucción
+            while True:
+                await asyncio.sleep(DEBOUNCE)
+                more, more_edited_at = watcher.changes()
+                if not more:
+                    break
+                changed += more
+                edited_at = min(edited_at, more_edited_at)
             try:
-                print_colored(f"🔄 Iniciando {name}...", 'cyan')
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    cwd=cwd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    universal_newlines=True,
-                    bufsize=1
-                )
-                self.processes.append(process)
-                
-                # Leer output en tiempo real
-                for line in iter(process.stdout.readline, ''):
-                    if not self.running:
-                        break
-                    if line.strip():
-                        print(f"[{name}] {line.strip()}")
-                
-            except Exception as e:
-                print_colored(f"❌ Error en {name}: {e}", 'red')
-        
-        thread = threading.Thread(target=run, daemon=True)
-        thread.start()
-        return thread
-    
-    def wait_for_services(self):
+                await watcher.action(self, sorted(set(changed)), edited_at)
+            except (OSError, ValueError) as e:
+                print_colored(f"❌ {watcher.name}: {e}", 'red')
+
+    async def _pump(self, service):
+        """Lee la salida del servicio en tiempo real y detecta su caída"""
+        stream = service.process.stdout
+        # Decoder incremental: un carácter multibyte puede quedar partido entre trozos
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        while True:
+            try:
+                data = await stream.readuntil(b'\n')
+            except asyncio.LimitOverrunError as e:
+                # Línea más larga que LINE_LIMIT: sigue en el buffer y se emite por trozos
+                data = await stream.readexactly(e.consumed)
+            except asyncio.IncompleteReadError as e:
+                # Fin de la salida: última línea sin salto (o vacía)
+                data = e.partial
+            if not data:
+                break
+            self.emit(service.name, decoder.decode(data))
+        await service.process.wait()
+        if self.running:
+            print_colored(f"❌ {service.name} falló. Verificar configuración.", 'red')
+            self.stop()
+
+    async def wait_for_services(self):
         """Espera a que los servicios estén listos"""
         print_colored("⏳ Esperando a que los servicios inicien...", 'yellow')
-        time.sleep(10)  # Dar tiempo para que inicien
-        
+        try:
+            await asyncio.wait_for(self.stopping.wait(), READY_TIMEOUT)
+            return
+        except asyncio.TimeoutError:
+            pass
+
         # Verificar si los servicios están corriendo
-        services_ok = True
-        for process in self.processes:
-            if process.poll() is not None:
-                services_ok = False
-                break
-        
+        services_ok = all(s.process is not None and s.process.returncode is None for s in self.services)
+
         if services_ok:
             print_colored("🎯 Servicios iniciados correctamente:", 'green')
             print_colored("📱 Flutter Web: http://localhost:3000", 'white')
@@ -96,65 +312,123 @@ class ServiceRunner:
             print_colored("⚠️ Presiona Ctrl+C para detener todos los servicios", 'yellow')
         else:
             print_colored("❌ Algunos servicios fallaron al iniciar", 'red')
-    
-    def monitor_services(self):
-        """Monitorea el estado de los servicios"""
-        while self.running:
-            time.sleep(5)
-            failed_services = []
-            
-            for i, process in enumerate(self.processes):
-                if process.poll() is not None:
-                    service_name = "Flutter" if i == 0 else "Firebase"
-                    failed_services.append(service_name)
-            
-            if failed_services:
-                for service in failed_services:
-                    print_colored(f"❌ {service} falló. Verificar configuración.", 'red')
-                break
+
+    def _signal_group(self, process, force=False):
+        """Termina el grupo del servicio (SIGTERM, o SIGKILL con `force`)"""
+        try:
+            if IS_WINDOWS:
+                if force:
+                    subprocess.run(f"taskkill /T /F /PID {process.pid}", shell=True, capture_output=True)
+                else:
+                    process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        except OSError:
+            pass
+
+    async def _stop_service(self, service):
+        process = service.process
+        if process is None or process.returncode is not None:
+            return
+        self._signal_group(process)
+        try:
+            await asyncio.wait_for(process.wait(), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._signal_group(process, force=True)
+            await process.wait()
+
+    async def cleanup(self):
+        self.running = False
+        await asyncio.gather(*(self._stop_service(s) for s in self.services))
+        print_colored("✅ Servicios detenidos", 'green')
+        for target, samples in self.latencies.items():
+            ordered = sorted(samples)
+            print_colored(f"⏱️ {target}: {len(ordered)} cambios, edición→en vivo mediana "
+                          f"{ordered[len(ordered) // 2]:.1f}s, máx {ordered[-1]:.1f}s", 'white')
+
+def describe(changed):
+    names = [os.path.basename(p) for p in changed]
+    return ", ".join(names[:3]) + (f" +{len(names) - 3}" if len(names) > 3 else "")
+
+async def rebuild_functions(runner, changed, edited_at):
+    """Build incremental de Functions; el emulador recarga lib/ al terminar"""
+    print_colored(f"🔨 Functions: {describe(changed)} cambió, compilando...", 'yellow')
+    live = runner.expect("Firebase", FUNCTIONS_LIVE)
+    started = time.time()
+    if not await runner.run_step("tsc", TSC_COMMAND, cwd="backend/functions"):
+        runner.forget(live)
+        print_colored("❌ Error de compilación en Functions", 'red')
+        return
+    built = time.time() - started
+    live_at = await runner.wait_live(live)
+    if live_at is None:
+        print_colored(f"⚠️ Functions compiladas en {built:.1f}s; el emulador no confirmó la recarga", 'yellow')
+        return
+    runner.report_latency("Functions", live_at - edited_at, f"build {built:.1f}s")
+
+async def hot_restart(runner, changed, edited_at):
+    """Hot restart de Flutter Web con `R` por stdin"""
+    print_colored(f"🔁 Flutter: {describe(changed)} cambió, hot restart...", 'yellow')
+    live = runner.expect("Flutter", FLUTTER_LIVE)
+    if not runner.send("Flutter", "R\n"):
+        runner.forget(live)
+        return
+    live_at = await runner.wait_live(live)
+    if live_at is None:
+        print_colored("⚠️ Flutter no confirmó el hot restart", 'yellow')
+        return
+    runner.report_latency("Flutter", live_at - edited_at, describe(changed))
 
 def main():
+    parser = argparse.ArgumentParser(description="Inicia Flutter Web y Firebase Emulators")
+    parser.add_argument('--record-queries', action='store_true',
+                        help="Grabar consultas a Firestore para index_advisor.py (proxy en :8085)")
+    parser.add_argument('--log', nargs='?', const=DEV_LOG, type=Path,
+                        help=f"Guardar la salida de los servicios para log_analyzer.py (default: {DEV_LOG})")
+    parser.add_argument('--no-watch', action='store_true',
+                        help="No recompilar Functions ni hacer hot restart de Flutter al editar")
+    args = parser.parse_args()
+
     print_colored("🛠️ Iniciando desarrollo Historia 1.1...", 'green')
     print()
-    
+
     # Verificar que estamos en el directorio correcto
     if not Path("frontend").exists() or not Path("backend").exists():
         print_colored("❌ Ejecuta este script desde la raíz del proyecto", 'red')
         sys.exit(1)
-    
-    runner = ServiceRunner()
-    
-    # Configurar manejador de señales
-    signal.signal(signal.SIGINT, runner.signal_handler)
-    signal.signal(signal.SIGTERM, runner.signal_handler)
-    
-    try:
-        print_colored("🔄 Iniciando servicios en paralelo...", 'yellow')
-        
-        # Iniciar Flutter Web
-        flutter_thread = runner.run_service(
-            "Flutter",
-            "flutter run -d web-server --web-port 3000",
-            cwd="frontend"
-        )
-        
-        # Iniciar Firebase Emulators
-        firebase_thread = runner.run_service(
-            "Firebase",
-            "firebase emulators:start --only auth,firestore,functions",
-            cwd="backend"
+
+    runner = ServiceRunner(log_path=args.log)
+
+    print_colored("🔄 Iniciando servicios en paralelo...", 'yellow')
+
+    # Flutter Web
+    runner.add_service(
+        "Flutter",
+        "flutter run -d web-server --web-port 3000",
+        cwd="frontend",
+        interactive=not args.no_watch
+    )
+
+    # Firebase Emulators; con --record-queries las Functions usan REST a través del proxy
+    runner.add_service(
+        "Firebase",
+        "firebase emulators:start --only auth,firestore,functions",
+        cwd="backend",
+        env={'FIRESTORE_PROFILE_HOST': QUERY_PROXY_HOST} if args.record_queries else None
+    )
+
+    if args.record_queries:
+        runner.add_service(
+            "QueryLog",
+            f'"{sys.executable}" -u scripts/index_advisor.py record'
         )
-        
-        # Esperar a que los servicios inicien
-        runner.wait_for_services()
-        
-        # Monitorear servicios
-        runner.monitor_services()
-        
-    except KeyboardInterrupt:
-        pass
-    finally:
-        runner.cleanup()
+
+    if not args.no_watch:
+        runner.add_watch("Functions", "backend/functions/src", ['.ts'], rebuild_functions)
+        runner.add_watch("Flutter", "frontend/lib", ['.dart'], hot_restart)
+
+    # Un solo event loop: salida de todos los servicios, listo/caídas y señales
+    runner.run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Scheduler de dunning: reintentos y notificaciones programadas
+Ejecutar: python scripts/dunning_scheduler.py --benchmark 1000000
+
+Motor para las secuencias automáticas de Automated Dunning (PRD 3.2):
+- Heap de buckets: un bucket por tick de tiempo (lista enlazada intrusiva) y un heap
+  solo con los ticks no vacíos, así encolar es O(1) y disparar es por bucket completo
+- Almacenamiento en arrays NumPy paralelos (~25 bytes por job), sin un objeto por job
+- Disparo en lotes: pop_due() retorna arrays con todos los jobs vencidos
+- Snapshot y recuperación desde el Firestore Emulator (scheduler_state/{nombre})
+- Benchmark de encolado/desencolado y memoria por job
+
+Requiere NumPy: pip install numpy
+"""
+
+import sys
+import json
+import time
+import heapq
+import argparse
+import tracemalloc
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from common import print_colored
+from firestore_emulator import FirestoreEmulator
+
+# Tipos de job
+JOB_PAYMENT_RETRY = 0
+JOB_EMAIL = 1
+JOB_SMS = 2
+JOB_KINDS = {'payment_retry': JOB_PAYMENT_RETRY, 'email': JOB_EMAIL, 'sms': JOB_SMS}
+
+# Estado de cada slot
+SLOT_FREE = 0
+SLOT_PENDING = 1
+SLOT_CANCELLED = 2
+
+# Jobs por documento de snapshot (~19 bytes/job, bajo el límite de 1 MiB tras base64)
+SNAPSHOT_CHUNK_JOBS = 30_000
+# Bytes de ids (JSON) por documento de snapshot: holgura bajo 1 MiB con millones de clientes
+SNAPSHOT_CHUNK_ID_BYTES = 512 * 1024
+SNAPSHOT_ID_TABLES = ('companies', 'customers')
+SNAPSHOT_FIELDS = [('due', np.int64), ('company', np.int32), ('customer', np.int32),
+                   ('kind', np.int8), ('attempt', np.int16)]
+
+def split_ids(values: Sequence[str], max_bytes: int = SNAPSHOT_CHUNK_ID_BYTES) -> List[List[str]]:
+    """Parte una tabla de ids en listas cuyo JSON no supera `max_bytes`, en orden"""
+    parts = [[]]  # type: List[List[str]]
+    size = 2
+    for value in values:
+        # Comillas y coma; los ids no suelen necesitar escapes
+        length = len(value.encode('utf-8')) + 4
+        if parts[-1] and size + length > max_bytes:
+            parts.append([])
+            size = 2
+        parts[-1].append(value)
+        size += length
+    return parts
+
+class Interner:
+    """Tabla de strings → índice entero (companyId, customerId)"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values = []
+        self.positions = {}
+        for value in values:
+            self.get(value)
+
+    def get(self, value: str) -> int:
+        position = self.positions.get(value)
+        if position is None:
+            position = len(self.values)
+            self.positions[value] = position
+            self.values.append(value)
+        return position
+
+    def many(self, values: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.get(v) for v in values), dtype=np.int32, count=len(values))
+
+class FiredBatch:
+    """Jobs disparados en un lote, como arrays paralelos"""
+
+    def __init__(self, scheduler: 'DunningScheduler', slots: np.ndarray):
+        self.job_id = (scheduler.generation[slots].astype(np.int64) << 32) | slots
+        self.due = scheduler.due[slots].copy()
+        self.company = scheduler.company[slots].copy()
+        self.customer = scheduler.customer[slots].copy()
+        self.kind = scheduler.kind[slots].copy()
+        self.attempt = scheduler.attempt[slots].copy()
+        self._companies = scheduler.companies
+        self._customers = scheduler.customers
+
+    def __len__(self):
+        return len(self.job_id)
+
+    def records(self) -> Iterable[Dict]:
+        """Itera los jobs como diccionarios (para handlers que no son vectorizados)"""
+        kinds = {value: name for name, value in JOB_KINDS.items()}
+        for i in range(len(self)):
+            yield {
+                'jobId': int(self.job_id[i]),
+                'dueAt': int(self.due[i]),
+                'companyId': self._companies.values[self.company[i]],
+                'customerId': self._customers.values[self.customer[i]],
+                'kind': kinds.get(int(self.kind[i]), 'unknown'),
+                'attempt': int(self.attempt[i])
+            }
+
+class DunningScheduler:
+    """Heap de buckets sobre arrays NumPy para millones de jobs pendientes
+
+    Cada job vive en un slot de arrays paralelos. Los jobs de un mismo tick forman una
+    lista enlazada a través de `next`; `bucket_heads` apunta al primero y `bucket_heap`
+    contiene los ticks no vacíos. Los jobs nunca se disparan antes de su `due`
+    (se redondea hacia arriba al tick) y a lo sumo un tick tarde.
+    """
+
+    def __init__(self, tick_seconds: int = 60, capacity: int = 1024):
+        self.tick_seconds = tick_seconds
+        self.capacity = 0
+        self.due = np.zeros(0, dtype=np.int64)
+        self.company = np.zeros(0, dtype=np.int32)
+        self.customer = np.zeros(0, dtype=np.int32)
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.attempt = np.zeros(0, dtype=np.int16)
+        self.next = np.zeros(0, dtype=np.int32)
+        self.status = np.zeros(0, dtype=np.int8)
+        self.generation = np.zeros(0, dtype=np.uint16)
+        self._grow(capacity)
+
+        self.high_water = 0
+        self.free_head = -1
+        self.free_count = 0
+        self.pending = 0
+        self.bucket_heads = {}
+        self.bucket_heap = []
+        self.companies = Interner()
+        self.customers = Interner()
+
+    def __len__(self):
+        return self.pending
+
+    def _grow(self, needed: int):
+        new_capacity = max(needed, self.capacity * 2, 1024)
+        for name in ('due', 'company', 'customer', 'kind', 'attempt', 'next', 'status', 'generation'):
+            current = getattr(self, name)
+            grown = np.zeros(new_capacity, dtype=current.dtype)
+            grown[:len(current)] = current
+            setattr(self, name, grown)
+        self.capacity = new_capacity
+
+    def _allocate(self, count: int) -> np.ndarray:
+        """Reserva `count` slots, reutilizando primero los liberados"""
+        slots = np.empty(count, dtype=np.int64)
+        reused = min(count, self.free_count)
+        for i in range(reused):
+            slots[i] = self.free_head
+            self.free_head = int(self.next[self.free_head])
+        self.free_count -= reused
+
+        fresh = count - reused
+        if fresh:
+            if self.high_water + fresh > self.capacity:
+                self._grow(self.high_water + fresh)
+            slots[reused:] = np.arange(self.high_water, self.high_water + fresh)
+            self.high_water += fresh
+        return slots
+
+    def _push_buckets(self, slots: np.ndarray, due: np.ndarray):
+        """Enlaza los slots en los buckets de su tick (un paso Python por tick distinto)"""
+        ticks = -(-due // self.tick_seconds)
+        order = np.argsort(ticks, kind='stable')
+        sorted_ticks = ticks[order]
+        sorted_slots = slots[order]
+        self.next[sorted_slots[:-1]] = sorted_slots[1:]
+
+        boundaries = np.flatnonzero(np.diff(sorted_ticks)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(sorted_slots)]])
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            tick = int(sorted_ticks[start])
+            head = self.bucket_heads.get(tick, -1)
+            self.next[sorted_slots[end - 1]] = head
+            if head == -1:
+                heapq.heappush(self.bucket_heap, tick)
+            self.bucket_heads[tick] = int(sorted_slots[start])
+
+    def schedule_many(self, company_ids: Sequence[str], customer_ids: Sequence[str],
+                      kinds: Sequence[int], due_at: Sequence[int],
+                      attempts: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Encola un lote de jobs y retorna sus job ids"""
+        count = len(due_at)
+        if count == 0:
+            return np.zeros(0, dtype=np.int64)
+        due = np.asarray(due_at, dtype=np.int64)
+        slots = self._allocate(count)
+        self.due[slots] = due
+        self.company[slots] = self.companies.many(company_ids)
+        self.customer[slots] = self.customers.many(customer_ids)
+        self.kind[slots] = np.asarray(kinds, dtype=np.int8)
+        self.attempt[slots] = 0 if attempts is None else np.asarray(attempts, dtype=np.int16)
+        self.status[slots] = SLOT_PENDING
+        self._push_buckets(slots, due)
+        self.pending += count
+        return (self.generation[slots].astype(np.int64) << 32) | slots
+
+    def schedule(self, company_id: str, customer_id: str, kind: int, due_at: int,
+                 attempt: int = 0) -> int:
+        """Encola un único job y retorna su job id"""
+        slot = int(self._allocate(1)[0])
+        self.due[slot] = due_at
+        self.company[slot] = self.companies.get(company_id)
+        self.customer[slot] = self.customers.get(customer_id)
+        self.kind[slot] = kind
+        self.attempt[slot] = attempt
+        self.status[slot] = SLOT_PENDING
+
+        tick = -(-due_at // self.tick_seconds)
+        head = self.bucket_heads.get(tick, -1)
+        self.next[slot] = head
+        if head == -1:
+            heapq.heappush(self.bucket_heap, tick)
+        self.bucket_heads[tick] = slot
+        self.pending += 1
+        return (int(self.generation[slot]) << 32) | slot
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancela un job pendiente; el slot se libera cuando su bucket se dispara"""
+        slot = job_id & 0xFFFFFFFF
+        if slot >= self.high_water or int(self.generation[slot]) != job_id >> 32:
+            return False
+        if self.status[slot] != SLOT_PENDING:
+            return False
+        self.status[slot] = SLOT_CANCELLED
+        self.pending -= 1
+        return True
+
+    def next_due(self) -> Optional[int]:
+        """Momento (epoch) del próximo bucket no vacío"""
+        return self.bucket_heap[0] * self.tick_seconds if self.bucket_heap else None
+
+    def pop_due(self, now: int, limit: Optional[int] = None) -> FiredBatch:
+        """Retira y retorna en un lote todos los jobs vencidos a `now` (hasta `limit`)"""
+        now_tick = now // self.tick_seconds
+        collected = []
+        # Solo los jobs pendientes cuentan para `limit`; los cancelados se liberan sin ocupar cupo
+        fired = 0
+        status = self.status
+        while self.bucket_heap and self.bucket_heap[0] <= now_tick:
+            if limit is not None and fired >= limit:
+                break
+            tick = heapq.heappop(self.bucket_heap)
+            slot = self.bucket_heads.pop(tick)
+            next_slots = self.next
+            while slot != -1:
+                if limit is not None and fired >= limit:
+                    # Devolver el resto del bucket para el próximo lote
+                    self.bucket_heads[tick] = slot
+                    heapq.heappush(self.bucket_heap, tick)
+                    break
+                collected.append(slot)
+                if status[slot] == SLOT_PENDING:
+                    fired += 1
+                slot = int(next_slots[slot])
+
+        slots = np.array(collected, dtype=np.int64)
+        live = slots[status[slots] == SLOT_PENDING]
+        batch = FiredBatch(self, live)
+        self.pending -= len(live)
+        self._release(slots)
+        return batch
+
+    def _release(self, slots: np.ndarray):
+        """Devuelve slots a la free list e invalida sus job ids anteriores"""
+        if len(slots) == 0:
+            return
+        self.status[slots] = SLOT_FREE
+        self.generation[slots] += 1
+        self.next[slots[:-1]] = slots[1:]
+        self.next[slots[-1]] = self.free_head
+        self.free_head = int(slots[0])
+        self.free_count += len(slots)
+
+    def memory_bytes(self) -> int:
+        """Bytes de los arrays de jobs (sin contar tablas de strings ni buckets)"""
+        return sum(getattr(self, name).nbytes for name in
+                   ('due', 'company', 'customer', 'kind', 'attempt', 'next', 'status', 'generation'))
+
+    def pending_slots(self) -> np.ndarray:
+        return np.flatnonzero(self.status[:self.high_water] == SLOT_PENDING)
+
+    def save(self, client: FirestoreEmulator, name: str = "dunning") -> int:
+        """Guarda un snapshot de los jobs pendientes en scheduler_state/{name}
+
+        Escribe los chunks de la nueva versión, luego el documento raíz que apunta a ella
+        (commit atómico) y por último borra los chunks de la versión anterior.
+        """
+        root = f"scheduler_state/{name}"
+        previous = client.get_document(root)
+        version = (previous or {}).get('version', 0) + 1
+
+        slots = self.pending_slots()
+        chunks = []
+        for index, start in enumerate(range(0, len(slots), SNAPSHOT_CHUNK_JOBS)):
+            part = slots[start:start + SNAPSHOT_CHUNK_JOBS]
+            chunk = {field: getattr(self, field)[part].astype(dtype).tobytes()
+                     for field, dtype in SNAPSHOT_FIELDS}
+            chunk['count'] = len(part)
+            chunks.append((f"{root}/chunks/v{version}_{index}", chunk))
+        job_chunks = len(chunks)
+        id_chunks = {}
+        for table in SNAPSHOT_ID_TABLES:
+            parts = split_ids(getattr(self, table).values)
+            id_chunks[table] = len(parts)
+            for index, part in enumerate(parts):
+                chunks.append((f"{root}/chunks/v{version}_{table}_{index}", {'ids': json.dumps(part)}))
+        client.set_documents(chunks, batch_size=8)
+
+        client.commit([client.update_write(root, {
+            'version': version,
+            'chunks': job_chunks,
+            'idChunks': id_chunks,
+            'pending': len(slots),
+            'tickSeconds': self.tick_seconds,
+            'savedAt': int(time.time())
+        })])
+
+        if previous:
+            old = [f"{root}/chunks/v{previous['version']}_{i}" for i in range(previous['chunks'])]
+            old.extend(snapshot_id_paths(root, previous))
+            for start in range(0, len(old), 500):
+                client.commit([client.delete_write(path) for path in old[start:start + 500]])
+        return len(slots)
+
+    @classmethod
+    def load(cls, client: FirestoreEmulator, name: str = "dunning") -> 'DunningScheduler':
+        """Reconstruye el scheduler desde el último snapshot guardado"""
+        root = f"scheduler_state/{name}"
+        meta = client.get_document(root)
+        if meta is None:
+            return cls()
+
+        scheduler = cls(tick_seconds=meta['tickSeconds'], capacity=meta['pending'])
+        if 'idChunks' in meta:
+            for table in SNAPSHOT_ID_TABLES:
+                values = []
+                for index in range(meta['idChunks'][table]):
+                    chunk = client.get_document(f"{root}/chunks/v{meta['version']}_{table}_{index}")
+                    values.extend(json.loads(chunk['ids']))
+                setattr(scheduler, table, Interner(values))
+        else:
+            # Snapshots anteriores: ambas tablas en un único documento
+            ids = client.get_document(f"{root}/chunks/v{meta['version']}_ids")
+            scheduler.companies = Interner(json.loads(ids['companies']))
+            scheduler.customers = Interner(json.loads(ids['customers']))
+
+        for index in range(meta['chunks']):
+            chunk = client.get_document(f"{root}/chunks/v{meta['version']}_{index}")
+            fields = {field: np.frombuffer(chunk[field], dtype=dtype) for field, dtype in SNAPSHOT_FIELDS}
+            count = chunk['count']
+            slots = scheduler._allocate(count)
+            for field, _ in SNAPSHOT_FIELDS:
+                getattr(scheduler, field)[slots] = fields[field]
+            scheduler.status[slots] = SLOT_PENDING
+            scheduler._push_buckets(slots, fields['due'])
+            scheduler.pending += count
+        return scheduler
+
+def snapshot_id_paths(root: str, meta: Dict) -> List[str]:
+    """Documentos con las tablas de ids de la versión descrita por `meta`"""
+    if 'idChunks' not in meta:
+        return [f"{root}/chunks/v{meta['version']}_ids"]
+    return [f"{root}/chunks/v{meta['version']}_{table}_{index}"
+            for table in SNAPSHOT_ID_TABLES for index in range(meta['idChunks'][table])]
+
+def synthetic_jobs(count: int, companies: int = 100, customers: int = 10_000,
+                   horizon: int = 30 * 86400, start: int = 0, seed: int = 7):
+    """Jobs sintéticos: ids de empresa/cliente, tipos y vencimientos en [start, start+horizon)"""
+    rng = np.random.default_rng(seed)
+    company_ids = [f"company_{i}" for i in rng.integers(0, companies, count)]
+    customer_ids = [f"cus_{i}" for i in rng.integers(0, customers, count)]
+    kinds = rng.integers(0, len(JOB_KINDS), count, dtype=np.int8)
+    due = start + rng.integers(0, horizon, count, dtype=np.int64)
+    return company_ids, customer_ids, kinds, due
+
+def run_benchmark(count: int, tick_seconds: int, client: Optional[FirestoreEmulator]):
+    """Mide encolado, disparo en lotes, memoria por job y (opcional) persistencia"""
+    print_colored(f"⏱️ Benchmark: {count:,} jobs, tick {tick_seconds}s", 'cyan')
+    company_ids, customer_ids, kinds, due = synthetic_jobs(count)
+
+    tracemalloc.start()
+    base_memory = tracemalloc.get_traced_memory()[0]
+    scheduler = DunningScheduler(tick_seconds=tick_seconds)
+
+    started = time.perf_counter()
+    scheduler.schedule_many(company_ids, customer_ids, kinds, due)
+    elapsed = time.perf_counter() - started
+    print_colored(f"  📥 Encolado en lote: {count / elapsed:,.0f} jobs/s ({elapsed:.2f}s)", 'white')
+
+    memory = tracemalloc.get_traced_memory()[0] - base_memory
+    tracemalloc.stop()
+    print_colored(f"  💾 Memoria: {memory / count:.1f} bytes/job en total "
+                  f"({scheduler.memory_bytes() / scheduler.capacity:.0f} bytes/slot en arrays, "
+                  f"{len(scheduler.bucket_heads):,} buckets)", 'white')
+
+    single = min(count, 100_000)
+    other = DunningScheduler(tick_seconds=tick_seconds)
+    started = time.perf_counter()
+    for i in range(single):
+        other.schedule(company_ids[i], customer_ids[i], int(kinds[i]), int(due[i]))
+    elapsed = time.perf_counter() - started
+    print_colored(f"  📥 Encolado individual: {single / elapsed:,.0f} jobs/s", 'white')
+
+    if client is not None:
+        started = time.perf_counter()
+        saved = scheduler.save(client, "benchmark")
+        save_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        scheduler = DunningScheduler.load(client, "benchmark")
+        load_elapsed = time.perf_counter() - started
+        print_colored(f"  🔥 Snapshot: {saved / save_elapsed:,.0f} jobs/s guardando, "
+                      f"{saved / load_elapsed:,.0f} jobs/s recuperando", 'white')
+
+    # Disparo simulando el avance del reloj hora por hora
+    started = time.perf_counter()
+    fired = 0
+    now = 0
+    while len(scheduler):
+        now += 3600
+        fired += len(scheduler.pop_due(now))
+    elapsed = time.perf_counter() - started
+    print_colored(f"  📤 Disparo en lotes: {fired / elapsed:,.0f} jobs/s ({fired:,} jobs)", 'green')
+
+def main():
+    """Función principal del scheduler de dunning"""
+    parser = argparse.ArgumentParser(description="Scheduler de reintentos y notificaciones de dunning")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark con N jobs sintéticos")
+    parser.add_argument('--tick', type=int, default=60, help="Resolución del scheduler en segundos")
+    parser.add_argument('--emulator', action='store_true',
+                        help="Incluir snapshot/recuperación contra el Firestore Emulator")
+    parser.add_argument('--drain', action='store_true',
+                        help="Recuperar el snapshot 'dunning' y disparar los jobs vencidos")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        client = FirestoreEmulator() if args.emulator else None
+        try:
+            run_benchmark(args.benchmark, args.tick, client)
+        finally:
+            if client is not None:
+                client.close()
+        return 0
+
+    if args.drain:
+        with FirestoreEmulator() as client:
+            scheduler = DunningScheduler.load(client)
+            print_colored(f"🔄 {len(scheduler):,} jobs pendientes recuperados", 'cyan')
+            batch = scheduler.pop_due(int(time.time()))
+            for record in list(batch.records())[:10]:
+                print_colored(f"   {record['kind']} {record['companyId']}/{record['customerId']} "
+                              f"intento {record['attempt']}", 'white')
+            print_colored(f"✅ {len(batch):,} jobs vencidos disparados, {len(scheduler):,} pendientes", 'green')
+            scheduler.save(client)
+        return 0
+
+    parser.print_help()
+    return 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Reset rápido del estado de los emuladores entre tests (sin reiniciarlos)
+Ejecutar: python scripts/emulator_reset.py serve --seed seed.json
+
+- Limpia Firestore y Auth con sus endpoints REST de emulador:
+    DELETE /emulator/v1/projects/{p}/databases/(default)/documents
+    DELETE /emulator/v1/projects/{p}/accounts
+- Re-aplica opcionalmente una semilla base en memoria (documentos por commits de
+  500 ya codificados una vez, usuarios de Auth con su localId)
+- Mide el costo de cada reset (limpieza Firestore, limpieza Auth, semilla)
+- `serve`: endpoint local para tests no-Python (Flutter integration tests):
+    POST http://localhost:9199/reset?test=<nombre>   GET /report
+- `reset`: un reset desde la línea de comandos; `benchmark`: N resets seguidos
+- Desde Python: `with EmulatorReset(seed).fixture("nombre_test"): ...`
+- Respeta FIRESTORE_EMULATOR_HOST, FIREBASE_AUTH_EMULATOR_HOST y GCLOUD_PROJECT
+  (los endpoints que entrega emulator_stacks.py a cada worker)
+
+Formato de la semilla (JSON):
+    {"firestore": {"companies/acme": {"name": "Acme"}},
+     "auth": [{"localId": "u1", "email": "u1@example.com", "password": "secret123"}]}
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+import http.server
+import urllib.parse
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common import print_colored, percentile
+from firestore_emulator import FirestoreEmulator, FirestoreEmulatorError, MAX_BATCH_WRITES, get_project_id
+
+DEFAULT_AUTH_HOST = "localhost:9099"
+SERVE_PORT = 9199
+REPORT_FILE = Path(".devtools/reset_report.json")
+
+def load_seed(path: Optional[Path]) -> Dict:
+    if path is None:
+        return {'firestore': {}, 'auth': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        seed = json.load(f)
+    return {'firestore': seed.get('firestore', {}), 'auth': seed.get('auth', [])}
+
+class AuthEmulator:
+    """Cliente mínimo del Auth Emulator con conexión keep-alive"""
+
+    def __init__(self, host: Optional[str], project_id: str, timeout: float = 30):
+        self.host = host or os.environ.get("FIREBASE_AUTH_EMULATOR_HOST", DEFAULT_AUTH_HOST)
+        self.project_id = project_id
+        self.timeout = timeout
+        self._conn = None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        # `Bearer owner` habilita operaciones administrativas (localId, limpieza)
+        headers = {'Authorization': 'Bearer owner', 'Content-Type': 'application/json'}
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=payload, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt == 1:
+                    raise
+        if response.status >= 400:
+            raise FirestoreEmulatorError(response.status, data.decode('utf-8', 'replace'))
+        return json.loads(data) if data else {}
+
+    def clear(self):
+        self.request('DELETE', f"/emulator/v1/projects/{self.project_id}/accounts")
+
+    def create_user(self, user: Dict):
+        self.request('POST', f"/identitytoolkit.googleapis.com/v1/projects/{self.project_id}/accounts",
+                     user)
+
+class EmulatorReset:
+    """Limpia Firestore/Auth y re-aplica la semilla; guarda el costo de cada reset"""
+
+    def __init__(self, seed: Optional[Dict] = None, firestore_host: Optional[str] = None,
+                 auth_host: Optional[str] = None, project_id: Optional[str] = None, auth: bool = True):
+        seed = seed or {'firestore': {}, 'auth': []}
+        if seed['auth'] and not auth:
+            # Sin limpiar Auth, recrear los usuarios fallaría por duplicados en el segundo reset
+            raise ValueError("La semilla tiene usuarios de Auth: no se puede combinar con --no-auth")
+        project_id = project_id or os.environ.get("GCLOUD_PROJECT") or get_project_id()
+        self.firestore = FirestoreEmulator(host=firestore_host, project_id=project_id)
+        self.auth = AuthEmulator(auth_host, project_id) if auth else None
+        # Writes codificados una sola vez: cada reset solo los reenvía
+        writes = [self.firestore.update_write(path, data) for path, data in seed['firestore'].items()]
+        self.seed_batches = [writes[i:i + MAX_BATCH_WRITES] for i in range(0, len(writes), MAX_BATCH_WRITES)]
+        self.seed_users = seed['auth']
+        self.samples = []  # type: List[Dict]
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.firestore.close()
+        if self.auth:
+            self.auth.close()
+
+    def reset(self, test: str = "") -> Dict:
+        """Deja los emuladores en el estado base; retorna los tiempos en ms"""
+        with self._lock:
+            timings = {'test': test}
+            started = time.perf_counter()
+            self.firestore.clear()
+            timings['firestore_ms'] = (time.perf_counter() - started) * 1000
+
+            mark = time.perf_counter()
+            if self.auth:
+                self.auth.clear()
+            timings['auth_ms'] = (time.perf_counter() - mark) * 1000
+
+            mark = time.perf_counter()
+            for batch in self.seed_batches:
+                self.firestore.commit(batch)
+            for user in self.seed_users:
+                self.auth.create_user(user)
+            timings['seed_ms'] = (time.perf_counter() - mark) * 1000
+            timings['total_ms'] = (time.perf_counter() - started) * 1000
+            self.samples.append(timings)
+            return timings
+
+    @contextmanager
+    def fixture(self, test: str = ""):
+        """Reset antes del test: `with resetter.fixture("test_login"): ...`"""
+        yield self.reset(test)
+
+    def summary(self) -> Dict:
+        totals = [s['total_ms'] for s in self.samples]
+        return {
+            'resets': len(totals),
+            'mean_ms': sum(totals) / len(totals) if totals else 0.0,
+            'p50_ms': percentile(totals, 50),
+            'p95_ms': percentile(totals, 95),
+            'max_ms': max(totals, default=0.0),
+            'firestore_ms': sum(s['firestore_ms'] for s in self.samples) / max(len(totals), 1),
+            'auth_ms': sum(s['auth_ms'] for s in self.samples) / max(len(totals), 1),
+            'seed_ms': sum(s['seed_ms'] for s in self.samples) / max(len(totals), 1)
+        }
+
+def show_report(resetter: EmulatorReset, top: int = 10):
+    summary = resetter.summary()
+    print_colored(f"\n🧼 {summary['resets']} resets: media {summary['mean_ms']:.1f} ms, p50 {summary['p50_ms']:.1f} ms, "
+                  f"p95 {summary['p95_ms']:.1f} ms, máx {summary['max_ms']:.1f} ms", 'cyan')
+    print_colored(f"   Firestore {summary['firestore_ms']:.1f} ms + Auth {summary['auth_ms']:.1f} ms "
+                  f"+ semilla {summary['seed_ms']:.1f} ms (promedio)", 'white')
+    named = [s for s in resetter.samples if s['test']]
+    for sample in sorted(named, key=lambda s: -s['total_ms'])[:top]:
+        print_colored(f"   {sample['total_ms']:>7.1f} ms  {sample['test']}", 'white')
+
+def write_report(resetter: EmulatorReset, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'summary': resetter.summary(), 'resets': resetter.samples}, f, indent=2)
+
+class ResetHandler(http.server.BaseHTTPRequestHandler):
+    """POST /reset?test=<nombre> → tiempos del reset; GET /report → resumen"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    resetter = None  # type: EmulatorReset
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        if url.path != '/reset':
+            self._reply(404, {'error': 'not found'})
+            return
+        test = urllib.parse.parse_qs(url.query).get('test', [''])[0]
+        try:
+            self._reply(200, self.resetter.reset(test))
+        except (OSError, http.client.HTTPException, FirestoreEmulatorError) as e:
+            self._reply(502, {'error': str(e)})
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path != '/report':
+            self._reply(404, {'error': 'not found'})
+            return
+        self._reply(200, self.resetter.summary())
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    """Función principal del reset de emuladores"""
+    parser = argparse.ArgumentParser(description="Reset rápido de Firestore/Auth Emulator entre tests")
+    parser.add_argument('command', choices=['reset', 'serve', 'benchmark'])
+    parser.add_argument('--seed', type=Path, help="Semilla base JSON (firestore/auth)")
+    parser.add_argument('--no-auth', action='store_true', help="No limpiar el Auth Emulator")
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help="Puerto de `serve`")
+    parser.add_argument('--count', type=int, default=50, help="Resets de `benchmark`")
+    parser.add_argument('--report', type=Path, default=REPORT_FILE, help="Reporte JSON de costos")
+    args = parser.parse_args()
+
+    try:
+        resetter = EmulatorReset(load_seed(args.seed), auth=not args.no_auth)
+    except ValueError as e:
+        print_colored(f"❌ {e}", 'red')
+        return 1
+    try:
+        if args.command == 'serve':
+            ResetHandler.resetter = resetter
+            server = http.server.ThreadingHTTPServer(('127.0.0.1', args.port), ResetHandler)
+            print_colored(f"🧼 Reset de emuladores en http://localhost:{args.port}/reset?test=<nombre>", 'cyan')
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+        else:
+            for index in range(args.count if args.command == 'benchmark' else 1):
+                timings = resetter.reset(f"benchmark-{index}" if args.command == 'benchmark' else "")
+            if args.command == 'reset':
+                print_colored(f"✅ Emuladores limpios en {timings['total_ms']:.1f} ms "
+                              f"(semilla {timings['seed_ms']:.1f} ms)", 'green')
+                return 0
+    except (OSError, http.client.HTTPException, FirestoreEmulatorError) as e:
+        print_colored(f"❌ Emulador no disponible: {e}", 'red')
+        return 1
+    finally:
+        resetter.close()
+
+    show_report(resetter, top=0 if args.command == 'benchmark' else 10)
+    if resetter.samples:
+        write_report(resetter, args.report)
+        print_colored(f"💾 Reporte en {args.report}", 'green')
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
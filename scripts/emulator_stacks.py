@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Stacks aislados de Firebase Emulators para tests de integración en paralelo
+Ejecutar: python scripts/emulator_stacks.py run --stacks 4 -- python -m pytest integration/
+
+- Asigna un conjunto de puertos libres por stack (Auth, Firestore, Functions, hub, logging)
+- Genera un firebase.json por stack en .devtools/stacks/<stack>/ y un proyecto
+  `demo-*` propio, así los datos de un stack no se ven desde otro
+- Inicia N stacks en paralelo y espera "All emulators ready" en cada uno
+- `run`: ejecuta el comando una vez por stack con sus endpoints en el entorno
+  (FIRESTORE_EMULATOR_HOST, FIREBASE_AUTH_EMULATOR_HOST, FUNCTIONS_EMULATOR_HOST,
+  GCLOUD_PROJECT, STACK_INDEX, STACK_COUNT para repartir shards)
+- `up`: deja los stacks corriendo e imprime sus endpoints (JSON con --json)
+- Cada stack corre en su propio grupo de procesos y se registra en
+  .devtools/stacks/stacks.json; `down` elimina los que quedaron de una ejecución abortada
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import atexit
+import signal
+import socket
+import argparse
+import platform
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common import print_colored
+
+STACKS_DIR = Path(".devtools/stacks")
+REGISTRY = STACKS_DIR / "stacks.json"
+BACKEND_DIR = Path("backend")
+EMULATORS = "auth,firestore,functions"
+READY_MARKER = "All emulators ready"
+PORT_NAMES = ('auth', 'firestore', 'firestore_ws', 'functions', 'hub', 'logging')
+IS_WINDOWS = platform.system() == "Windows"
+# Win32: OpenProcess/GetExitCodeProcess para comprobar procesos vivos
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
+def allocate_ports(count: int) -> List[int]:
+    """Pide al sistema `count` puertos libres distintos (todos abiertos a la vez)"""
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('127.0.0.1', 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+def _relative(target: Path, base: Path) -> str:
+    # firebase-tools resuelve las rutas de firebase.json respecto al directorio del archivo
+    return os.path.relpath(target.resolve(), base.resolve()).replace(os.sep, '/')
+
+class EmulatorStack:
+    """Un firebase emulators:start con puertos, config y proyecto propios"""
+
+    def __init__(self, index: int, run_id: str, ports: Dict[str, int]):
+        self.index = index
+        self.name = f"{run_id}-{index}"
+        self.project_id = f"demo-stack-{self.name}"
+        self.ports = ports
+        self.directory = STACKS_DIR / self.name
+        self.process = None  # type: Optional[subprocess.Popen]
+        self.ready = threading.Event()
+        self.log_path = self.directory / "emulators.log"
+
+    @property
+    def config_path(self) -> Path:
+        return self.directory / "firebase.json"
+
+    def write_config(self):
+        """firebase.json de este stack a partir de backend/firebase.json"""
+        with open(BACKEND_DIR / "firebase.json", 'r') as f:
+            base = json.load(f)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        firestore = dict(base.get('firestore', {}))
+        for key in ('rules', 'indexes'):
+            if key in firestore:
+                firestore[key] = _relative(BACKEND_DIR / firestore[key], self.directory)
+        functions = dict(base.get('functions', {}))
+        functions['source'] = _relative(BACKEND_DIR / functions.get('source', 'functions'), self.directory)
+        config = {
+            'firestore': firestore,
+            'functions': functions,
+            'emulators': {
+                'auth': {'host': '127.0.0.1', 'port': self.ports['auth']},
+                'firestore': {'host': '127.0.0.1', 'port': self.ports['firestore'],
+                              'websocketPort': self.ports['firestore_ws']},
+                'functions': {'host': '127.0.0.1', 'port': self.ports['functions']},
+                'hub': {'host': '127.0.0.1', 'port': self.ports['hub']},
+                'logging': {'host': '127.0.0.1', 'port': self.ports['logging']},
+                'ui': {'enabled': False},
+                'singleProjectMode': True
+            }
+        }
+        with open(self.config_path, 'w') as f:
+            json.dump(config, f, indent=2)
+
+    def endpoints(self) -> Dict[str, str]:
+        """Variables de entorno que apuntan un worker a este stack"""
+        return {
+            'FIRESTORE_EMULATOR_HOST': f"127.0.0.1:{self.ports['firestore']}",
+            'FIREBASE_AUTH_EMULATOR_HOST': f"127.0.0.1:{self.ports['auth']}",
+            'FUNCTIONS_EMULATOR_HOST': f"127.0.0.1:{self.ports['functions']}",
+            'GCLOUD_PROJECT': self.project_id,
+            'STACK_INDEX': str(self.index)
+        }
+
+    def start(self):
+        self.write_config()
+        command = (f'firebase emulators:start --only {EMULATORS} --project {self.project_id} '
+                   f'--config "{self.config_path.resolve()}"')
+        options = {}
+        if IS_WINDOWS:
+            options['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            # Grupo de procesos propio: el teardown alcanza java y node hijos
+            options['start_new_session'] = True
+        self.process = subprocess.Popen(command, shell=True, cwd=str(self.directory),
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        universal_newlines=True, bufsize=1, **options)
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        with open(self.log_path, 'w', encoding='utf-8') as log:
+            for line in iter(self.process.stdout.readline, ''):
+                log.write(line)
+                log.flush()
+                if READY_MARKER in line:
+                    self.ready.set()
+
+    def wait_ready(self, timeout: float, stopping: threading.Event) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not stopping.is_set():
+            if self.ready.wait(0.5):
+                return True
+            if self.process.poll() is not None:
+                return False
+        return False
+
+    def stop(self, timeout: float = 15):
+        if self.process is None:
+            return
+        # Aunque firebase ya haya salido, sus hijos (java, node) pueden seguir en el grupo
+        kill_group(self.process.pid, timeout)
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def tail(self, lines: int = 15) -> str:
+        try:
+            return "".join(open(self.log_path, encoding='utf-8').readlines()[-lines:])
+        except OSError:
+            return ""
+
+def process_alive(pid: int) -> bool:
+    """Comprueba si el proceso existe sin enviarle nada"""
+    if IS_WINDOWS:
+        # os.kill(pid, 0) en Windows llama a TerminateProcess: se consulta con OpenProcess
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def kill_group(pid: int, timeout: float = 15):
+    """Termina el grupo de procesos del stack (SIGTERM, luego SIGKILL)"""
+    if IS_WINDOWS:
+        subprocess.run(f"taskkill /T /F /PID {pid}", shell=True, capture_output=True)
+        return
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.killpg(pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.2)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+class StackRegistry:
+    """stacks.json: pids de grupos vivos para limpiar ejecuciones abortadas"""
+
+    def __init__(self, path: Path = REGISTRY):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, stacks: Dict[str, Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(stacks, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def add(self, stack: EmulatorStack):
+        with self._lock:
+            stacks = self._load()
+            stacks[stack.name] = {'pid': stack.process.pid, 'owner': os.getpid(), 'ports': stack.ports}
+            self._save(stacks)
+
+    def remove(self, name: str):
+        with self._lock:
+            stacks = self._load()
+            stacks.pop(name, None)
+            self._save(stacks)
+
+    def entries(self) -> Dict[str, Dict]:
+        return self._load()
+
+class StackManager:
+    """Inicia N stacks en paralelo y garantiza su teardown (context manager)"""
+
+    def __init__(self, count: int, ready_timeout: float = 180):
+        self.count = count
+        self.ready_timeout = ready_timeout
+        self.run_id = f"{os.getpid()}"
+        self.stacks = []  # type: List[EmulatorStack]
+        self.registry = StackRegistry()
+        # Señal recibida: el hilo principal hace el teardown al volver del paso en curso
+        self.stopping = threading.Event()
+        self.workers = []  # type: List[subprocess.Popen]
+
+    def __enter__(self):
+        atexit.register(self.stop)
+        self._previous_handlers = {}
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self._previous_handlers[signum] = signal.signal(signum, self._on_signal)
+        try:
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        for signum, handler in self._previous_handlers.items():
+            signal.signal(signum, handler)
+
+    def _on_signal(self, signum, frame):
+        if self.stopping.is_set():
+            return
+        print_colored("\n🛑 Deteniendo stacks...", 'yellow')
+        self.stopping.set()
+        for process in self.workers:
+            if process.poll() is None:
+                process.terminate()
+
+    def start(self):
+        # Todos los puertos se piden juntos: no se repiten entre stacks
+        ports = allocate_ports(self.count * len(PORT_NAMES))
+        for index in range(self.count):
+            chunk = ports[index * len(PORT_NAMES):(index + 1) * len(PORT_NAMES)]
+            self.stacks.append(EmulatorStack(index, self.run_id, dict(zip(PORT_NAMES, chunk))))
+
+        started = time.perf_counter()
+        for stack in self.stacks:
+            stack.start()
+            self.registry.add(stack)
+        with ThreadPoolExecutor(max_workers=self.count) as executor:
+            ready = list(executor.map(lambda s: s.wait_ready(self.ready_timeout, self.stopping), self.stacks))
+        if self.stopping.is_set():
+            return
+        failed = [stack for stack, ok in zip(self.stacks, ready) if not ok]
+        if failed:
+            for stack in failed:
+                print_colored(f"❌ Stack {stack.name} no quedó listo ({stack.log_path}):\n{stack.tail()}", 'red')
+            raise RuntimeError(f"{len(failed)} de {self.count} stacks no iniciaron")
+        print_colored(f"✅ {self.count} stacks listos en {time.perf_counter() - started:.1f}s", 'green')
+
+    def stop(self):
+        stacks, self.stacks = self.stacks, []
+        with ThreadPoolExecutor(max_workers=max(len(stacks), 1)) as executor:
+            list(executor.map(EmulatorStack.stop, stacks))
+        for stack in stacks:
+            self.registry.remove(stack.name)
+
+def run_workers(manager: StackManager, command: List[str]) -> int:
+    """Ejecuta `command` una vez por stack en paralelo; retorna el peor código de salida"""
+    stacks = manager.stacks
+    command_line = " ".join(shlex.quote(part) for part in command) if not IS_WINDOWS else \
+        subprocess.list2cmdline(command)
+    lock = threading.Lock()
+
+    def worker(stack: EmulatorStack) -> int:
+        env = dict(os.environ, **stack.endpoints(), STACK_COUNT=str(len(stacks)))
+        with lock:
+            if manager.stopping.is_set():
+                return 130
+            process = subprocess.Popen(command_line, shell=True, env=env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1)
+            manager.workers.append(process)
+        for line in iter(process.stdout.readline, ''):
+            with lock:
+                print(f"[stack-{stack.index}] {line.rstrip()}")
+        return process.wait()
+
+    with ThreadPoolExecutor(max_workers=len(stacks)) as executor:
+        codes = list(executor.map(worker, stacks))
+    for stack, code in zip(stacks, codes):
+        print_colored(f"   stack-{stack.index}: código {code}", 'green' if code == 0 else 'red')
+    return max(codes, default=0)
+
+def cleanup_registry() -> int:
+    """Termina stacks registrados cuyo proceso dueño ya no existe"""
+    registry = StackRegistry()
+    removed = 0
+    for name, entry in registry.entries().items():
+        if entry['owner'] != os.getpid() and process_alive(entry['owner']):
+            continue
+        kill_group(entry['pid'])
+        registry.remove(name)
+        removed += 1
+        print_colored(f"🧹 Stack {name} detenido (puertos {sorted(entry['ports'].values())})", 'yellow')
+    return removed
+
+def main():
+    """Función principal del gestor de stacks"""
+    parser = argparse.ArgumentParser(description="Stacks aislados de Firebase Emulators")
+    parser.add_argument('command', choices=['run', 'up', 'down'])
+    parser.add_argument('--stacks', type=int, default=os.cpu_count() or 1,
+                        help="Stacks en paralelo (default: CPUs)")
+    parser.add_argument('--ready-timeout', type=float, default=180,
+                        help="Segundos máximos para que cada stack quede listo")
+    parser.add_argument('--json', action='store_true', help="`up`: imprimir endpoints en JSON")
+    argv = sys.argv[1:]
+    # Todo lo que sigue a `--` es el comando de cada worker
+    worker = argv[argv.index('--') + 1:] if '--' in argv else []
+    args = parser.parse_args(argv[:argv.index('--')] if '--' in argv else argv)
+
+    if args.command == 'down':
+        removed = cleanup_registry()
+        print_colored(f"✅ {removed} stacks detenidos", 'green')
+        return 0
+
+    if not (BACKEND_DIR / "firebase.json").exists():
+        print_colored("❌ Ejecuta este script desde la raíz del proyecto", 'red')
+        return 1
+    if args.command == 'run' and not worker:
+        print_colored("❌ Falta el comando: emulator_stacks.py run --stacks 4 -- <comando>", 'red')
+        return 1
+
+    # Stacks huérfanos de ejecuciones anteriores ocupan puertos y memoria
+    cleanup_registry()
+    print_colored(f"🔥 Iniciando {args.stacks} stacks ({EMULATORS})...", 'cyan')
+    try:
+        with StackManager(args.stacks, args.ready_timeout) as manager:
+            if manager.stopping.is_set():
+                return 130
+            for stack in manager.stacks:
+                ports = ", ".join(f"{name} {port}" for name, port in stack.ports.items())
+                print_colored(f"   stack-{stack.index} [{stack.project_id}]: {ports}", 'white')
+            if args.command == 'run':
+                exit_code = run_workers(manager, worker)
+                return 130 if manager.stopping.is_set() else exit_code
+            if args.json:
+                print(json.dumps([stack.endpoints() for stack in manager.stacks], indent=2))
+            print_colored("⚠️ Presiona Ctrl+C para detener todos los stacks", 'yellow')
+            while not manager.stopping.wait(1):
+                if any(stack.process.poll() is not None for stack in manager.stacks):
+                    break
+            if manager.stopping.is_set():
+                return 130
+            print_colored("❌ Un stack terminó inesperadamente", 'red')
+            return 1
+    except RuntimeError as e:
+        print_colored(f"❌ {e}", 'red')
+        return 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
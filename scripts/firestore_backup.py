@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Backup y restore en paralelo del Firestore Emulator
+Ejecutar: python scripts/firestore_backup.py backup --output backups/2024-01-01
+          python scripts/firestore_backup.py restore --input backups/2024-01-01 [--company <id>]
+
+- Lee cada colección por rangos de nombres (particiones) en workers paralelos; los
+  cortes salen de una muestra de los nombres existentes, no de un alfabeto fijo
+- Escribe chunks NDJSON comprimidos con gzip y un manifest con sha256 por archivo
+- Restaura con commits por lotes de 500 y concurrencia acotada (--jobs)
+- Verifica checksums antes de escribir
+- Restore rápido del subárbol de una empresa (companies/{id} y documentos con su companyId)
+- Benchmark de throughput contra un proyecto aislado del emulador
+"""
+
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from common import print_colored
+from firestore_emulator import FirestoreEmulator, FirestoreEmulatorError, MAX_BATCH_WRITES
+
+# Colecciones (y subcolecciones por id, vía collection group) incluidas por defecto
+DEFAULT_COLLECTIONS = ['users', 'companies', 'customers', 'payment_events', 'campaigns',
+                       'templates', 'metrics', 'scheduler_state', 'chunks']
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+# Alfabeto de los ids automáticos de Firestore (ids sintéticos del benchmark)
+ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+# Empresas distintas que se listan por chunk en el manifest (más → se escanea el chunk)
+MAX_CHUNK_COMPANIES = 100
+RETRYABLE_STATUS = (409, 429, 500, 503)
+BENCHMARK_PROJECT = 'backup-benchmark'
+
+class ClientPool:
+    """Un FirestoreEmulator por hilo (el cliente no es thread-safe)"""
+
+    def __init__(self, host: Optional[str], project_id: Optional[str]):
+        self.host = host
+        self.project_id = project_id
+        self._local = threading.local()
+        self._clients = []
+        self._lock = threading.Lock()
+
+    def get(self) -> FirestoreEmulator:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = FirestoreEmulator(self.host, self.project_id)
+            self._local.client = client
+            with self._lock:
+                self._clients.append(client)
+        return client
+
+    def close(self):
+        for client in self._clients:
+            client.close()
+
+def partition_bounds(cuts: List[str]) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Rangos [inicio, fin) entre cortes; el primero y el último quedan abiertos para cubrir todo"""
+    starts = [None] + cuts
+    ends = cuts + [None]
+    return list(zip(starts, ends))
+
+def iter_partition(client: FirestoreEmulator, collection: str, start: Optional[str], end: Optional[str],
+                   page_size: int, keys_only: bool = False) -> Iterator[Dict]:
+    """Documentos REST del collection group `collection` con nombre en [start, end), paginando por nombre
+
+    `start` y `end` son nombres completos de documento: en un collection group las
+    subcolecciones (scheduler_state/{id}/chunks/...) se ordenan por su ruta completa.
+    Con keys_only=True solo se leen los nombres (sin campos).
+    """
+    conditions = []
+    if start is not None:
+        conditions.append({'fieldFilter': {'field': {'fieldPath': '__name__'},
+                                           'op': 'GREATER_THAN_OR_EQUAL', 'value': {'referenceValue': start}}})
+    if end is not None:
+        conditions.append({'fieldFilter': {'field': {'fieldPath': '__name__'},
+                                           'op': 'LESS_THAN', 'value': {'referenceValue': end}}})
+    query = {
+        'from': [{'collectionId': collection, 'allDescendants': True}],
+        'orderBy': [{'field': {'fieldPath': '__name__'}, 'direction': 'ASCENDING'}],
+        'limit': page_size
+    }
+    if keys_only:
+        query['select'] = {'fields': [{'fieldPath': '__name__'}]}
+    if len(conditions) == 1:
+        query['where'] = conditions[0]
+    elif conditions:
+        query['where'] = {'compositeFilter': {'op': 'AND', 'filters': conditions}}
+
+    while True:
+        documents = client.run_query(query, raw=True)
+        for document in documents:
+            yield document
+        if len(documents) < page_size:
+            return
+        query['startAt'] = {'values': [{'referenceValue': documents[-1]['name']}], 'before': False}
+
+def sample_cuts(client: FirestoreEmulator, collection: str, partitions: int, page_size: int) -> List[str]:
+    """Nombres de documento que parten el collection group en rangos de tamaño parecido
+
+    Los ids reales no se reparten uniformemente en el alfabeto (prefijos evt_/cus_/sub_,
+    ids de empresa compartidos) y las subcolecciones se ordenan por ruta completa: los
+    cortes se toman de los nombres existentes, en una pasada que lee solo __name__.
+    """
+    total = client.count({'from': [{'collectionId': collection, 'allDescendants': True}]})
+    partitions = min(partitions, total)
+    if partitions < 2:
+        return []
+    targets = [total * i // partitions for i in range(1, partitions)]
+    cuts = []
+    for position, document in enumerate(iter_partition(client, collection, None, None, page_size,
+                                                       keys_only=True)):
+        if position == targets[len(cuts)]:
+            cuts.append(document['name'])
+            if len(cuts) == len(targets):
+                break
+    return cuts
+
+def document_company(path: str, fields: Dict) -> Optional[str]:
+    """Empresa dueña del documento: companies/{id}/... o el campo companyId"""
+    if path.startswith('companies/'):
+        return path.split('/', 2)[1]
+    company = fields.get('companyId')
+    return company.get('stringValue') if company else None
+
+def write_chunk(path: Path, lines: List[bytes]) -> Tuple[int, str]:
+    """Escribe el chunk comprimido y retorna (bytes, sha256 del archivo)"""
+    data = gzip.compress(b''.join(lines), compresslevel=6)
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    temporary.replace(path)
+    return len(data), hashlib.sha256(data).hexdigest()
+
+def backup_partition(pool: ClientPool, output: Path, collection: str, index: int,
+                     bounds: Tuple[Optional[str], Optional[str]], chunk_docs: int,
+                     page_size: int) -> List[Dict]:
+    """Respalda una partición y retorna las entradas de manifest de sus chunks"""
+    client = pool.get()
+    prefix = f"{client.documents_root}/"
+    entries = []
+    lines = []
+    companies = set()
+
+    def flush():
+        name = f"{collection}/p{index:02d}-{len(entries):05d}.ndjson.gz"
+        size, digest = write_chunk(output / name, lines)
+        entries.append({
+            'file': name,
+            'collection': collection,
+            'documents': len(lines),
+            'bytes': size,
+            'sha256': digest,
+            'companies': sorted(companies) if len(companies) <= MAX_CHUNK_COMPANIES else None
+        })
+
+    (output / collection).mkdir(parents=True, exist_ok=True)
+    for document in iter_partition(client, collection, bounds[0], bounds[1], page_size):
+        path = document['name'][len(prefix):]
+        fields = document.get('fields', {})
+        company = document_company(path, fields)
+        if company:
+            companies.add(company)
+        lines.append(json.dumps({'path': path, 'fields': fields}, separators=(',', ':')).encode('utf-8') + b"\n")
+        if len(lines) >= chunk_docs:
+            flush()
+            lines = []
+            companies = set()
+    if lines:
+        flush()
+    return entries
+
+def run_backup(pool: ClientPool, output: Path, collections: List[str], partitions: int, jobs: int,
+               chunk_docs: int, page_size: int) -> Dict:
+    """Respalda todas las colecciones en paralelo y escribe el manifest"""
+    output.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    files = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        cuts = executor.map(lambda collection: sample_cuts(pool.get(), collection, partitions, page_size),
+                            collections)
+        futures = [executor.submit(backup_partition, pool, output, collection, index, bounds,
+                                   chunk_docs, page_size)
+                   for collection, collection_cuts in zip(collections, cuts)
+                   for index, bounds in enumerate(partition_bounds(collection_cuts))]
+        for future in as_completed(futures):
+            files.extend(future.result())
+    files.sort(key=lambda entry: entry['file'])
+    manifest = {
+        'version': FORMAT_VERSION,
+        'project': pool.get().project_id,
+        'createdAt': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        'collections': collections,
+        'partitions': partitions,
+        'documents': sum(entry['documents'] for entry in files),
+        'bytes': sum(entry['bytes'] for entry in files),
+        'seconds': round(time.perf_counter() - started, 3),
+        'files': files
+    }
+    with open(output / MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+class ChecksumError(Exception):
+    """El archivo de backup no coincide con el sha256 del manifest"""
+
+def read_chunk(path: Path, expected_sha256: str) -> List[bytes]:
+    """Líneas NDJSON del chunk, tras verificar el checksum del archivo"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if hashlib.sha256(data).hexdigest() != expected_sha256:
+        raise ChecksumError(f"Checksum inválido: {path}")
+    return [line for line in gzip.decompress(data).splitlines() if line]
+
+def commit_with_retry(client: FirestoreEmulator, writes: List[Dict], attempts: int = 5):
+    for attempt in range(attempts):
+        try:
+            client.commit(writes)
+            return
+        except FirestoreEmulatorError as e:
+            if e.status not in RETRYABLE_STATUS or attempt == attempts - 1:
+                raise
+        except ConnectionError:
+            if attempt == attempts - 1:
+                raise
+        time.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+
+def restore_file(pool: ClientPool, backup: Path, entry: Dict, company: Optional[str],
+                 batch_size: int) -> int:
+    """Restaura un chunk (verificando su checksum) y retorna documentos escritos"""
+    client = pool.get()
+    needle = company.encode('utf-8') if company is not None else None
+    writes = []
+    written = 0
+    for line in read_chunk(backup / entry['file'], entry['sha256']):
+        # Descarte barato antes de decodificar: el id de la empresa debe aparecer en la línea
+        if needle is not None and needle not in line:
+            continue
+        document = json.loads(line)
+        if company is not None and document_company(document['path'], document['fields']) != company:
+            continue
+        writes.append({'update': {'name': f"{client.documents_root}/{document['path']}",
+                                  'fields': document['fields']}})
+        if len(writes) >= batch_size:
+            commit_with_retry(client, writes)
+            written += len(writes)
+            writes = []
+    if writes:
+        commit_with_retry(client, writes)
+        written += len(writes)
+    return written
+
+def select_files(manifest: Dict, company: Optional[str], collections: Optional[List[str]]) -> List[Dict]:
+    """Chunks a restaurar; con company se saltan los que el manifest sabe que no la contienen"""
+    selected = []
+    for entry in manifest['files']:
+        if collections and entry['collection'] not in collections:
+            continue
+        if company is not None and entry['companies'] is not None and company not in entry['companies']:
+            continue
+        selected.append(entry)
+    return selected
+
+def run_restore(pool: ClientPool, backup: Path, jobs: int, company: Optional[str] = None,
+                collections: Optional[List[str]] = None, batch_size: int = MAX_BATCH_WRITES) -> Tuple[int, int]:
+    """Restaura en paralelo; retorna (documentos escritos, chunks leídos)"""
+    with open(backup / MANIFEST, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Versión de backup no soportada: {manifest.get('version')}")
+    files = select_files(manifest, company, collections)
+    written = 0
+    # El pool acota la concurrencia: como máximo `jobs` commits en vuelo contra el emulador
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(restore_file, pool, backup, entry, company, batch_size) for entry in files]
+        for future in as_completed(futures):
+            written += future.result()
+    return written, len(files)
+
+def show_throughput(label: str, documents: int, size: int, seconds: float):
+    print_colored(f"  {label}: {documents:,} documentos en {seconds:.2f}s "
+                  f"({documents / max(seconds, 1e-9):,.0f} docs/s, "
+                  f"{size / max(seconds, 1e-9) / 1024 / 1024:.1f} MB/s comprimido)", 'green')
+
+def seed_benchmark(client: FirestoreEmulator, count: int, companies: int):
+    """Siembra datos con la forma de producción: ids de Stripe con prefijo y subcolecciones
+
+    customers/cus_…, payment_events/evt_…, companies/company_N y los chunks de los
+    snapshots del scheduler (scheduler_state/{nombre}/chunks/v{versión}_{n}).
+    """
+    rng = random.Random(3)
+
+    def stripe_id(prefix: str) -> str:
+        return prefix + ''.join(rng.choice(ID_ALPHABET) for _ in range(14))
+
+    company_ids = [f"company_{i}" for i in range(companies)]
+    documents = [(f"companies/{company_id}", {'name': f"Empresa {i}", 'plan': 'growth'})
+                 for i, company_id in enumerate(company_ids)]
+    for i in range(count):
+        company_id = company_ids[i % companies]
+        if i % 20 == 0:
+            name = ('dunning', 'campaigns', 'retries')[i % 3]
+            documents.append((f"scheduler_state/{name}/chunks/v1_{i:08d}", {'jobs': 'x' * 200}))
+        elif i % 4 == 0:
+            documents.append((f"customers/{stripe_id('cus_')}", {'companyId': company_id, 'name': f"Cliente {i}",
+                                                                 'email': f"c{i}@example.com", 'riskScore': 0.25}))
+        else:
+            documents.append((f"payment_events/{stripe_id('evt_')}", {
+                'companyId': company_id, 'type': 'invoice.payment_failed', 'status': 'failed',
+                'amount': 1000 + i % 9000, 'currency': 'usd',
+                'createdAt': datetime.now(timezone.utc)}))
+    documents += [(f"scheduler_state/{name}", {'version': 1}) for name in ('dunning', 'campaigns', 'retries')]
+    client.set_documents(documents)
+    return company_ids
+
+def partition_balance(manifest: Dict) -> Dict[str, Tuple[int, int, int]]:
+    """(particiones, mínimo, máximo) de documentos por partición de cada colección"""
+    sizes = {}
+    for entry in manifest['files']:
+        partition = entry['file'].rsplit('/', 1)[-1].split('-', 1)[0]
+        per_collection = sizes.setdefault(entry['collection'], {})
+        per_collection[partition] = per_collection.get(partition, 0) + entry['documents']
+    return {collection: (len(counts), min(counts.values()), max(counts.values()))
+            for collection, counts in sizes.items()}
+
+def count_documents(pool: ClientPool, collections: List[str]) -> int:
+    client = pool.get()
+    return sum(1 for collection in collections
+               for _ in iter_partition(client, collection, None, None, 1000))
+
+def run_benchmark(args) -> int:
+    """Backup, restore completo y restore de una empresa en un proyecto aislado del emulador"""
+    pool = ClientPool(args.host, BENCHMARK_PROJECT)
+    collections = ['companies', 'customers', 'payment_events', 'scheduler_state', 'chunks']
+    output = args.output or Path(".devtools/backup_benchmark")
+    try:
+        client = pool.get()
+        client.clear()
+        print_colored(f"🌱 Sembrando {args.benchmark:,} documentos en el proyecto '{BENCHMARK_PROJECT}'...", 'cyan')
+        company_ids = seed_benchmark(client, args.benchmark, args.companies)
+
+        started = time.perf_counter()
+        manifest = run_backup(pool, output, collections, args.partitions, args.jobs, args.chunk_docs, 1000)
+        show_throughput("📦 Backup", manifest['documents'], manifest['bytes'], time.perf_counter() - started)
+        for collection, (used, smallest, largest) in partition_balance(manifest).items():
+            print_colored(f"     {collection:<16} {used} particiones, {smallest:,}-{largest:,} documentos", 'white')
+
+        client.clear()
+        started = time.perf_counter()
+        restored, _ = run_restore(pool, output, args.jobs)
+        show_throughput("♻️ Restore", restored, manifest['bytes'], time.perf_counter() - started)
+        found = count_documents(pool, collections)
+        if found != manifest['documents']:
+            print_colored(f"  ❌ Restaurados {found:,} de {manifest['documents']:,} documentos", 'red')
+            return 1
+
+        client.clear()
+        started = time.perf_counter()
+        restored, files = run_restore(pool, output, args.jobs, company=company_ids[0])
+        elapsed = time.perf_counter() - started
+        print_colored(f"  🏢 Restore de una empresa: {restored:,} documentos de {files} chunk(s) "
+                      f"en {elapsed:.2f}s", 'green')
+        client.clear()
+        return 0
+    finally:
+        pool.close()
+
+def main():
+    """Función principal de backup/restore"""
+    parser = argparse.ArgumentParser(description="Backup y restore del Firestore Emulator")
+    parser.add_argument('command', choices=['backup', 'restore', 'verify', 'benchmark'])
+    parser.add_argument('--output', type=Path, help="Directorio destino del backup")
+    parser.add_argument('--input', type=Path, help="Directorio del backup a restaurar/verificar")
+    parser.add_argument('--collections', help="Colecciones separadas por coma")
+    parser.add_argument('--company', help="Restaurar solo el subárbol de esta empresa")
+    parser.add_argument('--jobs', type=int, default=8, help="Workers en paralelo")
+    parser.add_argument('--partitions', type=int, default=8, help="Rangos de nombres por colección")
+    parser.add_argument('--chunk-docs', type=int, default=5000, help="Documentos por archivo")
+    parser.add_argument('--host', help="Host del emulador (por defecto FIRESTORE_EMULATOR_HOST)")
+    parser.add_argument('--project', help="Proyecto del emulador")
+    parser.add_argument('--clear', action='store_true', help="Vaciar el emulador antes de restaurar")
+    parser.add_argument('--count', type=int, default=100_000, help="Documentos del benchmark")
+    parser.add_argument('--companies', type=int, default=50, help="Empresas del benchmark")
+    args = parser.parse_args()
+    collections = args.collections.split(',') if args.collections else None
+
+    try:
+        if args.command == 'benchmark':
+            args.benchmark = args.count
+            return run_benchmark(args)
+
+        if args.command == 'verify':
+            with open(args.input / MANIFEST, 'r') as f:
+                manifest = json.load(f)
+            for entry in manifest['files']:
+                read_chunk(args.input / entry['file'], entry['sha256'])
+            print_colored(f"✅ {len(manifest['files'])} chunks verificados "
+                          f"({manifest['documents']:,} documentos)", 'green')
+            return 0
+
+        pool = ClientPool(args.host, args.project)
+        try:
+            if args.command == 'backup':
+                if not args.output:
+                    parser.error("backup requiere --output")
+                print_colored("📦 Respaldando Firestore...", 'green')
+                manifest = run_backup(pool, args.output, collections or DEFAULT_COLLECTIONS,
+                                      args.partitions, args.jobs, args.chunk_docs, 1000)
+                show_throughput("✅ Backup", manifest['documents'], manifest['bytes'], manifest['seconds'])
+                return 0
+
+            if not args.input:
+                parser.error("restore requiere --input")
+            if args.clear:
+                if args.company:
+                    parser.error("--clear no se puede combinar con --company")
+                pool.get().clear()
+            target = f"la empresa {args.company}" if args.company else "todas las colecciones"
+            print_colored(f"♻️ Restaurando {target}...", 'green')
+            started = time.perf_counter()
+            restored, files = run_restore(pool, args.input, args.jobs, args.company, collections)
+            elapsed = time.perf_counter() - started
+            print_colored(f"✅ {restored:,} documentos restaurados desde {files} chunk(s) en {elapsed:.2f}s "
+                          f"({restored / max(elapsed, 1e-9):,.0f} docs/s)", 'green')
+            return 0
+        finally:
+            pool.close()
+    except ChecksumError as e:
+        print_colored(f"❌ {e}", 'red')
+        return 1
+    except (FirestoreEmulatorError, OSError, ValueError) as e:
+        print_colored(f"❌ Error: {e}", 'red')
+        print_colored("💡 ¿Está corriendo el emulador? (python scripts/dev.py)", 'yellow')
+        return 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,332 @@
+"""
+Cliente mínimo para la API REST del Firestore Emulator
+Usado por las herramientas de scripts/ que leen o escriben datos locales.
+
+- Conexión HTTP persistente (keep-alive) hacia el emulador
+- Paginación de colecciones con cursores
+- Escrituras por lotes vía :commit
+- Codificación/decodificación de valores Firestore
+- Registro opcional de consultas (FIRESTORE_QUERY_LOG) para index_advisor.py
+"""
+
+import os
+import json
+import time
+import base64
+import http.client
+import urllib.parse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_HOST = "localhost:8080"
+DEFAULT_PROJECT = "revenue-recovery-saas"
+
+# Límite de escrituras por commit en Firestore
+MAX_BATCH_WRITES = 500
+
+class FirestoreEmulatorError(Exception):
+    """Error retornado por la API REST del emulador"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+def get_project_id(root: Path = Path(".")) -> str:
+    """Obtiene el proyecto por defecto desde backend/.firebaserc"""
+    firebaserc_path = root / "backend/.firebaserc"
+    try:
+        with open(firebaserc_path, 'r') as f:
+            return json.load(f)['projects']['default']
+    except Exception:
+        return DEFAULT_PROJECT
+
+def encode_value(value) -> Dict:
+    """Convierte un valor Python al formato de valor de Firestore"""
+    if value is None:
+        return {'nullValue': None}
+    if isinstance(value, bool):
+        return {'booleanValue': value}
+    if isinstance(value, int):
+        return {'integerValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, str):
+        return {'stringValue': value}
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return {'timestampValue': value.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')}
+    if isinstance(value, bytes):
+        return {'bytesValue': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, dict):
+        return {'mapValue': {'fields': encode_fields(value)}}
+    if isinstance(value, (list, tuple)):
+        return {'arrayValue': {'values': [encode_value(v) for v in value]}}
+    raise TypeError(f"Tipo no soportado por Firestore: {type(value).__name__}")
+
+def encode_fields(data: Dict) -> Dict:
+    return {key: encode_value(value) for key, value in data.items()}
+
+def decode_value(value: Dict):
+    """Convierte un valor de Firestore a Python (timestamps quedan como ISO string)"""
+    if 'nullValue' in value:
+        return None
+    if 'booleanValue' in value:
+        return value['booleanValue']
+    if 'integerValue' in value:
+        return int(value['integerValue'])
+    if 'doubleValue' in value:
+        return float(value['doubleValue'])
+    if 'stringValue' in value:
+        return value['stringValue']
+    if 'timestampValue' in value:
+        return value['timestampValue']
+    if 'bytesValue' in value:
+        return base64.b64decode(value['bytesValue'])
+    if 'referenceValue' in value:
+        return value['referenceValue']
+    if 'geoPointValue' in value:
+        return value['geoPointValue']
+    if 'mapValue' in value:
+        return decode_fields(value['mapValue'].get('fields', {}))
+    if 'arrayValue' in value:
+        return [decode_value(v) for v in value['arrayValue'].get('values', [])]
+    return None
+
+def decode_fields(fields: Dict) -> Dict:
+    return {key: decode_value(value) for key, value in fields.items()}
+
+def decode_document(document: Dict) -> Tuple[str, Dict]:
+    """Retorna (ruta relativa, datos) de un documento REST"""
+    path = document['name'].split('/documents/', 1)[1]
+    return path, decode_fields(document.get('fields', {}))
+
+class FirestoreEmulator:
+    """Cliente REST del Firestore Emulator (no thread-safe: un cliente por hilo)"""
+
+    def __init__(self, host: Optional[str] = None, project_id: Optional[str] = None,
+                 timeout: float = 30):
+        self.host = host or os.environ.get("FIRESTORE_EMULATOR_HOST", DEFAULT_HOST)
+        self.project_id = project_id or get_project_id()
+        self.timeout = timeout
+        self.database = f"projects/{self.project_id}/databases/(default)"
+        self.documents_root = f"{self.database}/documents"
+        self._conn = None
+        self.request_count = 0
+        self.query_log = os.environ.get("FIRESTORE_QUERY_LOG")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        """Ejecuta una petición reutilizando la conexión; reintenta una vez si se cerró"""
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Authorization': 'Bearer owner', 'Content-Type': 'application/json'}
+
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=payload, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt == 1:
+                    raise
+
+        self.request_count += 1
+        if response.status >= 400:
+            raise FirestoreEmulatorError(response.status, data.decode('utf-8', 'replace'))
+        return json.loads(data) if data else {}
+
+    def _log_query(self, entry: Dict):
+        """Agrega una consulta al log JSONL de FIRESTORE_QUERY_LOG (formato de index_advisor.py)"""
+        entry = dict(entry, ts=round(time.time(), 3), source='client')
+        with open(self.query_log, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def list_documents(self, collection: str, page_size: int = 300,
+                       page_token: Optional[str] = None, raw: bool = False) -> Tuple[List, Optional[str]]:
+        """Lee una página de la colección y retorna (documentos, siguiente cursor)
+
+        Con raw=True retorna los documentos REST sin decodificar (incluyen updateTime).
+        """
+        path = f"/v1/{self.documents_root}/{collection}?pageSize={page_size}"
+        if page_token:
+            path += f"&pageToken={urllib.parse.quote(page_token)}"
+        started = time.perf_counter()
+        response = self.request('GET', path)
+        documents = response.get('documents', [])
+        if self.query_log:
+            self._log_query({'kind': 'list', 'collection': collection, 'results': len(documents),
+                             'ms': round((time.perf_counter() - started) * 1000, 2)})
+        if not raw:
+            documents = [decode_document(d) for d in documents]
+        return documents, response.get('nextPageToken')
+
+    def iter_documents(self, collection: str, page_size: int = 300, raw: bool = False) -> Iterator:
+        """Itera todos los documentos de una colección página por página"""
+        page_token = None
+        while True:
+            documents, page_token = self.list_documents(collection, page_size, page_token, raw)
+            for document in documents:
+                yield document
+            if not page_token:
+                return
+
+    def get_document(self, path: str) -> Optional[Dict]:
+        """Retorna los datos del documento o None si no existe"""
+        try:
+            return decode_document(self.request('GET', f"/v1/{self.documents_root}/{path}"))[1]
+        except FirestoreEmulatorError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def batch_get(self, paths: List[str]) -> Dict[str, Optional[Dict]]:
+        """Lee varios documentos en una petición; retorna ruta → documento REST o None"""
+        if not paths:
+            return {}
+        response = self.request('POST', f"/v1/{self.documents_root}:batchGet",
+                                {'documents': [f"{self.documents_root}/{p}" for p in paths]})
+        found = {path: None for path in paths}
+        prefix = f"{self.documents_root}/"
+        for result in response:
+            if 'found' in result:
+                found[result['found']['name'][len(prefix):]] = result['found']
+        return found
+
+    def run_query(self, structured_query: Dict, parent: str = "", raw: bool = False) -> List:
+        """Ejecuta un structuredQuery y retorna los documentos encontrados (REST si raw=True)"""
+        parent_path = f"{self.documents_root}/{parent}" if parent else self.documents_root
+        started = time.perf_counter()
+        response = self.request('POST', f"/v1/{parent_path}:runQuery",
+                                {'structuredQuery': structured_query})
+        documents = [r['document'] for r in response if 'document' in r]
+        if self.query_log:
+            self._log_query({'kind': 'query', 'parent': parent, 'query': structured_query,
+                             'results': len(documents),
+                             'ms': round((time.perf_counter() - started) * 1000, 2)})
+        return documents if raw else [decode_document(d) for d in documents]
+
+    def iter_collection(self, collection: str, filters: Optional[Dict] = None,
+                        start_after: Optional[str] = None, page_size: int = 300) -> Iterator[Tuple[str, Dict]]:
+        """Itera una colección ordenada por id con filtros de igualdad, reanudable desde `start_after`
+
+        `start_after` es la ruta del último documento procesado (cursor de checkpoint).
+        """
+        query = {
+            'from': [{'collectionId': collection}],
+            'orderBy': [{'field': {'fieldPath': '__name__'}, 'direction': 'ASCENDING'}],
+            'limit': page_size
+        }
+        conditions = [{'fieldFilter': {'field': {'fieldPath': field}, 'op': 'EQUAL',
+                                       'value': encode_value(value)}}
+                      for field, value in (filters or {}).items()]
+        if len(conditions) == 1:
+            query['where'] = conditions[0]
+        elif conditions:
+            query['where'] = {'compositeFilter': {'op': 'AND', 'filters': conditions}}
+        while True:
+            if start_after:
+                query['startAt'] = {'values': [{'referenceValue': f"{self.documents_root}/{start_after}"}],
+                                    'before': False}
+            documents = self.run_query(query)
+            for document in documents:
+                yield document
+            if len(documents) < page_size:
+                return
+            start_after = documents[-1][0]
+
+    def iter_updated_since(self, collection: str, field: str, since: Optional[str] = None,
+                           page_size: int = 300) -> Iterator[Tuple[str, Dict]]:
+        """Itera documentos con `field` (timestamp) posterior a `since`, en orden y paginando con cursores"""
+        query = {
+            'from': [{'collectionId': collection}],
+            'orderBy': [{'field': {'fieldPath': field}, 'direction': 'ASCENDING'},
+                        {'field': {'fieldPath': '__name__'}, 'direction': 'ASCENDING'}],
+            'limit': page_size
+        }
+        if since:
+            query['where'] = {'fieldFilter': {'field': {'fieldPath': field}, 'op': 'GREATER_THAN',
+                                              'value': {'timestampValue': since}}}
+        while True:
+            documents = self.run_query(query)
+            for document in documents:
+                yield document
+            if len(documents) < page_size:
+                return
+            path, data = documents[-1]
+            query['startAt'] = {'values': [{'timestampValue': data[field]},
+                                           {'referenceValue': f"{self.documents_root}/{path}"}],
+                                'before': False}
+
+    def count(self, structured_query: Dict, parent: str = "") -> int:
+        """Cantidad de documentos que retorna un structuredQuery (agregación COUNT, sin leerlos)"""
+        parent_path = f"{self.documents_root}/{parent}" if parent else self.documents_root
+        started = time.perf_counter()
+        response = self.request('POST', f"/v1/{parent_path}:runAggregationQuery", {
+            'structuredAggregationQuery': {'structuredQuery': structured_query,
+                                           'aggregations': [{'alias': 'count', 'count': {}}]}
+        })
+        if self.query_log:
+            self._log_query({'kind': 'query', 'parent': parent, 'query': structured_query, 'results': 1,
+                             'ms': round((time.perf_counter() - started) * 1000, 2)})
+        fields = next((r['result']['aggregateFields'] for r in response if 'result' in r), {})
+        return int(fields.get('count', {}).get('integerValue', 0))
+
+    def count_missing_timestamp(self, collection: str, field: str) -> int:
+        """Documentos que iter_updated_since nunca retorna: sin `field` o con un valor que no es timestamp"""
+        total = self.count({'from': [{'collectionId': collection}]})
+        with_field = self.count({
+            'from': [{'collectionId': collection}],
+            'where': {'fieldFilter': {'field': {'fieldPath': field}, 'op': 'GREATER_THAN_OR_EQUAL',
+                                      'value': {'timestampValue': '0001-01-01T00:00:00Z'}}}
+        })
+        return total - with_field
+
+    def commit(self, writes: List[Dict]) -> Dict:
+        """Aplica una lista de writes REST en un único commit atómico"""
+        return self.request('POST', f"/v1/{self.documents_root}:commit", {'writes': writes})
+
+    def update_write(self, path: str, data: Dict, merge: bool = False) -> Dict:
+        """Write REST; con merge=True solo modifica los campos presentes en `data`"""
+        write = {'update': {'name': f"{self.documents_root}/{path}", 'fields': encode_fields(data)}}
+        if merge:
+            write['updateMask'] = {'fieldPaths': list(data)}
+        return write
+
+    def delete_write(self, path: str) -> Dict:
+        return {'delete': f"{self.documents_root}/{path}"}
+
+    def set_documents(self, documents: Iterable[Tuple[str, Dict]],
+                      batch_size: int = MAX_BATCH_WRITES, merge: bool = False) -> int:
+        """Escribe (ruta, datos) en commits de hasta batch_size documentos"""
+        batch_size = min(batch_size, MAX_BATCH_WRITES)
+        written = 0
+        writes = []
+        for path, data in documents:
+            writes.append(self.update_write(path, data, merge))
+            if len(writes) >= batch_size:
+                self.commit(writes)
+                written += len(writes)
+                writes = []
+        if writes:
+            self.commit(writes)
+            written += len(writes)
+        return written
+
+    def clear(self):
+        """Elimina todos los documentos del emulador"""
+        self.request('DELETE', f"/emulator/v1/{self.documents_root}")
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Profiler de amplificación de lecturas de las callable functions
+Ejecutar: python scripts/function_profiler.py --iterations 5
+
+- Proxy REST delante del Firestore Emulator (:8086 → :8080) que registra cada
+  petición de las functions con su latencia, documentos leídos y escritos
+- Invoca cada callable por separado (protocolo callable + ID token del Auth Emulator)
+  y atribuye al function todo el tráfico dentro de su ventana de ejecución
+- Reporte por function: lecturas de documentos, round trips, profundidad de la
+  cadena secuencial y latencia de Firestore en el camino crítico
+- Marca cadenas secuenciales, lecturas paralelas que podrían ir en un solo
+  batchGet, documentos leídos varias veces y lecturas extra de las reglas
+
+El Admin SDK usa gRPC por defecto; para que su tráfico pase por el proxy los
+emuladores deben iniciarse con:
+    FIRESTORE_PROFILE_HOST=localhost:8086 firebase emulators:start --only auth,firestore,functions
+(index.ts cambia entonces a REST contra ese host, solo dentro del emulador)
+"""
+
+import re
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import http.client
+import http.server
+import urllib.parse
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from common import print_colored
+from firestore_emulator import FirestoreEmulator, get_project_id
+from index_advisor import RecordingProxy
+
+PROXY_PORT = 8086
+UPSTREAM = "localhost:8080"
+DEFAULT_FUNCTIONS_HOST = "localhost:5001"
+DEFAULT_AUTH_HOST = "localhost:9099"
+DEFAULT_REGION = "us-central1"
+RULES_FILE = Path("backend/firestore.rules")
+
+# Margen para tráfico que llega justo después de la respuesta del callable (segundos)
+ATTRIBUTION_GRACE = 0.05
+
+def _relative(name: str) -> str:
+    return name.split('/documents/', 1)[1] if '/documents/' in name else name
+
+def shape_path(path: str) -> str:
+    """users/abc123/... → users/{id}/... (agrupa documentos por forma de ruta)"""
+    parts = path.split('/')
+    return '/'.join(part if i % 2 == 0 else '{id}' for i, part in enumerate(parts))
+
+class TraceProxy(RecordingProxy):
+    """Proxy de index_advisor.py que guarda cada operación en memoria con su intervalo"""
+
+    events = []  # type: List[Dict]
+    _lock = threading.Lock()
+
+    def _record(self, body: Optional[bytes], data: bytes, started: float, elapsed: float):
+        path = urllib.parse.urlsplit(self.path).path
+        if '/documents' not in path:
+            return
+        relative = urllib.parse.unquote(path.split('/documents', 1)[1]).strip('/')
+        request = json.loads(body) if body else {}
+        event = {'start': started, 'end': started + elapsed / 1000, 'ms': round(elapsed, 2),
+                 'kind': self.command.lower(), 'reads': 0, 'writes': 0, 'documents': []}
+
+        if relative.endswith(':batchGet'):
+            documents = [_relative(name) for name in request.get('documents', [])]
+            # Los documentos inexistentes también se facturan como lectura
+            event.update(kind='batchGet', reads=len(documents), documents=documents)
+        elif relative.endswith(':runQuery'):
+            results = [_relative(item['document']['name']) for item in json.loads(data) if 'document' in item]
+            source = (request.get('structuredQuery', {}).get('from') or [{}])[0]
+            # Una consulta sin resultados cuesta una lectura
+            event.update(kind='query', reads=max(1, len(results)), documents=results,
+                         collection=source.get('collectionId', ''))
+        elif relative.endswith(':commit'):
+            documents = []
+            for write in request.get('writes', []):
+                name = write.get('update', {}).get('name') or write.get('delete') or \
+                    write.get('transform', {}).get('document', '')
+                documents.append(_relative(name))
+            event.update(kind='commit', writes=len(documents), documents=documents)
+        elif ':' in relative.rsplit('/', 1)[-1]:
+            # beginTransaction, rollback, listCollectionIds...: round trip sin documentos
+            event['kind'] = relative.rsplit(':', 1)[-1]
+        elif self.command == 'GET' and relative.count('/') % 2 == 0:
+            results = [_relative(d['name']) for d in json.loads(data).get('documents', [])]
+            event.update(kind='list', reads=max(1, len(results)), documents=results)
+        elif self.command == 'GET':
+            event.update(kind='get', reads=1, documents=[relative])
+        elif self.command in ('PATCH', 'DELETE'):
+            event.update(kind='write', writes=1, documents=[relative])
+
+        with self._lock:
+            self.events.append(event)
+
+    @classmethod
+    def take(cls, start: float, end: float) -> List[Dict]:
+        """Retira y retorna los eventos que empezaron dentro de [start, end]"""
+        with cls._lock:
+            taken = [e for e in cls.events if start <= e['start'] <= end]
+            cls.events = [e for e in cls.events if not start <= e['start'] <= end]
+        return sorted(taken, key=lambda e: e['start'])
+
+def start_proxy(port: int, upstream: str) -> http.server.ThreadingHTTPServer:
+    TraceProxy.upstream = upstream
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), TraceProxy)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def sequential_depth(events: List[Dict]) -> int:
+    """Cadena más larga de peticiones donde cada una empieza después de que terminó la anterior"""
+    depth = []
+    for i, event in enumerate(events):
+        previous = [depth[j] for j in range(i) if events[j]['end'] <= event['start']]
+        depth.append(1 + max(previous, default=0))
+    return max(depth, default=0)
+
+def critical_path_ms(events: List[Dict]) -> float:
+    """Tiempo cubierto por al menos una petición a Firestore (unión de intervalos)"""
+    total = 0.0
+    current_start = current_end = None
+    for event in events:
+        if current_end is None or event['start'] > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = event['start'], event['end']
+        else:
+            current_end = max(current_end, event['end'])
+    if current_end is not None:
+        total += current_end - current_start
+    return total * 1000
+
+def waves(events: List[Dict]) -> List[List[Dict]]:
+    """Agrupa peticiones solapadas en el tiempo (lo que el código lanzó en paralelo)"""
+    groups = []
+    group_end = None
+    for event in events:
+        if group_end is None or event['start'] >= group_end:
+            groups.append([])
+            group_end = event['end']
+        groups[-1].append(event)
+        group_end = max(group_end, event['end'])
+    return groups
+
+def summarize(events: List[Dict], wall_ms: float) -> Dict:
+    read_paths = [path for e in events if e['reads'] for path in e['documents']]
+    return {
+        'reads': sum(e['reads'] for e in events),
+        'writes': sum(e['writes'] for e in events),
+        'round_trips': len(events),
+        'depth': sequential_depth(events),
+        'firestore_ms': critical_path_ms(events),
+        'wall_ms': wall_ms,
+        'repeated': sorted(path for path, count in Counter(read_paths).items() if count > 1),
+        'waves': [[(e['kind'], [shape_path(p) for p in e['documents']], e['ms']) for e in wave]
+                  for wave in waves(events)]
+    }
+
+def findings(name: str, summary: Dict) -> List[str]:
+    """Patrones a corregir en la traza de una invocación"""
+    notes = []
+    trace = summary['waves']
+    if summary['depth'] >= 2:
+        chain = " → ".join("+".join(sorted({p for _, paths, _ in wave for p in paths}) or {'?'})
+                           for wave in trace)
+        notes.append(f"{name}: cadena secuencial de {summary['depth']} round trips ({chain}); "
+                     f"leer en paralelo o desnormalizar la clave que se espera")
+    for wave in trace:
+        reads = [paths for kind, paths, _ in wave if kind in ('batchGet', 'get')]
+        if len(reads) >= 2:
+            docs = sorted({p for paths in reads for p in paths})
+            notes.append(f"{name}: {len(reads)} lecturas paralelas en round trips separados "
+                         f"({', '.join(docs)}); usar db.getAll() para un solo batchGet")
+    for path in summary['repeated']:
+        notes.append(f"{name}: {shape_path(path)} se lee más de una vez por invocación")
+    return notes
+
+def rules_reads(path: Path) -> Dict[str, int]:
+    """Lecturas adicionales por acceso de cliente según get()/exists() de firestore.rules
+
+    Las reglas solo se evalúan para el SDK de cliente; el Admin SDK de las functions
+    no paga estas lecturas. Accesos repetidos al mismo documento en una evaluación
+    se cobran una vez.
+    """
+    if not path.exists():
+        return {}
+    text = path.read_text(encoding='utf-8')
+    costs = OrderedDict()
+    for match in re.finditer(r'match\s+/(\S+)\s*\{', text):
+        target = match.group(1)
+        if target.startswith('databases/') or '=**' in target:
+            continue
+        # Cuerpo del bloque hasta su llave de cierre
+        depth, end = 1, match.end()
+        while depth and end < len(text):
+            depth += {'{': 1, '}': -1}.get(text[end], 0)
+            end += 1
+        body = text[match.end():end]
+        documents = set(re.findall(r'(?:get|exists)\(\s*(/databases/[^)]*\))', body))
+        if documents:
+            costs[re.sub(r'\{[^}]+\}', '{id}', target)] = len(documents)
+    return costs
+
+class CallableClient:
+    """Invoca callables en el Functions Emulator con un usuario del Auth Emulator"""
+
+    def __init__(self, functions_host: str, auth_host: str, project_id: str, region: str,
+                 timeout: float = 60):
+        self.functions_host = functions_host
+        self.auth_host = auth_host
+        self.base_path = f"/{project_id}/{region}"
+        self.timeout = timeout
+        self._conn = None
+        self.token = None
+        self.uid = None
+        self.email = None
+
+    def sign_up(self):
+        self.email = f"profiler-{uuid.uuid4().hex[:10]}@example.com"
+        conn = http.client.HTTPConnection(self.auth_host, timeout=self.timeout)
+        body = json.dumps({'email': self.email, 'password': 'profiler-pass', 'returnSecureToken': True})
+        conn.request('POST', '/identitytoolkit.googleapis.com/v1/accounts:signUp?key=fake-api-key',
+                     body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        data = json.loads(response.read() or b'{}')
+        conn.close()
+        if response.status >= 400:
+            raise RuntimeError(f"Auth Emulator HTTP {response.status}: {data}")
+        self.token = data['idToken']
+        self.uid = data['localId']
+
+    def call(self, name: str, data: Dict) -> Tuple[int, Dict, float, float]:
+        """POST callable; retorna (status, cuerpo, inicio, fin) con perf_counter"""
+        payload = json.dumps({'data': data}).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Authorization': f"Bearer {self.token}"}
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.functions_host, timeout=self.timeout)
+            started = time.perf_counter()
+            try:
+                self._conn.request('POST', f"{self.base_path}/{name}", body=payload, headers=headers)
+                response = self._conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self._conn.close()
+                self._conn = None
+                if attempt == 1:
+                    raise
+        finished = time.perf_counter()
+        try:
+            result = json.loads(body) if body else {}
+        except ValueError:
+            result = {'raw': body[:200].decode('utf-8', 'replace')}
+        return response.status, result, started, finished
+
+def build_scenarios(client: CallableClient, firestore: FirestoreEmulator) -> List[Tuple[str, str, Dict, Optional[Callable]]]:
+    """(etiqueta, function, data, preparación) en el orden de una sesión típica de la app"""
+    company_id = f"profiler-{client.uid[:8]}"
+
+    def attach_company():
+        # Preparación directa al emulador (no pasa por el proxy ni se atribuye)
+        firestore.set_documents([
+            (f"companies/{company_id}", {'id': company_id, 'name': 'Profiler Co'}),
+            (f"metrics/{company_id}", {'totalRevenue': 0, 'recoveredRevenue': 0,
+                                       'recoveryRate': 0, 'activeCustomers': 0}),
+        ])
+        firestore.set_documents([(f"users/{client.uid}", {'companyId': company_id})], merge=True)
+
+    return [
+        ('createUserProfile', 'createUserProfile', {'userId': client.uid, 'email': client.email}, None),
+        ('getUserProfile', 'getUserProfile', {}, None),
+        ('getInitialData (onboarding)', 'getInitialData', {}, None),
+        ('getInitialData (empresa)', 'getInitialData', {}, attach_company),
+    ]
+
+def profile(client: CallableClient, scenarios, iterations: int, warmup: int) -> Tuple[Dict, List[str], int]:
+    """Ejecuta la sesión `iterations` veces; retorna (resúmenes por escenario, lecturas entre functions, errores)"""
+    results = OrderedDict((label, []) for label, _, _, _ in scenarios)
+    cross_reads = Counter()
+    errors = 0
+    for iteration in range(warmup + iterations):
+        measured = iteration >= warmup
+        session_reads = {}
+        for label, name, data, setup in scenarios:
+            if setup:
+                setup()
+            status, body, started, finished = client.call(name, data)
+            events = TraceProxy.take(started, finished + ATTRIBUTION_GRACE)
+            if status >= 400 or 'error' in body:
+                errors += measured
+                print_colored(f"   ⚠️ {label}: HTTP {status} {body.get('error', body)}", 'yellow')
+                continue
+            if not measured:
+                continue
+            results[label].append(summarize(events, (finished - started) * 1000))
+            for path in {p for e in events if e['reads'] for p in e['documents']}:
+                session_reads.setdefault(path, set()).add(name)
+        for path, functions in session_reads.items():
+            if len(functions) > 1:
+                cross_reads[(shape_path(path), tuple(sorted(functions)))] += 1
+    notes = [f"{path} leído por {', '.join(functions)} en la misma sesión"
+             for (path, functions) in cross_reads]
+    return results, notes, errors
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2] if ordered else 0.0
+
+def show_report(results: Dict, session_notes: List[str], rules: Dict[str, int]) -> Tuple[List[str], Dict]:
+    print_colored(f"\n{'function':<30} {'lect.':>6} {'escr.':>6} {'RTs':>4} {'cadena':>7} "
+                  f"{'firestore ms':>13} {'total ms':>9}", 'cyan')
+    notes = []
+    report = OrderedDict()
+    for label, runs in results.items():
+        if not runs:
+            print_colored(f"{label:<30} sin invocaciones exitosas", 'red')
+            continue
+        row = {
+            'invocations': len(runs),
+            'reads': max(r['reads'] for r in runs),
+            'writes': max(r['writes'] for r in runs),
+            'round_trips': max(r['round_trips'] for r in runs),
+            'depth': max(r['depth'] for r in runs),
+            'firestore_ms': round(median([r['firestore_ms'] for r in runs]), 2),
+            'wall_ms': round(median([r['wall_ms'] for r in runs]), 2),
+            'trace': runs[-1]['waves']
+        }
+        report[label] = row
+        color = 'yellow' if row['depth'] >= 2 else 'white'
+        print_colored(f"{label:<30} {row['reads']:>6} {row['writes']:>6} {row['round_trips']:>4} "
+                      f"{row['depth']:>7} {row['firestore_ms']:>13.1f} {row['wall_ms']:>9.1f}", color)
+        for index, wave in enumerate(row['trace'], 1):
+            steps = ", ".join(f"{kind} {'+'.join(paths) or '-'} {ms:.1f}ms" for kind, paths, ms in wave)
+            print_colored(f"     {index}. {steps}", 'white')
+        notes.extend(findings(label, max(runs, key=lambda r: r['depth'])))
+
+    notes.extend(session_notes)
+    if rules:
+        print_colored("\n🔐 Lecturas extra de firestore.rules por acceso desde el cliente (Admin SDK no las paga):",
+                      'cyan')
+        for target, reads in rules.items():
+            print_colored(f"   {target}: +{reads} lectura(s) por get/list del cliente", 'white')
+    return notes, report
+
+def main():
+    """Función principal del profiler"""
+    parser = argparse.ArgumentParser(description="Profiler de lecturas de Firestore por callable function")
+    parser.add_argument('--iterations', type=int, default=5, help="Sesiones medidas")
+    parser.add_argument('--warmup', type=int, default=1, help="Sesiones descartadas (cold start)")
+    parser.add_argument('--port', type=int, default=PROXY_PORT, help="Puerto del proxy (FIRESTORE_PROFILE_HOST)")
+    parser.add_argument('--upstream', default=UPSTREAM, help="Host del Firestore Emulator")
+    parser.add_argument('--functions-host', default=DEFAULT_FUNCTIONS_HOST, help="Host del Functions Emulator")
+    parser.add_argument('--auth-host', default=DEFAULT_AUTH_HOST, help="Host del Auth Emulator")
+    parser.add_argument('--region', default=DEFAULT_REGION, help="Región de las functions")
+    parser.add_argument('--rules', type=Path, default=RULES_FILE, help="firestore.rules")
+    parser.add_argument('--output', type=Path, help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    project_id = get_project_id()
+    server = start_proxy(args.port, args.upstream)
+    print_colored(f"🔬 Proxy de perfilado: http://localhost:{args.port} → {args.upstream}", 'cyan')
+
+    client = CallableClient(args.functions_host, args.auth_host, project_id, args.region)
+    firestore = FirestoreEmulator(host=args.upstream, project_id=project_id)
+    try:
+        client.sign_up()
+        scenarios = build_scenarios(client, firestore)
+        print_colored(f"🚀 {args.iterations} sesiones (+{args.warmup} de calentamiento) como {client.email}", 'cyan')
+        results, session_notes, errors = profile(client, scenarios, args.iterations, args.warmup)
+    except (OSError, RuntimeError, http.client.HTTPException) as e:
+        print_colored(f"❌ Emuladores no disponibles: {e}", 'red')
+        print_colored("💡 FIRESTORE_PROFILE_HOST=localhost:8086 firebase emulators:start "
+                      "--only auth,firestore,functions", 'yellow')
+        return 1
+    finally:
+        firestore.close()
+        server.shutdown()
+
+    notes, report = show_report(results, session_notes, rules_reads(args.rules))
+    if report and all(row['round_trips'] == 0 for row in report.values()):
+        print_colored("\n⚠️ No se observó tráfico de las functions en el proxy: inicia los emuladores con "
+                      f"FIRESTORE_PROFILE_HOST=localhost:{args.port}", 'yellow')
+    elif notes:
+        print_colored(f"\n🐢 Amplificación detectada: {len(notes)}", 'yellow')
+        for note in notes:
+            print_colored(f"   {note}", 'yellow')
+    else:
+        print_colored("\n✅ Sin cadenas secuenciales ni lecturas repetidas", 'green')
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'functions': report, 'findings': notes}, f, indent=2)
+        print_colored(f"💾 Reporte en {args.output}", 'green')
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
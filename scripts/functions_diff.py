@@ -0,0 +1,688 @@
+#!/usr/bin/env python3
+"""
+Deploy selectivo de Cloud Functions por diff de exports
+Ejecutar: python scripts/functions_diff.py plan
+          python scripts/functions_diff.py deploy [--batch-size 10] [--parallel 2]
+
+- Divide los fuentes TypeScript de backend/functions/src en sentencias de primer
+  nivel y arma el grafo de símbolos (declaraciones locales e imports relativos)
+- Cada function exportada por index.ts recibe un fingerprint con las sentencias
+  que alcanza transitivamente, el código de inicialización de cada módulo que
+  carga y la configuración compartida (package.json, lockfile, tsconfig, .env)
+- Compara contra los fingerprints del último deploy exitoso por proyecto
+  (.devtools/functions_fingerprints.json) y despliega solo `functions:<nombre>`
+- Lotes de hasta --batch-size targets por `firebase deploy` (el CLI despliega en
+  paralelo dentro de cada lote); --parallel lotes a la vez
+- Si se eliminó una function exportada, cae a `firebase deploy --only functions`
+  para que el CLI gestione el borrado
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from common import print_colored
+from firestore_emulator import get_project_id
+
+FUNCTIONS_DIR = Path("backend/functions")
+FINGERPRINTS_FILE = Path(".devtools/functions_fingerprints.json")
+# Límite recomendado de functions por deploy para no agotar la cuota de la API
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_PARALLEL = 2
+# Archivos que afectan a todas las functions
+SHARED_FILES = ['package.json', 'package-lock.json', 'tsconfig.json', '.env', '.runtimeconfig.json']
+SOURCE_EXTENSIONS = ['.ts', '.tsx', '.js']
+
+IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*')
+DECLARATION = re.compile(r'^(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+                         r'(const|let|var|function\*?|class|interface|type|enum|namespace)\s*')
+STATEMENT_START = re.compile(r'(?:import|export|const|let|var|function|class|interface|type|enum|'
+                             r'namespace|async|declare|abstract)\b')
+FROM_CLAUSE = re.compile(r'''from\s*['"]([^'"]+)['"]''')
+# Builders de triggers: functions.https.onCall(...), onDocumentCreated(...), etc.
+TRIGGER = re.compile(r'\bfunctions\.|\bon[A-Z]\w*\s*\(')
+# Antes de `/` en estas posiciones empieza un regex literal, no una división
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^') | {''}
+# Una línea que termina así continúa en la siguiente
+CONTINUATIONS = set('=,(.?:+-*/&|')
+KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else'}
+
+def scan(source: str) -> Tuple[str, str]:
+    """Clasifica cada carácter: retorna (máscara, clases)
+
+    La máscara conserva el código y blanquea comentarios y contenido de strings
+    (las expresiones `${...}` de los templates se conservan). Clases por carácter:
+    'c' código, 's' string, 'x' comentario.
+    """
+    mask = []
+    kinds = []
+    i, n = 0, len(source)
+    # Templates abiertos: profundidad de llaves dentro de cada `${` pendiente
+    templates = []  # type: List[int]
+    last = ''
+
+    def emit(ch, kind):
+        mask.append(ch if kind == 'c' or ch == '\n' else ' ')
+        kinds.append(kind)
+
+    def read_template(start):
+        """Consume un template desde `start` (después del backtick) hasta su cierre o `${`"""
+        j = start
+        while j < n:
+            if source[j] == '\\':
+                emit(' ', 's')
+                if j + 1 < n:
+                    emit(' ', 's')
+                j += 2
+                continue
+            if source[j] == '`':
+                emit('`', 'c')
+                return j + 1, False
+            if source.startswith('${', j):
+                emit('$', 'c')
+                emit('{', 'c')
+                return j + 2, True
+            emit(source[j], 's')
+            j += 1
+        return j, False
+
+    while i < n:
+        ch = source[i]
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            end = n if end < 0 else end
+            for _ in range(i, end):
+                emit(' ', 'x')
+            i = end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            for j in range(i, end):
+                emit(source[j] if source[j] == '\n' else ' ', 'x')
+            i = end
+            continue
+        if ch in '\'"':
+            emit(ch, 'c')
+            j = i + 1
+            while j < n and source[j] != ch and source[j] != '\n':
+                if source[j] == '\\':
+                    emit(' ', 's')
+                    j += 1
+                if j < n:
+                    emit(source[j], 's')
+                j += 1
+            if j < n:
+                emit(source[j], 'c')
+            i = j + 1
+            last = ch
+            continue
+        if ch == '`':
+            emit('`', 'c')
+            i, opened = read_template(i + 1)
+            if opened:
+                templates.append(0)
+            last = '`'
+            continue
+        if ch == '/' and (last in REGEX_PRECEDERS or last in KEYWORDS):
+            emit('/', 'c')
+            j = i + 1
+            in_class = False
+            while j < n and source[j] != '\n' and (in_class or source[j] != '/'):
+                if source[j] == '\\':
+                    emit(' ', 's')
+                    j += 1
+                elif source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                if j < n:
+                    emit(source[j], 's')
+                j += 1
+            if j < n:
+                emit('/', 'c')
+            i = j + 1
+            last = 'regex'
+            continue
+        if templates:
+            if ch == '{':
+                templates[-1] += 1
+            elif ch == '}':
+                if templates[-1] == 0:
+                    templates.pop()
+                    emit('}', 'c')
+                    i, opened = read_template(i + 1)
+                    if opened:
+                        templates.append(0)
+                    last = '`'
+                    continue
+                templates[-1] -= 1
+        emit(ch, 'c')
+        if not ch.isspace():
+            if ch.isalnum() or ch in '_$':
+                match = IDENTIFIER.match(source, i)
+                if match and (i == 0 or not (source[i - 1].isalnum() or source[i - 1] in '_$')):
+                    word = match.group(0)
+                    for k in range(i + 1, match.end()):
+                        emit(source[k], 'c')
+                    i = match.end()
+                    last = word if word in KEYWORDS else 'identifier'
+                    continue
+                last = 'identifier'
+            else:
+                last = ch
+        i += 1
+    return ''.join(mask), ''.join(kinds)
+
+def normalize(source: str, kinds: str, start: int, end: int) -> str:
+    """Texto de una sentencia sin comentarios y con espacios de código colapsados"""
+    out = []
+    space = False
+    for k in range(start, end):
+        kind = kinds[k]
+        if kind == 'x':
+            continue
+        ch = source[k]
+        if kind == 'c' and ch.isspace():
+            space = True
+            continue
+        if space and out:
+            out.append(' ')
+        space = False
+        out.append(ch)
+    return ''.join(out)
+
+class Statement:
+    """Sentencia de primer nivel con lo que declara y lo que referencia"""
+
+    def __init__(self, text: str, code: str):
+        self.text = text
+        self.code = code.strip()
+        self.hash = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+        self.declares = []  # type: List[str]
+        self.references = set()  # type: Set[str]
+        self.kind = 'statement'
+
+class Module:
+    """Fuente TypeScript: sentencias, símbolos, imports y exports"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.source = path.read_text(encoding='utf-8')
+        self.statements = []  # type: List[Statement]
+        self.symbols = {}  # type: Dict[str, List[int]]
+        self.imports = {}  # type: Dict[str, Tuple[str, str]]
+        self.side_imports = []  # type: List[str]
+        self.exports = {}  # type: Dict[str, Tuple[str, ...]]
+        self.star_exports = []  # type: List[str]
+        self.initializers = []  # type: List[int]
+        self._parse()
+
+    def _split(self) -> List[Tuple[int, int]]:
+        """Límites de las sentencias de primer nivel"""
+        mask = self._scanned[0]
+        spans = []
+        start = None
+        depth = 0
+        line_start = True
+        for i, ch in enumerate(mask):
+            if ch.isspace():
+                line_start = line_start or ch == '\n'
+                continue
+            if start is None:
+                start = i
+            elif depth == 0 and line_start and STATEMENT_START.match(mask, i) \
+                    and mask[start:i].rstrip()[-1:] not in CONTINUATIONS:
+                # Sin `;`: una línea que empieza con una declaración abre otra sentencia
+                spans.append((start, i))
+                start = i
+            line_start = False
+            if ch in '({[':
+                depth += 1
+            elif ch in ')}]':
+                depth = max(0, depth - 1)
+            elif ch == ';' and depth == 0:
+                spans.append((start, i + 1))
+                start = None
+        if start is not None:
+            spans.append((start, len(mask)))
+        return spans
+
+    def _parse(self):
+        self._scanned = scan(self.source)
+        mask, kinds = self._scanned
+        for start, end in self._split():
+            statement = Statement(normalize(self.source, kinds, start, end), mask[start:end])
+            self._classify(statement, self.source[start:end])
+            index = len(self.statements)
+            self.statements.append(statement)
+            for name in statement.declares:
+                self.symbols.setdefault(name, []).append(index)
+            if statement.kind == 'statement':
+                self.initializers.append(index)
+
+    def _classify(self, statement: Statement, raw: str):
+        code = statement.code
+        specifier = FROM_CLAUSE.search(raw)
+        if code.startswith('import'):
+            statement.kind = 'import'
+            side = re.match(r'''import\s*['"]([^'"]+)['"]''', raw.strip())
+            if side:
+                self.side_imports.append(side.group(1))
+            elif specifier:
+                self._bind_imports(code, specifier.group(1))
+            return
+        if code.startswith('export') and specifier:
+            # export { a as b } from './x' / export * from './x'
+            statement.kind = 'reexport'
+            names = re.search(r'\{([^}]*)\}', code)
+            if names:
+                for local, exported in self._pairs(names.group(1)):
+                    self.exports[exported] = ('reexport', specifier.group(1), local)
+            else:
+                alias = re.match(r'export\s*\*\s*as\s+([\w$]+)', code)
+                if alias:
+                    self.exports[alias.group(1)] = ('namespace', specifier.group(1))
+                else:
+                    self.star_exports.append(specifier.group(1))
+            return
+        if re.match(r'export\s*\{', code):
+            statement.kind = 'export-list'
+            for local, exported in self._pairs(re.search(r'\{([^}]*)\}', code).group(1)):
+                self.exports[exported] = ('local', local)
+            return
+
+        exported = code.startswith('export')
+        declaration = DECLARATION.match(code)
+        if re.match(r'export\s+default\b', code):
+            statement.declares.append('default')
+            self.exports['default'] = ('local', 'default')
+        if declaration:
+            statement.kind = 'declaration'
+            rest = code[declaration.end():]
+            if declaration.group(1) in ('const', 'let', 'var'):
+                names = self._binding_names(rest)
+            else:
+                names = IDENTIFIER.findall(rest)[:1]
+            statement.declares.extend(names)
+            if exported:
+                for name in names:
+                    self.exports[name] = ('local', name)
+        elif statement.declares:
+            statement.kind = 'declaration'
+        statement.references = self._references(code) - set(statement.declares)
+
+    def _bind_imports(self, code: str, specifier: str):
+        clause = code[len('import'):code.rfind('from')].strip()
+        clause = re.sub(r'^type\s+', '', clause)
+        namespace = re.search(r'\*\s*as\s+([\w$]+)', clause)
+        if namespace:
+            self.imports[namespace.group(1)] = (specifier, '*')
+        names = re.search(r'\{([^}]*)\}', clause)
+        if names:
+            for imported, local in self._pairs(names.group(1)):
+                self.imports[local] = (specifier, imported)
+        default = re.match(r'([\w$]+)\s*(?:,|$)', clause)
+        if default:
+            self.imports[default.group(1)] = (specifier, 'default')
+
+    @staticmethod
+    def _pairs(names: str) -> List[Tuple[str, str]]:
+        """'a, b as c, type d' → [(a, a), (b, c), (d, d)]"""
+        pairs = []
+        for item in names.split(','):
+            words = [w for w in IDENTIFIER.findall(item) if w != 'type']
+            if len(words) == 3 and words[1] == 'as':
+                pairs.append((words[0], words[2]))
+            elif words:
+                pairs.append((words[0], words[0]))
+        return pairs
+
+    @staticmethod
+    def _binding_names(rest: str) -> List[str]:
+        """Nombres declarados por `const a = ..., b = ...` o desestructuración"""
+        names = []
+        depth = 0
+        expecting = True
+        i = 0
+        while i < len(rest):
+            ch = rest[i]
+            if depth == 0 and expecting:
+                if ch in '{[':
+                    close = rest.find('}' if ch == '{' else ']', i)
+                    pattern = rest[i + 1:close if close > 0 else len(rest)]
+                    for item in pattern.split(','):
+                        local = item.split(':')[-1].split('=')[0]
+                        names.extend(IDENTIFIER.findall(local)[:1])
+                    i = close + 1 if close > 0 else len(rest)
+                    expecting = False
+                    continue
+                match = IDENTIFIER.match(rest, i)
+                if match:
+                    names.append(match.group(0))
+                    i = match.end()
+                    expecting = False
+                    continue
+            if ch in '({[':
+                depth += 1
+            elif ch in ')}]':
+                depth -= 1
+            elif ch == ',' and depth == 0:
+                expecting = True
+            elif ch == '=' and depth == 0:
+                expecting = False
+            i += 1
+        return names
+
+    @staticmethod
+    def _references(code: str) -> Set[str]:
+        """Identificadores usados (sin accesos a propiedades `x.prop`)"""
+        references = set()
+        for match in IDENTIFIER.finditer(code):
+            before = code[:match.start()].rstrip()
+            if before.endswith('.') and not before.endswith('...'):
+                continue
+            references.add(match.group(0))
+        return references
+
+class SourceGraph:
+    """Grafo de módulos de backend/functions/src desde el entrypoint"""
+
+    def __init__(self, functions_dir: Path = FUNCTIONS_DIR):
+        self.functions_dir = functions_dir
+        self.modules = {}  # type: Dict[Path, Module]
+        self.entry = self._entrypoint()
+
+    def _entrypoint(self) -> Path:
+        """src/index.ts según el `main` de package.json (lib/index.js)"""
+        try:
+            with open(self.functions_dir / "package.json", 'r') as f:
+                main = json.load(f).get('main', 'lib/index.js')
+        except (OSError, ValueError):
+            main = 'lib/index.js'
+        candidate = re.sub(r'^lib/', 'src/', main)
+        resolved = self.resolve(self.functions_dir / candidate, '')
+        return resolved or self.functions_dir / "src/index.ts"
+
+    def resolve(self, base: Path, specifier: str) -> Optional[Path]:
+        """Archivo de un import relativo; None para paquetes de node_modules"""
+        if specifier and not specifier.startswith('.'):
+            return None
+        target = (base.parent / specifier) if specifier else base
+        stem = target.with_suffix('') if target.suffix in ('.js', '.ts') else target
+        for candidate in [stem.with_suffix(ext) for ext in SOURCE_EXTENSIONS] + \
+                         [stem / f"index{ext}" for ext in SOURCE_EXTENSIONS]:
+            if candidate.is_file():
+                return candidate.resolve()
+        return None
+
+    def module(self, path: Path) -> Module:
+        if path not in self.modules:
+            self.modules[path] = Module(path)
+        return self.modules[path]
+
+    def exported_functions(self) -> Dict[str, Tuple[Path, str]]:
+        """Nombre de deploy → (módulo, símbolo local) de cada trigger exportado"""
+        functions = {}
+        for name in self._export_names(self.entry, set()):
+            target = self._resolve_export(self.entry, name, set())
+            if target is None:
+                continue
+            module = self.module(target[0])
+            statements = [module.statements[i] for i in module.symbols.get(target[1], [])]
+            if any(TRIGGER.search(s.code) for s in statements):
+                functions[name] = target
+        return functions
+
+    def _export_names(self, path: Path, seen: Set[Path]) -> List[str]:
+        if path in seen:
+            return []
+        seen.add(path)
+        module = self.module(path)
+        names = [name for name, target in module.exports.items() if target[0] != 'namespace']
+        for specifier in module.star_exports:
+            child = self.resolve(path, specifier)
+            if child:
+                names.extend(n for n in self._export_names(child, seen) if n != 'default')
+        return names
+
+    def _resolve_export(self, path: Path, name: str, seen: Set[Tuple[Path, str]]) -> Optional[Tuple[Path, str]]:
+        """(módulo, símbolo local) que define el export `name` de `path`"""
+        if (path, name) in seen:
+            return None
+        seen.add((path, name))
+        module = self.module(path)
+        target = module.exports.get(name)
+        if target and target[0] == 'local':
+            if target[1] in module.imports:
+                specifier, imported = module.imports[target[1]]
+                child = self.resolve(path, specifier)
+                return self._resolve_export(child, imported, seen) if child and imported != '*' else None
+            return path, target[1]
+        if target and target[0] == 'reexport':
+            child = self.resolve(path, target[1])
+            return self._resolve_export(child, target[2], seen) if child else None
+        for specifier in module.star_exports:
+            child = self.resolve(path, specifier)
+            found = self._resolve_export(child, name, seen) if child else None
+            if found:
+                return found
+        return None
+
+    def closure(self, path: Path, symbol: str) -> Set[Tuple[Path, int]]:
+        """Sentencias alcanzables desde un símbolo, incluida la inicialización de cada módulo"""
+        reached = set()  # type: Set[Tuple[Path, int]]
+        loaded = set()  # type: Set[Path]
+        pending = [(path, symbol)]
+
+        def load(module_path: Path):
+            if module_path in loaded:
+                return
+            loaded.add(module_path)
+            module = self.module(module_path)
+            for index in module.initializers:
+                visit_statement(module_path, index)
+            for specifier in module.side_imports:
+                child = self.resolve(module_path, specifier)
+                if child:
+                    load(child)
+
+        def visit_statement(module_path: Path, index: int):
+            if (module_path, index) in reached:
+                return
+            reached.add((module_path, index))
+            for name in self.module(module_path).statements[index].references:
+                pending.append((module_path, name))
+
+        load(path)
+        visited = set()
+        while pending:
+            module_path, name = pending.pop()
+            if (module_path, name) in visited:
+                continue
+            visited.add((module_path, name))
+            module = self.module(module_path)
+            if name in module.symbols:
+                for index in module.symbols[name]:
+                    visit_statement(module_path, index)
+            elif name in module.imports:
+                specifier, imported = module.imports[name]
+                child = self.resolve(module_path, specifier)
+                if child is None:
+                    continue
+                load(child)
+                if imported == '*':
+                    for index in range(len(self.module(child).statements)):
+                        visit_statement(child, index)
+                else:
+                    target = self._resolve_export(child, imported, set())
+                    if target:
+                        load(target[0])
+                        pending.append(target)
+        return reached
+
+def shared_fingerprint(functions_dir: Path = FUNCTIONS_DIR) -> str:
+    """Hash de lo que afecta a todas las functions (dependencias, compilador, entorno)"""
+    digest = hashlib.sha256()
+    paths = [functions_dir / name for name in SHARED_FILES] + sorted(functions_dir.glob('.env.*'))
+    for path in paths:
+        if path.is_file():
+            digest.update(path.name.encode('utf-8'))
+            digest.update(path.read_bytes())
+    try:
+        with open(functions_dir.parent / "firebase.json", 'r') as f:
+            digest.update(json.dumps(json.load(f).get('functions'), sort_keys=True).encode('utf-8'))
+    except (OSError, ValueError):
+        pass
+    return digest.hexdigest()[:16]
+
+def compute_fingerprints(graph: SourceGraph) -> Dict[str, Dict]:
+    """Por function: fingerprint y hashes de las sentencias que alcanza"""
+    shared = shared_fingerprint(graph.functions_dir)
+    result = {}
+    for name, (path, symbol) in sorted(graph.exported_functions().items()):
+        statements = sorted(graph.module(p).statements[i].hash for p, i in graph.closure(path, symbol))
+        digest = hashlib.sha256(shared.encode('utf-8'))
+        for statement_hash in statements:
+            digest.update(statement_hash.encode('utf-8'))
+        result[name] = {'fingerprint': digest.hexdigest()[:16], 'shared': shared, 'statements': statements}
+    return result
+
+def load_state(path: Path = FINGERPRINTS_FILE) -> Dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state: Dict, path: Path = FINGERPRINTS_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def plan(graph: SourceGraph, deployed: Dict[str, Dict]) -> Tuple[Dict[str, List[str]], List[str], Dict[str, Dict]]:
+    """(functions a desplegar con sus motivos, functions eliminadas, fingerprints actuales)"""
+    current = compute_fingerprints(graph)
+    by_hash = {}
+    for path, module in graph.modules.items():
+        for statement in module.statements:
+            label = ", ".join(statement.declares) or statement.code.split('\n')[0][:40]
+            by_hash[statement.hash] = f"{os.path.relpath(path)}: {label}"
+    changed = {}
+    for name, info in current.items():
+        previous = deployed.get(name)
+        if previous is None:
+            changed[name] = ["nueva (sin deploy registrado)"]
+        elif previous['fingerprint'] != info['fingerprint']:
+            reasons = []
+            if previous.get('shared') != info['shared']:
+                reasons.append("configuración compartida (package.json, lockfile, tsconfig, .env)")
+            old = set(previous.get('statements', []))
+            reasons.extend(sorted({by_hash[h] for h in info['statements'] if h not in old}))
+            if not reasons:
+                reasons.append("se quitó código del que dependía")
+            changed[name] = reasons
+    removed = sorted(set(deployed) - set(current))
+    return changed, removed, current
+
+def deploy_batch(names: List[str], project_id: str) -> bool:
+    only = ",".join(f"functions:{name}" for name in names)
+    print_colored(f"🚀 firebase deploy --only {only}", 'cyan')
+    result = subprocess.run(f"firebase deploy --only {only} --project {project_id}",
+                            shell=True, cwd=str(FUNCTIONS_DIR.parent), text=True)
+    return result.returncode == 0
+
+def command_deploy(args, project_id: str, changed: Dict[str, List[str]], removed: List[str],
+                   current: Dict[str, Dict], state: Dict) -> int:
+    if removed or args.all:
+        if removed:
+            print_colored(f"🗑️ Functions eliminadas: {', '.join(removed)}; deploy completo", 'yellow')
+        if args.dry_run:
+            print_colored("   firebase deploy --only functions (dry-run)", 'white')
+            return 0
+        result = subprocess.run(f"firebase deploy --only functions --project {project_id}",
+                                shell=True, cwd=str(FUNCTIONS_DIR.parent), text=True)
+        if result.returncode != 0:
+            return 1
+        state[project_id] = current
+        save_state(state, args.state)
+        return 0
+
+    if not changed:
+        print_colored("✅ Ninguna function cambió desde el último deploy", 'green')
+        return 0
+    names = sorted(changed)
+    batches = [names[i:i + args.batch_size] for i in range(0, len(names), args.batch_size)]
+    if args.dry_run:
+        for batch in batches:
+            print_colored(f"   firebase deploy --only {','.join(f'functions:{n}' for n in batch)} (dry-run)", 'white')
+        return 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+        results = list(executor.map(lambda batch: (batch, deploy_batch(batch, project_id)), batches))
+    deployed = state.setdefault(project_id, {})
+    failed = []
+    for batch, ok in results:
+        if ok:
+            for name in batch:
+                deployed[name] = current[name]
+        else:
+            failed.extend(batch)
+    save_state(state, args.state)
+    elapsed = time.perf_counter() - started
+    if failed:
+        print_colored(f"❌ Falló el deploy de: {', '.join(failed)} ({elapsed:.0f}s)", 'red')
+        return 1
+    print_colored(f"✅ {len(names)} functions desplegadas en {len(batches)} lotes ({elapsed:.0f}s)", 'green')
+    return 0
+
+def main():
+    """Función principal del deploy selectivo de Functions"""
+    parser = argparse.ArgumentParser(description="Deploy selectivo de Functions por diff de exports")
+    parser.add_argument('command', choices=['plan', 'deploy'])
+    parser.add_argument('--project', help="Proyecto de Firebase (default: backend/.firebaserc)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Functions por `firebase deploy`")
+    parser.add_argument('--parallel', type=int, default=DEFAULT_PARALLEL, help="Lotes desplegados a la vez")
+    parser.add_argument('--all', action='store_true', help="Desplegar todas las functions")
+    parser.add_argument('--dry-run', action='store_true', help="Solo mostrar los comandos")
+    parser.add_argument('--state', type=Path, default=FINGERPRINTS_FILE, help="Fingerprints del último deploy")
+    args = parser.parse_args()
+
+    project_id = args.project or get_project_id()
+    graph = SourceGraph()
+    if not graph.entry.is_file():
+        print_colored(f"❌ No se encontró el entrypoint de Functions: {graph.entry}", 'red')
+        return 1
+    state = load_state(args.state)
+    changed, removed, current = plan(graph, state.get(project_id, {}))
+
+    print_colored(f"🔍 {len(current)} functions exportadas, {len(changed)} con cambios "
+                  f"(proyecto {project_id})", 'cyan')
+    for name in sorted(current):
+        if name in changed:
+            print_colored(f"   ⚡ {name}", 'yellow')
+            for reason in changed[name][:5]:
+                print_colored(f"      · {reason}", 'white')
+        else:
+            print_colored(f"   ✓ {name}", 'green')
+    for name in removed:
+        print_colored(f"   🗑️ {name} (eliminada)", 'red')
+
+    if args.command == 'plan':
+        return 0
+    return command_deploy(args, project_id, changed, removed, current, state)
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
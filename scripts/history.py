@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Historial de validaciones y tiempos de ejecución
+Ejecutar: python scripts/history.py report [--runs N] [--tool validate]
+
+Cada ejecución de validate_setup_improved.py, test.py y deploy.py agrega
+sus resultados a una base SQLite local (.devtools/history.db):
+- Estado y duración de cada verificación
+- Versiones de herramientas y host
+- Reporte de tendencias, checks inestables y checks más lentos
+"""
+
+import sys
+import json
+import time
+import socket
+import sqlite3
+import platform
+import argparse
+import subprocess
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common import print_colored
+
+HISTORY_DB = Path(".devtools/history.db")
+
+# Comandos usados para registrar versiones de herramientas en cada run
+TOOL_VERSION_COMMANDS = {
+    'node': "node --version",
+    'npm': "npm --version",
+    'firebase': "firebase --version",
+    'flutter': "flutter --version",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tool TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    exit_code INTEGER NOT NULL,
+    host TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    python_version TEXT NOT NULL,
+    tool_versions TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checks (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    item TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    message TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_runs_tool ON runs(tool, id);
+CREATE INDEX IF NOT EXISTS idx_checks_run ON checks(run_id);
+"""
+
+# Estado compartido entre comandos encadenados en un mismo proceso (cli.py)
+_VERSION_CACHE = {}  # type: Dict[str, str]
+_SESSION_RESULTS = {}  # type: Dict[str, int]
+
+def probe_tool_versions(tools=None, timeout=20) -> Dict[str, str]:
+    """Obtiene la primera línea de `--version` de cada herramienta instalada"""
+    versions = {}
+    for name, command in TOOL_VERSION_COMMANDS.items():
+        if tools is not None and name not in tools:
+            continue
+        if name in _VERSION_CACHE:
+            versions[name] = _VERSION_CACHE[name]
+            continue
+        if not shutil.which(command.split()[0]):
+            versions[name] = "no instalado"
+            continue
+        try:
+            result = subprocess.run(command, shell=True, capture_output=True,
+                                    text=True, timeout=timeout)
+            output = result.stdout.strip().split('\n')[0] if result.stdout else ""
+            versions[name] = output or "desconocida"
+        except Exception:
+            versions[name] = "desconocida"
+            continue
+        _VERSION_CACHE[name] = versions[name]
+    return versions
+
+def session_exit_code(tool: str) -> Optional[int]:
+    """Código de salida de `tool` si ya se ejecutó en este proceso (None si no)"""
+    return _SESSION_RESULTS.get(tool)
+
+class HistoryStore:
+    """Almacén SQLite de ejecuciones y verificaciones"""
+
+    def __init__(self, db_path: Path = HISTORY_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, tool: str, checks: List[Dict], duration: float,
+                   exit_code: int = 0, tool_versions: Optional[Dict[str, str]] = None,
+                   started_at: Optional[float] = None) -> int:
+        """Guarda una ejecución con sus verificaciones y retorna su id"""
+        started_at = started_at if started_at is not None else time.time() - duration
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (tool, started_at, duration, exit_code, host, platform,"
+                " python_version, tool_versions) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (tool, started_at, duration, exit_code, socket.gethostname(),
+                 platform.platform(), platform.python_version(),
+                 json.dumps(tool_versions or {}, sort_keys=True))
+            )
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO checks (run_id, category, item, status, duration, message)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, c['category'], c['item'], int(bool(c['status'])),
+                  float(c.get('duration', 0.0)), c.get('message', '') or '')
+                 for c in checks]
+            )
+        return run_id
+
+    def recent_runs(self, limit: int, tool: Optional[str] = None) -> List[Dict]:
+        """Retorna las últimas `limit` ejecuciones, de la más antigua a la más reciente"""
+        query = ("SELECT r.id, r.tool, r.started_at, r.duration, r.exit_code, r.host,"
+                 " r.tool_versions, COUNT(c.run_id), COALESCE(SUM(c.status), 0)"
+                 " FROM runs r LEFT JOIN checks c ON c.run_id = r.id")
+        params = []
+        if tool:
+            query += " WHERE r.tool = ?"
+            params.append(tool)
+        query += " GROUP BY r.id ORDER BY r.id DESC LIMIT ?"
+        params.append(limit)
+
+        runs = []
+        for row in self.conn.execute(query, params):
+            runs.append({
+                'id': row[0], 'tool': row[1], 'started_at': row[2],
+                'duration': row[3], 'exit_code': row[4], 'host': row[5],
+                'tool_versions': json.loads(row[6]), 'total': row[7], 'passed': row[8]
+            })
+        return list(reversed(runs))
+
+    def check_history(self, run_ids: List[int]) -> Dict[tuple, List[tuple]]:
+        """Agrupa (status, duration) por (tool, category, item) en orden de ejecución"""
+        history = {}
+        if not run_ids:
+            return history
+        placeholders = ",".join("?" * len(run_ids))
+        rows = self.conn.execute(
+            "SELECT r.tool, c.category, c.item, c.status, c.duration FROM checks c"
+            f" JOIN runs r ON r.id = c.run_id WHERE c.run_id IN ({placeholders})"
+            " ORDER BY c.run_id",
+            run_ids
+        )
+        for tool, category, item, status, duration in rows:
+            history.setdefault((tool, category, item), []).append((status, duration))
+        return history
+
+def record_run(tool: str, checks: List[Dict], duration: float, exit_code: int = 0,
+               tool_versions: Optional[Dict[str, str]] = None):
+    """Registra una ejecución sin interrumpir al script llamador si algo falla"""
+    _SESSION_RESULTS[tool] = exit_code
+    if tool_versions:
+        # validate ya ejecutó estos probes: test/deploy encadenados no los repiten
+        _VERSION_CACHE.update(tool_versions)
+    try:
+        store = HistoryStore()
+        try:
+            if tool_versions is None:
+                tool_versions = probe_tool_versions()
+            store.record_run(tool, checks, duration, exit_code, tool_versions)
+        finally:
+            store.close()
+    except Exception as e:
+        print_colored(f"⚠️ No se pudo guardar el historial: {e}", 'yellow')
+
+def find_flaky_checks(history: Dict[tuple, List[tuple]]) -> List[Dict]:
+    """Checks que pasaron y fallaron dentro de la ventana, ordenados por cambios de estado"""
+    flaky = []
+    for key, samples in history.items():
+        statuses = [s for s, _ in samples]
+        passed = sum(statuses)
+        if 0 < passed < len(statuses):
+            flips = sum(1 for a, b in zip(statuses, statuses[1:]) if a != b)
+            flaky.append({'key': key, 'passed': passed, 'total': len(statuses), 'flips': flips})
+    return sorted(flaky, key=lambda f: (-f['flips'], f['key']))
+
+def find_slowest_checks(history: Dict[tuple, List[tuple]], top: int) -> List[Dict]:
+    """Checks con mayor duración promedio dentro de la ventana"""
+    slowest = []
+    for key, samples in history.items():
+        durations = [d for _, d in samples]
+        slowest.append({
+            'key': key,
+            'avg': sum(durations) / len(durations),
+            'max': max(durations),
+            'last': durations[-1]
+        })
+    return sorted(slowest, key=lambda s: -s['avg'])[:top]
+
+def show_report(store: HistoryStore, runs: int = 20, tool: Optional[str] = None, top: int = 10):
+    """Muestra tendencias, checks inestables y checks lentos de las últimas N ejecuciones"""
+    recent = store.recent_runs(runs, tool)
+
+    print_colored("\n" + "="*60, 'white')
+    print_colored(f"📈 HISTORIAL - últimas {len(recent)} ejecuciones", 'cyan')
+    print_colored("="*60, 'white')
+
+    if not recent:
+        print_colored("ℹ️ No hay ejecuciones registradas todavía", 'yellow')
+        return
+
+    # Tendencia por ejecución
+    print_colored("\n🕒 Tendencia:", 'white')
+    for run in recent:
+        stamp = time.strftime('%Y-%m-%d %H:%M', time.localtime(run['started_at']))
+        rate = (run['passed'] / run['total'] * 100) if run['total'] else 0
+        color = 'green' if run['exit_code'] == 0 else 'red'
+        print_colored(f"   #{run['id']:<5} {stamp}  {run['tool']:<10} "
+                      f"{run['passed']}/{run['total']} ({rate:5.1f}%)  "
+                      f"{run['duration']:7.1f}s  {run['host']}", color)
+
+    # Regresiones de velocidad por herramienta: mitad reciente vs mitad anterior
+    by_tool = {}
+    for run in recent:
+        by_tool.setdefault(run['tool'], []).append(run['duration'])
+    for name, durations in by_tool.items():
+        if len(durations) < 4:
+            continue
+        half = len(durations) // 2
+        before = sum(durations[:half]) / half
+        after = sum(durations[half:]) / (len(durations) - half)
+        if before > 0 and after > before * 1.2:
+            print_colored(f"   ⚠️ {name}: duración promedio subió de {before:.1f}s "
+                          f"a {after:.1f}s (+{(after / before - 1) * 100:.0f}%)", 'yellow')
+
+    # Cambios de versiones de herramientas entre ejecuciones
+    previous = {}
+    for run in recent:
+        last = previous.get(run['tool'])
+        if last is not None:
+            for name, version in run['tool_versions'].items():
+                if name in last and last[name] != version:
+                    print_colored(f"   🔄 #{run['id']} {name}: {last[name]} → {version}", 'magenta')
+        previous[run['tool']] = run['tool_versions']
+
+    history = store.check_history([r['id'] for r in recent])
+
+    flaky = find_flaky_checks(history)
+    print_colored(f"\n🎲 Checks inestables: {len(flaky)}", 'white')
+    for entry in flaky[:top]:
+        tool_name, category, item = entry['key']
+        print_colored(f"   ⚠️ [{tool_name}] {category}: {item} - "
+                      f"{entry['passed']}/{entry['total']} exitosos, "
+                      f"{entry['flips']} cambios de estado", 'yellow')
+
+    print_colored("\n🐢 Checks más lentos (promedio):", 'white')
+    for entry in find_slowest_checks(history, top):
+        tool_name, category, item = entry['key']
+        print_colored(f"   {entry['avg']:7.2f}s (máx {entry['max']:.2f}s, último "
+                      f"{entry['last']:.2f}s)  [{tool_name}] {category}: {item}", 'white')
+
+def main():
+    """Función principal del historial"""
+    parser = argparse.ArgumentParser(description="Historial de validaciones y tiempos")
+    parser.add_argument('--db', default=str(HISTORY_DB), help="Ruta de la base SQLite")
+    subparsers = parser.add_subparsers(dest='command')
+
+    report = subparsers.add_parser('report', help="Muestra tendencias de las últimas ejecuciones")
+    report.add_argument('--runs', type=int, default=20, help="Número de ejecuciones a analizar")
+    report.add_argument('--tool', help="Filtrar por herramienta (validate, test, deploy)")
+    report.add_argument('--top', type=int, default=10, help="Cantidad de checks a listar")
+
+    args = parser.parse_args()
+    if args.command != 'report':
+        parser.print_help()
+        return 1
+
+    if not Path(args.db).exists():
+        print_colored(f"ℹ️ No existe historial en {args.db}", 'yellow')
+        return 0
+
+    store = HistoryStore(Path(args.db))
+    try:
+        show_report(store, args.runs, args.tool, args.top)
+    finally:
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Fingerprinting de assets y headers de caché para Firebase Hosting
+Ejecutar: python scripts/hosting_cache.py fingerprint   (después de `flutter build web`)
+
+- Renombra los assets de arranque de Flutter Web por hash de contenido
+  (main.dart.js → main.dart.<hash>.js, flutter.js, flutter_bootstrap.js,
+  canvaskit/ → canvaskit.<hash>/) y reescribe sus referencias en index.html,
+  el service worker y los demás loaders
+- Mantiene en backend/firebase.json los headers del bloque `hosting`:
+  - Archivos con hash: `Cache-Control: public, max-age=31536000, immutable`
+  - index.html, rutas de la SPA, service worker y version.json: `no-cache`
+  - Resto de assets sin hash (assets/, icons/, manifest): TTL corto
+- Compara una visita repetida contra un servidor estático local que aplica los
+  headers (con ETag/304), antes y después del cambio: requests y bytes
+- `headers`: solo actualiza firebase.json; `simulate`: solo la comparación
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import http.client
+import http.server
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from common import print_colored
+
+FIREBASE_JSON = Path("backend/firebase.json")
+BUILD_DIR = Path("frontend/build/web")
+MANIFEST_FILE = Path(".devtools/hosting_manifest.json")
+STANDIN_PORT = 7441
+
+# Assets de arranque que solo se referencian desde los loaders (seguros de renombrar)
+FINGERPRINT_TARGETS = ['main.dart.js', 'flutter.js', 'flutter_bootstrap.js', 'canvaskit/']
+# Archivos de texto donde se reescriben las referencias
+REWRITE_EXTENSIONS = ('.html', '.js', '.json', '.css')
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+NO_CACHE = "no-cache"
+SHORT_TTL = "public, max-age=600"
+# Caché por defecto de Firebase Hosting sin headers configurados
+HOSTING_DEFAULT = "max-age=3600"
+HASHED = r"^/(?:.+\.[0-9a-f]{%d}\.[A-Za-z0-9]+|[^/]+\.[0-9a-f]{%d}/.+)$" % (HASH_LENGTH, HASH_LENGTH)
+
+MANAGED_HEADERS = [
+    {'regex': HASHED, 'headers': [{'key': 'Cache-Control', 'value': IMMUTABLE}]},
+    {'source': '/@(index.html|flutter_service_worker.js|version.json)',
+     'headers': [{'key': 'Cache-Control', 'value': NO_CACHE}]},
+    # Rutas de la SPA (rewrite a index.html)
+    {'regex': '^/[^.]*$', 'headers': [{'key': 'Cache-Control', 'value': NO_CACHE}]},
+    {'source': '/@(assets|icons)/**', 'headers': [{'key': 'Cache-Control', 'value': SHORT_TTL}]},
+    {'source': '/*.@(png|ico|svg|webmanifest)', 'headers': [{'key': 'Cache-Control', 'value': SHORT_TTL}]},
+    {'source': '/manifest.json', 'headers': [{'key': 'Cache-Control', 'value': SHORT_TTL}]},
+]
+
+def content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    if path.is_dir():
+        for child in sorted(p for p in path.rglob('*') if p.is_file()):
+            digest.update(child.relative_to(path).as_posix().encode('utf-8'))
+            digest.update(child.read_bytes())
+    else:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:HASH_LENGTH]
+
+def hashed_name(target: str, digest: str) -> str:
+    """main.dart.js → main.dart.<hash>.js; canvaskit/ → canvaskit.<hash>/"""
+    if target.endswith('/'):
+        return f"{target.rstrip('/')}.{digest}/"
+    stem, ext = os.path.splitext(target)
+    return f"{stem}.{digest}{ext}"
+
+def reference_pattern(target: str):
+    """Referencias a `target` como ruta propia (no `assets/x/main.dart.js` ni `main.dart.js.map`)"""
+    suffix = '' if target.endswith('/') else r'(?![\w\-.])'
+    return re.compile(r'(?<![\w\-.])(?<![\w\-]/)' + re.escape(target) + suffix)
+
+def rewrite(text: str, mapping: Dict[str, str]) -> str:
+    for old, new in mapping.items():
+        text = reference_pattern(old).sub(new, text)
+    return text
+
+def text_files(build_dir: Path) -> List[Path]:
+    """Archivos de texto fuera de assets/ (los assets se cargan por AssetManifest)"""
+    return [p for p in build_dir.rglob('*')
+            if p.is_file() and p.suffix in REWRITE_EXTENSIONS and 'assets' not in p.relative_to(build_dir).parts]
+
+def fingerprint(build_dir: Path, targets: List[str] = FINGERPRINT_TARGETS) -> Dict[str, str]:
+    """Renombra los targets por hash y reescribe referencias; retorna {viejo: nuevo}"""
+    pending = [t for t in targets if (build_dir / t.rstrip('/')).exists()]
+    mapping = {}  # type: Dict[str, str]
+    # Primero los que no referencian a otros pendientes: su hash ya incluye las referencias reescritas
+    while pending:
+        ready = []
+        for target in pending:
+            path = build_dir / target.rstrip('/')
+            text = '' if path.is_dir() else path.read_text(encoding='utf-8', errors='replace')
+            others = [t for t in pending if t != target]
+            if not any(reference_pattern(t).search(text) for t in others):
+                ready.append(target)
+        # Ciclo de referencias: se rompe procesando el primero
+        for target in ready or pending[:1]:
+            path = build_dir / target.rstrip('/')
+            if path.is_file():
+                text = path.read_text(encoding='utf-8', errors='replace')
+                updated = rewrite(text, mapping)
+                if updated != text:
+                    path.write_text(updated, encoding='utf-8')
+            new = hashed_name(target, content_hash(path))
+            path.rename(build_dir / new.rstrip('/'))
+            mapping[target] = new
+            pending.remove(target)
+
+    for path in text_files(build_dir):
+        if any(path.relative_to(build_dir).as_posix().startswith(new.rstrip('/')) for new in mapping.values()):
+            continue
+        text = path.read_text(encoding='utf-8', errors='replace')
+        updated = rewrite(text, mapping)
+        if updated != text:
+            path.write_text(updated, encoding='utf-8')
+    return mapping
+
+def ensure_headers(config_path: Path = FIREBASE_JSON) -> bool:
+    """Escribe los headers administrados en el bloque `hosting`; True si cambió"""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    hosting = config.setdefault('hosting', {})
+    managed = [json.dumps(rule, sort_keys=True) for rule in MANAGED_HEADERS]
+    values = {IMMUTABLE, NO_CACHE, SHORT_TTL}
+    # Se conservan los headers propios (los que no fijan Cache-Control con estos valores)
+    others = [rule for rule in hosting.get('headers', [])
+              if not any(h.get('key') == 'Cache-Control' and h.get('value') in values for h in rule.get('headers', []))]
+    headers = others + MANAGED_HEADERS
+    if [json.dumps(r, sort_keys=True) for r in hosting.get('headers', [])] == \
+            [json.dumps(r, sort_keys=True) for r in others] + managed:
+        return False
+    hosting['headers'] = headers
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return True
+
+def glob_to_regex(glob: str) -> str:
+    """Glob de Firebase Hosting (`**`, `*`, `?`, `@(a|b)`) a regex"""
+    out = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif glob[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif glob[i] == '?':
+            out.append('[^/]')
+            i += 1
+        elif glob.startswith('@(', i):
+            end = glob.index(')', i)
+            out.append('(?:' + '|'.join(re.escape(p) for p in glob[i + 2:end].split('|')) + ')')
+            i = end + 1
+        else:
+            out.append(re.escape(glob[i]))
+            i += 1
+    return '^' + ''.join(out) + '$'
+
+def cache_control(path: str, rules: List[Dict]) -> str:
+    """Cache-Control que Hosting enviaría para `path` (la última regla que coincide gana)"""
+    value = HOSTING_DEFAULT
+    for rule in rules:
+        pattern = rule.get('regex') or glob_to_regex(rule.get('source', ''))
+        if re.match(pattern, path):
+            for header in rule.get('headers', []):
+                if header.get('key', '').lower() == 'cache-control':
+                    value = header['value']
+    return value
+
+class StaticHandler(http.server.SimpleHTTPRequestHandler):
+    """Stand-in de Hosting: archivos del build con headers de firebase.json y ETag"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    rules = []  # type: List[Dict]
+    root = '.'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=self.root, **kwargs)
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().send_head()
+        with open(path, 'rb') as f:
+            data = f.read()
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control(self.path.split('?')[0], self.rules))
+            self.end_headers()
+            return None
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control(self.path.split('?')[0], self.rules))
+        self.end_headers()
+        self.wfile.write(data)
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+class BrowserCache:
+    """Caché HTTP mínima de navegador: frescura por max-age, revalidación por ETag"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.entries = {}  # type: Dict[str, Tuple[float, Optional[str], bool]]
+
+    def visit(self, paths: List[str], now: float) -> Dict:
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        stats = {'requests': 0, 'not_modified': 0, 'bytes': 0, 'from_cache': 0}
+        for path in paths:
+            entry = self.entries.get(path)
+            if entry and now < entry[0]:
+                stats['from_cache'] += 1
+                continue
+            headers = {}
+            if entry and entry[1] and not entry[2]:
+                headers['If-None-Match'] = entry[1]
+            conn.request('GET', '/' + path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            header_bytes = len(f"HTTP/1.1 {response.status} {response.reason}\r\n") + \
+                sum(len(k) + len(v) + 4 for k, v in response.getheaders()) + 2
+            stats['requests'] += 1
+            stats['bytes'] += header_bytes + len(body)
+            if response.status == 304:
+                stats['not_modified'] += 1
+            control = response.getheader('Cache-Control', '')
+            max_age = re.search(r'max-age=(\d+)', control)
+            fresh_for = 0 if 'no-cache' in control or not max_age else int(max_age.group(1))
+            self.entries[path] = (now + fresh_for, response.getheader('ETag'), 'no-store' in control)
+        conn.close()
+        return stats
+
+def visit_list(build_dir: Path) -> List[str]:
+    """Archivos que carga una visita (todo el build salvo source maps)"""
+    return sorted(p.relative_to(build_dir).as_posix() for p in build_dir.rglob('*')
+                  if p.is_file() and p.suffix != '.map')
+
+def simulate_visits(build_dir: Path, rules: List[Dict], redeploy, port: int) -> List[Dict]:
+    """Primera visita, visita al día siguiente y visita tras un redeploy del código Dart"""
+    StaticHandler.rules = rules
+    StaticHandler.root = str(build_dir)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), StaticHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        browser = BrowserCache(port)
+        now = time.time()
+        results = [browser.visit(visit_list(build_dir), now)]
+        results.append(browser.visit(visit_list(build_dir), now + 86400))
+        redeploy(build_dir)
+        results.append(browser.visit(visit_list(build_dir), now + 2 * 86400))
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def change_dart_code(build_dir: Path, fingerprinted: bool):
+    """Simula un deploy que solo cambia main.dart.js (sobre el build original)"""
+    main = build_dir / "main.dart.js"
+    with open(main, 'a', encoding='utf-8') as f:
+        f.write("\n// redeploy\n")
+    if fingerprinted:
+        fingerprint(build_dir)
+
+def compare(build_dir: Path, port: int) -> Optional[Dict]:
+    """Visitas repetidas sin headers (Hosting por defecto) vs fingerprinting + headers"""
+    if not (build_dir / "main.dart.js").exists():
+        print_colored("⚠️ El build ya tiene fingerprinting o no tiene main.dart.js; se omite la comparación", 'yellow')
+        return None
+    scenarios = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = Path(tmp) / "baseline"
+        optimized = Path(tmp) / "optimized"
+        # Copias del build original: el redeploy simulado parte del mismo código
+        shutil.copytree(build_dir, baseline)
+        shutil.copytree(build_dir, optimized)
+        original = Path(tmp) / "original"
+        shutil.copytree(build_dir, original)
+
+        def redeploy_baseline(path):
+            change_dart_code(path, False)
+
+        def redeploy_optimized(path):
+            # El build nuevo sale sin hash: se reemplaza por el original modificado y se re-fingerprintea
+            shutil.rmtree(path)
+            shutil.copytree(original, path)
+            change_dart_code(path, True)
+
+        scenarios['sin headers'] = simulate_visits(baseline, [], redeploy_baseline, port)
+        fingerprint(optimized)
+        scenarios['fingerprint + headers'] = simulate_visits(optimized, MANAGED_HEADERS, redeploy_optimized, port)
+    return scenarios
+
+def show_comparison(scenarios: Dict):
+    labels = ["primera visita", "visita al día siguiente", "visita tras redeploy"]
+    print_colored(f"\n🌐 Stand-in de Hosting: {'escenario':<24} {'requests':>9} {'304':>5} {'caché':>6} {'bytes':>12}", 'cyan')
+    for name, results in scenarios.items():
+        for label, stats in zip(labels, results):
+            print_colored(f"   {name:<22} {label:<24} {stats['requests']:>9} {stats['not_modified']:>5} "
+                          f"{stats['from_cache']:>6} {stats['bytes']:>12,}", 'white')
+    before, after = scenarios['sin headers'], scenarios['fingerprint + headers']
+    for index, label in ((1, "al día siguiente"), (2, "tras redeploy")):
+        saved = before[index]['bytes'] - after[index]['bytes']
+        print_colored(f"✅ Visita {label}: requests {before[index]['requests']} → {after[index]['requests']} "
+                      f"({after[index]['from_cache']} desde caché), bytes {before[index]['bytes']:,} → "
+                      f"{after[index]['bytes']:,} ({'ahorro' if saved >= 0 else 'extra'} {abs(saved):,})", 'green')
+
+def main():
+    """Función principal del fingerprinting de Hosting"""
+    parser = argparse.ArgumentParser(description="Fingerprinting de assets y headers de caché para Hosting")
+    parser.add_argument('command', choices=['fingerprint', 'headers', 'simulate'])
+    parser.add_argument('--build-dir', type=Path, default=BUILD_DIR, help="Build de Flutter Web")
+    parser.add_argument('--config', type=Path, default=FIREBASE_JSON, help="firebase.json a actualizar")
+    parser.add_argument('--no-compare', action='store_true', help="No medir visitas repetidas con el stand-in")
+    parser.add_argument('--port', type=int, default=STANDIN_PORT, help="Puerto del stand-in")
+    args = parser.parse_args()
+
+    if args.command in ('fingerprint', 'headers'):
+        if ensure_headers(args.config):
+            print_colored(f"📝 Headers de caché actualizados en {args.config}", 'green')
+        else:
+            print_colored(f"✓ Headers de caché al día en {args.config}", 'white')
+        if args.command == 'headers':
+            return 0
+
+    if not args.build_dir.is_dir():
+        print_colored(f"❌ No existe el build: {args.build_dir} (ejecutar `flutter build web`)", 'red')
+        return 1
+
+    if args.command == 'simulate' or not args.no_compare:
+        try:
+            scenarios = compare(args.build_dir, args.port)
+        except OSError as e:
+            print_colored(f"❌ No se pudo levantar el stand-in en el puerto {args.port}: {e} (usar --port)", 'red')
+            return 1
+        if scenarios:
+            show_comparison(scenarios)
+    if args.command == 'simulate':
+        return 0
+
+    mapping = fingerprint(args.build_dir)
+    if not mapping:
+        print_colored("⚠️ No se encontraron assets para fingerprinting (¿build ya procesado?)", 'yellow')
+        return 0
+    print_colored("🔖 Assets con hash de contenido:", 'cyan')
+    for old, new in mapping.items():
+        print_colored(f"   {old} → {new}", 'white')
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(MANIFEST_FILE, 'w') as f:
+        json.dump({'build_dir': str(args.build_dir), 'files': mapping, 'created_at': time.time()}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
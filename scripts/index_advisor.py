@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Asesor de índices compuestos a partir de un log de consultas
+Ejecutar: python scripts/index_advisor.py record        (proxy de grabación en :8085)
+          python scripts/index_advisor.py analyze --write
+
+- `record`: proxy HTTP delante del Firestore Emulator que registra cada runQuery y
+  cada lectura de colección en .devtools/query_log.jsonl
+- Las herramientas de scripts/ registran sus consultas con FIRESTORE_QUERY_LOG=<archivo>
+- `analyze`: deduce el conjunto mínimo de índices compuestos (y fieldOverrides de
+  collection group) y escribe o mezcla backend/firestore.indexes.json
+- Marca consultas que leen mucho más de lo que retornan (offset, colecciones completas)
+"""
+
+import sys
+import json
+import time
+import argparse
+import http.client
+import http.server
+import threading
+import urllib.parse
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from common import print_colored
+
+QUERY_LOG = Path(".devtools/query_log.jsonl")
+INDEXES_FILE = Path("backend/firestore.indexes.json")
+PROXY_PORT = 8085
+UPSTREAM = "localhost:8080"
+
+EQUALITY_OPS = {'EQUAL', 'IN'}
+ARRAY_OPS = {'ARRAY_CONTAINS', 'ARRAY_CONTAINS_ANY'}
+INEQUALITY_OPS = {'LESS_THAN', 'LESS_THAN_OR_EQUAL', 'GREATER_THAN', 'GREATER_THAN_OR_EQUAL',
+                  'NOT_EQUAL', 'NOT_IN'}
+UNARY_EQUALITY = {'IS_NULL', 'IS_NAN'}
+
+# Umbrales para marcar lecturas amplificadas
+SCAN_RATIO = 10
+FULL_SCAN_DOCS = 1000
+
+class QueryLog:
+    """Escritor JSONL thread-safe del log de consultas"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, entry: Dict):
+        line = json.dumps(dict(entry, ts=round(time.time(), 3), source='proxy')) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+class RecordingProxy(http.server.BaseHTTPRequestHandler):
+    """Reenvía todo al emulador y registra runQuery y listados de colecciones"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    upstream = UPSTREAM
+    log = None  # type: QueryLog
+    _local = threading.local()
+
+    def _forward(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else None
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.upstream, timeout=60)
+            self._local.connection = connection
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in ('host', 'connection', 'content-length')}
+        started = time.perf_counter()
+        try:
+            connection.request(self.command, self.path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, ConnectionError):
+            connection.close()
+            self._local.connection = None
+            self.send_error(502, "Emulador no disponible")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.send_response(response.status)
+        for name, value in response.getheaders():
+            if name.lower() not in ('content-length', 'transfer-encoding', 'connection'):
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+        if response.status < 400:
+            try:
+                self._record(body, data, started, elapsed)
+            except ValueError:
+                pass
+
+    def _record(self, body: Optional[bytes], data: bytes, started: float, elapsed: float):
+        path = urllib.parse.urlsplit(self.path).path
+        if '/documents' not in path:
+            return
+        relative = urllib.parse.unquote(path.split('/documents', 1)[1]).strip('/')
+        if self.command == 'POST' and relative.endswith(':runQuery'):
+            request = json.loads(body)
+            results = sum(1 for item in json.loads(data) if 'document' in item)
+            self.log.write({'kind': 'query', 'parent': relative[:-len(':runQuery')],
+                            'query': request.get('structuredQuery', {}), 'results': results,
+                            'ms': round(elapsed, 2)})
+        elif self.command == 'GET' and relative and relative.count('/') % 2 == 0:
+            documents = json.loads(data).get('documents', [])
+            self.log.write({'kind': 'list', 'collection': relative.rsplit('/', 1)[-1],
+                            'results': len(documents), 'ms': round(elapsed, 2)})
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _forward
+
+    def log_message(self, format, *args):
+        pass
+
+def run_proxy(port: int, upstream: str, log_path: Path):
+    RecordingProxy.upstream = upstream
+    RecordingProxy.log = QueryLog(log_path)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), RecordingProxy)
+    print_colored(f"🎙️ Grabando consultas: http://localhost:{port} → {upstream} ({log_path})", 'cyan')
+    print_colored(f"💡 Apunta los clientes con FIRESTORE_EMULATOR_HOST=localhost:{port}", 'yellow')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print_colored("\n🛑 Grabación detenida", 'yellow')
+    finally:
+        server.server_close()
+
+def _collect_filters(where: Optional[Dict], filters: List[Tuple[str, str]]):
+    if not where:
+        return
+    if 'compositeFilter' in where:
+        for child in where['compositeFilter'].get('filters', []):
+            _collect_filters(child, filters)
+    elif 'fieldFilter' in where:
+        filters.append((where['fieldFilter']['field']['fieldPath'], where['fieldFilter']['op']))
+    elif 'unaryFilter' in where:
+        op = where['unaryFilter']['op']
+        field = where['unaryFilter']['field']['fieldPath']
+        filters.append((field, 'EQUAL' if op in UNARY_EQUALITY else 'NOT_EQUAL'))
+
+class QueryShape:
+    """Forma de una consulta: colección, alcance, campos de igualdad, array y orden"""
+
+    def __init__(self, query: Dict):
+        source = (query.get('from') or [{}])[0]
+        self.collection = source.get('collectionId', '')
+        self.scope = 'COLLECTION_GROUP' if source.get('allDescendants') else 'COLLECTION'
+        filters = []
+        _collect_filters(query.get('where'), filters)
+        self.equality = sorted({field for field, op in filters if op in EQUALITY_OPS and field != '__name__'})
+        self.array = sorted({field for field, op in filters if op in ARRAY_OPS})
+        inequality = [field for field, op in filters if op in INEQUALITY_OPS and field != '__name__']
+        self.order = [(o['field']['fieldPath'], o.get('direction', 'ASCENDING'))
+                      for o in query.get('orderBy', []) if o['field']['fieldPath'] != '__name__']
+        ordered = {field for field, _ in self.order}
+        # Firestore ordena implícitamente por los campos con desigualdad no listados en orderBy
+        for field in inequality:
+            if field not in ordered:
+                self.order.append((field, 'ASCENDING'))
+                ordered.add(field)
+        self.equality = [field for field in self.equality if field not in ordered]
+        self.offset = int(query.get('offset', 0))
+        self.limit = query.get('limit')
+        self.filtered = bool(filters)
+
+    def fields(self) -> List[str]:
+        return self.equality + self.array + [field for field, _ in self.order]
+
+    def needs_composite(self) -> bool:
+        """Solo igualdades entre sí se resuelven con merge de índices simples"""
+        return len(set(self.fields())) >= 2 and bool(self.order or self.array)
+
+    def index(self) -> Dict:
+        fields = [{'fieldPath': field, 'order': 'ASCENDING'} for field in self.equality]
+        fields += [{'fieldPath': field, 'arrayConfig': 'CONTAINS'} for field in self.array]
+        fields += [{'fieldPath': field, 'order': direction} for field, direction in self.order]
+        return {'collectionGroup': self.collection, 'queryScope': self.scope, 'fields': fields}
+
+    def describe(self) -> str:
+        parts = [f"{field} ==" for field in self.equality] + [f"{field} contains" for field in self.array]
+        parts += [f"orden {field} {'↑' if direction == 'ASCENDING' else '↓'}" for field, direction in self.order]
+        scope = " (group)" if self.scope == 'COLLECTION_GROUP' else ""
+        return f"{self.collection}{scope}: " + (", ".join(parts) or "sin filtros")
+
+def index_key(index: Dict) -> str:
+    return json.dumps([index['collectionGroup'], index['queryScope'], index['fields']], sort_keys=True)
+
+def group_field_overrides(shapes: Iterable[QueryShape]) -> List[Dict]:
+    """Consultas de collection group sobre un solo campo requieren un fieldOverride explícito"""
+    overrides = OrderedDict()
+    for shape in shapes:
+        if shape.scope != 'COLLECTION_GROUP' or shape.needs_composite():
+            continue
+        for field in shape.fields():
+            overrides[(shape.collection, field)] = {
+                'collectionGroup': shape.collection,
+                'fieldPath': field,
+                # Un override reemplaza los índices simples por defecto: se incluyen de nuevo
+                'indexes': [
+                    {'order': 'ASCENDING', 'queryScope': 'COLLECTION'},
+                    {'order': 'DESCENDING', 'queryScope': 'COLLECTION'},
+                    {'arrayConfig': 'CONTAINS', 'queryScope': 'COLLECTION'},
+                    {'order': 'ASCENDING', 'queryScope': 'COLLECTION_GROUP'},
+                    {'order': 'DESCENDING', 'queryScope': 'COLLECTION_GROUP'}
+                ]
+            }
+    return list(overrides.values())
+
+def read_log(path: Path) -> List[Dict]:
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+def analyze(entries: List[Dict], scan_ratio: float, full_scan_docs: int):
+    """Agrupa por forma y retorna (estadísticas por forma, índices requeridos, overrides, alertas)"""
+    shapes = OrderedDict()
+    warnings = []
+    for entry in entries:
+        if entry.get('kind') == 'list':
+            if entry['results'] >= full_scan_docs:
+                warnings.append(f"lectura completa de {entry['collection']}: {entry['results']:,} documentos "
+                                f"en una página (¿falta un filtro?)")
+            continue
+        shape = QueryShape(entry.get('query', {}))
+        key = shape.describe()
+        stats = shapes.setdefault(key, {'shape': shape, 'count': 0, 'results': 0, 'scanned': 0,
+                                        'max_offset': 0, 'ms': 0.0})
+        stats['count'] += 1
+        stats['results'] += entry.get('results', 0)
+        # Firestore lee (y factura) los documentos saltados por offset
+        stats['scanned'] += entry.get('results', 0) + shape.offset
+        # El offset no es parte de la forma: cualquier llamada con offset cuenta, no solo la primera
+        stats['max_offset'] = max(stats['max_offset'], shape.offset)
+        stats['ms'] += entry.get('ms', 0)
+
+    required = OrderedDict()
+    for key, stats in shapes.items():
+        shape = stats['shape']
+        if shape.needs_composite():
+            index = shape.index()
+            required.setdefault(index_key(index), index)
+        ratio = stats['scanned'] / max(stats['results'], 1)
+        if stats['max_offset'] and ratio >= scan_ratio:
+            warnings.append(f"{key}: offset lee {ratio:.0f}x lo que retorna (usar cursores startAfter)")
+        average = stats['results'] / stats['count']
+        if not shape.filtered and shape.limit is None and average >= full_scan_docs:
+            warnings.append(f"{key}: consulta sin filtros ni limit retorna {average:,.0f} documentos en promedio")
+    overrides = group_field_overrides(stats['shape'] for stats in shapes.values())
+    return shapes, list(required.values()), overrides, warnings
+
+def merge_indexes(existing: Dict, indexes: List[Dict], overrides: List[Dict]) -> Tuple[Dict, int, List[Dict]]:
+    """Agrega índices/overrides faltantes; retorna (archivo, nuevos, existentes sin uso observado)"""
+    current = existing.get('indexes', [])
+    known = {index_key(index) for index in current}
+    needed = {index_key(index) for index in indexes}
+    added = [index for index in indexes if index_key(index) not in known]
+    unused = [index for index in current if index_key(index) not in needed]
+
+    current_overrides = existing.get('fieldOverrides', [])
+    known_overrides = {(o['collectionGroup'], o['fieldPath']) for o in current_overrides}
+    new_overrides = [o for o in overrides if (o['collectionGroup'], o['fieldPath']) not in known_overrides]
+
+    merged = dict(existing)
+    merged['indexes'] = current + added
+    merged['fieldOverrides'] = current_overrides + new_overrides
+    return merged, len(added) + len(new_overrides), unused
+
+def run_analyze(args) -> int:
+    if not args.log.exists():
+        print_colored(f"❌ No existe el log {args.log}", 'red')
+        print_colored("💡 Graba con: python scripts/index_advisor.py record "
+                      "o FIRESTORE_QUERY_LOG=.devtools/query_log.jsonl", 'yellow')
+        return 1
+    entries = read_log(args.log)
+    shapes, indexes, overrides, warnings = analyze(entries, args.scan_ratio, args.full_scan_docs)
+
+    print_colored(f"🔍 {len(entries):,} consultas registradas, {len(shapes)} formas distintas", 'cyan')
+    for key, stats in sorted(shapes.items(), key=lambda item: -item[1]['count']):
+        marker = "🧩" if stats['shape'].needs_composite() else "  "
+        print_colored(f"  {marker} {stats['count']:>6,}x  {stats['results'] / stats['count']:>8,.1f} docs  "
+                      f"{stats['ms'] / stats['count']:>7.1f} ms  {key}", 'white')
+
+    existing = {'indexes': [], 'fieldOverrides': []}
+    if args.indexes.exists():
+        with open(args.indexes, 'r') as f:
+            existing = json.load(f)
+    merged, added, unused = merge_indexes(existing, indexes, overrides)
+
+    print_colored(f"\n🧩 Índices compuestos requeridos: {len(indexes)} "
+                  f"(+{len(overrides)} fieldOverrides de collection group), {added} nuevos", 'cyan')
+    for index in indexes:
+        fields = ", ".join(f"{f['fieldPath']} {f.get('order', f.get('arrayConfig'))}" for f in index['fields'])
+        print_colored(f"   {index['collectionGroup']} [{index['queryScope']}]: {fields}", 'white')
+    for index in unused:
+        print_colored(f"   ⚠️ Sin uso en el log: {index['collectionGroup']} "
+                      f"{[f['fieldPath'] for f in index['fields']]}", 'yellow')
+
+    if warnings:
+        print_colored(f"\n🐢 Consultas con lectura amplificada: {len(warnings)}", 'yellow')
+        for warning in warnings:
+            print_colored(f"   {warning}", 'yellow')
+
+    if args.write and added:
+        with open(args.indexes, 'w') as f:
+            json.dump(merged, f, indent=2)
+            f.write("\n")
+        print_colored(f"\n✅ {args.indexes} actualizado", 'green')
+    elif added:
+        print_colored(f"\n💡 Usa --write para agregarlos a {args.indexes}", 'yellow')
+        if args.check:
+            return 1
+    return 0
+
+def main():
+    """Función principal del asesor de índices"""
+    parser = argparse.ArgumentParser(description="Asesor de índices compuestos de Firestore")
+    parser.add_argument('command', choices=['record', 'analyze'])
+    parser.add_argument('--log', type=Path, default=QUERY_LOG, help="Log JSONL de consultas")
+    parser.add_argument('--port', type=int, default=PROXY_PORT, help="Puerto del proxy de grabación")
+    parser.add_argument('--upstream', default=UPSTREAM, help="Host del Firestore Emulator")
+    parser.add_argument('--indexes', type=Path, default=INDEXES_FILE, help="firestore.indexes.json")
+    parser.add_argument('--write', action='store_true', help="Escribir los índices faltantes")
+    parser.add_argument('--check', action='store_true', help="Salir con error si faltan índices")
+    parser.add_argument('--scan-ratio', type=float, default=SCAN_RATIO,
+                        help="Documentos leídos por documento retornado para marcar una consulta")
+    parser.add_argument('--full-scan-docs', type=int, default=FULL_SCAN_DOCS,
+                        help="Documentos a partir de los cuales una lectura sin filtros se marca")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        run_proxy(args.port, args.upstream, args.log)
+        return 0
+    return run_analyze(args)
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Análisis de logs de los emuladores: latencias y errores en memoria constante
+Ejecutar: python scripts/log_analyzer.py [archivos...] [--follow]
+
+- Lee firebase-debug.log, firestore-debug.log y ui-debug.log (backend/) y la
+  salida de dev.py (`python scripts/dev.py --log` → .devtools/dev.log); `-` lee stdin
+- Extrae:
+  - Duración de cada ejecución de function (`Finished "us-central1-fn" in 12.3ms`)
+  - Latencia de requests HTTP del CLI (pares `>>> [apiv2]` / `<<< [apiv2]`)
+  - Errores y warnings (niveles del CLI, Java, logs estructurados de functions)
+- Histogramas logarítmicos de tamaño fijo por operación (total y ventana móvil
+  por minuto), top-N de operaciones más lentas con un heap acotado y firmas de
+  error normalizadas: memoria constante aunque el log tenga varios GB
+- `--follow`: sigue los archivos como `tail -F` (rotación y truncado) y muestra
+  el reporte de la ventana móvil cada --interval segundos
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import math
+import time
+import heapq
+import argparse
+import calendar
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from common import print_colored
+
+DEFAULT_LOGS = [Path("backend/firebase-debug.log"), Path("backend/firestore-debug.log"),
+                Path("backend/ui-debug.log"), Path(".devtools/dev.log")]
+REPORT_FILE = Path(".devtools/log_report.json")
+
+# Buckets logarítmicos: error relativo ~5% entre 0.01 ms y ~1 h
+BUCKET_BASE = 1.1
+BUCKET_MIN_MS = 0.01
+BUCKET_COUNT = 240
+# Cotas para mantener la memoria constante
+MAX_OPERATIONS = 500
+MAX_ERROR_SIGNATURES = 200
+MAX_PENDING_REQUESTS = 1000
+OTHER = "(otras)"
+
+PREFIX = re.compile(r'\s*(?:\[(\w+)\] )?(?:\[(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?Z\] )?\s*')
+FINISHED = re.compile(r'Finished "([^"]+)" in ~?([\d.]+)\s*(ms|s)\b')
+APIV2 = re.compile(r'(>>>|<<<) \[apiv2\]\[(query|status)\] ([A-Z]+) (\S+)(?: (\d{3}))?')
+# Marcas de nivel del CLI (`!!`, `⚠`) y de los logs Java del emulador de Firestore
+MARKER = re.compile(r'(!!|⚠|SEVERE:|WARNING:)\s*')
+STRUCTURED = re.compile(r'>\s+(\{.*\})\s*$')
+ERROR_WORDS = re.compile(r'\b(Error|Exception|ERROR|FAILED|Unhandled)\b')
+# Normalización de firmas de error y rutas
+VOLATILE = re.compile(r'"[^"]*"|\'[^\']*\'|\b0x[0-9a-f]+\b|\b[0-9a-f]{8,}\b|\d+(\.\d+)?', re.IGNORECASE)
+ID_SEGMENT = re.compile(r'/(?=[^/]*\d)[^/?]{6,}|/\d+')
+
+class Histogram:
+    """Histograma logarítmico de tamaño fijo (percentiles con ~5% de error)"""
+
+    __slots__ = ('counts', 'total', 'sum_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    @staticmethod
+    def bucket(value_ms: float) -> int:
+        if value_ms <= BUCKET_MIN_MS:
+            return 0
+        return min(BUCKET_COUNT - 1, int(math.log(value_ms / BUCKET_MIN_MS, BUCKET_BASE)) + 1)
+
+    def add(self, value_ms: float):
+        self.counts[self.bucket(value_ms)] += 1
+        self.total += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def merge(self, other: 'Histogram'):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.sum_ms += other.sum_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, pct: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * self.total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # Límite superior del bucket, acotado por el máximo observado
+                return min(self.max_ms, BUCKET_MIN_MS * BUCKET_BASE ** index)
+        return self.max_ms
+
+class Operation:
+    """Latencias de una operación: total, ventana móvil por minuto y errores"""
+
+    __slots__ = ('histogram', 'minutes', 'errors')
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.minutes = {}  # type: Dict[int, Histogram]
+        self.errors = 0
+
+    def add(self, value_ms: float, minute: int, window: int):
+        self.histogram.add(value_ms)
+        slot = self.minutes.get(minute)
+        if slot is None:
+            slot = self.minutes[minute] = Histogram()
+            for old in [m for m in self.minutes if m <= minute - window]:
+                del self.minutes[old]
+        slot.add(value_ms)
+
+    def window(self, now_minute: int, window: int) -> Histogram:
+        merged = Histogram()
+        for minute, histogram in self.minutes.items():
+            if minute > now_minute - window:
+                merged.merge(histogram)
+        return merged
+
+class LogStats:
+    """Acumula latencias y errores de un stream de líneas de log"""
+
+    def __init__(self, top: int = 10, window_minutes: int = 5):
+        self.top = top
+        self.window_minutes = window_minutes
+        self.operations = {}  # type: Dict[str, Operation]
+        self.slowest = []  # type: List[Tuple[float, str, str]]
+        self.errors = {}  # type: Dict[str, Dict]
+        self.pending = {}  # type: Dict[Tuple[str, str, str], List[float]]
+        self.lines = 0
+        self.bytes = 0
+        self.clock = 0.0
+        self._second = None
+        self._epoch = 0
+
+    def _operation(self, name: str) -> Operation:
+        operation = self.operations.get(name)
+        if operation is None:
+            if len(self.operations) >= MAX_OPERATIONS:
+                name = OTHER
+                operation = self.operations.get(name)
+            if operation is None:
+                operation = self.operations[name] = Operation()
+        return operation
+
+    def record(self, name: str, value_ms: float, where: str, failed: bool = False):
+        operation = self._operation(name)
+        operation.add(value_ms, int(self.clock // 60), self.window_minutes)
+        if failed:
+            operation.errors += 1
+        entry = (value_ms, name, where)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif value_ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def error(self, source: str, level: str, message: str):
+        signature = f"{source} {level}: {VOLATILE.sub('#', message.strip())[:160]}"
+        entry = self.errors.get(signature)
+        if entry is None:
+            if len(self.errors) >= MAX_ERROR_SIGNATURES:
+                signature = f"{source} {level}: {OTHER}"
+                entry = self.errors.get(signature)
+            if entry is None:
+                entry = self.errors[signature] = {'count': 0, 'level': level, 'example': message.strip()[:300],
+                                                  'first': self.clock}
+        entry['count'] += 1
+        entry['last'] = self.clock
+
+    def _timestamp(self, seconds: str, fraction: Optional[str]):
+        # Muchas líneas comparten el mismo segundo: se evita re-parsear la fecha
+        if seconds != self._second:
+            self._second = seconds
+            self._epoch = calendar.timegm(time.strptime(seconds, '%Y-%m-%dT%H:%M:%S'))
+        self.clock = self._epoch + float(fraction or 0)
+
+    def feed(self, line: str, source: str):
+        self.lines += 1
+        self.bytes += len(line)
+        # [nivel] [timestamp] cuerpo (firebase-debug.log) o [Servicio] cuerpo (dev.py)
+        prefix = PREFIX.match(line)
+        tag, seconds, fraction = prefix.groups()
+        if seconds:
+            self._timestamp(seconds, fraction)
+        body = line[prefix.end():]
+
+        if 'Finished "' in body:
+            finished = FINISHED.search(body)
+            if finished:
+                value = float(finished.group(2)) * (1000 if finished.group(3) == 's' else 1)
+                # us-central1-getUserProfile → getUserProfile
+                name = finished.group(1).split('-', 2)[-1] if finished.group(1).count('-') >= 2 else finished.group(1)
+                self.record(f"function {name}", value, f"{source}:{self.lines}")
+                return
+        if '[apiv2]' in body:
+            self._apiv2(body, source)
+            return
+        if body.startswith('>') and '{' in body:
+            structured = STRUCTURED.match(body)
+            if structured:
+                try:
+                    entry = json.loads(structured.group(1))
+                except ValueError:
+                    entry = None
+                if isinstance(entry, dict) and entry.get('severity') in ('ERROR', 'CRITICAL', 'WARNING'):
+                    level = 'warn' if entry['severity'] == 'WARNING' else 'error'
+                    self.error(source, level, str(entry.get('message', structured.group(1))))
+                return
+        tag = (tag or '').lower()
+        marker = MARKER.match(body)
+        if tag in ('error', 'warn'):
+            self.error(source, tag, body)
+        elif marker:
+            level = 'warn' if marker.group(1) in ('⚠', 'WARNING:') else 'error'
+            self.error(source, level, body[marker.end():])
+        elif tag != 'debug' and ERROR_WORDS.search(body) and not body.startswith('at '):
+            self.error(source, 'error', body)
+
+    def _apiv2(self, line: str, source: str):
+        match = APIV2.search(line)
+        if not match:
+            return
+        direction, _, method, url, status = match.groups()
+        key = (source, method, url)
+        if direction == '>>>':
+            if len(self.pending) >= MAX_PENDING_REQUESTS:
+                # Requests sin respuesta (timeouts, logs cortados): se descarta la más vieja
+                del self.pending[next(iter(self.pending))]
+            self.pending.setdefault(key, []).append(self.clock)
+            return
+        if not status:
+            return
+        starts = self.pending.get(key)
+        if not starts:
+            return
+        started = starts.pop(0)
+        if not starts:
+            del self.pending[key]
+        path = url.split('?', 1)[0].split('://', 1)[-1]
+        name = f"http {method} {ID_SEGMENT.sub('/{id}', path)}"
+        failed = int(status) >= 400
+        self.record(name, max(0.0, (self.clock - started) * 1000), f"{source}:{self.lines}", failed)
+        if failed:
+            self.error(source, 'error', f"HTTP {status} {method} {name.split(' ', 2)[2]}")
+
+    def summary(self, window: bool = False) -> Dict:
+        now_minute = int(self.clock // 60)
+        operations = {}
+        for name, operation in self.operations.items():
+            histogram = operation.window(now_minute, self.window_minutes) if window else operation.histogram
+            if not histogram.total:
+                continue
+            operations[name] = {
+                'count': histogram.total,
+                'mean_ms': histogram.sum_ms / histogram.total,
+                'p50_ms': histogram.percentile(50),
+                'p95_ms': histogram.percentile(95),
+                'p99_ms': histogram.percentile(99),
+                'max_ms': histogram.max_ms,
+                'errors': operation.errors
+            }
+        return {
+            'lines': self.lines,
+            'bytes': self.bytes,
+            'operations': operations,
+            'slowest': [{'ms': ms, 'operation': name, 'where': where}
+                        for ms, name, where in sorted(self.slowest, reverse=True)],
+            'errors': sorted(({'signature': s, **e} for s, e in self.errors.items()),
+                             key=lambda e: -e['count'])
+        }
+
+def read_lines(handle) -> Iterator[str]:
+    """Líneas decodificadas de un archivo binario (tolera bytes inválidos)"""
+    for raw in handle:
+        yield raw.decode('utf-8', 'replace').rstrip('\r\n')
+
+class Follower:
+    """Sigue un archivo como `tail -F`: reabre si se rota o se trunca"""
+
+    def __init__(self, path: Path, from_start: bool):
+        self.path = path
+        self.handle = None
+        self.inode = None
+        self.partial = b''
+        self._open(from_start)
+
+    def _open(self, from_start: bool = True):
+        try:
+            self.handle = open(self.path, 'rb')
+        except OSError:
+            self.handle = None
+            return
+        stat = os.fstat(self.handle.fileno())
+        self.inode = stat.st_ino
+        if not from_start:
+            self.handle.seek(0, io.SEEK_END)
+
+    def poll(self) -> Iterator[str]:
+        if self.handle is None:
+            self._open()
+            if self.handle is None:
+                return
+        while True:
+            chunk = self.handle.readline()
+            if not chunk:
+                break
+            if not chunk.endswith(b'\n'):
+                # Línea a medio escribir: se completa en el próximo poll
+                self.partial += chunk
+                break
+            line, self.partial = self.partial + chunk, b''
+            yield line.decode('utf-8', 'replace').rstrip('\r\n')
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.handle.tell():
+            self.handle.close()
+            self.partial = b''
+            self._open()
+
+def show_report(summary: Dict, title: str, top: int):
+    print_colored(f"\n📊 {title}: {summary['lines']:,} líneas ({summary['bytes'] / 1e6:.1f} MB)", 'cyan')
+    operations = sorted(summary['operations'].items(), key=lambda item: -item[1]['p95_ms'])
+    if operations:
+        print_colored(f"{'operación':<52} {'n':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'err':>5}", 'cyan')
+    for name, stats in operations[:top * 2]:
+        color = 'red' if stats['errors'] else 'white'
+        print_colored(f"{name[:52]:<52} {stats['count']:>7} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+                      f"{stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f} {stats['errors']:>5}", color)
+    if summary['slowest']:
+        print_colored(f"\n🐢 Top {len(summary['slowest'])} operaciones más lentas:", 'yellow')
+        for entry in summary['slowest']:
+            print_colored(f"   {entry['ms']:>9.1f} ms  {entry['operation']}  ({entry['where']})", 'white')
+    if summary['errors']:
+        print_colored(f"\n❌ Errores y warnings ({sum(e['count'] for e in summary['errors'])}):", 'red')
+        for entry in summary['errors'][:top]:
+            color = 'yellow' if entry['level'] == 'warn' else 'red'
+            print_colored(f"   {entry['count']:>6}×  {entry['example'][:110]}", color)
+
+def main():
+    """Función principal del análisis de logs"""
+    parser = argparse.ArgumentParser(description="Latencias y errores desde los logs de los emuladores")
+    parser.add_argument('paths', nargs='*', type=str, help="Logs a leer (`-` = stdin; default: logs de backend/ y dev.py)")
+    parser.add_argument('--follow', '-f', action='store_true', help="Seguir los archivos como `tail -F`")
+    parser.add_argument('--from-start', action='store_true', help="Con --follow, leer también el contenido existente")
+    parser.add_argument('--interval', type=float, default=30.0, help="Segundos entre reportes con --follow")
+    parser.add_argument('--window', type=int, default=5, help="Minutos de la ventana móvil")
+    parser.add_argument('--top', type=int, default=10, help="Operaciones lentas y errores a mostrar")
+    parser.add_argument('--report', type=Path, default=REPORT_FILE, help="Reporte JSON")
+    args = parser.parse_args()
+
+    paths = args.paths or [str(p) for p in DEFAULT_LOGS if p.exists()]
+    if not paths:
+        print_colored("⚠️ No hay logs: ejecutar los emuladores (`python scripts/dev.py --log`)", 'yellow')
+        return 1
+    stats = LogStats(top=args.top, window_minutes=args.window)
+    started = time.perf_counter()
+
+    if args.follow:
+        followers = [(Follower(Path(p), args.from_start), Path(p).name) for p in paths if p != '-']
+        print_colored(f"👀 Siguiendo {', '.join(name for _, name in followers)} (Ctrl+C para terminar)", 'cyan')
+        next_report = time.monotonic() + args.interval
+        try:
+            while True:
+                for follower, name in followers:
+                    for line in follower.poll():
+                        stats.feed(line, name)
+                stats.clock = max(stats.clock, time.time())
+                if time.monotonic() >= next_report:
+                    show_report(stats.summary(window=True), f"Últimos {args.window} min", args.top)
+                    next_report = time.monotonic() + args.interval
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+    else:
+        for path in paths:
+            name = 'stdin' if path == '-' else Path(path).name
+            try:
+                handle = sys.stdin.buffer if path == '-' else open(path, 'rb', buffering=1 << 20)
+            except OSError as e:
+                print_colored(f"❌ No se pudo abrir {path}: {e}", 'red')
+                continue
+            try:
+                for line in read_lines(handle):
+                    stats.feed(line, name)
+            finally:
+                if handle is not sys.stdin.buffer:
+                    handle.close()
+
+    summary = stats.summary()
+    elapsed = time.perf_counter() - started
+    show_report(summary, "Total", args.top)
+    if not args.follow:
+        print_colored(f"\n⏱️ {summary['bytes'] / 1e6 / max(elapsed, 1e-9):.0f} MB/s", 'white')
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(summary, f, indent=2)
+    print_colored(f"💾 Reporte en {args.report}", 'green')
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+Motor batch de métricas del dashboard (getInitialData)
+Ejecutar: python scripts/metrics_engine.py --events dump/payment_events.jsonl
+
+Precalcula por empresa las métricas que getInitialData lee desde
+metrics/{companyId} en una sola lectura:
+- Lee payment_events/customers desde un dump JSONL o desde el Firestore Emulator
+- Agrupa por empresa con NumPy (bincount) en vez de loops por evento
+- Escribe documentos compactos en metrics/ (emulador) o en un archivo JSONL
+- Modo incremental (--incremental): parciales por empresa y día + watermark,
+  solo procesa los eventos nuevos desde la ejecución anterior
+- Benchmark de throughput en eventos/segundo (--benchmark N)
+
+Requiere NumPy: pip install numpy
+"""
+
+import sys
+import json
+import hashlib
+import time
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from common import print_colored
+from firestore_emulator import FirestoreEmulator, decode_document
+
+# Tipos de evento codificados como enteros para agrupar con bincount
+KIND_OTHER = 0
+KIND_SUCCEEDED = 1
+KIND_FAILED = 2
+KIND_RECOVERED = 3
+NUM_KINDS = 4
+
+EVENT_KINDS = {
+    'succeeded': KIND_SUCCEEDED,
+    'paid': KIND_SUCCEEDED,
+    'invoice.payment_succeeded': KIND_SUCCEEDED,
+    'payment_intent.succeeded': KIND_SUCCEEDED,
+    'failed': KIND_FAILED,
+    'invoice.payment_failed': KIND_FAILED,
+    'payment_intent.payment_failed': KIND_FAILED,
+    'recovered': KIND_RECOVERED,
+}
+
+INACTIVE_CUSTOMER_STATUSES = {'canceled', 'cancelled', 'churned', 'deleted'}
+
+SECONDS_PER_DAY = 86400
+METRICS_STATE = Path(".devtools/metrics_state.npz")
+
+def parse_timestamp(value) -> int:
+    """Convierte epoch (s/ms), ISO 8601 o {_seconds} de Firestore a epoch en segundos"""
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value / 1000) if value > 1e11 else int(value)
+    if isinstance(value, dict):
+        return int(value.get('_seconds', value.get('seconds', 0)))
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def event_kind(event: Dict) -> int:
+    """Clasifica un payment_event por su status (o type de Stripe)"""
+    kind = EVENT_KINDS.get(event.get('status'))
+    if kind is None:
+        kind = EVENT_KINDS.get(event.get('type'), KIND_OTHER)
+    return kind
+
+class CompanyIndex:
+    """Asigna un índice entero estable a cada companyId"""
+
+    def __init__(self, company_ids: Iterable[str] = ()):
+        self.ids = []
+        self.positions = {}
+        for company_id in company_ids:
+            self.get(company_id)
+
+    def get(self, company_id: str) -> int:
+        position = self.positions.get(company_id)
+        if position is None:
+            position = len(self.ids)
+            self.positions[company_id] = position
+            self.ids.append(company_id)
+        return position
+
+    def __len__(self):
+        return len(self.ids)
+
+class EventColumns:
+    """payment_events en formato columnar (un array NumPy por campo)"""
+
+    def __init__(self, company: np.ndarray, customer: np.ndarray, amount: np.ndarray,
+                 kind: np.ndarray, created_at: np.ndarray):
+        self.company = company
+        self.customer = customer
+        self.amount = amount
+        self.kind = kind
+        self.created_at = created_at
+
+    def __len__(self):
+        return len(self.company)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], companies: CompanyIndex,
+                     customers: Optional[Dict[str, int]] = None) -> 'EventColumns':
+        """Construye las columnas a partir de documentos payment_events (sin ids repetidos)"""
+        customers = customers if customers is not None else {}
+        company, customer, amount, kind, created_at = [], [], [], [], []
+        seen_ids = set()
+        for event in records:
+            company_id = event.get('companyId')
+            if not company_id:
+                continue
+            event_id = event.get('id')
+            if event_id is not None:
+                if event_id in seen_ids:
+                    continue
+                seen_ids.add(event_id)
+            company.append(companies.get(company_id))
+            customer.append(customers.setdefault(event.get('customerId') or '', len(customers)))
+            amount.append(int(event.get('amount') or 0))
+            kind.append(event_kind(event))
+            created_at.append(parse_timestamp(event.get('createdAt')))
+        return cls(
+            np.array(company, dtype=np.int32),
+            np.array(customer, dtype=np.int64),
+            np.array(amount, dtype=np.int64),
+            np.array(kind, dtype=np.int8),
+            np.array(created_at, dtype=np.int64)
+        )
+
+def read_jsonl(path: Path) -> Iterable[Dict]:
+    """Lee un dump JSONL (un documento por línea, opcionalmente {id, data})"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'data' in record and isinstance(record['data'], dict):
+                record = dict(record['data'], id=record.get('id'))
+            yield record
+
+def read_collection(client: FirestoreEmulator, collection: str) -> Iterable[Dict]:
+    """Lee una colección del emulador como documentos planos con su id"""
+    for path, data in client.iter_documents(collection):
+        yield dict(data, id=path.rsplit('/', 1)[-1])
+
+def count_active_customers(records: Iterable[Dict], companies: CompanyIndex) -> np.ndarray:
+    """Cuenta clientes activos por empresa desde el export de customers"""
+    company = [companies.get(c['companyId']) for c in records
+               if c.get('companyId') and c.get('status') not in INACTIVE_CUSTOMER_STATUSES]
+    return np.bincount(np.array(company, dtype=np.int64), minlength=len(companies))
+
+def count_distinct_customers(events: EventColumns, num_companies: int) -> np.ndarray:
+    """Clientes distintos con eventos por empresa (fallback sin export de customers)"""
+    if len(events) == 0:
+        return np.zeros(num_companies, dtype=np.int64)
+    pairs = np.unique(events.company.astype(np.int64) << 32 | events.customer)
+    return np.bincount(pairs >> 32, minlength=num_companies)
+
+def aggregate_by_kind(company: np.ndarray, kind: np.ndarray, amount: np.ndarray,
+                      num_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Suma de montos y conteo por (grupo, tipo) con un único bincount vectorizado"""
+    key = company.astype(np.int64) * NUM_KINDS + kind
+    size = num_groups * NUM_KINDS
+    # Los montos en centavos son enteros: la suma en float64 es exacta hasta 2^53
+    sums = np.bincount(key, weights=amount, minlength=size)
+    counts = np.bincount(key, minlength=size)
+    return (np.rint(sums).astype(np.int64).reshape(num_groups, NUM_KINDS),
+            counts.astype(np.int64).reshape(num_groups, NUM_KINDS))
+
+def build_metrics(sums: np.ndarray, counts: np.ndarray, active_customers: np.ndarray,
+                  companies: CompanyIndex) -> Dict[str, Dict]:
+    """Convierte las matrices agregadas en documentos metrics/{companyId}"""
+    recovered = sums[:, KIND_RECOVERED]
+    failed = sums[:, KIND_FAILED]
+    total = sums[:, KIND_SUCCEEDED] + recovered
+    at_risk = np.maximum(failed - recovered, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(failed > 0, recovered / np.where(failed > 0, failed, 1) * 100, 0.0)
+
+    updated_at = datetime.now(timezone.utc)
+    metrics = {}
+    for position, company_id in enumerate(companies.ids):
+        metrics[company_id] = {
+            'totalRevenue': int(total[position]),
+            'recoveredRevenue': int(recovered[position]),
+            'failedRevenue': int(failed[position]),
+            'revenueAtRisk': int(at_risk[position]),
+            'recoveryRate': round(float(rate[position]), 2),
+            'activeCustomers': int(active_customers[position]),
+            'failedPayments': int(counts[position, KIND_FAILED]),
+            'recoveredPayments': int(counts[position, KIND_RECOVERED]),
+            'eventCount': int(counts[position].sum()),
+            'amountUnit': 'cents',
+            'updatedAt': updated_at
+        }
+    return metrics
+
+def compute_metrics(events: EventColumns, companies: CompanyIndex,
+                    active_customers: Optional[np.ndarray] = None) -> Dict[str, Dict]:
+    """Calcula todas las métricas por empresa en una pasada vectorizada"""
+    num_companies = len(companies)
+    sums, counts = aggregate_by_kind(events.company, events.kind, events.amount, num_companies)
+    if active_customers is None:
+        active_customers = count_distinct_customers(events, num_companies)
+    elif len(active_customers) < num_companies:
+        active_customers = np.pad(active_customers, (0, num_companies - len(active_customers)))
+    return build_metrics(sums, counts, active_customers, companies)
+
+def write_metrics_jsonl(metrics: Dict[str, Dict], path: Path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for company_id, document in metrics.items():
+            record = dict(document, id=company_id, updatedAt=document['updatedAt'].isoformat())
+            f.write(json.dumps(record) + "\n")
+
+def write_metrics_emulator(metrics: Dict[str, Dict], client: FirestoreEmulator) -> int:
+    return client.set_documents((f"metrics/{company_id}", document)
+                                for company_id, document in metrics.items())
+
+def aggregate_daily(events: EventColumns) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Parciales por (empresa, día de createdAt): claves empaquetadas, sumas y conteos"""
+    day = events.created_at // SECONDS_PER_DAY
+    keys = events.company.astype(np.int64) << 32 | day
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums, counts = aggregate_by_kind(inverse.reshape(-1), events.kind, events.amount, len(unique_keys))
+    return unique_keys, sums, counts
+
+def merge_partials(keys_a: np.ndarray, sums_a: np.ndarray, counts_a: np.ndarray,
+                   keys_b: np.ndarray, sums_b: np.ndarray, counts_b: np.ndarray):
+    """Combina dos conjuntos de parciales sumando los que comparten (empresa, día)"""
+    keys, inverse = np.unique(np.concatenate([keys_a, keys_b]), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = np.zeros((len(keys), NUM_KINDS), dtype=np.int64)
+    counts = np.zeros((len(keys), NUM_KINDS), dtype=np.int64)
+    np.add.at(sums, inverse, np.concatenate([sums_a, sums_b]))
+    np.add.at(counts, inverse, np.concatenate([counts_a, counts_b]))
+    return keys, sums, counts
+
+def arrival_time(record: Dict) -> int:
+    """Momento de llegada del evento: ingestedAt, updateTime del emulador o createdAt"""
+    for field in ('ingestedAt', '_updateTime', 'createdAt'):
+        if record.get(field) is not None:
+            return parse_timestamp(record[field])
+    return 0
+
+def read_collection_with_arrival(client: FirestoreEmulator, collection: str) -> Iterable[Dict]:
+    """Lee una colección incluyendo updateTime de cada documento como _updateTime"""
+    for document in client.iter_documents(collection, raw=True):
+        path, data = decode_document(document)
+        yield dict(data, id=path.rsplit('/', 1)[-1], _updateTime=document.get('updateTime'))
+
+def read_events_since(client: FirestoreEmulator, cutoff: Optional[int]) -> Iterable[Dict]:
+    """payment_events con ingestedAt posterior a `cutoff` (query por rango en el emulador)
+
+    Sin cutoff (primera ejecución) se lee la colección completa. La query por rango solo
+    ve documentos con ingestedAt (lo escribe stripeWebhook); run_incremental recalcula
+    todo mientras existan eventos sin ese campo (históricos, seeds).
+    """
+    if cutoff is None:
+        yield from read_collection_with_arrival(client, 'payment_events')
+        return
+    since = datetime.fromtimestamp(cutoff, timezone.utc).isoformat().replace('+00:00', 'Z')
+    for path, data in client.iter_updated_since('payment_events', 'ingestedAt', since):
+        yield dict(data, id=path.rsplit('/', 1)[-1])
+
+class MetricsState:
+    """Estado del modo incremental: parciales diarios, watermark y clientes vistos
+
+    Los eventos se asumen append-only (cada cambio de estado es un evento nuevo), por lo
+    que los parciales son sumas enteras y su merge es exactamente igual a recalcular.
+    Los eventos tardíos o fuera de orden se agregan al día de su createdAt, no al de llegada.
+    """
+
+    def __init__(self):
+        self.companies = CompanyIndex()
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros((0, NUM_KINDS), dtype=np.int64)
+        self.counts = np.zeros((0, NUM_KINDS), dtype=np.int64)
+        # Watermark de llegada (emulador) y offsets de lectura por dump JSONL
+        self.watermark = None
+        self.offsets = {}
+        # Hash de 64 bits (ordenado) de cada id procesado, para no duplicar eventos
+        self.seen = np.zeros(0, dtype=np.uint64)
+        self.customers = {}
+
+    @classmethod
+    def load(cls, path: Path) -> 'MetricsState':
+        state = cls()
+        if not path.exists():
+            return state
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            state.keys = data['keys']
+            state.sums = data['sums']
+            state.counts = data['counts']
+            state.seen = data['seen']
+        state.companies = CompanyIndex(meta['companies'])
+        state.watermark = meta['watermark']
+        state.offsets = meta['offsets']
+        state.customers = {company: set(ids) for company, ids in meta['customers'].items()}
+        return state
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'companies': self.companies.ids,
+            'watermark': self.watermark,
+            'offsets': self.offsets,
+            'customers': {company: sorted(ids) for company, ids in self.customers.items()}
+        }
+        np.savez_compressed(path, keys=self.keys, sums=self.sums, counts=self.counts,
+                            seen=self.seen, meta=np.array(json.dumps(meta)))
+
+    def fold(self, records: Iterable[Dict], lateness: int, use_watermark: bool) -> int:
+        """Agrega solo los eventos nuevos y actualiza watermark; retorna cuántos se procesaron
+
+        Con use_watermark se ignoran los eventos que llegaron antes de watermark - lateness
+        (en el emulador la query ya no los lee); el resto se deduplica por id contra todo
+        lo ya procesado.
+        """
+        cutoff = self.watermark - lateness if (use_watermark and self.watermark is not None) else None
+        candidates = []
+        latest = self.watermark or 0
+        for record in records:
+            arrival = arrival_time(record)
+            if cutoff is not None and arrival < cutoff:
+                continue
+            latest = max(latest, arrival)
+            candidates.append(record)
+
+        new_records = self._drop_seen(candidates)
+        if new_records:
+            customers = {}
+            events = EventColumns.from_records(new_records, self.companies, customers)
+            keys, sums, counts = aggregate_daily(events)
+            self.keys, self.sums, self.counts = merge_partials(
+                self.keys, self.sums, self.counts, keys, sums, counts)
+            for record in new_records:
+                if record.get('companyId'):
+                    self.customers.setdefault(record['companyId'], set()).add(
+                        record.get('customerId') or '')
+
+        self.watermark = latest
+        return len(new_records)
+
+    def _drop_seen(self, records: List[Dict]) -> List[Dict]:
+        """Filtra eventos ya procesados (o repetidos en el lote) y registra los nuevos"""
+        hashes = np.array([event_id_hash(r.get('id')) for r in records], dtype=np.uint64)
+        has_id = np.array([r.get('id') is not None for r in records], dtype=bool)
+        keep = ~has_id
+        if has_id.any():
+            id_positions = np.flatnonzero(has_id)
+            unique_hashes, first = np.unique(hashes[id_positions], return_index=True)
+            position = np.searchsorted(self.seen, unique_hashes)
+            already_seen = np.zeros(len(unique_hashes), dtype=bool)
+            in_range = position < len(self.seen)
+            already_seen[in_range] = self.seen[position[in_range]] == unique_hashes[in_range]
+            keep[id_positions[first[~already_seen]]] = True
+            self.seen = np.union1d(self.seen, unique_hashes[~already_seen])
+        return [record for record, kept in zip(records, keep) if kept]
+
+    def metrics(self, active_customers: Optional[np.ndarray] = None) -> Dict[str, Dict]:
+        """Totales por empresa a partir de los parciales diarios"""
+        num_companies = len(self.companies)
+        company = (self.keys >> 32).astype(np.int64)
+        sums = np.zeros((num_companies, NUM_KINDS), dtype=np.int64)
+        counts = np.zeros((num_companies, NUM_KINDS), dtype=np.int64)
+        np.add.at(sums, company, self.sums)
+        np.add.at(counts, company, self.counts)
+        if active_customers is None:
+            active_customers = np.array([len(self.customers.get(c, ())) for c in self.companies.ids],
+                                        dtype=np.int64)
+        elif len(active_customers) < num_companies:
+            active_customers = np.pad(active_customers, (0, num_companies - len(active_customers)))
+        return build_metrics(sums, counts, active_customers, self.companies)
+
+def event_id_hash(event_id: Optional[str]) -> int:
+    """Hash estable de 64 bits de un id de evento"""
+    if event_id is None:
+        return 0
+    digest = hashlib.blake2b(str(event_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def read_jsonl_from(path: Path, offset: int) -> Tuple[List[Dict], int]:
+    """Lee un dump JSONL append-only desde un offset y retorna (registros, nuevo offset)"""
+    records = []
+    with open(path, 'rb') as f:
+        if offset > Path(path).stat().st_size:
+            offset = 0  # El archivo fue truncado o reemplazado: releer completo
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Línea incompleta: se procesa en la siguiente ejecución
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'data' in record and isinstance(record['data'], dict):
+                record = dict(record['data'], id=record.get('id'))
+            records.append(record)
+    return records, offset
+
+def strip_volatile(metrics: Dict[str, Dict]) -> Dict[str, Dict]:
+    return {company: {k: v for k, v in document.items() if k != 'updatedAt'}
+            for company, document in metrics.items()}
+
+def run_incremental(args, client: Optional[FirestoreEmulator]):
+    """Agrega los eventos nuevos al estado guardado y retorna las métricas resultantes"""
+    state = MetricsState.load(args.state)
+    started = time.perf_counter()
+
+    if args.emulator:
+        cutoff = state.watermark - args.lateness if state.watermark is not None else None
+        if cutoff is not None:
+            unseen = client.count_missing_timestamp('payment_events', 'ingestedAt')
+            if unseen:
+                # La query por watermark no los ve: los totales incrementales se desviarían
+                print_colored(f"  ⚠️ {unseen:,} payment_events sin ingestedAt quedan fuera del modo incremental; "
+                              f"recalculando todo (escribir ingestedAt en ellos lo habilita)", 'yellow')
+                offsets = state.offsets
+                state = MetricsState()
+                state.offsets = offsets
+                cutoff = None
+        folded = state.fold(read_events_since(client, cutoff), args.lateness, use_watermark=True)
+    else:
+        source = str(Path(args.events).resolve())
+        records, offset = read_jsonl_from(args.events, state.offsets.get(source, 0))
+        folded = state.fold(records, args.lateness, use_watermark=False)
+        state.offsets[source] = offset
+
+    active_customers = None
+    if args.customers or args.emulator:
+        customer_records = read_collection(client, 'customers') if args.emulator \
+            else read_jsonl(args.customers)
+        active_customers = count_active_customers(customer_records, state.companies)
+
+    metrics = state.metrics(active_customers)
+    state.save(args.state)
+    print_colored(f"  🔁 {folded:,} eventos nuevos agregados en {time.perf_counter() - started:.2f}s "
+                  f"({len(state.keys):,} parciales empresa/día)", 'white')
+    return metrics
+
+def synthetic_records(count: int, num_companies: int = 100, customers_per_company: int = 200,
+                      seed: int = 7, start: int = 1_700_000_000, days: int = 90) -> Iterable[Dict]:
+    """Genera payment_events sintéticos con la forma de los documentos reales"""
+    rng = np.random.default_rng(seed)
+    company = rng.integers(0, num_companies, count)
+    customer = rng.integers(0, customers_per_company, count)
+    amount = rng.integers(500, 50_000, count)
+    status = rng.choice(np.array(['succeeded', 'failed', 'recovered']), count, p=[0.8, 0.14, 0.06])
+    created_at = start + rng.integers(0, days * 86400, count)
+    for i in range(count):
+        yield {
+            'id': f"evt_{seed}_{i}",
+            'companyId': f"company_{company[i]}",
+            'customerId': f"cus_{company[i]}_{customer[i]}",
+            'amount': int(amount[i]),
+            'status': str(status[i]),
+            'createdAt': int(created_at[i])
+        }
+
+def synthetic_columns(count: int, num_companies: int = 100, customers_per_company: int = 200,
+                      seed: int = 7) -> Tuple[EventColumns, CompanyIndex]:
+    """Genera columnas sintéticas directamente (sin pasar por JSON)"""
+    rng = np.random.default_rng(seed)
+    companies = CompanyIndex(f"company_{i}" for i in range(num_companies))
+    events = EventColumns(
+        rng.integers(0, num_companies, count, dtype=np.int32),
+        rng.integers(0, customers_per_company, count, dtype=np.int64),
+        rng.integers(500, 50_000, count, dtype=np.int64),
+        rng.choice(np.array([KIND_SUCCEEDED, KIND_FAILED, KIND_RECOVERED], dtype=np.int8),
+                   count, p=[0.8, 0.14, 0.06]),
+        1_700_000_000 + rng.integers(0, 90 * 86400, count, dtype=np.int64)
+    )
+    return events, companies
+
+def run_benchmark(count: int, num_companies: int):
+    """Mide eventos/segundo de parseo JSON y de agregación vectorizada"""
+    print_colored(f"⏱️ Benchmark: {count:,} eventos, {num_companies} empresas", 'cyan')
+
+    # Parseo: JSONL en memoria → columnas (limitado para no dominar el benchmark)
+    parse_count = min(count, 200_000)
+    lines = [json.dumps(r) for r in synthetic_records(parse_count, num_companies)]
+    started = time.perf_counter()
+    companies = CompanyIndex()
+    EventColumns.from_records((json.loads(line) for line in lines), companies)
+    parse_elapsed = time.perf_counter() - started
+    print_colored(f"  📥 Parseo JSONL: {parse_count / parse_elapsed:,.0f} eventos/s "
+                  f"({parse_count:,} en {parse_elapsed:.2f}s)", 'white')
+
+    # Agregación sobre columnas ya cargadas
+    events, companies = synthetic_columns(count, num_companies)
+    started = time.perf_counter()
+    metrics = compute_metrics(events, companies)
+    compute_elapsed = time.perf_counter() - started
+    print_colored(f"  🧮 Agregación: {count / compute_elapsed:,.0f} eventos/s "
+                  f"({count:,} en {compute_elapsed:.3f}s, {len(metrics)} documentos)", 'green')
+
+def main():
+    """Función principal del motor de métricas"""
+    parser = argparse.ArgumentParser(description="Precalcula metrics/{companyId} para el dashboard")
+    parser.add_argument('--events', type=Path, help="Dump JSONL de payment_events")
+    parser.add_argument('--customers', type=Path, help="Dump JSONL de customers")
+    parser.add_argument('--emulator', action='store_true',
+                        help="Leer payment_events/customers desde el Firestore Emulator")
+    parser.add_argument('--output', type=Path, help="Escribir métricas a un archivo JSONL")
+    parser.add_argument('--write', action='store_true',
+                        help="Escribir métricas en metrics/ del emulador")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Procesar solo eventos nuevos usando el estado guardado")
+    parser.add_argument('--state', type=Path, default=METRICS_STATE,
+                        help="Archivo de estado del modo incremental (.npz)")
+    parser.add_argument('--lateness', type=int, default=3 * SECONDS_PER_DAY,
+                        help="Tolerancia en segundos para eventos que llegan fuera de orden")
+    parser.add_argument('--verify', action='store_true',
+                        help="Comparar el resultado incremental con un recálculo completo")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark con N eventos sintéticos")
+    parser.add_argument('--companies', type=int, default=100, help="Empresas para --benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.companies)
+        return 0
+
+    if not args.events and not args.emulator:
+        parser.print_help()
+        return 1
+
+    print_colored("📊 Calculando métricas de recuperación...", 'green')
+    client = FirestoreEmulator() if (args.emulator or args.write) else None
+    started = time.perf_counter()
+
+    companies = CompanyIndex()
+    try:
+        if args.incremental:
+            metrics = run_incremental(args, client)
+            if args.verify:
+                full_companies = CompanyIndex()
+                full_records = read_collection(client, 'payment_events') if args.emulator \
+                    else read_jsonl(args.events)
+                full_events = EventColumns.from_records(full_records, full_companies)
+                full_active = None
+                if args.customers or args.emulator:
+                    customer_records = read_collection(client, 'customers') if args.emulator \
+                        else read_jsonl(args.customers)
+                    full_active = count_active_customers(customer_records, full_companies)
+                full = compute_metrics(full_events, full_companies, full_active)
+                if strip_volatile(full) == strip_volatile(metrics):
+                    print_colored("  ✅ Incremental idéntico al recálculo completo", 'green')
+                else:
+                    differing = [c for c in set(full) | set(metrics)
+                                 if strip_volatile(full).get(c) != strip_volatile(metrics).get(c)]
+                    print_colored(f"  ❌ {len(differing)} empresas difieren del recálculo completo: "
+                                  f"{', '.join(sorted(differing)[:5])}", 'red')
+                    return 1
+            if args.output:
+                write_metrics_jsonl(metrics, args.output)
+                print_colored(f"  ✅ Métricas escritas en {args.output}", 'green')
+            if args.write:
+                written = write_metrics_emulator(metrics, client)
+                print_colored(f"  ✅ {written} documentos escritos en metrics/", 'green')
+            return 0
+
+        event_records = read_collection(client, 'payment_events') if args.emulator \
+            else read_jsonl(args.events)
+        events = EventColumns.from_records(event_records, companies)
+        loaded = time.perf_counter()
+        print_colored(f"  📥 {len(events):,} eventos cargados en {loaded - started:.2f}s", 'white')
+
+        active_customers = None
+        if args.customers or args.emulator:
+            customer_records = read_collection(client, 'customers') if args.emulator \
+                else read_jsonl(args.customers)
+            active_customers = count_active_customers(customer_records, companies)
+
+        metrics = compute_metrics(events, companies, active_customers)
+        computed = time.perf_counter()
+        rate = len(events) / (computed - loaded) if computed > loaded else 0
+        print_colored(f"  🧮 {len(metrics)} empresas en {computed - loaded:.3f}s "
+                      f"({rate:,.0f} eventos/s)", 'white')
+
+        if args.output:
+            write_metrics_jsonl(metrics, args.output)
+            print_colored(f"  ✅ Métricas escritas en {args.output}", 'green')
+        if args.write:
+            written = write_metrics_emulator(metrics, client)
+            print_colored(f"  ✅ {written} documentos escritos en metrics/", 'green')
+        if not args.output and not args.write:
+            for company_id, document in list(metrics.items())[:10]:
+                print_colored(f"   {company_id}: revenue={document['totalRevenue']} "
+                              f"recovered={document['recoveredRevenue']} "
+                              f"rate={document['recoveryRate']}% "
+                              f"customers={document['activeCustomers']}", 'white')
+    except Exception as e:
+        print_colored(f"❌ Error calculando métricas: {e}", 'red')
+        return 1
+    finally:
+        if client is not None:
+            client.close()
+
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
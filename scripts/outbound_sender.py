@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Envío masivo de emails y SMS con rate limiting por proveedor
+Ejecutar: python scripts/outbound_sender.py --input out.ndjson
+
+Pipeline asyncio para SendGrid y Twilio (PRD 4.2 y 9.1):
+- Token bucket por proveedor (requests/s y ráfaga)
+- Pool de conexiones HTTP keep-alive por proveedor
+- Llamadas en lote donde el proveedor lo permite (SendGrid: personalizations)
+- Reintentos con backoff exponencial y jitter; respeta Retry-After en 429
+- Stand-ins HTTP locales de SendGrid y Twilio con sus propios límites (--serve)
+- Benchmark offline de throughput y comportamiento ante 429 (--benchmark)
+
+La entrada es el NDJSON de template_renderer.py (channel, to, subject, body).
+Por defecto se envía a los stand-ins locales; para los proveedores reales usar
+--sendgrid-url https://api.sendgrid.com y --twilio-url https://api.twilio.com
+"""
+
+import os
+import sys
+import abc
+import json
+import time
+import random
+import asyncio
+import argparse
+import ssl
+import urllib.parse
+from base64 import b64encode
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from common import print_colored, percentile
+
+SENDGRID_STANDIN_PORT = 7425
+TWILIO_STANDIN_PORT = 7426
+# Límite de personalizations por request de /v3/mail/send
+SENDGRID_MAX_BATCH = 1000
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 10.0
+
+class TokenBucket:
+    """Token bucket: `rate` tokens por segundo con ráfaga máxima `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        if now >= self.paused_until and self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1):
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+            elif self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            else:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Detiene el bucket (Retry-After) para todos los workers del proveedor"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+async def read_http_message(reader: asyncio.StreamReader) -> Tuple[str, Dict[str, str], bytes]:
+    """Lee primera línea, headers (en minúsculas) y cuerpo de un mensaje HTTP/1.1"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        body = b''.join(chunks)
+    else:
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return lines[0], headers, body
+
+class HTTPConnection:
+    """Conexión HTTP/1.1 keep-alive sobre asyncio streams"""
+
+    def __init__(self, host: str, port: int, use_ssl: bool):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if use_ssl else None
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, headers: Dict[str, str],
+                      body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+            head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}",
+                    f"Content-Length: {len(body)}", "Connection: keep-alive"]
+            head.extend(f"{name}: {value}" for name, value in headers.items())
+            try:
+                self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+                await self.writer.drain()
+                status_line, response_headers, response_body = await read_http_message(self.reader)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # El servidor cerró la conexión ociosa: reabrir una vez
+                self.close()
+                if attempt == 1:
+                    raise
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return int(status_line.split(' ')[1]), response_headers, response_body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.reader = None
+
+class Provider(abc.ABC):
+    """Configuración de un proveedor: URL, límites y formato de las llamadas"""
+
+    name = ''
+    batch_size = 1
+
+    def __init__(self, base_url: str, rate: float, connections: int):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.use_ssl = parsed.scheme == 'https'
+        self.port = parsed.port or (443 if self.use_ssl else 80)
+        self.bucket = TokenBucket(rate)
+        self.connections = connections
+
+    @abc.abstractmethod
+    def build_request(self, messages: List[Dict]) -> Tuple[str, Dict[str, str], bytes]:
+        """(path, headers, body) de la llamada que envía `messages`"""
+
+class SendGridProvider(Provider):
+    """SendGrid v3 mail/send: hasta 1000 destinatarios por request vía personalizations
+
+    Cada destinatario lleva su asunto y cuerpo ya renderizados en dynamic_template_data;
+    el template dinámico de SendGrid solo los interpola ({{subject}}, {{{body}}}).
+    """
+
+    name = 'sendgrid'
+    batch_size = SENDGRID_MAX_BATCH
+
+    def __init__(self, base_url: str, rate: float, connections: int):
+        super().__init__(base_url, rate, connections)
+        self.api_key = os.environ.get('SENDGRID_API_KEY', 'SG.local')
+        self.template_id = os.environ.get('SENDGRID_TEMPLATE_ID', 'd-local')
+        self.sender = os.environ.get('SENDGRID_FROM', 'billing@example.com')
+
+    def build_request(self, messages: List[Dict]) -> Tuple[str, Dict[str, str], bytes]:
+        payload = {
+            'from': {'email': self.sender},
+            'template_id': self.template_id,
+            'personalizations': [{
+                'to': [{'email': message['to']}],
+                'dynamic_template_data': {'subject': message.get('subject', ''),
+                                          'body': message.get('body', '')},
+                'custom_args': {'customerId': message.get('customerId') or '',
+                                'templateId': message.get('templateId') or ''}
+            } for message in messages]
+        }
+        headers = {'Authorization': f"Bearer {self.api_key}", 'Content-Type': 'application/json'}
+        return '/v3/mail/send', headers, json.dumps(payload).encode('utf-8')
+
+class TwilioProvider(Provider):
+    """Twilio Messages API: un SMS por request (no tiene envío en lote)"""
+
+    name = 'twilio'
+
+    def __init__(self, base_url: str, rate: float, connections: int):
+        super().__init__(base_url, rate, connections)
+        self.account_sid = os.environ.get('TWILIO_ACCOUNT_SID', 'AClocal')
+        token = os.environ.get('TWILIO_AUTH_TOKEN', 'local')
+        self.auth = b64encode(f"{self.account_sid}:{token}".encode('utf-8')).decode('ascii')
+        self.sender = os.environ.get('TWILIO_FROM', '+15550000000')
+
+    def build_request(self, messages: List[Dict]) -> Tuple[str, Dict[str, str], bytes]:
+        message = messages[0]
+        body = urllib.parse.urlencode({'To': message['to'], 'From': self.sender,
+                                       'Body': message.get('body', '')})
+        headers = {'Authorization': f"Basic {self.auth}",
+                   'Content-Type': 'application/x-www-form-urlencoded'}
+        return f"/2010-04-01/Accounts/{self.account_sid}/Messages.json", headers, body.encode('utf-8')
+
+class SendStats:
+    """Contadores del envío por proveedor"""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.latencies = []
+
+    def summary(self) -> Dict:
+        p95 = percentile(self.latencies, 95)
+        return {'sent': self.sent, 'failed': self.failed, 'requests': self.requests,
+                'throttled': self.throttled, 'retries': self.retries, 'p95_ms': round(p95 * 1000, 1)}
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Backoff exponencial con full jitter; Retry-After actúa como mínimo"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+    return max(delay, retry_after or 0)
+
+class OutboundSender:
+    """Reparte mensajes por canal hacia los workers de cada proveedor"""
+
+    def __init__(self, providers: Dict[str, Provider], queue_size: int = 64):
+        self.providers = providers
+        self.queues = {channel: asyncio.Queue(maxsize=queue_size) for channel in providers}
+        self.stats = {provider.name: SendStats() for provider in providers.values()}
+
+    async def _send_batch(self, provider: Provider, connection: HTTPConnection, batch: List[Dict]):
+        stats = self.stats[provider.name]
+        path, headers, body = provider.build_request(batch)
+        for attempt in range(MAX_RETRIES + 1):
+            await provider.bucket.acquire()
+            started = time.monotonic()
+            try:
+                status, response_headers, _ = await connection.request('POST', path, headers, body)
+            except (OSError, asyncio.IncompleteReadError):
+                connection.close()
+                status, response_headers = 0, {}
+            stats.requests += 1
+            stats.latencies.append(time.monotonic() - started)
+            if 200 <= status < 300:
+                stats.sent += len(batch)
+                return
+            if status and status != 429 and status < 500:
+                break  # Error del cliente: reintentar no ayuda
+            if status == 429:
+                stats.throttled += 1
+            if attempt == MAX_RETRIES:
+                break
+            retry_after = response_headers.get('retry-after')
+            retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            if retry_after:
+                provider.bucket.pause(retry_after)
+            stats.retries += 1
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+        stats.failed += len(batch)
+
+    async def _worker(self, channel: str):
+        provider = self.providers[channel]
+        queue = self.queues[channel]
+        connection = HTTPConnection(provider.host, provider.port, provider.use_ssl)
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                await self._send_batch(provider, connection, batch)
+        finally:
+            connection.close()
+
+    async def run(self, messages: Iterable[Dict]):
+        """Envía todos los mensajes; la cola acotada aplica backpressure a la lectura"""
+        workers = [asyncio.ensure_future(self._worker(channel))
+                   for channel, provider in self.providers.items()
+                   for _ in range(provider.connections)]
+        pending = {channel: [] for channel in self.providers}
+        for message in messages:
+            channel = message.get('channel', 'email')
+            if channel not in pending or not message.get('to'):
+                continue
+            batch = pending[channel]
+            batch.append(message)
+            if len(batch) >= self.providers[channel].batch_size:
+                await self.queues[channel].put(batch)
+                pending[channel] = []
+        for channel, batch in pending.items():
+            if batch:
+                await self.queues[channel].put(batch)
+            for _ in range(self.providers[channel].connections):
+                await self.queues[channel].put(None)
+        await asyncio.gather(*workers)
+
+class StandInServer:
+    """Stand-in HTTP de SendGrid/Twilio: acepta requests hasta `limit` por segundo, luego 429"""
+
+    def __init__(self, name: str, limit: float):
+        self.name = name
+        self.bucket = TokenBucket(limit)
+        self.accepted = 0
+        self.requests = 0
+        self.throttled = 0
+        self.server = None
+
+    async def start(self, port: int):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line, headers, body = await read_http_message(reader)
+                status, response_headers, payload = self._respond(request_line, headers, body)
+                head = [f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}",
+                        f"Content-Length: {len(payload)}", "Content-Type: application/json"]
+                head.extend(f"{name}: {value}" for name, value in response_headers.items())
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, request_line: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict, bytes]:
+        self.requests += 1
+        if not headers.get('authorization'):
+            return 401, {}, b'{"errors":[{"message":"unauthorized"}]}'
+        if not self.bucket.try_acquire():
+            self.throttled += 1
+            return 429, {'Retry-After': '1'}, b'{"code":20429,"message":"Too Many Requests"}'
+        if self.name == 'sendgrid':
+            self.accepted += len(json.loads(body).get('personalizations', []))
+            return 202, {}, b''
+        self.accepted += 1
+        return 201, {}, json.dumps({'sid': f"SM{self.accepted:032d}", 'status': 'queued'}).encode('utf-8')
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+async def start_standins(sendgrid_limit: float, twilio_limit: float) -> Dict[str, StandInServer]:
+    servers = {'sendgrid': StandInServer('sendgrid', sendgrid_limit),
+               'twilio': StandInServer('twilio', twilio_limit)}
+    await servers['sendgrid'].start(SENDGRID_STANDIN_PORT)
+    await servers['twilio'].start(TWILIO_STANDIN_PORT)
+    return servers
+
+def build_providers(args, rate_factor: float = 1.0) -> Dict[str, Provider]:
+    return {
+        'email': SendGridProvider(args.sendgrid_url, args.sendgrid_rate * rate_factor, args.connections),
+        'sms': TwilioProvider(args.twilio_url, args.twilio_rate * rate_factor, args.connections)
+    }
+
+def read_messages(path: Path) -> Iterable[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def synthetic_messages(count: int) -> Iterable[Dict]:
+    for i in range(count):
+        if i % 2 == 0:
+            yield {'channel': 'email', 'to': f"cliente{i}@example.com", 'customerId': f"cus_{i:08d}",
+                   'subject': "Tu pago no se pudo procesar", 'body': f"<p>Hola cliente {i}</p>"}
+        else:
+            yield {'channel': 'sms', 'to': f"+1555{i:07d}", 'customerId': f"cus_{i:08d}",
+                   'body': f"Hola cliente {i}, actualiza tu tarjeta"}
+
+def show_stats(sender: OutboundSender, elapsed: float):
+    for name, stats in sender.stats.items():
+        summary = stats.summary()
+        color = 'green' if summary['failed'] == 0 else 'red'
+        print_colored(f"  📨 {name}: {summary['sent']:,} enviados ({summary['sent'] / elapsed:,.0f} msg/s), "
+                      f"{summary['requests']:,} requests, {summary['throttled']:,} 429, "
+                      f"{summary['retries']:,} reintentos, {summary['failed']:,} fallidos, "
+                      f"p95 {summary['p95_ms']} ms", color)
+
+async def run_benchmark(args) -> int:
+    """Envía mensajes sintéticos a stand-ins locales y verifica lo recibido"""
+    print_colored(f"⏱️ Benchmark: {args.benchmark:,} mensajes, límite stand-in SendGrid "
+                  f"{args.sendgrid_rate:g} req/s, Twilio {args.twilio_rate:g} req/s, "
+                  f"cliente a {args.rate_factor:g}x", 'cyan')
+    servers = await start_standins(args.sendgrid_rate, args.twilio_rate)
+    try:
+        sender = OutboundSender(build_providers(args, args.rate_factor))
+        started = time.perf_counter()
+        await sender.run(synthetic_messages(args.benchmark))
+        elapsed = time.perf_counter() - started
+        show_stats(sender, elapsed)
+        print_colored(f"  ⏱️ Total: {args.benchmark / elapsed:,.0f} msg/s ({elapsed:.2f}s)", 'white')
+        for name, server in servers.items():
+            print_colored(f"  🧪 Stand-in {name}: {server.accepted:,} aceptados, "
+                          f"{server.throttled:,} respondidos con 429", 'white')
+        expected = args.benchmark
+        received = sum(server.accepted for server in servers.values())
+        if received != expected:
+            print_colored(f"  ❌ Se esperaban {expected:,} mensajes y llegaron {received:,}", 'red')
+            return 1
+        return 0
+    finally:
+        for server in servers.values():
+            server.close()
+
+async def send_file(args) -> OutboundSender:
+    # El sender (y sus asyncio.Queue) se crea dentro del loop de asyncio.run: en Python
+    # 3.7-3.9 una cola creada fuera queda ligada a otro loop
+    sender = OutboundSender(build_providers(args))
+    await sender.run(read_messages(args.input))
+    return sender
+
+async def serve(args):
+    servers = await start_standins(args.sendgrid_rate, args.twilio_rate)
+    print_colored(f"🧪 Stand-ins: SendGrid http://127.0.0.1:{SENDGRID_STANDIN_PORT} "
+                  f"({args.sendgrid_rate:g} req/s), Twilio http://127.0.0.1:{TWILIO_STANDIN_PORT} "
+                  f"({args.twilio_rate:g} req/s)", 'cyan')
+    print_colored("Presiona Ctrl+C para detener", 'yellow')
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print_colored("  " + ", ".join(f"{name}: {s.accepted:,} aceptados / {s.throttled:,} 429"
+                                           for name, s in servers.items()), 'white')
+    finally:
+        for server in servers.values():
+            server.close()
+
+def main():
+    """Función principal del envío de mensajes"""
+    parser = argparse.ArgumentParser(description="Envío de emails y SMS con rate limiting")
+    parser.add_argument('--input', type=Path, help="NDJSON de mensajes (salida de template_renderer.py)")
+    parser.add_argument('--sendgrid-url', default=f"http://127.0.0.1:{SENDGRID_STANDIN_PORT}")
+    parser.add_argument('--twilio-url', default=f"http://127.0.0.1:{TWILIO_STANDIN_PORT}")
+    parser.add_argument('--sendgrid-rate', type=float, default=10, help="Requests/s a SendGrid")
+    parser.add_argument('--twilio-rate', type=float, default=100, help="Requests/s a Twilio")
+    parser.add_argument('--connections', type=int, default=8, help="Conexiones keep-alive por proveedor")
+    parser.add_argument('--serve', action='store_true', help="Levantar solo los stand-ins locales")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark offline con N mensajes")
+    parser.add_argument('--rate-factor', type=float, default=1.0,
+                        help="En benchmark, tasa del cliente respecto al límite del stand-in (>1 provoca 429)")
+    args = parser.parse_args()
+
+    try:
+        if args.serve:
+            asyncio.run(serve(args))
+            return 0
+        if args.benchmark:
+            return asyncio.run(run_benchmark(args))
+        if not args.input:
+            parser.print_help()
+            return 1
+
+        print_colored(f"📤 Enviando mensajes de {args.input}...", 'green')
+        started = time.perf_counter()
+        sender = asyncio.run(send_file(args))
+        elapsed = time.perf_counter() - started
+        show_stats(sender, elapsed)
+        return 1 if any(stats.failed for stats in sender.stats.values()) else 0
+    except KeyboardInterrupt:
+        print_colored("\n🛑 Detenido", 'yellow')
+        return 0
+    except OSError as e:
+        print_colored(f"❌ Error de conexión: {e}", 'red')
+        return 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
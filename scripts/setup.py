@@ -6,44 +6,10 @@ Versión mejorada con validaciones automáticas
 
 import os
 import sys
-import subprocess
 import shutil
 from pathlib import Path
 
-def print_colored(message, color='white'):
-    colors = {
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'red': '\033[91m',
-        'cyan': '\033[96m',
-        'white': '\033[97m',
-        'reset': '\033[0m'
-    }
-    print(f"{colors.get(color, colors['white'])}{message}{colors['reset']}")
-
-def run_command(command, cwd=None, description=""):
-    """Ejecuta un comando y retorna True si fue exitoso"""
-    if description:
-        print_colored(f"🔄 {description}...", 'yellow')
-    
-    try:
-        result = subprocess.run(command, shell=True, cwd=cwd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            if description:
-                print_colored(f"✅ {description} - Exitoso", 'green')
-            return True, result.stdout, result.stderr
-        else:
-            if description:
-                print_colored(f"❌ {description} - Falló", 'red')
-            if result.stderr.strip():
-                print_colored(f"   Error: {result.stderr.strip()}", 'red')
-            return False, result.stdout, result.stderr
-            
-    except Exception as e:
-        if description:
-            print_colored(f"❌ Error ejecutando {description}: {e}", 'red')
-        return False, "", str(e)
+from common import print_colored, run_command
 
 def check_dependency(command, name, install_command=None):
     """Verifica si una dependencia está instalada"""
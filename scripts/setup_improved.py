@@ -11,67 +11,16 @@ Versión mejorada con:
 import os
 import sys
 import json
-import subprocess
 import shutil
 import platform
 import urllib.request
 from pathlib import Path
 from typing import Tuple, Optional
 
-def print_colored(message, color='white'):
-    """Imprime mensaje con color en la terminal"""
-    colors = {
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'red': '\033[91m',
-        'cyan': '\033[96m',
-        'white': '\033[97m',
-        'blue': '\033[94m',
-        'magenta': '\033[95m',
-        'reset': '\033[0m'
-    }
-    print(f"{colors.get(color, colors['white'])}{message}{colors['reset']}")
+from common import print_colored, run_command
 
-def run_command(command, cwd=None, description="", timeout=120):
-    """Ejecuta un comando con manejo de errores mejorado"""
-    if description:
-        print_colored(f"🔄 {description}...", 'yellow')
-    
-    try:
-        # Usar shell apropiado para el sistema
-        shell = True
-        if platform.system() == "Windows":
-            # En Windows, usar PowerShell para mejor compatibilidad
-            if not command.startswith('powershell'):
-                command = f'powershell -Command "{command}"'
-        
-        result = subprocess.run(
-            command, 
-            shell=shell, 
-            cwd=cwd, 
-            capture_output=True, 
-            text=True,
-            timeout=timeout
-        )
-        
-        if result.returncode == 0:
-            if description:
-                print_colored(f"✅ {description} - Exitoso", 'green')
-            return True, result.stdout, result.stderr
-        else:
-            if description:
-                print_colored(f"❌ {description} - Falló", 'red')
-            if result.stderr.strip():
-                print_colored(f"   Error: {result.stderr.strip()}", 'red')
-            return False, result.stdout, result.stderr
-            
-    except subprocess.TimeoutExpired:
-        print_colored(f"❌ {description} - Timeout después de {timeout}s", 'red')
-        return False, "", "Timeout"
-    except Exception as e:
-        if description:
-            print_colored(f"❌ Error ejecutando {description}: {e}", 'red')
-        return False, "", str(e)
+# Timeout por defecto de los comandos del setup
+COMMAND_TIMEOUT = 120
 
 def check_internet_connection():
     """Verifica conectividad a internet"""
@@ -124,22 +73,22 @@ def check_and_install_dependency(command, name, install_commands=None):
     for install_type, install_cmd in install_commands.items():
         if install_type == 'windows' and system_info['is_windows']:
             print_colored(f"🔄 Instalando {name} en Windows...", 'yellow')
-            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}")
+            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}", timeout=COMMAND_TIMEOUT)
             if success:
                 return True
         elif install_type == 'macos' and system_info['is_macos']:
             print_colored(f"🔄 Instalando {name} en macOS...", 'yellow')
-            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}")
+            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}", timeout=COMMAND_TIMEOUT)
             if success:
                 return True
         elif install_type == 'linux' and system_info['is_linux']:
             print_colored(f"🔄 Instalando {name} en Linux...", 'yellow')
-            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}")
+            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}", timeout=COMMAND_TIMEOUT)
             if success:
                 return True
         elif install_type == 'universal':
             print_colored(f"🔄 Instalando {name} (universal)...", 'yellow')
-            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}")
+            success, stdout, stderr = run_command(install_cmd, description=f"Instalando {name}", timeout=COMMAND_TIMEOUT)
             if success:
                 return True
     
@@ -204,7 +153,7 @@ def setup_flutter():
         return False
     
     # Verificar versión de Flutter
-    success, stdout, stderr = run_command("flutter --version")
+    success, stdout, stderr = run_command("flutter --version", timeout=COMMAND_TIMEOUT)
     if success:
         print_colored(f"✅ Flutter encontrado", 'green')
         
@@ -216,12 +165,12 @@ def setup_flutter():
     
     # Habilitar web support
     success, stdout, stderr = run_command("flutter config --enable-web", 
-                                         description="Habilitando Flutter Web")
+                                         description="Habilitando Flutter Web", timeout=COMMAND_TIMEOUT)
     if not success:
         print_colored("⚠️ No se pudo habilitar Flutter Web automáticamente", 'yellow')
     
     # Verificar que web está habilitado
-    success, stdout, stderr = run_command("flutter config")
+    success, stdout, stderr = run_command("flutter config", timeout=COMMAND_TIMEOUT)
     if success and "enable-web: true" in stdout:
         print_colored("✅ Flutter Web habilitado correctamente", 'green')
     else:
@@ -260,7 +209,7 @@ def setup_firebase_cli():
     
     # Verificar si Firebase CLI ya está instalado
     if shutil.which('firebase'):
-        success, stdout, stderr = run_command("firebase --version")
+        success, stdout, stderr = run_command("firebase --version", timeout=COMMAND_TIMEOUT)
         if success:
             print_colored(f"✅ Firebase CLI ya instalado: {stdout.strip()}", 'green')
             return True
@@ -278,7 +227,7 @@ def setup_firebase_cli():
     
     # Verificar instalación
     if shutil.which('firebase'):
-        success, stdout, stderr = run_command("firebase --version")
+        success, stdout, stderr = run_command("firebase --version", timeout=COMMAND_TIMEOUT)
         if success:
             print_colored(f"✅ Firebase CLI instalado exitosamente: {stdout.strip()}", 'green')
             return True
@@ -412,6 +361,9 @@ firebase-debug.log
 firestore-debug.log
 ui-debug.log
 
+# Herramientas locales (historial, baselines)
+.devtools/
+
 # IDEs
 .vscode/
 .idea/
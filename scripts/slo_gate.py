@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Verificación post-deploy de latencia (SLO) con rollback automático
+Ejecutar: python scripts/slo_gate.py snapshot        (antes del deploy)
+          python scripts/slo_gate.py verify --rollback (después del deploy)
+
+- `snapshot`: guarda la versión live de Hosting y el commit del último deploy
+  verificado en .devtools/deploy_state.json
+- `verify`: ráfaga corta de probes sintéticos contra Hosting y las callables
+  (getUserProfile, getInitialData); compara p95 y tasa de error contra los
+  baselines de .devtools/slo_baselines.json
+- Si el SLO se incumple y se pasa --rollback:
+  - Hosting: `firebase hosting:clone <site>@<versión anterior> <site>:live`
+  - Functions: redeploy de todas las functions desde el commit verificado
+    anterior (git worktree en .devtools/rollback/)
+- Un verify exitoso actualiza los baselines y marca el commit actual como verificado
+- `--standin` levanta un stand-in local (Hosting + callables) con latencia y
+  errores configurables; el rollback se imprime en lugar de ejecutarse
+
+Credenciales opcionales para probar callables autenticadas:
+    SLO_PROBE_ID_TOKEN, o SLO_PROBE_EMAIL + SLO_PROBE_PASSWORD + FIREBASE_API_KEY
+Sin ellas las callables responden `unauthenticated` (se cuenta como respuesta esperada).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+import http.server
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from common import print_colored, percentile
+from firestore_emulator import get_project_id
+from functions_diff import load_state, save_state
+
+STATE_FILE = Path(".devtools/deploy_state.json")
+BASELINES_FILE = Path(".devtools/slo_baselines.json")
+ROLLBACK_DIR = Path(".devtools/rollback")
+PROBED_FUNCTIONS = ['getUserProfile', 'getInitialData']
+DEFAULT_REGION = "us-central1"
+STANDIN_PORT = 7440
+
+# SLO: p95 hasta TOLERANCE sobre el baseline (y al menos MIN_DELTA_MS), errores hasta MAX_ERROR_RATE
+TOLERANCE = 0.25
+MIN_DELTA_MS = 50.0
+MAX_ERROR_RATE = 0.02
+# Muestras de ejecuciones exitosas que forman el baseline (mediana)
+BASELINE_SAMPLES = 10
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2] if ordered else 0.0
+
+def load_json(path: Path) -> Dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_json(path: Path, data: Dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def run_firebase(command: str, cwd: str = "backend", capture: bool = True) -> subprocess.CompletedProcess:
+    return subprocess.run(command, shell=True, cwd=cwd, capture_output=capture, text=True)
+
+def current_commit() -> Optional[str]:
+    result = subprocess.run("git rev-parse HEAD", shell=True, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def live_hosting_version(project_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """(site, versionId) del canal live según `firebase hosting:channel:list --json`"""
+    result = run_firebase(f"firebase hosting:channel:list --json --project {project_id}")
+    try:
+        channels = json.loads(result.stdout).get('result', {}).get('channels', [])
+    except ValueError:
+        return None, None
+    for channel in channels:
+        if channel.get('name', '').endswith('/channels/live'):
+            version = channel.get('release', {}).get('version', {}).get('name', '')
+            # sites/<site>/versions/<versionId>
+            parts = version.split('/')
+            if len(parts) == 4:
+                return parts[1], parts[3]
+    return None, None
+
+class Target:
+    """Endpoint a probar: Hosting (GET) o callable (POST con protocolo callable)"""
+
+    def __init__(self, name: str, url: str, callable_fn: bool, token: Optional[str]):
+        self.name = name
+        self.url = url
+        self.callable = callable_fn
+        self.token = token
+        parsed = urllib.parse.urlsplit(url)
+        self.secure = parsed.scheme == 'https'
+        self.netloc = parsed.netloc
+        self.path = parsed.path or '/'
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            conn = cls(self.netloc, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def probe(self) -> Tuple[float, bool]:
+        """Una request; retorna (latencia ms, éxito)"""
+        conn = self._connection()
+        started = time.perf_counter()
+        try:
+            if self.callable:
+                headers = {'Content-Type': 'application/json'}
+                if self.token:
+                    headers['Authorization'] = f"Bearer {self.token}"
+                conn.request('POST', self.path, body=b'{"data":{}}', headers=headers)
+            else:
+                conn.request('GET', self.path)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            return (time.perf_counter() - started) * 1000, False
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status < 400:
+            return elapsed, True
+        # Sin token la callable responde UNAUTHENTICATED: la function corrió y respondió
+        expected = self.callable and not self.token and response.status == 401 and b'UNAUTHENTICATED' in body
+        return elapsed, expected
+
+def run_burst(target: Target, requests: int, concurrency: int) -> Dict:
+    """Ráfaga de `requests` probes con `concurrency` conexiones keep-alive"""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: target.probe(), range(requests)))
+    latencies = [ms for ms, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        'requests': requests,
+        'errors': errors,
+        'error_rate': errors / requests if requests else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95)
+    }
+
+def evaluate(result: Dict, baseline: Optional[Dict]) -> List[str]:
+    """Incumplimientos del SLO para un target (lista vacía si cumple)"""
+    breaches = []
+    if result['error_rate'] > MAX_ERROR_RATE:
+        breaches.append(f"tasa de error {result['error_rate']:.1%} > {MAX_ERROR_RATE:.0%}")
+    if baseline:
+        limit = max(baseline['p95_ms'] * (1 + TOLERANCE), baseline['p95_ms'] + MIN_DELTA_MS)
+        if result['p95_ms'] > limit:
+            breaches.append(f"p95 {result['p95_ms']:.0f} ms > {limit:.0f} ms (baseline {baseline['p95_ms']:.0f} ms)")
+    return breaches
+
+def baseline_for(baselines: Dict, key: str) -> Optional[Dict]:
+    samples = baselines.get(key, [])
+    if not samples:
+        return None
+    return {'p95_ms': median([s['p95_ms'] for s in samples]),
+            'error_rate': median([s['error_rate'] for s in samples])}
+
+def probe_token(project_id: str) -> Optional[str]:
+    """ID token del usuario sintético (env) para probar callables autenticadas"""
+    token = os.environ.get("SLO_PROBE_ID_TOKEN")
+    email, password = os.environ.get("SLO_PROBE_EMAIL"), os.environ.get("SLO_PROBE_PASSWORD")
+    api_key = os.environ.get("FIREBASE_API_KEY")
+    if token or not (email and password and api_key):
+        return token
+    conn = http.client.HTTPSConnection("identitytoolkit.googleapis.com", timeout=30)
+    conn.request('POST', f"/v1/accounts:signInWithPassword?key={api_key}",
+                 body=json.dumps({'email': email, 'password': password, 'returnSecureToken': True}),
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    data = json.loads(response.read() or b'{}')
+    conn.close()
+    if response.status >= 400:
+        print_colored(f"⚠️ No se pudo iniciar sesión con el usuario de probes: {data}", 'yellow')
+        return None
+    return data.get('idToken')
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Stand-in de Hosting y callables con latencia y tasa de error configurables"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency_ms = 20.0
+    error_rate = 0.0
+
+    def _reply(self, status: int, body: bytes, content_type: str):
+        time.sleep(max(0.0, random.gauss(self.latency_ms, self.latency_ms * 0.1)) / 1000)
+        if random.random() < self.error_rate:
+            status, body = 500, b'{"error":{"status":"INTERNAL"}}'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200, b'<!DOCTYPE html><html><body>stand-in</body></html>', 'text/html')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        if not self.headers.get('Authorization'):
+            self._reply(401, b'{"error":{"message":"Unauthenticated","status":"UNAUTHENTICATED"}}',
+                        'application/json')
+            return
+        self._reply(200, b'{"result":{"success":true}}', 'application/json')
+
+    def log_message(self, format, *args):
+        pass
+
+def start_standin(port: int, latency_ms: float, error_rate: float) -> http.server.ThreadingHTTPServer:
+    StandInHandler.latency_ms = latency_ms
+    StandInHandler.error_rate = error_rate
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def rollback(state: Dict, project_id: str, dry_run: bool) -> bool:
+    """Vuelve Hosting a la versión previa y redeploya las functions del último commit verificado"""
+    ok = True
+    previous = state.get('previous', {})
+    commands = []
+    if previous.get('hosting_site') and previous.get('hosting_version'):
+        site = previous['hosting_site']
+        commands.append((f"firebase hosting:clone {site}@{previous['hosting_version']} {site}:live "
+                         f"--project {project_id}", "backend"))
+    else:
+        print_colored("⚠️ Sin versión previa de Hosting registrada (ejecutar `snapshot` antes del deploy)", 'yellow')
+        ok = False
+
+    good_commit = state.get('verified', {}).get('commit')
+    if good_commit and good_commit != current_commit():
+        worktree = ROLLBACK_DIR / good_commit[:12]
+        if not worktree.exists():
+            commands.append((f'git worktree add --detach "{worktree}" {good_commit}', "."))
+        commands.append(("npm install && npm run build", str(worktree / "backend/functions")))
+        commands.append((f"firebase deploy --only functions --project {project_id} --force", str(worktree / "backend")))
+    else:
+        print_colored("⚠️ Sin commit verificado anterior: las Functions no se pueden revertir", 'yellow')
+        ok = False
+
+    for command, cwd in commands:
+        print_colored(f"   ↩️ {command}  (en {cwd})", 'magenta')
+        if dry_run:
+            continue
+        if run_firebase(command, cwd=cwd, capture=False).returncode != 0:
+            print_colored(f"❌ Rollback falló: {command}", 'red')
+            return False
+    if good_commit and not dry_run:
+        # Las functions live ya no coinciden con los fingerprints: el próximo deploy es completo
+        fingerprints = load_state()
+        fingerprints.pop(project_id, None)
+        save_state(fingerprints)
+    return ok
+
+def command_snapshot(project_id: str) -> int:
+    state = load_json(STATE_FILE)
+    site, version = live_hosting_version(project_id)
+    state['previous'] = {'hosting_site': site, 'hosting_version': version, 'taken_at': time.time()}
+    save_json(STATE_FILE, state)
+    if version:
+        print_colored(f"📸 Hosting live: {site}@{version}", 'green')
+    else:
+        print_colored("⚠️ No se pudo leer la versión live de Hosting (primer deploy o sin acceso)", 'yellow')
+    verified = state.get('verified', {}).get('commit')
+    print_colored(f"📸 Último commit verificado: {verified[:12] if verified else 'ninguno'}", 'white')
+    return 0
+
+def command_verify(args, project_id: str) -> int:
+    server = None
+    hosting_url = args.hosting_url or f"https://{project_id}.web.app/"
+    functions_url = args.functions_url or f"https://{args.region}-{project_id}.cloudfunctions.net"
+    if args.standin:
+        server = start_standin(args.port, args.standin_latency_ms, args.standin_error_rate)
+        hosting_url = f"http://127.0.0.1:{args.port}/"
+        functions_url = f"http://127.0.0.1:{args.port}"
+    token = probe_token(project_id) if not args.standin else None
+
+    targets = [Target('hosting', hosting_url, False, None)]
+    targets += [Target(name, f"{functions_url.rstrip('/')}/{name}", True, token) for name in args.functions]
+
+    baselines = load_json(args.baselines)
+    print_colored(f"🎯 Probes: {args.requests} requests × {len(targets)} targets, concurrencia {args.concurrency}", 'cyan')
+    print_colored(f"\n{'target':<18} {'p50 ms':>8} {'p95 ms':>8} {'base p95':>9} {'errores':>8}", 'cyan')
+    breaches = {}
+    results = {}
+    try:
+        for target in targets:
+            # Calentamiento: la primera request puede caer en un cold start
+            target.probe()
+            result = run_burst(target, args.requests, args.concurrency)
+            key = f"{target.name} {target.url}"
+            baseline = baseline_for(baselines, key)
+            problems = evaluate(result, baseline)
+            results[key] = result
+            if problems:
+                breaches[target.name] = problems
+            color = 'red' if problems else 'green'
+            base = f"{baseline['p95_ms']:.0f}" if baseline else "-"
+            print_colored(f"{target.name:<18} {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} {base:>9} "
+                          f"{result['error_rate']:>8.1%}", color)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    state = load_json(STATE_FILE)
+    if not breaches:
+        for key, result in results.items():
+            samples = baselines.setdefault(key, [])
+            samples.append({'p95_ms': result['p95_ms'], 'error_rate': result['error_rate'], 'ts': time.time()})
+            del samples[:-BASELINE_SAMPLES]
+        save_json(args.baselines, baselines)
+        if not args.standin:
+            state['verified'] = {'commit': current_commit(), 'verified_at': time.time()}
+            save_json(STATE_FILE, state)
+        print_colored("\n✅ SLO cumplido; baselines actualizados", 'green')
+        return 0
+
+    print_colored("\n❌ SLO incumplido:", 'red')
+    for name, problems in breaches.items():
+        for problem in problems:
+            print_colored(f"   {name}: {problem}", 'red')
+    if args.rollback:
+        print_colored("\n↩️ Revirtiendo a la versión anterior...", 'yellow')
+        if rollback(state, project_id, dry_run=args.dry_run or args.standin):
+            print_colored("✅ Rollback completado", 'green')
+        else:
+            print_colored("⚠️ Rollback incompleto: revisar manualmente", 'yellow')
+    return 1
+
+def main():
+    """Función principal de la verificación post-deploy"""
+    parser = argparse.ArgumentParser(description="Verificación de SLO post-deploy con rollback")
+    parser.add_argument('command', choices=['snapshot', 'verify'])
+    parser.add_argument('--project', help="Proyecto de Firebase (default: backend/.firebaserc)")
+    parser.add_argument('--region', default=DEFAULT_REGION, help="Región de las functions")
+    parser.add_argument('--functions', nargs='+', default=PROBED_FUNCTIONS, help="Callables a probar")
+    parser.add_argument('--hosting-url', help="URL de Hosting (default: https://<proyecto>.web.app/)")
+    parser.add_argument('--functions-url', help="Base de las functions (default: cloudfunctions.net)")
+    parser.add_argument('--requests', type=int, default=40, help="Requests por target")
+    parser.add_argument('--concurrency', type=int, default=4, help="Conexiones en paralelo por target")
+    parser.add_argument('--baselines', type=Path, default=BASELINES_FILE, help="Archivo de baselines")
+    parser.add_argument('--rollback', action='store_true', help="Revertir si el SLO se incumple")
+    parser.add_argument('--dry-run', action='store_true', help="Solo mostrar los comandos de rollback")
+    parser.add_argument('--standin', action='store_true', help="Probar contra el stand-in local")
+    parser.add_argument('--port', type=int, default=STANDIN_PORT, help="Puerto del stand-in")
+    parser.add_argument('--standin-latency-ms', type=float, default=20.0, help="Latencia del stand-in")
+    parser.add_argument('--standin-error-rate', type=float, default=0.0, help="Fracción de 500 del stand-in")
+    args = parser.parse_args()
+
+    project_id = args.project or get_project_id()
+    if args.command == 'snapshot':
+        return command_snapshot(project_id)
+    return command_verify(args, project_id)
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Motor de renderizado de templates de dunning (email y SMS)
+Ejecutar: python scripts/template_renderer.py --emulator --company <companyId> --channel email --output out.ndjson
+
+Templates personalizables por empresa y segmento (PRD 3.2):
+- Compila cada documento de templates/ una sola vez a una función Python
+- Cache LRU de funciones compiladas por (templateId, version)
+- Renderizado en streaming de lotes de destinatarios (NDJSON), sin materializar la campaña
+- Pool de procesos para campañas de cientos de miles de destinatarios:
+  cada worker compila los templates una vez por campaña, no por mensaje
+- Benchmark de mensajes por segundo
+
+Sintaxis: {{customer.name}}, {{amount|money}}, {{company.name|upper}}
+Filtros: money (centavos → 12.34), upper, lower, title, date (ISO → AAAA-MM-DD)
+"""
+
+import re
+import sys
+import json
+import html
+import time
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common import print_colored
+from firestore_emulator import FirestoreEmulator
+
+CHANNELS = ('email', 'sms')
+# Campos renderizables por canal
+CHANNEL_FIELDS = {'email': ('subject', 'body'), 'sms': ('body',)}
+# Campo del cliente con la dirección de destino por canal
+CHANNEL_ADDRESS = {'email': 'email', 'sms': 'phone'}
+DEFAULT_SEGMENT = 'default'
+CACHE_SIZE = 256
+
+PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_][\w.]*)\s*(?:\|\s*([a-z]+)\s*)?\}\}")
+
+def _money(value) -> str:
+    try:
+        return f"{int(value) / 100:,.2f}"
+    except (TypeError, ValueError):
+        return str(value)
+
+def _date(value) -> str:
+    return str(value)[:10]
+
+FILTERS = {
+    'money': _money,
+    'upper': lambda value: str(value).upper(),
+    'lower': lambda value: str(value).lower(),
+    'title': lambda value: str(value).title(),
+    'date': _date
+}
+
+class TemplateError(Exception):
+    """Template inválido (placeholder o filtro desconocido)"""
+
+def _lookup(context: Dict, keys: Tuple[str, ...]):
+    value = context
+    for key in keys:
+        if not isinstance(value, dict):
+            return ''
+        value = value.get(key)
+        if value is None:
+            return ''
+    return value
+
+def compile_text(text: str, escape: bool = False) -> Callable[[Dict], str]:
+    """Compila un texto con placeholders a una función context → str
+
+    Genera el código de una función con los literales como constantes y un acceso por
+    placeholder; los literales y rutas entran al código solo vía repr().
+    """
+    namespace = {'_lookup': _lookup, '_str': str, '_escape': html.escape}
+    parts = []
+    position = 0
+    for i, match in enumerate(PLACEHOLDER.finditer(text)):
+        if match.start() > position:
+            parts.append(repr(text[position:match.start()]))
+        keys = tuple(match.group(1).split('.'))
+        expression = f"_lookup(c, {keys!r})"
+        filter_name = match.group(2)
+        if filter_name:
+            if filter_name not in FILTERS:
+                raise TemplateError(f"Filtro desconocido: {filter_name}")
+            namespace[f"_f{i}"] = FILTERS[filter_name]
+            expression = f"_f{i}({expression})"
+        else:
+            expression = f"_str({expression})"
+        parts.append(f"_escape({expression})" if escape else expression)
+        position = match.end()
+    if position < len(text):
+        parts.append(repr(text[position:]))
+
+    if '{{' in PLACEHOLDER.sub('', text):
+        raise TemplateError("Placeholder mal formado")
+    if not parts:
+        return lambda context: ''
+    if len(parts) == 1 and parts[0].startswith(("'", '"')):
+        constant = text
+        return lambda context: constant
+    source = f"def render(c):\n    return ''.join(({', '.join(parts)},))\n"
+    exec(compile(source, '<template>', 'exec'), namespace)
+    return namespace['render']
+
+class CompiledTemplate:
+    """Funciones de renderizado de un template (un campo por canal)"""
+
+    def __init__(self, template_id: str, document: Dict):
+        self.template_id = template_id
+        self.version = document.get('version', 0)
+        self.channel = document.get('channel', 'email')
+        if self.channel not in CHANNELS:
+            raise TemplateError(f"Canal desconocido: {self.channel}")
+        self.fields = CHANNEL_FIELDS[self.channel]
+        # El cuerpo de email es HTML: los valores se escapan, el asunto no
+        self.renderers = [compile_text(document.get(field) or '',
+                                       escape=(self.channel == 'email' and field == 'body'))
+                          for field in self.fields]
+
+    def render(self, context: Dict) -> Dict[str, str]:
+        return {field: renderer(context) for field, renderer in zip(self.fields, self.renderers)}
+
+class TemplateCache:
+    """LRU de templates compilados por (templateId, version)"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template_id: str, document: Dict) -> CompiledTemplate:
+        key = (template_id, document.get('version', 0))
+        compiled = self._entries.get(key)
+        if compiled is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return compiled
+        self.misses += 1
+        compiled = CompiledTemplate(template_id, document)
+        self._entries[key] = compiled
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return compiled
+
+    def __len__(self):
+        return len(self._entries)
+
+_CACHE = TemplateCache()
+
+class TemplateSet:
+    """Selecciona el template de cada destinatario por empresa, canal y segmento
+
+    Preferencia: empresa + segmento, empresa + 'default', global + segmento, global + 'default'.
+    Si hay varias versiones del mismo template se usa la mayor.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, Dict]], cache: TemplateCache = _CACHE):
+        self.cache = cache
+        self.documents = {}
+        self.by_key = {}
+        for template_id, document in documents:
+            if document.get('active') is False:
+                continue
+            key = (document.get('companyId') or '', document.get('channel', 'email'),
+                   document.get('segment') or DEFAULT_SEGMENT)
+            current = self.by_key.get(key)
+            if current is None or document.get('version', 0) > self.documents[current].get('version', 0):
+                self.by_key[key] = template_id
+            self.documents[template_id] = document
+        self._selected = {}
+
+    def select(self, company_id: str, channel: str, segment: Optional[str]) -> Optional[CompiledTemplate]:
+        key = (company_id, channel, segment)
+        if key not in self._selected:
+            template_id = None
+            for candidate in ((company_id, channel, segment), (company_id, channel, DEFAULT_SEGMENT),
+                              ('', channel, segment), ('', channel, DEFAULT_SEGMENT)):
+                template_id = self.by_key.get(candidate)
+                if template_id:
+                    break
+            self._selected[key] = template_id
+        template_id = self._selected[key]
+        return self.cache.get(template_id, self.documents[template_id]) if template_id else None
+
+def build_context(customer: Dict, company: Dict) -> Dict:
+    """Contexto de un destinatario: sus campos al nivel raíz y también bajo customer/company"""
+    context = dict(customer)
+    context['customer'] = customer
+    context['company'] = company
+    return context
+
+def render_stream(templates: TemplateSet, recipients: Iterable[Dict], companies: Dict[str, Dict],
+                  channel: str) -> Iterator[str]:
+    """Genera una línea NDJSON por destinatario renderizado (sin template → se omite)"""
+    dumps = json.dumps
+    address_field = CHANNEL_ADDRESS[channel]
+    for customer in recipients:
+        company_id = customer.get('companyId') or ''
+        template = templates.select(company_id, channel, customer.get('riskSegment'))
+        if template is None:
+            continue
+        message = template.render(build_context(customer, companies.get(company_id, {})))
+        message['customerId'] = customer.get('id')
+        message['companyId'] = company_id
+        message['channel'] = channel
+        message['to'] = customer.get(address_field)
+        message['templateId'] = template.template_id
+        message['version'] = template.version
+        yield dumps(message)
+
+# Estado por worker: templates y empresas llegan una vez por campaña vía initializer
+_WORKER = {}
+
+def _init_worker(template_documents: List[Tuple[str, Dict]], companies: Dict[str, Dict], channel: str):
+    _WORKER['templates'] = TemplateSet(template_documents)
+    _WORKER['companies'] = companies
+    _WORKER['channel'] = channel
+
+def _render_chunk(recipients: List[Dict]) -> str:
+    lines = render_stream(_WORKER['templates'], recipients, _WORKER['companies'], _WORKER['channel'])
+    return ''.join(line + "\n" for line in lines)
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def render_campaign(template_documents: List[Tuple[str, Dict]], recipients: Iterable[Dict],
+                    companies: Dict[str, Dict], channel: str, out, workers: int = 1,
+                    chunk_size: int = 5000) -> int:
+    """Renderiza la campaña hacia `out`; retorna la cantidad de mensajes
+
+    Con workers > 1 reparte chunks entre procesos manteniendo como máximo 2 chunks
+    en vuelo por worker, así la memoria no crece con el tamaño de la campaña.
+    """
+    count = 0
+    if workers <= 1:
+        templates = TemplateSet(template_documents)
+        for line in render_stream(templates, recipients, companies, channel):
+            out.write(line)
+            out.write("\n")
+            count += 1
+        return count
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(template_documents, companies, channel)) as executor:
+        pending = []
+        for chunk in chunked(recipients, chunk_size):
+            pending.append(executor.submit(_render_chunk, chunk))
+            if len(pending) >= workers * 2:
+                rendered = pending.pop(0).result()
+                out.write(rendered)
+                count += rendered.count("\n")
+        for future in pending:
+            rendered = future.result()
+            out.write(rendered)
+            count += rendered.count("\n")
+    return count
+
+def load_templates(path: Optional[Path], client: Optional[FirestoreEmulator]) -> List[Tuple[str, Dict]]:
+    """Templates desde un JSON ({id: documento} o lista con id) o desde templates/ del emulador"""
+    if client is not None:
+        return [(p.rsplit('/', 1)[-1], data) for p, data in client.iter_documents('templates')]
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return list(data.items())
+    return [(document['id'], document) for document in data]
+
+def read_recipients(path: Path, company_id: Optional[str]) -> Iterator[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            customer = json.loads(line)
+            if company_id is None or customer.get('companyId') == company_id:
+                yield customer
+
+def synthetic_campaign(count: int) -> Tuple[List[Tuple[str, Dict]], Iterator[Dict], Dict[str, Dict]]:
+    """Templates por segmento y destinatarios sintéticos (generados al vuelo)"""
+    templates = []
+    for segment in ('low', 'medium', 'high', DEFAULT_SEGMENT):
+        templates.append((f"email_{segment}", {
+            'channel': 'email', 'segment': segment, 'version': 1,
+            'subject': "{{company.name}}: tu pago de ${{amount|money}} no se pudo procesar",
+            'body': ("<p>Hola {{customer.name|title}},</p><p>No pudimos cobrar "
+                     "${{amount|money}} el {{lastFailedAt|date}}. Actualiza tu tarjeta "
+                     "terminada en {{card.last4}} aquí: {{updateUrl}}</p>")
+        }))
+    companies = {f"company_{i}": {'name': f"Empresa {i}"} for i in range(50)}
+
+    def recipients():
+        segments = ('low', 'medium', 'high', None)
+        for i in range(count):
+            yield {
+                'id': f"cus_{i:08d}",
+                'companyId': f"company_{i % 50}",
+                'name': f"cliente {i}",
+                'email': f"cliente{i}@example.com",
+                'phone': f"+1555{i % 10_000_000:07d}",
+                'amount': 1999 + i % 5000,
+                'lastFailedAt': "2026-10-01T12:00:00Z",
+                'card': {'last4': f"{i % 10000:04d}"},
+                'updateUrl': f"https://pay.example.com/u/{i:08d}",
+                'riskSegment': segments[i % 4]
+            }
+    return templates, recipients(), companies
+
+class _NullWriter:
+    def write(self, data):
+        return len(data)
+
+def run_benchmark(count: int, workers: int, chunk_size: int):
+    """Mide mensajes/s y compara contra compilar el template en cada mensaje"""
+    print_colored(f"⏱️ Benchmark: {count:,} destinatarios, {workers} proceso(s)", 'cyan')
+    templates, recipients, companies = synthetic_campaign(count)
+
+    started = time.perf_counter()
+    rendered = render_campaign(templates, recipients, companies, 'email', _NullWriter(),
+                               workers, chunk_size)
+    elapsed = time.perf_counter() - started
+    print_colored(f"  ✉️ {rendered / elapsed:,.0f} mensajes/s ({rendered:,} en {elapsed:.2f}s)", 'green')
+    if workers <= 1:
+        print_colored(f"  🗃️ Cache: {_CACHE.misses} compilaciones, {_CACHE.hits:,} hits", 'white')
+
+    # Línea base: compilar por mensaje (lo que se evita con el cache)
+    sample = min(count, 20_000)
+    _, baseline_recipients, _ = synthetic_campaign(sample)
+    documents = dict(templates)
+    started = time.perf_counter()
+    for customer in baseline_recipients:
+        template = CompiledTemplate('email_default', documents['email_default'])
+        template.render(build_context(customer, companies[customer['companyId']]))
+    baseline = sample / (time.perf_counter() - started)
+    print_colored(f"  🐢 Compilando por mensaje: {baseline:,.0f} mensajes/s", 'yellow')
+    return 0
+
+def main():
+    """Función principal del renderizado de templates"""
+    parser = argparse.ArgumentParser(description="Renderizado de templates de dunning")
+    parser.add_argument('--templates', type=Path, help="JSON con documentos de templates")
+    parser.add_argument('--recipients', type=Path, help="JSONL de customers destinatarios")
+    parser.add_argument('--emulator', action='store_true',
+                        help="Leer templates, companies y customers del Firestore Emulator")
+    parser.add_argument('--company', help="Renderizar solo destinatarios de esta empresa")
+    parser.add_argument('--channel', choices=CHANNELS, default='email')
+    parser.add_argument('--output', type=Path, help="Archivo NDJSON de salida (por defecto stdout)")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para campañas grandes")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Destinatarios por chunk")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark con N destinatarios")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        return run_benchmark(args.benchmark, args.workers, args.chunk_size)
+
+    if not args.emulator and not (args.templates and args.recipients):
+        parser.print_help()
+        return 1
+
+    client = FirestoreEmulator() if args.emulator else None
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        templates = load_templates(args.templates, client)
+        if client is not None:
+            companies = {p.rsplit('/', 1)[-1]: data for p, data in client.iter_documents('companies')}
+            recipients = (dict(data, id=p.rsplit('/', 1)[-1]) for p, data in client.iter_documents('customers')
+                          if args.company is None or data.get('companyId') == args.company)
+        else:
+            companies = {}
+            recipients = read_recipients(args.recipients, args.company)
+
+        started = time.perf_counter()
+        count = render_campaign(templates, recipients, companies, args.channel, out,
+                                args.workers, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        print_colored(f"✅ {count:,} mensajes renderizados en {elapsed:.2f}s "
+                      f"({count / max(elapsed, 1e-9):,.0f} mensajes/s)", 'green', file=sys.stderr)
+    except (TemplateError, OSError, ValueError) as e:
+        print_colored(f"❌ Error renderizando templates: {e}", 'red', file=sys.stderr)
+        return 1
+    finally:
+        if args.output:
+            out.close()
+        if client is not None:
+            client.close()
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
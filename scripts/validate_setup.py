@@ -13,42 +13,15 @@ Versión mejorada con:
 import os
 import sys
 import json
-import subprocess
 import requests
 import time
 from pathlib import Path
 from typing import Tuple, List, Dict, Optional
 
-def print_colored(message, color='white'):
-    """Imprime mensaje con color en la terminal"""
-    colors = {
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'red': '\033[91m',
-        'cyan': '\033[96m',
-        'white': '\033[97m',
-        'blue': '\033[94m',
-        'magenta': '\033[95m',
-        'reset': '\033[0m'
-    }
-    print(f"{colors.get(color, colors['white'])}{message}{colors['reset']}")
+from common import print_colored, run_command
 
-def run_command(command, cwd=None, timeout=30):
-    """Ejecuta un comando y retorna True si fue exitoso"""
-    try:
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            cwd=cwd, 
-            capture_output=True, 
-            text=True,
-            timeout=timeout
-        )
-        return result.returncode == 0, result.stdout, result.stderr
-    except subprocess.TimeoutExpired:
-        return False, "", f"Command timed out after {timeout}s"
-    except Exception as e:
-        return False, "", str(e)
+# Timeout por defecto de los comandos de validación
+COMMAND_TIMEOUT = 30
 
 def check_url_accessible(url, timeout=5):
     """Verifica si una URL es accesible"""
@@ -170,7 +143,7 @@ class EnvironmentValidator:
         print_colored("🔍 Validando configuración Flutter...", 'cyan')
         
         # Verificar Flutter instalado
-        success, stdout, stderr = run_command("flutter --version")
+        success, stdout, stderr = run_command("flutter --version", timeout=COMMAND_TIMEOUT)
         if not success:
             print_colored("❌ Flutter no está instalado o no está en PATH", 'red')
             self.add_result("Flutter", "Installation", False, "Flutter no encontrado",
@@ -190,7 +163,7 @@ class EnvironmentValidator:
         self.add_result("Flutter", "Installation", True, flutter_version)
         
         # Verificar web habilitado
-        success, stdout, stderr = run_command("flutter config")
+        success, stdout, stderr = run_command("flutter config", timeout=COMMAND_TIMEOUT)
         web_enabled = False
         if success and "enable-web: true" in stdout:
             web_enabled = True
@@ -202,7 +175,7 @@ class EnvironmentValidator:
                            "Ejecutar: flutter config --enable-web")
         
         # Verificar devices disponibles
-        success, stdout, stderr = run_command("flutter devices")
+        success, stdout, stderr = run_command("flutter devices", timeout=COMMAND_TIMEOUT)
         chrome_available = False
         if success and ("Chrome" in stdout or "chrome" in stdout):
             chrome_available = True
@@ -322,7 +295,7 @@ def validate_firebase_setup():
     print_colored("🔍 Validando configuración Firebase...", 'cyan')
     
     # Verificar Firebase CLI
-    success, stdout, stderr = run_command("firebase --version")
+    success, stdout, stderr = run_command("firebase --version", timeout=COMMAND_TIMEOUT)
     if not success:
         print_colored("❌ Firebase CLI no está instalado", 'red')
         print_colored("   Ejecutar: npm install -g firebase-tools", 'yellow')
@@ -376,7 +349,7 @@ def validate_firebase_setup():
         return False
     
     # Verificar Node.js y npm
-    success, stdout, stderr = run_command("node --version")
+    success, stdout, stderr = run_command("node --version", timeout=COMMAND_TIMEOUT)
     if not success:
         print_colored("❌ Node.js no está instalado", 'red')
         return False
@@ -8,62 +8,71 @@ Versión mejorada con:
 - Diagnósticos automáticos  
 - Sugerencias de solución
 - Métricas de salud del proyecto
+- Validación de múltiples workspaces en paralelo (--workspaces <glob>)
 """
 
+import io
 import os
 import sys
+import glob
 import json
-import subprocess
+import argparse
+import contextlib
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Tuple, List, Dict, Optional
 
-def print_colored(message, color='white'):
-    """Imprime mensaje con color en la terminal"""
-    colors = {
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'red': '\033[91m',
-        'cyan': '\033[96m',
-        'white': '\033[97m',
-        'blue': '\033[94m',
-        'magenta': '\033[95m',
-        'reset': '\033[0m'
-    }
-    print(f"{colors.get(color, colors['white'])}{message}{colors['reset']}")
+from common import print_colored, run_command
+from history import record_run
 
-def run_command(command, cwd=None, timeout=30):
-    """Ejecuta un comando y retorna True si fue exitoso"""
-    try:
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            cwd=cwd, 
-            capture_output=True, 
-            text=True,
-            timeout=timeout
-        )
-        return result.returncode == 0, result.stdout, result.stderr
-    except subprocess.TimeoutExpired:
-        return False, "", f"Command timed out after {timeout}s"
-    except Exception as e:
-        return False, "", str(e)
+# Probes de herramientas globales: no dependen del workspace validado
+PROBE_COMMANDS = {
+    "flutter --version": 30,
+    "flutter config": 30,
+    "flutter devices": 30,
+    "firebase --version": 30,
+    "node --version": 30,
+    "ping -c 1 8.8.8.8": 10
+}
+
+_PROBE_CACHE = {}
+
+def run_probe(command, timeout=30):
+    """Ejecuta un probe de herramienta reutilizando el resultado si ya existe"""
+    if command not in _PROBE_CACHE:
+        _PROBE_CACHE[command] = run_command(command, timeout=timeout)
+    return _PROBE_CACHE[command]
+
+def probe_tools():
+    """Ejecuta todos los probes en paralelo y retorna la cache resultante"""
+    pending = [cmd for cmd in PROBE_COMMANDS if cmd not in _PROBE_CACHE]
+    with ThreadPoolExecutor(max_workers=len(pending) or 1) as executor:
+        outputs = executor.map(lambda cmd: run_command(cmd, timeout=PROBE_COMMANDS[cmd]), pending)
+        for command, output in zip(pending, outputs):
+            _PROBE_CACHE[command] = output
+    return dict(_PROBE_CACHE)
 
 class ValidationResults:
     def __init__(self):
         self.results = []
         self.warnings = []
         self.errors = []
+        self._last_mark = time.perf_counter()
         
     def add_result(self, category: str, item: str, status: bool, message: str = "", suggestion: str = ""):
         """Añade resultado de validación"""
+        # La duración de cada check es el tiempo desde el resultado anterior
+        now = time.perf_counter()
         result = {
             'category': category,
             'item': item,
             'status': status,
             'message': message,
-            'suggestion': suggestion
+            'suggestion': suggestion,
+            'duration': now - self._last_mark
         }
+        self._last_mark = now
         self.results.append(result)
         
         if not status:
@@ -84,7 +93,21 @@ class ValidationResults:
             'success_rate': (passed / total * 100) if total > 0 else 0
         }
 
-def validate_project_structure(results: ValidationResults):
+    def get_tool_versions(self):
+        """Retorna las versiones detectadas durante la validación"""
+        version_items = {
+            ('Flutter', 'Installation'): 'flutter',
+            ('Firebase', 'CLI'): 'firebase',
+            ('Firebase', 'Node.js'): 'node'
+        }
+        versions = {}
+        for result in self.results:
+            name = version_items.get((result['category'], result['item']))
+            if name:
+                versions[name] = result['message'] if result['status'] else "no instalado"
+        return versions
+
+def validate_project_structure(results: ValidationResults, root: Path = Path(".")):
     """Valida que la estructura del proyecto esté completa"""
     print_colored("🔍 Validando estructura del proyecto...", 'cyan')
     
@@ -127,7 +150,7 @@ def validate_project_structure(results: ValidationResults):
     all_files = frontend_files + backend_files + tooling_files
     
     for file_path in all_files:
-        path = Path(file_path)
+        path = root / file_path
         if path.exists():
             # Verificar si el archivo no está vacío
             if path.stat().st_size > 0:
@@ -152,7 +175,7 @@ def validate_project_structure(results: ValidationResults):
     ]
     
     for dir_path in important_dirs:
-        if Path(dir_path).exists():
+        if (root / dir_path).exists():
             print_colored(f"  ✅ {dir_path}/", 'green')
             results.add_result("Structure", f"{dir_path}/", True)
         else:
@@ -160,12 +183,12 @@ def validate_project_structure(results: ValidationResults):
             results.add_result("Structure", f"{dir_path}/", False, "Directorio faltante",
                              f"Crear directorio {dir_path}")
 
-def validate_flutter_setup(results: ValidationResults):
+def validate_flutter_setup(results: ValidationResults, root: Path = Path(".")):
     """Valida que Flutter esté correctamente configurado"""
     print_colored("🔍 Validando configuración Flutter...", 'cyan')
     
     # Verificar Flutter instalado
-    success, stdout, stderr = run_command("flutter --version")
+    success, stdout, stderr = run_probe("flutter --version")
     if not success:
         print_colored("❌ Flutter no está instalado o no está en PATH", 'red')
         results.add_result("Flutter", "Installation", False, "Flutter no encontrado",
@@ -185,7 +208,7 @@ def validate_flutter_setup(results: ValidationResults):
     results.add_result("Flutter", "Installation", True, flutter_version)
     
     # Verificar web habilitado
-    success, stdout, stderr = run_command("flutter config")
+    success, stdout, stderr = run_probe("flutter config")
     if success and "enable-web: true" in stdout:
         print_colored("  ✅ Flutter Web habilitado", 'green')
         results.add_result("Flutter", "Web Support", True)
@@ -195,7 +218,7 @@ def validate_flutter_setup(results: ValidationResults):
                          "Ejecutar: flutter config --enable-web")
     
     # Verificar devices disponibles
-    success, stdout, stderr = run_command("flutter devices")
+    success, stdout, stderr = run_probe("flutter devices")
     if success and ("Chrome" in stdout or "chrome" in stdout):
         print_colored("  ✅ Chrome disponible para desarrollo", 'green')
         results.add_result("Flutter", "Chrome Device", True)
@@ -205,7 +228,7 @@ def validate_flutter_setup(results: ValidationResults):
                          "Verificar instalación de Chrome")
     
     # Verificar pubspec.yaml
-    pubspec_path = Path("frontend/pubspec.yaml")
+    pubspec_path = root / "frontend/pubspec.yaml"
     if pubspec_path.exists():
         try:
             with open(pubspec_path, 'r', encoding='utf-8') as f:
@@ -238,7 +261,7 @@ def validate_flutter_setup(results: ValidationResults):
             results.add_result("Flutter", "Dependencies", False, str(e))
     
     # Verificar firebase_options.dart
-    firebase_options_path = Path("frontend/lib/firebase_options.dart")
+    firebase_options_path = root / "frontend/lib/firebase_options.dart"
     if firebase_options_path.exists():
         try:
             with open(firebase_options_path, 'r', encoding='utf-8') as f:
@@ -259,12 +282,12 @@ def validate_flutter_setup(results: ValidationResults):
         results.add_result("Flutter", "Firebase Options", False, "Archivo no encontrado",
                          "Ejecutar: flutterfire configure --project=tu-proyecto")
 
-def validate_firebase_setup(results: ValidationResults):
+def validate_firebase_setup(results: ValidationResults, root: Path = Path(".")):
     """Valida que Firebase esté correctamente configurado"""
     print_colored("🔍 Validando configuración Firebase...", 'cyan')
     
     # Verificar Firebase CLI
-    success, stdout, stderr = run_command("firebase --version")
+    success, stdout, stderr = run_probe("firebase --version")
     if not success:
         print_colored("❌ Firebase CLI no está instalado", 'red')
         results.add_result("Firebase", "CLI", False, "Firebase CLI no encontrado",
@@ -275,7 +298,7 @@ def validate_firebase_setup(results: ValidationResults):
     results.add_result("Firebase", "CLI", True, stdout.strip())
     
     # Verificar .firebaserc
-    firebaserc_path = Path("backend/.firebaserc")
+    firebaserc_path = root / "backend/.firebaserc"
     if firebaserc_path.exists():
         try:
             with open(firebaserc_path, 'r') as f:
@@ -296,7 +319,7 @@ def validate_firebase_setup(results: ValidationResults):
                          "Ejecutar: firebase init en directorio backend/")
     
     # Verificar firebase.json
-    firebase_json_path = Path("backend/firebase.json")
+    firebase_json_path = root / "backend/firebase.json"
     if firebase_json_path.exists():
         try:
             with open(firebase_json_path, 'r') as f:
@@ -323,7 +346,7 @@ def validate_firebase_setup(results: ValidationResults):
         results.add_result("Firebase", "Config Features", False, "Archivo no encontrado")
     
     # Verificar Node.js y npm
-    success, stdout, stderr = run_command("node --version")
+    success, stdout, stderr = run_probe("node --version")
     if not success:
         print_colored("❌ Node.js no está instalado", 'red')
         results.add_result("Firebase", "Node.js", False, "Node.js no encontrado")
@@ -333,13 +356,13 @@ def validate_firebase_setup(results: ValidationResults):
     results.add_result("Firebase", "Node.js", True, stdout.strip())
     
     # Verificar dependencias de Functions
-    functions_package_path = Path("backend/functions/package.json")
+    functions_package_path = root / "backend/functions/package.json"
     if functions_package_path.exists():
         print_colored("  ✅ Functions package.json existe", 'green')
         results.add_result("Firebase", "Functions Package", True)
         
         # Verificar node_modules
-        node_modules_path = Path("backend/functions/node_modules")
+        node_modules_path = root / "backend/functions/node_modules"
         if not node_modules_path.exists():
             print_colored("⚠️ node_modules no encontrado en functions", 'yellow')
             results.add_result("Firebase", "Functions Dependencies", False, 
@@ -352,7 +375,7 @@ def validate_firebase_setup(results: ValidationResults):
         print_colored("❌ Functions package.json no encontrado", 'red')
         results.add_result("Firebase", "Functions Package", False, "package.json faltante")
 
-def validate_scripts(results: ValidationResults):
+def validate_scripts(results: ValidationResults, root: Path = Path(".")):
     """Valida que los scripts estén disponibles"""
     print_colored("🔍 Validando scripts de desarrollo...", 'cyan')
     
@@ -364,7 +387,7 @@ def validate_scripts(results: ValidationResults):
     ]
     
     for script_path in required_scripts:
-        if Path(script_path).exists():
+        if (root / script_path).exists():
             print_colored(f"  ✅ {script_path}", 'green')
             results.add_result("Scripts", script_path, True)
         else:
@@ -374,20 +397,20 @@ def validate_scripts(results: ValidationResults):
     # Verificar helpers
     helpers = ["run.bat", "run.sh"]
     for helper in helpers:
-        if Path(helper).exists():
+        if (root / helper).exists():
             print_colored(f"  ✅ {helper}", 'green')
             results.add_result("Scripts", helper, True)
         else:
             print_colored(f"  ⚠️ {helper} no encontrado", 'yellow')
             results.add_result("Scripts", helper, False, "Helper faltante")
 
-def run_health_checks(results: ValidationResults):
+def run_health_checks(results: ValidationResults, root: Path = Path(".")):
     """Ejecuta verificaciones de salud del sistema"""
     print_colored("🔍 Ejecutando verificaciones de salud...", 'cyan')
     
     # Verificar conectividad a internet
     print_colored("  🌐 Verificando conectividad...", 'blue')
-    success, _, _ = run_command("ping -c 1 8.8.8.8", timeout=10)
+    success, _, _ = run_probe("ping -c 1 8.8.8.8", timeout=10)
     if success:
         print_colored("  ✅ Conectividad a internet OK", 'green')
         results.add_result("Health", "Internet", True)
@@ -398,7 +421,7 @@ def run_health_checks(results: ValidationResults):
     # Verificar espacio en disco
     try:
         import shutil
-        total, used, free = shutil.disk_usage(".")
+        total, used, free = shutil.disk_usage(root)
         free_gb = free // (1024**3)
         if free_gb > 2:
             print_colored(f"  ✅ Espacio libre: {free_gb}GB", 'green')
@@ -479,23 +502,143 @@ def show_next_steps(results: ValidationResults):
         print_colored("3. Verificar requisitos del sistema", 'white')
         print_colored("4. Contactar al equipo si persisten los problemas", 'white')
 
+def run_all_validations(results: ValidationResults, root: Path = Path(".")):
+    """Ejecuta todas las validaciones sobre un workspace"""
+    validate_project_structure(results, root)
+    print()
+    validate_flutter_setup(results, root)
+    print()
+    validate_firebase_setup(results, root)
+    print()
+    validate_scripts(results, root)
+    print()
+    run_health_checks(results, root)
+
+def get_exit_code(summary):
+    """Código de salida según la tasa de éxito"""
+    if summary['success_rate'] >= 90:
+        return 0
+    elif summary['success_rate'] >= 70:
+        return 1
+    return 2
+
+def _init_workspace_worker(probe_cache):
+    """Inicializa cada proceso del pool con los probes ya ejecutados"""
+    _PROBE_CACHE.update(probe_cache)
+
+def validate_workspace(root: str):
+    """Valida un workspace sin imprimir nada y retorna sus resultados"""
+    results = ValidationResults()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_all_validations(results, Path(root))
+    return root, results.results
+
+def show_workspace_matrix(workspace_results: Dict[str, List[Dict]]):
+    """Muestra una matriz check x workspace con el estado de cada verificación"""
+    names = list(workspace_results)
+    
+    print_colored("\n" + "="*60, 'white')
+    print_colored(f"📊 MATRIZ DE VALIDACIÓN - {len(names)} workspaces", 'cyan')
+    print_colored("="*60, 'white')
+    
+    for index, name in enumerate(names, 1):
+        print_colored(f"   [{index}] {name}", 'white')
+    
+    # Filas en el orden de aparición de cada check
+    rows = {}
+    for name in names:
+        for result in workspace_results[name]:
+            key = (result['category'], result['item'])
+            rows.setdefault(key, {})[name] = result['status']
+    
+    width = max([len(f"{c}: {i}") for c, i in rows] + [10])
+    header = " ".join(f"{index:>3}" for index in range(1, len(names) + 1))
+    print_colored(f"\n   {'Check':<{width}} {header}", 'cyan')
+    
+    all_passed = 0
+    for (category, item), statuses in rows.items():
+        cells = []
+        for name in names:
+            status = statuses.get(name)
+            cells.append("  -" if status is None else ("  ✅" if status else "  ❌"))
+        if all(statuses.get(name) for name in names):
+            all_passed += 1
+            color = 'green'
+        else:
+            color = 'yellow'
+        print_colored(f"   {category + ': ' + item:<{width}}{''.join(cells)}", color)
+    
+    print_colored(f"\n🎯 {all_passed}/{len(rows)} checks exitosos en todos los workspaces", 'white')
+    for index, name in enumerate(names, 1):
+        results = workspace_results[name]
+        passed = len([r for r in results if r['status']])
+        rate = (passed / len(results) * 100) if results else 0
+        color = 'green' if rate >= 90 else 'yellow' if rate >= 70 else 'red'
+        print_colored(f"   [{index}] {passed}/{len(results)} ({rate:.1f}%) {name}", color)
+
+def validate_workspaces(pattern: str, jobs: Optional[int] = None):
+    """Valida todos los workspaces que coinciden con el glob usando un pool de procesos"""
+    roots = sorted(p for p in glob.glob(os.path.expanduser(pattern)) if Path(p).is_dir())
+    if not roots:
+        print_colored(f"❌ Ningún directorio coincide con: {pattern}", 'red')
+        return 2
+    
+    print_colored(f"🚀 Validando {len(roots)} workspaces en paralelo...\n", 'green')
+    started = time.perf_counter()
+    
+    # Los probes de herramientas se ejecutan una sola vez y se comparten
+    print_colored("🔍 Ejecutando probes de herramientas compartidos...", 'cyan')
+    probe_cache = probe_tools()
+    print_colored(f"  ✅ {len(probe_cache)} probes en {time.perf_counter() - started:.1f}s", 'green')
+    
+    workspace_results = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_workspace_worker,
+                             initargs=(probe_cache,)) as executor:
+        for root, results in executor.map(validate_workspace, roots):
+            workspace_results[root] = results
+    
+    show_workspace_matrix(workspace_results)
+    
+    elapsed = time.perf_counter() - started
+    print_colored(f"\n⏱️ {len(roots)} workspaces validados en {elapsed:.1f}s", 'cyan')
+    
+    # Un único run en el historial, con el workspace como prefijo de categoría
+    checks = []
+    for root, results in workspace_results.items():
+        for result in results:
+            checks.append(dict(result, category=f"{root}/{result['category']}"))
+    
+    exit_code = 0
+    for results in workspace_results.values():
+        passed = len([r for r in results if r['status']])
+        summary = {'success_rate': (passed / len(results) * 100) if results else 0}
+        exit_code = max(exit_code, get_exit_code(summary))
+    
+    versions = ValidationResults()
+    versions.results = next(iter(workspace_results.values()))
+    record_run("validate-workspaces", checks, elapsed, exit_code, versions.get_tool_versions())
+    return exit_code
+
 def main():
     """Función principal de validación mejorada"""
+    parser = argparse.ArgumentParser(description="Validación avanzada del entorno")
+    parser.add_argument('--workspaces', metavar='GLOB',
+                        help="Valida todos los checkouts que coinciden con el glob")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="Procesos paralelos para --workspaces (default: CPUs)")
+    args = parser.parse_args()
+    
+    if args.workspaces:
+        return validate_workspaces(args.workspaces, args.jobs)
+    
     print_colored("🚀 Validación Avanzada - Historia 1.1: Registro de Usuario\n", 'green')
     print_colored("🔍 Ejecutando verificaciones exhaustivas...\n", 'cyan')
     
+    started = time.perf_counter()
     results = ValidationResults()
     
     # Ejecutar todas las validaciones
-    validate_project_structure(results)
-    print()
-    validate_flutter_setup(results)
-    print()
-    validate_firebase_setup(results)
-    print()
-    validate_scripts(results)
-    print()
-    run_health_checks(results)
+    run_all_validations(results)
     
     # Mostrar reporte detallado
     show_detailed_report(results)
@@ -505,15 +648,18 @@ def main():
     
     # Retornar código de salida apropiado
     summary = results.get_summary()
-    if summary['success_rate'] >= 90:
+    exit_code = get_exit_code(summary)
+    if exit_code == 0:
         print_colored("\n🎉 ¡Validación completada exitosamente!", 'green')
-        return 0
-    elif summary['success_rate'] >= 70:
+    elif exit_code == 1:
         print_colored("\n⚠️ Validación completada con warnings.", 'yellow')
-        return 1
     else:
         print_colored("\n❌ Validación falló. Revisar errores.", 'red')
-        return 2
+    
+    # Guardar resultados en el historial local
+    record_run("validate", results.results, time.perf_counter() - started,
+               exit_code, results.get_tool_versions())
+    return exit_code
 
 if __name__ == "__main__":
     exit_code = main()
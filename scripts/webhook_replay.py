@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Replay y carga de webhooks de Stripe contra el Functions Emulator
+Ejecutar: python scripts/webhook_replay.py --count 1000 --rate 50
+
+Ejercita stripeWebhook → payment_events en local:
+- Genera eventos tipo Stripe o reproduce un stream grabado (--replay)
+- Firma cada evento con un secreto de prueba (header Stripe-Signature)
+- Siembra customers/{customerId}.companyId, de donde stripeWebhook deriva la empresa
+- Envía a tasa controlada con distintas formas de carga (constant, burst, ramp, poisson)
+- Mide latencia end-to-end: desde el POST hasta que el documento aparece en Firestore
+- Reenvía ids duplicados y verifica que se procesen de forma idempotente
+
+El emulador debe iniciarse con el mismo secreto:
+    STRIPE_WEBHOOK_SECRET=whsec_test_local firebase emulators:start
+"""
+
+import sys
+import hmac
+import json
+import time
+import random
+import hashlib
+import secrets
+import argparse
+import threading
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from common import print_colored, percentile
+from firestore_emulator import FirestoreEmulator, get_project_id
+
+DEFAULT_SECRET = "whsec_test_local"
+DEFAULT_FUNCTIONS_HOST = "localhost:5001"
+DEFAULT_REGION = "us-central1"
+
+# Mezcla de tipos de evento para streams generados
+EVENT_MIX = [
+    ('invoice.payment_failed', 0.25),
+    ('invoice.payment_succeeded', 0.55),
+    ('customer.subscription.updated', 0.20)
+]
+
+def sign_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Genera el header Stripe-Signature para un payload"""
+    timestamp = timestamp or int(time.time())
+    signed = f"{timestamp}.".encode('utf-8') + payload
+    signature = hmac.new(secret.encode('utf-8'), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+def new_run_id() -> str:
+    """Sufijo único por ejecución: ids repetidos entre corridas caerían en el camino de deduplicación"""
+    return secrets.token_hex(6)
+
+def generate_events(count: int, companies: int, run_id: str, seed: int = 7) -> List[Tuple[str, Dict]]:
+    """Genera eventos con la forma de los webhooks de Stripe"""
+    rng = random.Random(seed)
+    types = [t for t, _ in EVENT_MIX]
+    weights = [w for _, w in EVENT_MIX]
+    now = int(time.time())
+    events = []
+    for i in range(count):
+        event_type = rng.choices(types, weights)[0]
+        company_id = f"company_{rng.randrange(companies)}"
+        customer_id = f"cus_{company_id}_{rng.randrange(500)}"
+        if event_type.startswith('invoice.'):
+            obj = {
+                'id': f"in_{run_id}_{i}",
+                'object': 'invoice',
+                'customer': customer_id,
+                'amount_due': rng.randrange(500, 50_000),
+                'currency': 'usd',
+                'attempt_count': rng.randrange(1, 4)
+            }
+        else:
+            obj = {
+                'id': f"sub_{customer_id}",
+                'object': 'subscription',
+                'customer': customer_id,
+                'status': rng.choice(['active', 'past_due', 'unpaid']),
+                'currency': 'usd'
+            }
+        events.append((company_id, {
+            'id': f"evt_{run_id}_{i}",
+            'object': 'event',
+            'type': event_type,
+            'created': now - rng.randrange(0, 3600),
+            'livemode': False,
+            'data': {'object': obj}
+        }))
+    return events
+
+def load_events(path: Path, default_company: str) -> List[Tuple[str, Dict]]:
+    """Carga un stream grabado: {"companyId", "event"} por línea o eventos Stripe crudos"""
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'event' in record:
+                events.append((record.get('companyId') or default_company, record['event']))
+            else:
+                metadata = record.get('data', {}).get('object', {}).get('metadata') or {}
+                events.append((metadata.get('companyId') or default_company, record))
+    return events
+
+def with_run_ids(events: List[Tuple[str, Dict]], run_id: str) -> List[Tuple[str, Dict]]:
+    """Reescribe los ids de un stream grabado con el sufijo de la ejecución
+
+    Los duplicados dentro del stream siguen compartiendo id; entre ejecuciones no.
+    """
+    return [(company_id, dict(event, id=f"{event['id']}_{run_id}")) for company_id, event in events]
+
+def seed_customers(client: FirestoreEmulator, events: List[Tuple[str, Dict]]) -> int:
+    """Mapeo customers/{stripeCustomerId}.companyId del que stripeWebhook deriva la empresa"""
+    mapping = {}
+    for company_id, event in events:
+        obj = event.get('data', {}).get('object', {})
+        customer_id = obj.get('id') if obj.get('object') == 'customer' else obj.get('customer')
+        if customer_id:
+            mapping[customer_id] = company_id
+    # merge: no pisa los demás campos de clientes que ya existan en el emulador
+    return client.set_documents(((f"customers/{customer_id}", {'companyId': company_id})
+                                 for customer_id, company_id in mapping.items()), merge=True)
+
+def build_schedule(count: int, rate: float, shape: str, burst_size: int, seed: int = 7) -> List[float]:
+    """Offsets de envío en segundos; la tasa promedio es `rate` eventos/s en todas las formas"""
+    rng = random.Random(seed)
+    offsets = []
+    elapsed = 0.0
+    for i in range(count):
+        if shape == 'burst':
+            # Grupos de burst_size simultáneos, espaciados para mantener la tasa promedio
+            offsets.append((i // burst_size) * burst_size / rate)
+            continue
+        if shape == 'ramp':
+            # La tasa crece linealmente de 10% a 190% de `rate`
+            current = rate * (0.1 + 1.8 * i / max(1, count - 1))
+            elapsed += 1.0 / current
+        elif shape == 'poisson':
+            elapsed += rng.expovariate(rate)
+        else:
+            elapsed += 1.0 / rate
+        offsets.append(elapsed)
+    return offsets
+
+def add_duplicates(plan: List[Tuple[float, str, Dict]], fraction: float,
+                   seed: int = 7) -> Tuple[List[Tuple[float, str, Dict]], set]:
+    """Reenvía una fracción de eventos con el mismo id un poco después del original"""
+    rng = random.Random(seed)
+    count = int(len(plan) * fraction)
+    duplicated = rng.sample(range(len(plan)), count) if count else []
+    extra = []
+    for index in duplicated:
+        offset, company_id, event = plan[index]
+        extra.append((offset + rng.uniform(0.05, 1.0), company_id, event))
+    combined = sorted(plan + extra, key=lambda item: item[0])
+    return combined, {plan[i][2]['id'] for i in duplicated}
+
+class WebhookSender:
+    """Envía eventos firmados reutilizando una conexión keep-alive por hilo"""
+
+    def __init__(self, host: str, path: str, secret: str, timeout: float = 30):
+        self.host = host
+        self.path = path
+        self.secret = secret
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self):
+        if getattr(self.local, 'conn', None) is None:
+            self.local.conn = http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return self.local.conn
+
+    def send(self, company_id: str, payload: bytes) -> Tuple[int, float]:
+        """POST firmado; retorna (status HTTP, latencia en segundos). Status 0 = error de red"""
+        headers = {
+            'Content-Type': 'application/json',
+            'Stripe-Signature': sign_payload(payload, self.secret)
+        }
+        started = time.perf_counter()
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                query = urllib.parse.quote(company_id, safe='')
+                conn.request('POST', f"{self.path}?companyId={query}", body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status, time.perf_counter() - started
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self.local.conn = None
+                if attempt == 1:
+                    return 0, time.perf_counter() - started
+        return 0, time.perf_counter() - started
+
+class IngestTracker:
+    """Detecta cuándo aparece cada payment_events/{id} consultando el emulador por lotes"""
+
+    def __init__(self, client: FirestoreEmulator, poll_interval: float = 0.02, batch_size: int = 300):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.pending = {}
+        self.latencies = {}
+        self.update_times = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def expect(self, event_id: str, sent_at: float):
+        with self.lock:
+            if event_id not in self.latencies and event_id not in self.pending:
+                self.pending[event_id] = sent_at
+
+    def wait(self, timeout: float) -> int:
+        """Espera a que aparezcan todos los documentos; retorna cuántos faltan"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self.lock:
+                if not self.pending:
+                    break
+            time.sleep(self.poll_interval)
+        self.stopped.set()
+        self.thread.join()
+        return len(self.pending)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            with self.lock:
+                batch = list(self.pending.items())[:self.batch_size]
+            if not batch:
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                found = self.client.batch_get([f"payment_events/{event_id}" for event_id, _ in batch])
+            except Exception:
+                time.sleep(self.poll_interval)
+                continue
+            seen_at = time.perf_counter()
+            with self.lock:
+                for event_id, sent_at in batch:
+                    document = found.get(f"payment_events/{event_id}")
+                    if document is not None:
+                        self.pending.pop(event_id, None)
+                        self.latencies[event_id] = seen_at - sent_at
+                        self.update_times[event_id] = document.get('updateTime')
+            if len(batch) < self.batch_size:
+                time.sleep(self.poll_interval)
+
+def verify_idempotency(client: FirestoreEmulator, tracker: IngestTracker,
+                       duplicated: set) -> Tuple[int, List[str]]:
+    """Comprueba que los reenvíos no modificaron el documento original"""
+    ids = [event_id for event_id in duplicated if event_id in tracker.update_times]
+    changed = []
+    for start in range(0, len(ids), 300):
+        chunk = ids[start:start + 300]
+        found = client.batch_get([f"payment_events/{event_id}" for event_id in chunk])
+        for event_id in chunk:
+            document = found.get(f"payment_events/{event_id}")
+            if document is None or document.get('updateTime') != tracker.update_times[event_id]:
+                changed.append(event_id)
+    return len(ids), changed
+
+def show_report(results: List[Tuple[str, int, float]], elapsed: float, tracker: IngestTracker,
+                missing: int, duplicate_check: Tuple[int, List[str]], duplicated: set):
+    """Muestra throughput, latencias y resultado de idempotencia"""
+    statuses = {}
+    for _, status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    accepted = sum(count for status, count in statuses.items() if 200 <= status < 300)
+    post_latencies = [latency * 1000 for _, status, latency in results if 200 <= status < 300]
+    ingest_latencies = [latency * 1000 for latency in tracker.latencies.values()]
+
+    print_colored("\n" + "="*60, 'white')
+    print_colored("📊 REPORTE DE WEBHOOKS", 'cyan')
+    print_colored("="*60, 'white')
+    print_colored(f"   Enviados: {len(results)} en {elapsed:.1f}s ({len(results) / elapsed:.1f} req/s)", 'white')
+    print_colored(f"   ✅ Aceptados (2xx): {accepted}", 'green')
+    for status, count in sorted(statuses.items()):
+        if not 200 <= status < 300:
+            label = "error de red" if status == 0 else f"HTTP {status}"
+            print_colored(f"   ❌ {label}: {count}", 'red')
+
+    print_colored("\n⏱️ Latencia POST (ms):", 'white')
+    print_colored(f"   p50={percentile(post_latencies, 50):.1f}  p95={percentile(post_latencies, 95):.1f}  "
+                  f"p99={percentile(post_latencies, 99):.1f}", 'white')
+    print_colored("⏱️ Latencia de ingesta POST → documento en Firestore (ms):", 'white')
+    print_colored(f"   p50={percentile(ingest_latencies, 50):.1f}  p95={percentile(ingest_latencies, 95):.1f}  "
+                  f"p99={percentile(ingest_latencies, 99):.1f}  "
+                  f"max={max(ingest_latencies) if ingest_latencies else 0:.1f}", 'white')
+    if missing:
+        print_colored(f"   ⚠️ {missing} documentos no aparecieron antes del timeout", 'yellow')
+
+    checked, changed = duplicate_check
+    if duplicated:
+        if changed:
+            print_colored(f"\n❌ Idempotencia: {len(changed)}/{checked} eventos duplicados "
+                          f"modificaron el documento (ej: {changed[0]})", 'red')
+        else:
+            print_colored(f"\n✅ Idempotencia: {checked} eventos reenviados sin cambios en payment_events", 'green')
+
+def main():
+    """Función principal del harness de webhooks"""
+    parser = argparse.ArgumentParser(description="Replay y carga de webhooks de Stripe en local")
+    parser.add_argument('--replay', type=Path, help="Stream grabado en JSONL a reproducir")
+    parser.add_argument('--record', type=Path, help="Guardar el stream generado en JSONL")
+    parser.add_argument('--count', type=int, default=500, help="Eventos a generar")
+    parser.add_argument('--companies', type=int, default=5, help="Empresas para eventos generados")
+    parser.add_argument('--company', default="company_0", help="companyId por defecto en --replay")
+    parser.add_argument('--rate', type=float, default=50, help="Tasa promedio en eventos/s")
+    parser.add_argument('--shape', choices=['constant', 'burst', 'ramp', 'poisson'], default='constant')
+    parser.add_argument('--burst-size', type=int, default=50, help="Eventos por ráfaga (--shape burst)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Envíos simultáneos máximos")
+    parser.add_argument('--duplicates', type=float, default=0.05, help="Fracción de eventos a reenviar")
+    parser.add_argument('--secret', default=DEFAULT_SECRET, help="Secreto de firma de prueba")
+    parser.add_argument('--functions-host', default=DEFAULT_FUNCTIONS_HOST)
+    parser.add_argument('--region', default=DEFAULT_REGION)
+    parser.add_argument('--timeout', type=float, default=60, help="Espera máxima de ingesta (s)")
+    args = parser.parse_args()
+
+    run_id = new_run_id()
+    events = with_run_ids(load_events(args.replay, args.company), run_id) if args.replay \
+        else generate_events(args.count, args.companies, run_id)
+    if args.record:
+        with open(args.record, 'w', encoding='utf-8') as f:
+            for company_id, event in events:
+                f.write(json.dumps({'companyId': company_id, 'event': event}) + "\n")
+        print_colored(f"💾 Stream guardado en {args.record}", 'green')
+
+    offsets = build_schedule(len(events), args.rate, args.shape, args.burst_size)
+    plan = [(offset, company_id, event) for offset, (company_id, event) in zip(offsets, events)]
+    plan, duplicated = add_duplicates(plan, args.duplicates)
+    payloads = {event['id']: json.dumps(event).encode('utf-8') for _, event in events}
+
+    project_id = get_project_id()
+    sender = WebhookSender(args.functions_host, f"/{project_id}/{args.region}/stripeWebhook", args.secret)
+    client = FirestoreEmulator(project_id=project_id)
+    tracker = IngestTracker(FirestoreEmulator(project_id=project_id))
+    seeded = seed_customers(client, events)
+    print_colored(f"👥 {seeded} clientes mapeados a su empresa en customers/", 'white')
+
+    print_colored(f"🚀 Enviando {len(plan)} webhooks ({len(duplicated)} duplicados) "
+                  f"a {args.rate:g} ev/s, forma '{args.shape}'...", 'green')
+
+    results = []
+    results_lock = threading.Lock()
+
+    def deliver(company_id, event):
+        sent_at = time.perf_counter()
+        status, latency = sender.send(company_id, payloads[event['id']])
+        if 200 <= status < 300:
+            tracker.expect(event['id'], sent_at)
+        with results_lock:
+            results.append((event['id'], status, latency))
+
+    tracker.start()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for offset, company_id, event in plan:
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(deliver, company_id, event)
+        elapsed = time.perf_counter() - started
+        missing = tracker.wait(args.timeout)
+        duplicate_check = verify_idempotency(client, tracker, duplicated)
+    except KeyboardInterrupt:
+        print_colored("\n🛑 Envío interrumpido", 'yellow')
+        return 1
+    finally:
+        client.close()
+        tracker.client.close()
+
+    show_report(results, elapsed, tracker, missing, duplicate_check, duplicated)
+    failed = any(not 200 <= status < 300 for _, status, _ in results)
+    return 1 if failed or missing or duplicate_check[1] else 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)